@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+BatchRunner module processing queries from a JSONL file with bounded concurrency.
+
+Each input line is a JSON object with a "query" and optionally an "id" and a
+"session". Queries of one session run in order and share a conversation
+memory; different sessions run concurrently on one agent, sharing its LLM
+cache, connection pool and tool prefetcher. Every result is appended to the
+output JSONL as soon as it is ready, so an interrupted run resumes where it
+stopped.
+
+Usage:
+    python batch_runner.py queries.jsonl responses.jsonl --concurrency 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Any, List, Optional, TextIO
+
+from main import LLMFlowAgent, ConversationMemory, format_llm_usage
+from model_tiers import collect_timings, collect_usage
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Compute a percentile with linear interpolation between the closest ranks.
+
+    Args:
+        values (List[float]): Samples
+        pct (float): Percentile between 0 and 100
+
+    Returns:
+        float: The percentile, or 0.0 without samples
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def load_records(path: str, query_field: str = "query") -> List[Dict[str, Any]]:
+    """
+    Read the queries of a batch.
+
+    Args:
+        path (str): Input JSONL file
+        query_field (str): Field holding the query text
+
+    Returns:
+        List[Dict[str, Any]]: Records with "id", "session" and "query", in file order;
+            lines without a query are skipped
+    """
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                print(f"Skipping line {line_number} of {path}: {str(e)}")
+                continue
+            query = record.get(query_field) if isinstance(record, dict) else None
+            if not isinstance(query, str) or not query.strip():
+                print(f"Skipping line {line_number} of {path}: no '{query_field}' field")
+                continue
+            records.append({
+                "id": str(record.get("id", record.get("request_id", f"line-{line_number}"))),
+                "session": record.get("session", record.get("session_id")),
+                "query": query
+            })
+    return records
+
+
+def load_completed(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Read the results of an interrupted run and drop a partially written last line.
+
+    Args:
+        path (str): Output JSONL file
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Completed results by record id
+    """
+    if not os.path.exists(path):
+        return {}
+    completed = {}
+    valid_lines = []
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    for line in lines:
+        try:
+            result = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(result, dict) and "id" in result:
+            completed[result["id"]] = result
+            valid_lines.append(line if line.endswith("\n") else line + "\n")
+    if valid_lines != lines:
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(valid_lines)
+    return completed
+
+
+class BatchRunner:
+    """
+    Runner feeding a batch of queries through one agent.
+
+    Concurrency is bounded by a semaphore over queries in progress; sessions
+    are the unit of parallelism, since the turns of a conversation depend on
+    each other. Each result records the response, the end-to-end latency, the
+    seconds spent per stage (LLM stages by name, tool calls as "tool") and the
+    tokens and seconds Ollama spent evaluating the prompts and generating.
+    """
+
+    def __init__(self, agent: LLMFlowAgent, concurrency: int = 4):
+        """
+        Initialize the runner.
+
+        Args:
+            agent (LLMFlowAgent): Agent processing the queries
+            concurrency (int): Maximum number of queries in progress at once
+        """
+        self.agent = agent
+        self.concurrency = max(1, concurrency)
+
+    @staticmethod
+    def _group_by_session(records: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Split records into conversations: one per session id, one per record without a session."""
+        groups: Dict[Any, List[Dict[str, Any]]] = {}
+        for index, record in enumerate(records):
+            key = ("session", record["session"]) if record["session"] is not None else ("record", index)
+            groups.setdefault(key, []).append(record)
+        return list(groups.values())
+
+    async def _run_session(self, records: List[Dict[str, Any]], completed: Dict[str, Dict[str, Any]],
+                           semaphore: asyncio.Semaphore, output: TextIO,
+                           results: List[Dict[str, Any]]) -> None:
+        """Process the records of one conversation in order, replaying the turns already completed."""
+        memory = ConversationMemory()
+        for record in records:
+            done = completed.get(record["id"])
+            if done is not None:
+                memory.add_message("user", record["query"])
+                memory.add_message("assistant", str(done.get("response", "")))
+                continue
+
+            async with semaphore:
+                result = {"id": record["id"], "session": record["session"], "query": record["query"]}
+                start = time.perf_counter()
+                with collect_timings() as timings, collect_usage() as usage:
+                    try:
+                        result["response"] = await self.agent.aprocess_query(record["query"], memory=memory)
+                    except Exception as e:
+                        print(f"Error processing batch record {record['id']}: {str(e)}")
+                        result["response"] = None
+                        result["error"] = str(e)
+                result["latency"] = round(time.perf_counter() - start, 4)
+                result["stages"] = {stage: round(seconds, 4) for stage, seconds in timings.as_dict().items()}
+                result["llm_usage"] = usage.summary()
+
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            results.append(result)
+
+    async def arun(self, records: List[Dict[str, Any]], output_path: str, resume: bool = True) -> Dict[str, Any]:
+        """
+        Process a batch and append the results to a JSONL file.
+
+        Args:
+            records (List[Dict[str, Any]]): Records from load_records
+            output_path (str): Output JSONL file
+            resume (bool): Skip records already in the output file; if False the file is overwritten
+
+        Returns:
+            Dict[str, Any]: Summary with counts, throughput, latency percentiles and cache hit rates
+        """
+        completed = load_completed(output_path) if resume else {}
+        results: List[Dict[str, Any]] = []
+        semaphore = asyncio.Semaphore(self.concurrency)
+        start = time.perf_counter()
+        with open(output_path, "a" if resume else "w", encoding="utf-8") as output:
+            await asyncio.gather(*(
+                self._run_session(group, completed, semaphore, output, results)
+                for group in self._group_by_session(records)
+            ))
+        elapsed = time.perf_counter() - start
+        return self.summarize(results, elapsed, skipped=sum(1 for record in records if record["id"] in completed))
+
+    def run(self, records: List[Dict[str, Any]], output_path: str, resume: bool = True) -> Dict[str, Any]:
+        """
+        Synchronous wrapper around arun running on the agent's event loop.
+
+        Args:
+            records (List[Dict[str, Any]]): Records from load_records
+            output_path (str): Output JSONL file
+            resume (bool): Skip records already in the output file; if False the file is overwritten
+
+        Returns:
+            Dict[str, Any]: Summary of the run
+        """
+        return self.agent.run_coroutine(self.arun(records, output_path, resume=resume))
+
+    def summarize(self, results: List[Dict[str, Any]], elapsed: float, skipped: int = 0) -> Dict[str, Any]:
+        """
+        Summarize the results of a run.
+
+        Args:
+            results (List[Dict[str, Any]]): Results written during this run
+            elapsed (float): Wall-clock seconds of the run
+            skipped (int): Records already completed by an earlier run
+
+        Returns:
+            Dict[str, Any]: Processed, skipped and failed counts, throughput in queries per
+                second, latency percentiles in seconds, mean seconds per stage, cache hit rates
+                and the agent's LLM usage per query type and stage
+        """
+        latencies = [result["latency"] for result in results]
+        stage_totals: Dict[str, float] = {}
+        for result in results:
+            for stage, seconds in result["stages"].items():
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+
+        llm_cache = self.agent.llm_cache.get_stats()
+        stage_stats = self.agent.model_tiers.get_stats()
+        hit_rates = {"llm_cache": llm_cache["hit_rate"]}
+        hit_rates.update({
+            f"llm_cache.{stage}": values["cache_hits"] / values["calls"]
+            for stage, values in stage_stats.items() if values["calls"]
+        })
+        if self.agent.fast_router is not None:
+            hit_rates["fast_path"] = self.agent.fast_router.get_stats()["hit_rate"]
+        if self.agent.prefetch_tools:
+            hit_rates["tool_prefetch"] = self.agent.prefetcher.get_stats()["hit_rate"]
+        step_cache = self.agent.step_cache.get_stats()
+        if step_cache["hits"] + step_cache["misses"]:
+            hit_rates["chain_step_cache"] = step_cache["hit_rate"]
+
+        return {
+            "processed": len(results),
+            "skipped": skipped,
+            "errors": sum(1 for result in results if "error" in result),
+            "elapsed": elapsed,
+            "throughput": len(results) / elapsed if elapsed > 0 else 0.0,
+            "latency": {f"p{pct}": percentile(latencies, pct) for pct in (50, 95, 99)},
+            "stages": {stage: total / len(results) for stage, total in sorted(stage_totals.items())},
+            "hit_rates": hit_rates,
+            "llm_usage": self.agent.get_llm_usage()
+        }
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    """Print a batch summary."""
+    print(f"Processed {summary['processed']} queries ({summary['skipped']} already done, "
+          f"{summary['errors']} errors) in {summary['elapsed']:.1f}s: {summary['throughput']:.2f} queries/s")
+    latency = summary["latency"]
+    print(f"Latency p50 {latency['p50'] * 1000:.0f}ms  p95 {latency['p95'] * 1000:.0f}ms  "
+          f"p99 {latency['p99'] * 1000:.0f}ms")
+    if summary["stages"]:
+        print("Mean seconds per query by stage: " +
+              ", ".join(f"{stage} {seconds:.3f}" for stage, seconds in summary["stages"].items()))
+    print("Hit rates: " + ", ".join(f"{name} {rate:.0%}" for name, rate in summary["hit_rates"].items()))
+    if summary["llm_usage"]["queries"]:
+        print(format_llm_usage(summary["llm_usage"]))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Process queries from a JSONL file with LLMFlowAgent")
+    parser.add_argument("input", help="JSONL file with one {\"query\", \"id\"?, \"session\"?} object per line")
+    parser.add_argument("output", help="JSONL file the results are appended to")
+    parser.add_argument("--concurrency", type=int, default=4, help="Queries processed at once")
+    parser.add_argument("--query-field", default="query", help="Input field holding the query text")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of resuming")
+    parser.add_argument("--ollama-url", default="http://localhost:11434", help="Ollama server URL")
+    parser.add_argument("--model", default=None, help="Default LLM model")
+    parser.add_argument("--cache-path", default=None, help="SQLite file persisting the LLM response cache")
+    parser.add_argument("--deadline", type=float, default=None, help="Seconds each query may take")
+    parser.add_argument("--trace-file", default=None, help="JSON-lines file spans of every query are appended to")
+    args = parser.parse_args(argv)
+
+    records = load_records(args.input, query_field=args.query_field)
+    options = {"ollama_url": args.ollama_url, "cache_path": args.cache_path,
+               "max_in_flight": max(4, args.concurrency), "deadline": args.deadline,
+               "trace_path": args.trace_file}
+    if args.model:
+        options["model"] = args.model
+    agent = LLMFlowAgent(**options)
+    try:
+        summary = BatchRunner(agent, concurrency=args.concurrency).run(
+            records, args.output, resume=not args.no_resume
+        )
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun with the same output file to resume")
+        return
+    finally:
+        agent.close()
+    print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
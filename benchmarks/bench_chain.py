@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Compare chain wall time with sequential and dependency-aware parallel steps.
+
+The chains are made of N independent steps calling stand-in tools that each
+take --tool-ms, so run one after another they take the sum of the step times
+and run concurrently about the longest one. A chain whose every step reads the
+previous step's output is timed too; it cannot overlap in either mode.
+
+Usage:
+    python -m benchmarks.bench_chain --steps 1,2,4,8 --tool-ms 200
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+from unittest.mock import patch
+
+from chain_orchestrator import ChainStep
+from main import LLMFlowAgent
+
+
+def make_tools(tool_latency: float, count: int):
+    """Build stand-in tools that sleep like a network call."""
+    def lookup(query: str) -> str:
+        time.sleep(tool_latency)
+        return f"result for {query}"
+    return {f"tool{index}": {"module": None, "functions": {"lookup": lookup}} for index in range(count)}
+
+
+def independent_chain(count: int):
+    return [ChainStep(f"tool{index}", "lookup", {"query": f"city {index}"}, f"out{index}") for index in range(count)]
+
+
+def dependent_chain(count: int):
+    return [ChainStep(f"tool{index}", "lookup", {"query": f"{{{{out{index - 1}}}}}" if index else "city"},
+                      f"out{index}") for index in range(count)]
+
+
+def chain_seconds(tools, chain, parallel: bool) -> float:
+    """Wall seconds of one chain execution."""
+    with contextlib.redirect_stdout(io.StringIO()), \
+            patch.object(LLMFlowAgent, '_discover_tools', return_value=tools), \
+            patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
+        agent = LLMFlowAgent(parallel_chains=parallel, tool_pool_sizes={"io": max(len(chain), 1)})
+    try:
+        start = time.perf_counter()
+        asyncio.run(agent.orchestrator.execute_chain(chain))
+        return time.perf_counter() - start
+    finally:
+        agent.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", default="1,2,4,8", help="Comma-separated chain lengths")
+    parser.add_argument("--tool-ms", type=float, default=200, help="Latency of each stand-in tool call")
+    args = parser.parse_args()
+    tool_latency = args.tool_ms / 1000
+
+    print(f"{'chain':<14}{'steps':>6}{'sum':>10}{'sequential':>12}{'parallel':>10}{'speed-up':>10}")
+    for count in (int(value) for value in args.steps.split(",")):
+        tools = make_tools(tool_latency, count)
+        for label, chain in (("independent", independent_chain(count)), ("dependent", dependent_chain(count))):
+            sequential = chain_seconds(tools, chain, parallel=False)
+            parallel = chain_seconds(tools, chain, parallel=True)
+            print(f"{label:<14}{count:>6}{count * tool_latency:>9.2f}s{sequential:>11.2f}s"
+                  f"{parallel:>9.2f}s{sequential / parallel:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Compare chain step conditions evaluated locally with the LLM round trip they replace.
+
+Each condition is evaluated over a small weather and stock context by the local
+evaluator, and through a full chain step with the stub Ollama server answering
+condition prompts after --llm-ms when the evaluator is bypassed.
+
+Usage:
+    python -m benchmarks.bench_conditions --iterations 100000 --llm-ms 150
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+from unittest.mock import patch
+
+from benchmarks.stub_ollama import StubOllamaServer
+from chain_orchestrator import ChainStep
+from condition_evaluator import ConditionEvaluator
+from main import LLMFlowAgent
+
+CONTEXT = {"weather_data": {"precipitation": {"rain": 1.5}, "temperature": 21.0, "conditions": "Rain"},
+           "stock_data": {"change_percent": -2.4, "symbol": "AAPL"}}
+
+CONDITIONS = [
+    "weather_data['precipitation']['rain'] > 0",
+    "weather_data['conditions'] in ('Rain', 'Snow') and weather_data['temperature'] < 25",
+    "not stock_data['change_percent'] >= -1 or stock_data['symbol'] == 'MSFT'"
+]
+
+
+def local_microseconds(condition: str, iterations: int) -> float:
+    """Microseconds per local evaluation of condition."""
+    evaluator = ConditionEvaluator()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        evaluator.evaluate(condition, CONTEXT)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def chain_step_milliseconds(url: str, condition: str, local: bool, repeats: int) -> float:
+    """Median milliseconds of a conditional chain step whose tool returns at once."""
+    tools = {"weather": {"module": None, "functions": {"get_weather": lambda location: CONTEXT["weather_data"]}}}
+    with contextlib.redirect_stdout(io.StringIO()), \
+            patch.object(LLMFlowAgent, '_discover_tools', return_value=tools), \
+            patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
+        agent = LLMFlowAgent(ollama_url=url, cache_size=0)
+    if not local:
+        agent.orchestrator.conditions.evaluate = lambda expression, context: None
+    chain = [ChainStep("weather", "get_weather", {"location": "Tokyo"}, "weather_data", condition=condition)]
+    timings = []
+    try:
+        for _ in range(repeats):
+            agent.orchestrator.cache.clear()
+            start = time.perf_counter()
+            asyncio.run(agent.orchestrator.execute_chain(chain, dict(CONTEXT)))
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        agent.close()
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100000, help="Local evaluations per condition")
+    parser.add_argument("--llm-ms", type=float, default=150, help="Latency of the stub LLM per condition prompt")
+    parser.add_argument("--repeats", type=int, default=10, help="Chain executions per measurement")
+    args = parser.parse_args()
+
+    with StubOllamaServer(responder=lambda payload: "True", latency=args.llm_ms / 1000) as stub:
+        print(f"{'local eval':>11}{'step (local)':>14}{'step (LLM)':>12}  condition")
+        for condition in CONDITIONS:
+            local = local_microseconds(condition, args.iterations)
+            step_local = chain_step_milliseconds(stub.url, condition, True, args.repeats)
+            step_llm = chain_step_milliseconds(stub.url, condition, False, args.repeats)
+            print(f"{local:>9.2f}us{step_local:>12.2f}ms{step_llm:>10.2f}ms  {condition}")
+
+
+if __name__ == "__main__":
+    main()
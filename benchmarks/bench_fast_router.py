@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Measure fast-path router coverage and precision on a labeled query set.
+
+Each query is labeled with the (tool, function, args) route it should take, or
+None when it needs the LLM. The sweep over thresholds shows how many LLM
+routing calls the fast path removes and how often a routed query is wrong.
+
+Usage:
+    python -m benchmarks.bench_fast_router --thresholds 0.8 0.9 0.95
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from typing import Any, List, Optional, Tuple
+
+from fast_router import FastPathRouter
+from main import LLMFlowAgent
+
+LABELED_QUERIES: List[Tuple[str, Optional[Tuple[str, str, List[Any]]]]] = [
+    ("convert 100 USD to EUR", ("currency", "convert_currency", [100, "USD", "EUR"])),
+    ("how much is 250 dollars in yen?", ("currency", "convert_currency", [250, "USD", "JPY"])),
+    ("GBP to CHF", ("currency", "convert_currency", [1, "GBP", "CHF"])),
+    ("weather in Madrid", ("weather", "get_weather", ["Madrid"])),
+    ("what's the weather in london?", ("weather", "get_weather", ["London"])),
+    ("is it raining in paris", ("weather", "get_weather", ["Paris"])),
+    ("current temperature in new york", ("weather", "get_weather", ["New York"])),
+    ("time in Tokyo", ("time", "get_current_time", ["Tokyo"])),
+    ("what time is it in sydney?", ("time", "get_current_time", ["Sydney"])),
+    ("time difference between dubai and singapore", ("time", "get_time_difference", ["Dubai", "Singapore"])),
+    ("air quality in beijing", ("air_quality", "get_air_quality", ["Beijing"])),
+    ("how's the pollution in los angeles today?", ("air_quality", "get_air_quality", ["Los Angeles"])),
+    ("tell me about the planet jupiter", ("astronomy", "get_planet_info", ["Jupiter"])),
+    ("weather in Springfield", ("weather", "get_weather", ["Springfield"])),
+    ("convert 3pm New York time to London", None),
+    ("weather in Tokyo and the time in Paris", None),
+    ("if it is raining in London, find indoor activities", None),
+    ("news about the weather in Madrid", None),
+    ("what's a good time to visit tokyo", None),
+    ("is it a good time to call london", None),
+    ("I lived in london for a long time", None),
+    ("mars bar calories", None),
+    ("what is the weather like in paris texas", None),
+    ("what was the weather in london last week", None),
+    ("what is the stock price of apple?", None),
+    ("who was Marie Curie?", None),
+    ("hello, how are you?", None),
+    ("thanks!", None),
+]
+
+
+def evaluate(router: FastPathRouter) -> dict:
+    """Route the labeled set and count correct and wrong fast-path routes."""
+    correct = wrong = 0
+    start = time.perf_counter()
+    for query, expected in LABELED_QUERIES:
+        route = router.route(query)
+        if route is None:
+            continue
+        if expected == (route["tool"], route["function"], route["args"]):
+            correct += 1
+        else:
+            wrong += 1
+    elapsed = time.perf_counter() - start
+    stats = router.get_stats()
+    stats.update({
+        "correct": correct,
+        "wrong": wrong,
+        "precision": correct / (correct + wrong) if correct + wrong else 1.0,
+        "routable": sum(1 for _, expected in LABELED_QUERIES if expected),
+        "us_per_query": elapsed / len(LABELED_QUERIES) * 1e6,
+    })
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.7, 0.8, 0.9, 0.95])
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent = LLMFlowAgent()
+    print(f"{len(LABELED_QUERIES)} labeled queries, "
+          f"{sum(1 for _, expected in LABELED_QUERIES if expected)} with a deterministic route")
+    for threshold in args.thresholds:
+        stats = evaluate(FastPathRouter(agent.tools, agent.tool_name_map, threshold=threshold))
+        print(f"threshold={threshold:.2f} hit_rate={stats['hit_rate']:.2f} "
+              f"precision={stats['precision']:.2f} wrong={stats['wrong']} "
+              f"avg_conf={stats['avg_hit_confidence']:.2f} {stats['us_per_query']:.0f}us/query")
+    print("Best-match confidence histogram:", stats["confidence_histogram"])
+    agent.close()
+
+
+if __name__ == "__main__":
+    main()
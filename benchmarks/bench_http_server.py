@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Load-test the HTTP serving mode against the stub Ollama server.
+
+Each simulated client holds one session and sends --turns queries back to
+back over a keep-alive connection. The stub answers every LLM call after
+--latency-ms, so throughput is bounded by how many queries the server
+admits at once. Rejected requests (503) are counted, not retried.
+
+Usage:
+    python -m benchmarks.bench_http_server --clients 32 --turns 5
+"""
+
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import threading
+import time
+from typing import List, Tuple
+
+from batch_runner import percentile
+from benchmarks.stub_ollama import StubOllamaServer
+from http_server import AgentHTTPServer
+from main import LLMFlowAgent
+
+ROUTE = json.dumps({"entities": {}, "type": "casual_conversation", "tool": None, "function": None,
+                    "args": [], "explanation": "", "language": "en", "translation": None})
+
+
+def respond(payload):
+    """Route everything to casual conversation and answer briefly."""
+    return ROUTE if payload["prompt"].startswith("You are the router") else "Sure, happy to help."
+
+
+def client(server: AgentHTTPServer, client_id: int, turns: int, results: List[Tuple[int, float]]) -> None:
+    """Run one session's turns over a single keep-alive connection."""
+    connection = http.client.HTTPConnection(server.host, server.port, timeout=60)
+    for turn in range(turns):
+        body = json.dumps({"query": f"chat message {turn} from client {client_id}", "session": f"client-{client_id}"})
+        start = time.perf_counter()
+        connection.request("POST", "/query", body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        results.append((response.status, time.perf_counter() - start))
+    connection.close()
+
+
+def run(url: str, clients: int, turns: int, max_in_flight: int, max_queue: int) -> None:
+    """Serve one configuration and print its throughput, latency and rejections."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent = LLMFlowAgent(ollama_url=url, cache_size=0, max_in_flight=max_in_flight,
+                             pool_size=max(10, max_in_flight))
+        server = AgentHTTPServer(agent, port=0, max_in_flight=max_in_flight, max_queue=max_queue).start_background()
+        results: List[Tuple[int, float]] = []
+        threads = [threading.Thread(target=client, args=(server, i, turns, results)) for i in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        stats = server.get_stats()
+        server.stop()
+        agent.close()
+
+    latencies = [latency * 1000 for status, latency in results if status == 200]
+    rejected = sum(1 for status, _ in results if status == 503)
+    print(f"in-flight {max_in_flight:>3}, queue {max_queue:>3}: {len(latencies) / elapsed:7.1f} queries/s  "
+          f"p50 {percentile(latencies, 50):7.1f}ms  p95 {percentile(latencies, 95):7.1f}ms  "
+          f"p99 {percentile(latencies, 99):7.1f}ms  rejected {rejected}  "
+          f"sessions {stats['sessions']['active']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent sessions")
+    parser.add_argument("--turns", type=int, default=5, help="Queries per session")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Simulated time per LLM call")
+    args = parser.parse_args()
+
+    print(f"{args.clients} sessions x {args.turns} turns, {args.latency_ms:.0f}ms per LLM call:")
+    for max_in_flight, max_queue in ((1, 64), (4, 64), (16, 64), (4, 4)):
+        with StubOllamaServer(responder=respond, latency=args.latency_ms / 1000) as stub:
+            run(stub.url, args.clients, args.turns, max_in_flight, max_queue)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-call overhead of a fresh connection per prompt versus the pooled OllamaClient.
+
+Runs against a local stub server so only HTTP/connection overhead is measured.
+
+Usage:
+    python -m benchmarks.bench_ollama_client --calls 500
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+import requests
+
+from benchmarks.stub_ollama import StubOllamaServer
+from ollama_client import OllamaClient
+
+
+def _time_calls(call: Callable[[], None], calls: int) -> List[float]:
+    """Run a callable repeatedly and return per-call latencies in milliseconds."""
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def _report(label: str, latencies: List[float], connections: int) -> None:
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{label:<22} mean={statistics.mean(latencies):7.3f}ms "
+          f"p50={statistics.median(latencies):7.3f}ms p95={p95:7.3f}ms "
+          f"connections={connections}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=300, help="Number of generate calls per mode")
+    args = parser.parse_args()
+
+    with StubOllamaServer() as stub:
+        url = f"{stub.url}/api/generate"
+        payload = {"model": "stub", "prompt": "ping", "stream": False}
+
+        def fresh_connection() -> None:
+            response = requests.post(url, json=payload, timeout=60)
+            response.raise_for_status()
+            response.json()
+
+        before = _time_calls(fresh_connection, args.calls)
+        fresh_connections = stub.connections
+
+        client = OllamaClient(stub.url)
+        after = _time_calls(lambda: client.generate("stub", "ping"), args.calls)
+        pooled_connections = stub.connections - fresh_connections
+        client.close()
+
+    print(f"Per-call overhead over {args.calls} calls against a local stub server:")
+    _report("requests.post (before)", before, fresh_connections)
+    _report("OllamaClient (after)", after, pooled_connections)
+    saved = statistics.mean(before) - statistics.mean(after)
+    print(f"Saved per call: {saved:.3f}ms ({saved / statistics.mean(before) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Compare tool-query latency with and without speculative tool prefetch.
+
+The stub Ollama server answers routing prompts after --route-ms, and the
+tool functions are stand-ins that take --tool-ms. Queries name a known city
+or currency pair but join two requests, so the fast path leaves them to the
+LLM; with prefetch the tool call the entities point to runs during routing.
+
+Usage:
+    python -m benchmarks.bench_prefetch --route-ms 300 --tool-ms 200
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import time
+import types
+from unittest.mock import patch
+
+from benchmarks.stub_ollama import StubOllamaServer
+from main import LLMFlowAgent
+
+ROUTE = {"entities": {}, "explanation": "", "language": "en", "translation": None}
+
+# Query -> the tool call the LLM settles on
+QUERIES = {
+    "weather in Madrid and then something fun to do": ("weather", "get_weather", ["Madrid"]),
+    "weather in Tokyo and is it a good day for a walk": ("weather", "get_weather", ["Tokyo"]),
+    "convert 250 USD to EUR and tell me if that is a lot": ("currency", "convert_currency", [250, "USD", "EUR"]),
+    "weather in London and also the news": ("weather", "get_weather", ["London"])
+}
+
+
+def make_tools(tool_latency: float):
+    """Build stand-in tools that sleep like a network call, with the lexicons the fast router reads."""
+    def tool(name):
+        def func(*args):
+            time.sleep(tool_latency)
+            return f"{name}{tuple(args)}"
+        return func
+
+    time_module = types.ModuleType("time_tool")
+    time_module.CITY_TIMEZONES = {"madrid": "Europe/Madrid", "tokyo": "Asia/Tokyo", "london": "Europe/London"}
+    currency_module = types.ModuleType("currency_tool")
+    currency_module.CURRENCY_ALIASES = {"USD": "USD", "EUR": "EUR"}
+    return {
+        "weather": {"module": None, "functions": {"get_weather": tool("get_weather")}},
+        "time": {"module": time_module, "functions": {"get_current_time": tool("get_current_time")}},
+        "currency": {"module": currency_module, "functions": {"convert_currency": tool("convert_currency")}}
+    }
+
+
+def make_responder(route_latency: float):
+    """Build a responder that routes each benchmark query to its tool call after route_latency."""
+    def respond(payload):
+        time.sleep(route_latency)
+        for query, (tool_name, function_name, args) in QUERIES.items():
+            if f"\"{query.lower()}\"" in payload["prompt"]:
+                return json.dumps(dict(ROUTE, type="tool_request", tool=tool_name, function=function_name, args=args))
+        return json.dumps(dict(ROUTE, type="casual_conversation", tool=None, function=None, args=[]))
+    return respond
+
+
+def run(url: str, tool_latency: float, prefetch: bool, rounds: int):
+    """Run every query rounds times and return the median latency in milliseconds and the prefetch stats."""
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()), \
+            patch.object(LLMFlowAgent, '_discover_tools', return_value=make_tools(tool_latency)), \
+            patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
+        agent = LLMFlowAgent(ollama_url=url, cache_size=0, prefetch_tools=prefetch)
+        for _ in range(rounds):
+            for query in QUERIES:
+                start = time.perf_counter()
+                agent.process_query(query)
+                timings.append((time.perf_counter() - start) * 1000)
+        stats = agent.prefetcher.get_stats()
+        agent.close()
+    return statistics.median(timings), stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the query set")
+    parser.add_argument("--route-ms", type=float, default=300, help="Simulated routing call time")
+    parser.add_argument("--tool-ms", type=float, default=200, help="Simulated tool call time")
+    args = parser.parse_args()
+
+    print(f"Median tool-query latency, routing {args.route_ms:.0f}ms, tool {args.tool_ms:.0f}ms:")
+    for prefetch in (False, True):
+        with StubOllamaServer(responder=make_responder(args.route_ms / 1000)) as stub:
+            median, stats = run(stub.url, args.tool_ms / 1000, prefetch, args.rounds)
+        label = "prefetch" if prefetch else "no prefetch"
+        print(f"{label:<12} {median:8.1f}ms  launched={stats['launched']} hits={stats['hits']} "
+              f"wasted={stats['wasted']} pending={stats['pending']} hit rate={stats['hit_rate']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Report prompt token savings of the top-k tool catalog per prompt stage.
+
+Every labeled query is routed (single-call and two-step prompts), analyzed
+and turned into a chain against the stub Ollama server. The catalog records,
+per stage, the estimated tokens of the full tool catalog and instructions the
+prompt used to carry against what it carries now; the stub records the total
+size of every prompt actually sent.
+
+Usage:
+    python -m benchmarks.bench_prompt_catalog --top-k 3
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import statistics
+from typing import Any, Dict
+
+from benchmarks.bench_semantic_router import load_labeled_queries
+from benchmarks.stub_ollama import StubOllamaServer
+from main import LLMFlowAgent
+from prompt_catalog import estimate_tokens
+
+ROUTE = {"type": "tool_request", "tool": "weather", "function": "get_weather", "args": ["Madrid"],
+         "entities": {"location": "Madrid"}}
+CHAIN = [{"tool_name": "weather", "function_name": "get_weather", "input_params": {"location": "Madrid"},
+          "output_key": "weather_data"}]
+
+
+def respond(payload: Dict[str, Any]) -> str:
+    """Answer every prompt with canned JSON of the shape its stage expects."""
+    if payload["prompt"].startswith("Given the query"):
+        return json.dumps(CHAIN)
+    return json.dumps(dict(ROUTE, arguments=["Madrid"]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--top-k", type=int, default=3, help="Tools described in routing and analysis prompts")
+    parser.add_argument("--chain-top-k", type=int, default=5, help="Tools described in chain prompts")
+    args = parser.parse_args()
+
+    labeled = load_labeled_queries()
+    with StubOllamaServer(responder=respond) as stub:
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent = LLMFlowAgent(ollama_url=stub.url, cache_size=0, catalog_top_k=args.top_k,
+                                 chain_catalog_top_k=args.chain_top_k)
+            for item in labeled:
+                query = item["query"].lower()
+                agent.route_query_single_call(query)
+                agent.routing_mode = "two_step"
+                agent.determine_query_type(query)
+                agent.routing_mode = "single_call"
+                agent.analyze_tool_query(query, extracted_entities={})
+                agent.orchestrator.generate_chain(query)
+        stats = agent.tool_catalog.get_stats()
+        prompts = [request["payload"]["prompt"] for request in stub.requests]
+        agent.close()
+
+    print(f"{len(labeled)} queries, top_k={args.top_k}, chain_top_k={args.chain_top_k}")
+    print(f"{'stage':<10}{'calls':>7}{'full tok/call':>15}{'sent tok/call':>15}{'saved/call':>12}{'saved':>8}")
+    for stage, values in stats.items():
+        print(f"{stage:<10}{values['calls']:>7}{values['full_tokens'] / values['calls']:>15.0f}"
+              f"{values['prompt_tokens'] / values['calls']:>15.0f}{values['saved_per_call']:>12.0f}"
+              f"{values['saved_ratio']:>8.0%}")
+    print(f"Mean prompt size sent: {statistics.mean(estimate_tokens(prompt) for prompt in prompts):.0f} tokens "
+          f"over {len(prompts)} LLM calls")
+
+
+if __name__ == "__main__":
+    main()
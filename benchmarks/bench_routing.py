@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark single-call structured routing against the two-step extract-then-classify path.
+
+The stub Ollama server answers every generate call after a fixed delay, standing
+in for the prompt evaluation cost of a local model, so the difference between
+the modes is the number of serial LLM round trips per query.
+
+Usage:
+    python -m benchmarks.bench_routing --latency 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import time
+from typing import Any, Dict
+
+from benchmarks.stub_ollama import StubOllamaServer
+from main import LLMFlowAgent
+
+QUERIES = [
+    "what's the weather in madrid?",
+    "convert 100 usd to eur",
+    "what time is it in tokyo?",
+    "tell me about jupiter",
+    "hello, how are you?",
+]
+
+ENTITIES = {"location": "Madrid", "from_currency": None, "to_currency": None, "amount": None}
+ROUTE = {"type": "tool_request", "tool": "weather", "function": "get_weather", "args": ["Madrid"],
+         "explanation": "Weather request.", "language": "en", "translation": None}
+
+
+def respond(payload: Dict[str, Any]) -> str:
+    """Answer the agent's routing prompts with canned JSON."""
+    prompt = payload["prompt"]
+    if "In a single step, extract the key entities" in prompt:
+        return json.dumps(dict(ROUTE, entities=ENTITIES))
+    if "extract key entities" in prompt:
+        return json.dumps(ENTITIES)
+    return json.dumps(ROUTE)
+
+
+def run_mode(url: str, stub: StubOllamaServer, mode: str, rounds: int) -> Dict[str, float]:
+    """Route every query in the given mode and collect call counts and latency."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent = LLMFlowAgent(ollama_url=url, routing_mode=mode)
+    latencies = []
+    calls_before = len(stub.requests)
+    for _ in range(rounds):
+        for query in QUERIES:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                agent.determine_query_type(query)
+            latencies.append(time.perf_counter() - start)
+    agent.close()
+    total = rounds * len(QUERIES)
+    return {
+        "calls_per_query": (len(stub.requests) - calls_before) / total,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": statistics.median(latencies) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.1, help="Simulated seconds per LLM call")
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the query set per mode")
+    args = parser.parse_args()
+
+    with StubOllamaServer(responder=respond, latency=args.latency) as stub:
+        results = {mode: run_mode(stub.url, stub, mode, args.rounds) for mode in ("two_step", "single_call")}
+
+    print(f"Routing latency with {args.latency * 1000:.0f}ms per LLM call:")
+    for mode, result in results.items():
+        print(f"{mode:<12} calls/query={result['calls_per_query']:.2f} "
+              f"mean={result['mean_ms']:8.1f}ms p50={result['p50_ms']:8.1f}ms")
+    saved = results["two_step"]["mean_ms"] - results["single_call"]["mean_ms"]
+    print(f"Saved per query: {saved:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
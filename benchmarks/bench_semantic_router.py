@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Offline accuracy and latency benchmark for the semantic tool router.
+
+Every query in the labeled set (benchmarks/data/labeled_queries.jsonl) names
+the tool and function that should answer it, or null for casual conversation.
+The report gives top-1 and shortlist recall for tools, top-1 accuracy for
+functions, how often casual queries get an empty shortlist, and the scoring
+latency per query. No network or model is used.
+
+Usage:
+    python -m benchmarks.bench_semantic_router --verbose
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import time
+from typing import Any, Dict, List
+
+from main import LLMFlowAgent
+from semantic_router import SemanticToolRouter
+
+LABELED_QUERIES_PATH = os.path.join(os.path.dirname(__file__), "data", "labeled_queries.jsonl")
+
+
+def load_labeled_queries(path: str = LABELED_QUERIES_PATH) -> List[Dict[str, Any]]:
+    """Load the labeled query set, one JSON object per line."""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(router: SemanticToolRouter, labeled: List[Dict[str, Any]], verbose: bool = False) -> Dict[str, float]:
+    """Score the router on the labeled set."""
+    tool_queries = [item for item in labeled if item["tool"]]
+    casual_queries = [item for item in labeled if not item["tool"]]
+    top1 = function_top1 = in_shortlist = shortlist_size = 0
+    latencies = []
+
+    for item in tool_queries:
+        start = time.perf_counter()
+        shortlist = router.shortlist(item["query"])
+        latencies.append(time.perf_counter() - start)
+        ranking = router.rank(item["query"])
+        shortlisted_tools = [entry["tool"] for entry in shortlist]
+        top1 += ranking[0]["tool"] == item["tool"]
+        function_top1 += ranking[0]["tool"] == item["tool"] and ranking[0]["function"] == item["function"]
+        in_shortlist += item["tool"] in shortlisted_tools
+        shortlist_size += len(shortlist)
+        if verbose and ranking[0]["tool"] != item["tool"]:
+            print(f"  miss: {item['query']!r} -> {ranking[0]['tool']} ({ranking[0]['score']:.2f}), "
+                  f"expected {item['tool']}")
+
+    casual_empty = 0
+    for item in casual_queries:
+        start = time.perf_counter()
+        shortlist = router.shortlist(item["query"])
+        latencies.append(time.perf_counter() - start)
+        casual_empty += not shortlist
+
+    latencies.sort()
+    return {
+        "tool_top1": top1 / len(tool_queries),
+        "function_top1": function_top1 / len(tool_queries),
+        "shortlist_recall": in_shortlist / len(tool_queries),
+        "avg_shortlist": shortlist_size / len(tool_queries),
+        "casual_empty": casual_empty / len(casual_queries) if casual_queries else 0.0,
+        "p50_us": statistics.median(latencies) * 1e6,
+        "p95_us": latencies[int(0.95 * (len(latencies) - 1))] * 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data", default=LABELED_QUERIES_PATH, help="Labeled query set (JSONL)")
+    parser.add_argument("--verbose", action="store_true", help="Print misclassified queries")
+    args = parser.parse_args()
+
+    labeled = load_labeled_queries(args.data)
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent = LLMFlowAgent()
+
+    start = time.perf_counter()
+    router = SemanticToolRouter(agent.tool_descriptions, agent.tools)
+    build_ms = (time.perf_counter() - start) * 1000
+    results = evaluate(router, labeled, verbose=args.verbose)
+    agent.close()
+
+    print(f"{len(labeled)} labeled queries, {len(router.documents)} indexed documents, "
+          f"index built in {build_ms:.1f}ms")
+    print(f"tool top-1 accuracy:     {results['tool_top1']:.1%}")
+    print(f"function top-1 accuracy: {results['function_top1']:.1%}")
+    print(f"shortlist recall:        {results['shortlist_recall']:.1%} "
+          f"(avg {results['avg_shortlist']:.1f} tools)")
+    print(f"casual -> no shortlist:  {results['casual_empty']:.1%}")
+    print(f"scoring latency:         p50={results['p50_us']:.0f}us p95={results['p95_us']:.0f}us")
+
+
+if __name__ == "__main__":
+    main()
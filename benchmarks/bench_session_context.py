@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Compare prompt tokens evaluated per conversational turn with and without session context reuse.
+
+A scripted multi-turn conversation runs against the stub Ollama server, which
+keeps a KV cache per model and reports prompt_eval_count the way Ollama does:
+only tokens after the longest prefix shared with the previous request are
+evaluated. Without context reuse every turn resends the instructions and the
+recent history, which changes from the first message onward; with reuse the
+turn carries the returned context plus only the new messages.
+
+Usage:
+    python -m benchmarks.bench_session_context --turns 8
+"""
+
+import argparse
+import contextlib
+import io
+from typing import Any, Dict, List
+
+from benchmarks.stub_ollama import StubOllamaServer
+from main import LLMFlowAgent
+
+MESSAGES = [
+    "Hi there!",
+    "How are you doing today?",
+    "Can you tell me a fun fact?",
+    "That's interesting, tell me another one.",
+    "What do you like to talk about?",
+    "Do you know any good books?",
+    "Thanks for the recommendation!",
+    "Goodbye for now."
+]
+
+
+def run_conversation(url: str, turns: int, max_context_tokens: Any) -> List[Dict[str, int]]:
+    """Run the scripted conversation and return the token counts of each turn."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent = LLMFlowAgent(ollama_url=url, cache_size=0, max_context_tokens=max_context_tokens)
+    usage = []
+    for turn in range(turns):
+        query = MESSAGES[turn % len(MESSAGES)]
+        before = agent.llm_client.get_stats()
+        agent.memory.add_message("user", query)
+        response = agent.handle_casual_conversation(query, {"language": "en"})
+        agent.memory.add_message("assistant", response)
+        after = agent.llm_client.get_stats()
+        usage.append({"prompt_eval_tokens": after["prompt_eval_tokens"] - before["prompt_eval_tokens"]})
+    agent.close()
+    return usage
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=8, help="Conversational turns per run")
+    args = parser.parse_args()
+
+    reply = "Happy to chat! Here is a short and friendly answer to your message."
+    results = {}
+    for label, max_context_tokens in (("full prompt", None), ("context reuse", 4096)):
+        with StubOllamaServer(responder=lambda payload: reply) as stub:
+            results[label] = run_conversation(stub.url, args.turns, max_context_tokens)
+
+    print(f"Prompt tokens evaluated per turn over {args.turns} turns:")
+    print(f"{'turn':<6}" + "".join(f"{label:>16}" for label in results))
+    for turn in range(args.turns):
+        print(f"{turn + 1:<6}" + "".join(f"{usage[turn]['prompt_eval_tokens']:>16}" for usage in results.values()))
+    totals = {label: sum(item["prompt_eval_tokens"] for item in usage) for label, usage in results.items()}
+    print(f"{'total':<6}" + "".join(f"{total:>16}" for total in totals.values()))
+    saved = totals["full prompt"] - totals["context reuse"]
+    print(f"Saved: {saved} tokens ({saved / totals['full prompt']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Compare end-to-end latency with and without speculative stages.
+
+The stub Ollama server answers routing prompts after --route-ms and streams
+casual replies at --token-ms per token. With speculation the casual reply is
+drafted while routing runs, so casual queries finish after roughly
+max(routing, reply) instead of routing + reply. Tool queries pay only the
+discarded draft tokens generated before routing resolved.
+
+Usage:
+    python -m benchmarks.bench_speculation --queries 10
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import time
+from unittest.mock import patch
+
+from benchmarks.stub_ollama import StubOllamaServer
+from main import LLMFlowAgent
+
+ROUTE = {"entities": {}, "tool": None, "function": None, "args": [], "explanation": "",
+         "language": "en", "translation": None}
+REPLY = "Hi there, it is nice to hear from you again, how can I help you today?"
+
+
+def make_responder(route_latency: float):
+    """Build a responder answering routing prompts slowly and everything else with a casual reply."""
+    def respond(payload):
+        prompt = payload["prompt"]
+        if prompt.startswith("You are the router"):
+            time.sleep(route_latency)
+            if "Oslo" in prompt:
+                return json.dumps(dict(ROUTE, type="tool_request", tool="weather",
+                                       function="get_weather", args=["Oslo"]))
+            return json.dumps(dict(ROUTE, type="casual_conversation"))
+        return REPLY
+    return respond
+
+
+def run(url: str, query: str, speculative: bool, count: int) -> float:
+    """Run a query repeatedly and return the median latency in milliseconds."""
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()), \
+            patch.object(LLMFlowAgent, '_discover_tools', return_value={}), \
+            patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}), \
+            patch.object(LLMFlowAgent, 'execute_tool', return_value="Sunny"):
+        agent = LLMFlowAgent(ollama_url=url, cache_size=0, speculative=speculative)
+        for _ in range(count):
+            start = time.perf_counter()
+            agent.process_query(query, on_token=lambda token: None)
+            timings.append((time.perf_counter() - start) * 1000)
+        agent.close()
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=10, help="Queries per scenario")
+    parser.add_argument("--route-ms", type=float, default=300, help="Simulated routing call time")
+    parser.add_argument("--token-ms", type=float, default=15, help="Simulated time per streamed token")
+    args = parser.parse_args()
+
+    print(f"Median latency over {args.queries} queries, routing {args.route_ms:.0f}ms, "
+          f"{args.token_ms:.0f}ms per token:")
+    for label, query in (("casual", "hello again"), ("tool", "weather in Oslo")):
+        results = {}
+        for speculative in (False, True):
+            with StubOllamaServer(responder=make_responder(args.route_ms / 1000),
+                                  token_latency=args.token_ms / 1000) as stub:
+                results[speculative] = run(stub.url, query, speculative, args.queries)
+        print(f"{label:<7} sequential {results[False]:8.1f}ms  speculative {results[True]:8.1f}ms  "
+              f"saved {results[False] - results[True]:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
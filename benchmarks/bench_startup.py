@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Measure agent startup time and the import cost of each tool module.
+
+Every measurement runs in a fresh interpreter so modules imported by an
+earlier measurement are not already cached. The per-module figures are the
+seconds a cold `import <tool module>` takes, dependencies included; the
+startup figures time `import main` plus LLMFlowAgent construction with lazy
+and eager tool loading.
+
+Usage:
+    python -m benchmarks.bench_startup --repeat 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+from tool_loader import TOOL_MODULES, TOOLS_DIR
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {tools_dir!r})
+start = time.perf_counter()
+try:
+    import {module}
+    result = time.perf_counter() - start
+except Exception as e:
+    result = f"{{type(e).__name__}}: {{e}}"
+print(json.dumps(result))
+"""
+
+STARTUP_SNIPPET = """
+import contextlib, io, json, time
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    from main import LLMFlowAgent
+    imported = time.perf_counter()
+    agent = LLMFlowAgent(cache_size=0, lazy_tools={lazy}, preload_tools={preload!r})
+    constructed = time.perf_counter()
+    agent.prewarm_tools(agent.preload_tools or [])
+    ready = time.perf_counter()
+    stats = agent.tool_loader.get_stats()
+    agent.close()
+print(json.dumps({{"import": imported - start, "construct": constructed - imported,
+                   "prewarm": ready - constructed, "tools_imported": len(stats["imported"])}}))
+"""
+
+
+def run_snippet(code: str):
+    """Run a snippet in a fresh interpreter and decode the JSON it prints last."""
+    completed = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return f"exit {completed.returncode}: {completed.stderr.strip().splitlines()[-1:] or ''}"
+    return json.loads(lines[-1])
+
+
+def module_costs(repeat: int) -> Dict[str, object]:
+    """Median cold import seconds per tool, or the error a tool failed with."""
+    costs = {}
+    for tool_name, tool_info in TOOL_MODULES.items():
+        samples = [run_snippet(IMPORT_SNIPPET.format(tools_dir=TOOLS_DIR, module=tool_info["module"]))
+                   for _ in range(repeat)]
+        failures = [sample for sample in samples if not isinstance(sample, float)]
+        costs[tool_name] = failures[0] if failures else statistics.median(samples)
+    return costs
+
+
+def startup(repeat: int, lazy: bool, preload: List[str]) -> Dict[str, float]:
+    """Median startup phases over several fresh interpreters."""
+    samples = [run_snippet(STARTUP_SNIPPET.format(lazy=lazy, preload=preload or None)) for _ in range(repeat)]
+    failures = [sample for sample in samples if not isinstance(sample, dict)]
+    if failures:
+        raise RuntimeError(f"Agent startup failed: {failures[0]}")
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per measurement")
+    parser.add_argument("--preload", nargs="*", default=["weather", "time"],
+                        help="Tools pre-warmed in the lazy + preload scenario")
+    args = parser.parse_args()
+
+    print(f"Cold import cost per tool module (median of {args.repeat}):")
+    costs = module_costs(args.repeat)
+    for tool_name, cost in sorted(costs.items(), key=lambda item: -item[1] if isinstance(item[1], float) else 0):
+        if isinstance(cost, float):
+            print(f"{tool_name:<12} {cost * 1000:8.1f}ms")
+        else:
+            print(f"{tool_name:<12} {'failed':>10}  {cost}")
+    total = sum(cost for cost in costs.values() if isinstance(cost, float))
+    print(f"{'total':<12} {total * 1000:8.1f}ms")
+
+    print(f"\nAgent startup (median of {args.repeat}):")
+    scenarios = {
+        "eager": (False, []),
+        "lazy": (True, []),
+        f"lazy + preload {','.join(args.preload)}": (True, args.preload)
+    }
+    for label, (lazy, preload) in scenarios.items():
+        phases = startup(args.repeat, lazy, preload)
+        print(f"{label:<28} import main {phases['import'] * 1000:7.1f}ms  "
+              f"construct {phases['construct'] * 1000:7.1f}ms  prewarm {phases['prewarm'] * 1000:7.1f}ms  "
+              f"tools imported={phases['tools_imported']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Measure the overhead of tracing, disabled and enabled.
+
+The first table times the instrumentation primitives alone: an empty span
+and a cache lookup, with tracing off, with tracing on, and with tracing on
+and spans written to a JSON-lines file. The second times whole queries
+answered by the stub Ollama server (a cached LLM call, an LLM call and a
+tool call each), so the overhead can be compared to a query's cost.
+
+Usage:
+    python -m benchmarks.bench_tracing --iterations 200000 --queries 200
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+from unittest.mock import patch
+
+from benchmarks.stub_ollama import StubOllamaServer
+from main import LLMFlowAgent
+from tracing import TRACER, cache_lookup, span
+
+ROUTE = {"type": "tool_request", "tool": "weather", "function": "get_weather", "args": ["Oslo"],
+         "entities": {}, "explanation": "", "language": "en", "translation": None}
+
+
+def per_call(func, iterations: int) -> float:
+    """Nanoseconds per call of func."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+def empty_span() -> None:
+    with span("bench", stage="bench"):
+        pass
+
+
+def lookup() -> None:
+    if cache_lookup("bench", False):
+        pass
+
+
+@contextlib.contextmanager
+def tracing_mode(mode: str):
+    """Run a block with tracing off, on, or on and written to a temporary file."""
+    TRACER.reset()
+    with tempfile.TemporaryDirectory() as directory:
+        if mode != "off":
+            TRACER.enable(os.path.join(directory, "trace.jsonl") if mode == "file" else None)
+        try:
+            yield
+        finally:
+            TRACER.disable()
+
+
+def query_latency(url: str, queries: int) -> float:
+    """Median milliseconds per query routed by the LLM to a stand-in tool."""
+    tools = {"weather": {"module": None, "functions": {"get_weather": lambda location: f"Sunny in {location}"}}}
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()), \
+            patch.object(LLMFlowAgent, '_discover_tools', return_value=tools), \
+            patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
+        agent = LLMFlowAgent(ollama_url=url, fast_path_threshold=None, semantic_top_k=None)
+        for index in range(queries):
+            start = time.perf_counter()
+            agent.process_query(f"weather please {index % 10}")
+            timings.append((time.perf_counter() - start) * 1000)
+        agent.close()
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200000, help="Calls per primitive measurement")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per end-to-end measurement")
+    args = parser.parse_args()
+
+    modes = {"off": "tracing off", "memory": "tracing on", "file": "tracing on + JSONL file"}
+    print("Per-call cost of the instrumentation:")
+    for mode, label in modes.items():
+        with tracing_mode(mode):
+            span_ns = per_call(empty_span, args.iterations)
+            lookup_ns = per_call(lookup, args.iterations)
+        print(f"{label:<26} span {span_ns:9.0f}ns  cache lookup {lookup_ns:9.0f}ns")
+
+    print(f"\nMedian query latency against the stub Ollama server ({args.queries} queries):")
+    with StubOllamaServer(responder=lambda payload: json.dumps(ROUTE)) as stub:
+        for mode, label in modes.items():
+            with tracing_mode(mode):
+                latency = query_latency(stub.url, args.queries)
+                spans = TRACER.get_stats()["spans"]
+            print(f"{label:<26} {latency:8.3f}ms  spans={spans}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Compare first-query latency on a cold model, after warm-up, and after an idle gap.
+
+The stub Ollama server simulates model loading: a model that is not resident
+takes --load-ms to load and stays resident for the request's keep_alive.
+Scenarios:
+    cold            first query after startup, no warm-up
+    warm            first query after LLMFlowAgent.warm_up()
+    idle, no keeper query after the keep_alive expired during an idle gap
+    idle, keeper    same gap with the background keep-alive thread running
+
+Usage:
+    python -m benchmarks.bench_warmup --load-ms 800
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from typing import Callable
+
+from benchmarks.stub_ollama import StubOllamaServer
+from main import LLMFlowAgent
+
+KEEP_ALIVE = 0.5
+
+
+def time_first_query(url: str, prepare: Callable[[LLMFlowAgent], None]) -> float:
+    """Build an agent, run the preparation step and time one casual query in milliseconds."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent = LLMFlowAgent(ollama_url=url, cache_size=0, keep_alive=KEEP_ALIVE,
+                             keep_alive_interval=KEEP_ALIVE / 4)
+        prepare(agent)
+        start = time.perf_counter()
+        agent.query_llm("Hello there!")
+        elapsed = (time.perf_counter() - start) * 1000
+        agent.close()
+    return elapsed
+
+
+def idle(agent: LLMFlowAgent, background: bool) -> None:
+    """Warm up, use the model once, then stay idle for longer than keep_alive."""
+    agent.warm_up(background=background)
+    agent.query_llm("first query")
+    time.sleep(KEEP_ALIVE * 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--load-ms", type=float, default=800, help="Simulated model load time")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Simulated generation time")
+    args = parser.parse_args()
+
+    scenarios = {
+        "cold": lambda agent: None,
+        "warm": lambda agent: agent.warm_up(background=False),
+        "idle, no keeper": lambda agent: idle(agent, background=False),
+        "idle, keeper": lambda agent: idle(agent, background=True)
+    }
+    print(f"First-query latency, model load {args.load_ms:.0f}ms, keep_alive {KEEP_ALIVE}s:")
+    for label, prepare in scenarios.items():
+        with StubOllamaServer(latency=args.latency_ms / 1000, load_latency=args.load_ms / 1000) as stub:
+            elapsed = time_first_query(stub.url, prepare)
+            loads = stub.loads
+        print(f"{label:<16} {elapsed:8.1f}ms  model loads={loads}")
+
+
+if __name__ == "__main__":
+    main()
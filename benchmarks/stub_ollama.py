@@ -0,0 +1,256 @@
+"""
+Local stand-in for the Ollama HTTP API used by the benchmarks and tests.
+"""
+
+import json
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from model_residency import parse_keep_alive
+
+# Expiry reported for models kept loaded forever (keep_alive < 0)
+FOREVER = 100 * 365 * 24 * 3600
+
+
+def tokenize(text: str) -> List[int]:
+    """Split text into word and punctuation tokens and map each to a stable token id."""
+    return [zlib.crc32(token.encode("utf-8")) % 32000 for token in re.findall(r"\w+|[^\w\s]", text)]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Request handler implementing the subset of the Ollama API used by the agent."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without TCP_NODELAY a keep-alive
+    # client pays the delayed-ACK penalty on every response.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Silence the default per-request logging."""
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        stub = self.server.stub
+        stub._record_request(self.path, payload)
+
+        if self.path == "/api/generate":
+            load_duration = stub._load(payload)
+            if not payload.get("prompt"):
+                # An empty prompt only loads the model, as in Ollama
+                self._send_json({
+                    "model": payload.get("model"),
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "response": "",
+                    "done": True,
+                    "done_reason": "load",
+                    "load_duration": int(load_duration * 1e9)
+                })
+                return
+            if stub.latency:
+                time.sleep(stub.latency)
+            text = stub.responder(payload)
+            usage = stub._evaluate(payload, text)
+            # Durations as Ollama reports them, in nanoseconds: latency stands for prompt
+            # evaluation and token_latency for the generation of each token
+            usage["load_duration"] = int(load_duration * 1e9)
+            usage["prompt_eval_duration"] = int(stub.latency * 1e9)
+            usage["eval_duration"] = int(stub.token_latency * usage["eval_count"] * 1e9)
+            usage["total_duration"] = usage["load_duration"] + usage["prompt_eval_duration"] + usage["eval_duration"]
+            if payload.get("stream", True):
+                self._send_stream(payload, text, usage)
+                return
+            self._send_json(dict({
+                "model": payload.get("model"),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "response": text,
+                "done": True
+            }, **usage))
+        else:
+            self._send_json({"error": f"unknown endpoint {self.path}"}, status=404)
+
+    def do_GET(self) -> None:
+        stub = self.server.stub
+        stub._record_request(self.path, {})
+        if self.path == "/api/ps":
+            self._send_json({"models": stub.running_models()})
+        else:
+            self._send_json({"error": f"unknown endpoint {self.path}"}, status=404)
+
+    def _send_stream(self, payload: Dict[str, Any], text: str, usage: Dict[str, Any]) -> None:
+        """Send the completion as chunked NDJSON, one word-sized token per chunk."""
+        stub = self.server.stub
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        tokens = re.findall(r"\S+\s*|\s+", text) or [""]
+        try:
+            for token in tokens:
+                if stub.token_latency:
+                    time.sleep(stub.token_latency)
+                self._write_chunk({"model": payload.get("model"), "response": token, "done": False})
+            self._write_chunk(dict({"model": payload.get("model"), "response": "", "done": True}, **usage))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _write_chunk(self, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, body: Dict[str, Any], status: int = 200) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    """Threading HTTP server that counts accepted TCP connections."""
+
+    daemon_threads = True
+
+    def process_request(self, request, client_address) -> None:
+        with self.stub._lock:
+            self.stub.connections += 1
+        super().process_request(request, client_address)
+
+
+class StubOllamaServer:
+    """
+    In-process fake Ollama server.
+
+    Like Ollama, the stub keeps the token sequence it evaluated last per model
+    (its KV cache) and only counts the tokens after the longest common prefix
+    in prompt_eval_count. A request's input is its "context" tokens followed by
+    the prompt tokens, and the returned "context" is that input followed by
+    the response tokens.
+
+    Models are loaded on first use, which takes load_latency seconds, and stay
+    loaded for the request's keep_alive (default 5 minutes); /api/ps lists the
+    loaded models with their expiry.
+
+    Usage:
+        with StubOllamaServer(latency=0.01) as stub:
+            client = OllamaClient(stub.url)
+    """
+
+    def __init__(self, responder: Optional[Callable[[Dict[str, Any]], str]] = None,
+                 latency: float = 0.0, token_latency: float = 0.0, load_latency: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0):
+        """
+        Initialize the stub server.
+
+        Args:
+            responder: Callable mapping a request payload to the completion text
+            latency (float): Seconds to sleep before answering each generate call
+            token_latency (float): Seconds to sleep before each streamed token
+            load_latency (float): Seconds a model takes to load when it is not resident
+            host (str): Interface to bind
+            port (int): Port to bind (0 picks a free port)
+        """
+        self.responder = responder or (lambda payload: "OK")
+        self.latency = latency
+        self.token_latency = token_latency
+        self.load_latency = load_latency
+        self.loads = 0
+        self.loaded: Dict[str, float] = {}
+        self.connections = 0
+        self.requests: List[Dict[str, Any]] = []
+        self.kv_cache: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._server = _StubHTTPServer((host, port), _StubHandler)
+        self._server.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running stub."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _record_request(self, path: str, payload: Dict[str, Any]) -> None:
+        with self._lock:
+            self.requests.append({"path": path, "payload": payload})
+
+    def _load(self, payload: Dict[str, Any]) -> float:
+        """Load the requested model if it is not resident and extend its residency by keep_alive."""
+        model = payload.get("model", "")
+        keep_alive = parse_keep_alive(payload.get("keep_alive"))
+        load_duration = 0.0
+        # Models load one at a time; concurrent requests for a cold model wait for one load
+        with self._load_lock:
+            if self.loaded.get(model, 0.0) <= time.time():
+                if self.load_latency:
+                    time.sleep(self.load_latency)
+                load_duration = self.load_latency
+                with self._lock:
+                    self.loads += 1
+                    self.kv_cache.pop(model, None)
+            self.loaded[model] = time.time() + (keep_alive if keep_alive is not None else FOREVER)
+        return load_duration
+
+    def running_models(self) -> List[Dict[str, Any]]:
+        """List the resident models in /api/ps format."""
+        now = time.time()
+        with self._load_lock:
+            loaded = {model: expires for model, expires in self.loaded.items() if expires > now}
+        return [
+            {
+                "name": model,
+                "model": model,
+                "expires_at": datetime.fromtimestamp(expires, timezone.utc).isoformat()
+            }
+            for model, expires in sorted(loaded.items())
+        ]
+
+    def unload(self, model: str) -> None:
+        """Evict a model, as Ollama does under memory pressure."""
+        with self._load_lock:
+            self.loaded.pop(model, None)
+
+    def _evaluate(self, payload: Dict[str, Any], text: str) -> Dict[str, Any]:
+        """Count the prompt tokens missing from the model's KV cache and build the returned context."""
+        model = payload.get("model", "")
+        tokens = list(payload.get("context") or []) + tokenize(payload.get("prompt", ""))
+        output = tokenize(text)
+        with self._lock:
+            cached = self.kv_cache.get(model, [])
+            reused = 0
+            for cached_token, token in zip(cached, tokens):
+                if cached_token != token:
+                    break
+                reused += 1
+            self.kv_cache[model] = tokens + output
+        return {
+            "context": tokens + output,
+            "prompt_eval_count": len(tokens) - reused,
+            "eval_count": len(output)
+        }
+
+    def start(self) -> "StubOllamaServer":
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the server and close its socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
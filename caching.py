@@ -0,0 +1,415 @@
+"""
+Caching module providing an in-memory TTL/LRU cache, a content-addressed LLM response cache
+and a cache of chain step results.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+# Sentinel returned on a cache miss so that None can be cached as a value
+MISSING = object()
+
+# Default of the ttl arguments: use the cache's default TTL, so that None can mean no expiry
+DEFAULT_TTL = object()
+
+# Seconds a chain step result stays valid, per tool: live data briefly, reference data for
+# long; 0 disables caching (the current time); tools not listed use the cache's default TTL
+STEP_RESULT_TTLS = {
+    "time": 0,
+    "stock": 60,
+    "currency": 600,
+    "weather": 600,
+    "air_quality": 900,
+    "news": 600,
+    "search": 1800,
+    "web_parser": 1800,
+    "astronomy": 3600,
+    "ip_geolocation": 3600,
+    "geolocation": 86400,
+    "wikipedia": 86400
+}
+
+
+class LRUCache:
+    """Thread-safe in-memory cache with least-recently-used eviction and per-entry TTLs."""
+
+    def __init__(self, max_entries: int = 1024, default_ttl: Optional[float] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Maximum number of entries kept before evicting the least recently used
+            default_ttl (Optional[float]): Seconds an entry stays valid; None means no expiry
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0
+        }
+
+    def get(self, key: str, default: Any = MISSING) -> Any:
+        """
+        Look up a key, refreshing its recency on a hit.
+
+        Args:
+            key (str): Cache key
+            default (Any): Value returned on a miss
+
+        Returns:
+            Any: The cached value or default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and time.time() >= expires_at:
+                del self._entries[key]
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Any = DEFAULT_TTL) -> None:
+        """
+        Store a value, evicting the least recently used entries if the cache is full.
+
+        Args:
+            key (str): Cache key
+            value (Any): Value to store
+            ttl (Optional[float]): Seconds the entry stays valid; None means no expiry;
+                defaults to default_ttl
+        """
+        ttl = self.default_ttl if ttl is DEFAULT_TTL else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def delete(self, key: str) -> bool:
+        """
+        Remove an entry.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            bool: Whether the key was stored
+        """
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        """Remove all entries (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss/eviction counters.
+
+        Returns:
+            Dict[str, Any]: Counters plus current size and hit rate
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache for LLM completions.
+
+    Entries are keyed by a hash of the model, prompt and generation options. An
+    in-memory LRU tier answers repeats within the process; an optional SQLite
+    tier persists responses across restarts.
+    """
+
+    def __init__(self, max_entries: int = 1024, default_ttl: Optional[float] = 3600,
+                 db_path: Optional[str] = None):
+        """
+        Initialize the LLM response cache.
+
+        Args:
+            max_entries (int): Maximum number of responses kept in memory
+            default_ttl (Optional[float]): Seconds a response stays valid; None means no expiry
+            db_path (Optional[str]): Path of the SQLite file for the disk tier; None disables it
+        """
+        self.default_ttl = default_ttl
+        self.memory = LRUCache(max_entries=max_entries, default_ttl=default_ttl)
+        self.db_path = db_path
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "discarded": 0
+        }
+
+        if db_path:
+            directory = os.path.dirname(os.path.abspath(db_path))
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Build the content address for a completion request.
+
+        Args:
+            model (str): Model name
+            prompt (str): Prompt text
+            options (Optional[Dict[str, Any]]): Generation options that affect the output
+
+        Returns:
+            str: SHA-256 hex digest of the canonicalized request
+        """
+        canonical = json.dumps(
+            {"model": model, "prompt": prompt, "options": options or {}},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response, checking memory first and then disk.
+
+        Args:
+            key (str): Key from make_key
+
+        Returns:
+            Optional[str]: The cached response or None on a miss
+        """
+        value = self.memory.get(key)
+        if value is not MISSING:
+            self._count("memory_hits")
+            return value
+
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT response, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] is not None and time.time() >= row[1]:
+                    self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                    row = None
+            if row is not None:
+                response, expires_at = row
+                remaining = expires_at - time.time() if expires_at is not None else None
+                self.memory.set(key, response, ttl=remaining)
+                self._count("disk_hits")
+                return response
+
+        self._count("misses")
+        return None
+
+    def set(self, key: str, response: str, ttl: Any = DEFAULT_TTL) -> None:
+        """
+        Store a response in memory and, if enabled, on disk.
+
+        Args:
+            key (str): Key from make_key
+            response (str): LLM response text
+            ttl (Optional[float]): Seconds the response stays valid; None means no expiry;
+                defaults to default_ttl
+        """
+        ttl = self.default_ttl if ttl is DEFAULT_TTL else ttl
+        self.memory.set(key, response, ttl=ttl)
+        if self._db is not None:
+            expires_at = time.time() + ttl if ttl is not None else None
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, response, expires_at) VALUES (?, ?, ?)",
+                    (key, response, expires_at)
+                )
+                self._db.commit()
+
+    def delete(self, key: str) -> None:
+        """
+        Remove a response from both tiers, e.g. one its caller could not use.
+
+        Args:
+            key (str): Key from make_key
+        """
+        removed = self.memory.delete(key)
+        if self._db is not None:
+            with self._db_lock:
+                removed = self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,)).rowcount > 0 or removed
+                self._db.commit()
+        if removed:
+            self._count("discarded")
+
+    def _count(self, counter: str) -> None:
+        with self._db_lock:
+            self.stats[counter] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters for both tiers.
+
+        Returns:
+            Dict[str, Any]: Hit and miss counters, responses discarded by their callers, hit rate
+                and memory tier stats
+        """
+        with self._db_lock:
+            stats = dict(self.stats)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hits"] = hits
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        stats["memory"] = self.memory.get_stats()
+        return stats
+
+    def close(self) -> None:
+        """Close the disk tier."""
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+                self._db = None
+
+
+class StepResultCache:
+    """
+    Cache of chain step results shared by the chains of all queries.
+
+    Entries are keyed by the tool, the function and the arguments the step's
+    placeholders resolved to, after coercion, so steps asking for the same call
+    share a result and steps whose inputs resolved differently never do. Each
+    tool has its own TTL, and the least recently used results are evicted once
+    max_entries are stored.
+    """
+
+    def __init__(self, max_entries: int = 512, default_ttl: Optional[float] = 300,
+                 ttls: Optional[Dict[str, Optional[float]]] = None):
+        """
+        Initialize the step result cache.
+
+        Args:
+            max_entries (int): Maximum number of results kept
+            default_ttl (Optional[float]): Seconds a result of a tool without its own TTL stays
+                valid; None means no expiry
+            ttls (Optional[Dict[str, Optional[float]]]): Tool name -> seconds its results stay
+                valid (0 disables caching), overriding STEP_RESULT_TTLS
+        """
+        self.default_ttl = default_ttl
+        self.ttls = {**STEP_RESULT_TTLS, **(ttls or {})}
+        self.results = LRUCache(max_entries=max_entries, default_ttl=default_ttl)
+        self._lock = threading.Lock()
+        self.tool_stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(tool_name: str, function_name: str, args: Any) -> str:
+        """
+        Build the key of a tool call.
+
+        Args:
+            tool_name (str): Tool name
+            function_name (str): Function name
+            args (Any): Resolved and coerced arguments
+
+        Returns:
+            str: SHA-256 hex digest of the canonicalized call
+        """
+        canonical = json.dumps([tool_name, function_name, args], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, tool_name: str) -> Optional[float]:
+        """Seconds a result of the tool stays valid (0: not cached)."""
+        return self.ttls.get(tool_name, self.default_ttl)
+
+    def get(self, tool_name: str, function_name: str, args: Any) -> Any:
+        """
+        Look up the result of a tool call.
+
+        Args:
+            tool_name (str): Tool name
+            function_name (str): Function name
+            args (Any): Resolved and coerced arguments
+
+        Returns:
+            Any: The cached result, or MISSING
+        """
+        if self.ttl_for(tool_name) == 0:
+            self._count(tool_name, "uncached")
+            return MISSING
+        value = self.results.get(self.make_key(tool_name, function_name, args))
+        self._count(tool_name, "misses" if value is MISSING else "hits")
+        return value
+
+    def set(self, tool_name: str, function_name: str, args: Any, value: Any) -> None:
+        """
+        Store the result of a tool call, unless the tool is not cached or the result is an error.
+
+        Args:
+            tool_name (str): Tool name
+            function_name (str): Function name
+            args (Any): Resolved and coerced arguments
+            value (Any): The tool's result
+        """
+        ttl = self.ttl_for(tool_name)
+        if ttl == 0 or self.is_error(value):
+            return
+        self.results.set(self.make_key(tool_name, function_name, args), value, ttl=ttl)
+
+    @staticmethod
+    def is_error(value: Any) -> bool:
+        """Whether a tool result reports a failure, which should be retried rather than reused."""
+        if isinstance(value, str):
+            return value.startswith("Error")
+        return isinstance(value, dict) and "error" in value
+
+    def _count(self, tool_name: str, counter: str) -> None:
+        with self._lock:
+            stats = self.tool_stats.setdefault(tool_name, {"hits": 0, "misses": 0, "uncached": 0})
+            stats[counter] += 1
+
+    def clear(self) -> None:
+        """Remove all results (counters are kept)."""
+        self.results.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss/eviction counters.
+
+        Returns:
+            Dict[str, Any]: Hits, misses, evictions, expirations, size and hit rate, plus hits,
+                misses and uncached lookups per tool
+        """
+        stats = self.results.get_stats()
+        with self._lock:
+            stats["tools"] = {tool_name: dict(values) for tool_name, values in sorted(self.tool_stats.items())}
+        return stats
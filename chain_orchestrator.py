@@ -1,14 +1,27 @@
 """
 ChainOrchestrator module for managing sequential or conditional chains of tool executions.
+
+Steps that do not depend on each other's output run concurrently: a step waits only
+for the earlier steps whose output_key its {{...}} placeholders or its condition
+refer to.
 """
 
 import asyncio
 import json
 import re
-from datetime import datetime
-from typing import Dict, List, Any, Optional, Union, Callable
+import time
+from typing import Dict, List, Any, Optional, Set, Tuple, Union, Callable
 from dataclasses import dataclass
 
+from caching import MISSING, StepResultCache
+from condition_evaluator import ConditionEvaluator
+from deadline import DeadlineExceeded, check_deadline, deadline_expired, remaining
+from speculation import SpeculationCancelled, SpeculationHandle
+from structured_output import chain_schema
+from tool_pools import ToolPools
+from tool_registry import ToolAdapter
+from tracing import cache_lookup, span
+
 @dataclass
 class ChainStep:
     """Data structure representing a step in a tool execution chain."""
@@ -18,30 +31,80 @@ class ChainStep:
     output_key: str
     condition: Optional[str] = None
 
+# Output of a step whose condition was false; it adds nothing to the context
+NO_OUTPUT = object()
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*([^{}]+?)\s*\}\}")
+
+
+def chain_dependencies(chain: List[ChainStep]) -> List[Set[int]]:
+    """
+    Find the earlier steps each step of a chain has to wait for.
+    
+    A step depends on the latest earlier step producing an output_key named in one
+    of its placeholders, and on those named in its condition; a condition naming
+    none of them is evaluated against everything before it, so it depends on all
+    earlier steps. A step overwriting an output_key waits for the earlier steps
+    writing or reading that key, so the context ends up as a sequential run leaves it.
+    
+    Args:
+        chain: List of ChainStep objects
+        
+    Returns:
+        List[Set[int]]: For each step, the indexes of the steps it depends on
+    """
+    dependencies = []
+    writers: Dict[str, int] = {}
+    readers: Dict[str, List[int]] = {}
+    for index, step in enumerate(chain):
+        needs = set()
+        for placeholder in PLACEHOLDER_PATTERN.findall(json.dumps(step.input_params, ensure_ascii=False)):
+            needs.update(part for part in placeholder.split(".") if part in writers)
+        if step.condition:
+            named = {key for key in writers if re.search(rf"\b{re.escape(key)}\b", step.condition)}
+            needs.update(named or writers)
+        step_dependencies = {writers[key] for key in needs}
+        if step.output_key in writers:
+            step_dependencies.add(writers[step.output_key])
+            step_dependencies.update(readers.get(step.output_key, ()))
+        for key in needs:
+            readers.setdefault(key, []).append(index)
+        writers[step.output_key] = index
+        dependencies.append(step_dependencies)
+    return dependencies
+
+
 class ChainOrchestrator:
     """Manages sequential or conditional chains of tool executions."""
     
-    def __init__(self, agent):
+    def __init__(self, agent, parallel: bool = True, cache: Optional[StepResultCache] = None,
+                 pools: Optional[ToolPools] = None):
         """
         Initialize the ChainOrchestrator.
         
         Args:
             agent: Reference to LLMFlowAgent for accessing LLM and tools
+            parallel (bool): Run steps that do not depend on each other concurrently;
+                False runs every step after the one before it
+            cache (Optional[StepResultCache]): Step result cache, shared by the chains of
+                all queries; defaults to a new cache with the default size and TTLs
+            pools (Optional[ToolPools]): Thread pools and per-tool concurrency limits the tool
+                calls run under; None runs them on the agent's thread pool
         """
         self.agent = agent
-        self.memory = agent.memory
+        self.parallel = parallel
+        self.pools = pools
         self.tool_registry = self._build_tool_registry()
-        self.cache = {}
+        self.chain_schema = chain_schema(self.tool_registry)
+        self.cache = cache if cache is not None else StepResultCache()
         self.cache_ttl = 300  # 5 minutes
+        # Conditions are expressions over the context, evaluated without the LLM when possible
+        self.conditions = ConditionEvaluator()
+        self.stats = {"chains": 0, "steps": 0, "step_seconds": 0.0, "wall_seconds": 0.0}
         
-    def _build_tool_registry(self) -> Dict[str, Dict[str, Callable]]:
-        """Build a registry mapping tool names to their callable functions."""
-        registry = {}
-        for tool_name, tool_info in self.agent.tools.items():
-            registry[tool_name] = {}
-            for func_name, func in tool_info.get("functions", {}).items():
-                registry[tool_name][func_name] = func
-        return registry
+    def _build_tool_registry(self) -> Dict[str, Dict[str, ToolAdapter]]:
+        """Build a registry mapping tool names to the call adapters of their functions."""
+        return self.agent.tool_registry.functions(self.agent.tools)
 
     def define_chain(self, chain_config: Union[List[Dict], str]) -> List[ChainStep]:
         """
@@ -73,28 +136,37 @@ class ChainOrchestrator:
             ))
         return chain
 
-    def generate_chain(self, query: str) -> List[ChainStep]:
+    def generate_chain(self, query: str, speculation: Optional[SpeculationHandle] = None) -> List[ChainStep]:
         """
         Generate a chain of tool calls based on the query.
         
         Args:
             query: User's query
+            speculation: Set when the chain is drafted speculatively; the LLM call then stops
+                as soon as the draft is cancelled
             
         Returns:
             List[ChainStep]: Generated chain of steps
+            
+        Raises:
+            SpeculationCancelled: If the draft was cancelled
         """
-        # Create tool descriptions for the LLM
-        tool_descriptions = []
-        for tool_name, tool_info in self.agent.tools.items():
-            tool_desc = {
-                "name": tool_name,
-                "description": tool_info.get("description", ""),
-                "functions": list(self.tool_registry[tool_name].keys())
-            }
-            tool_descriptions.append(tool_desc)
+        # Describe only the tools a multi-step answer is likely to need
+        catalog = self.agent.tool_catalog
+        candidates = self.agent.shortlist_tools(query, top_k=catalog.chain_top_k, pick=False)
+        selected = [tool_name for tool_name in catalog.select(candidates, catalog.chain_top_k)
+                    if tool_name in self.tool_registry]
+        tools_text = catalog.render(selected, examples=False)
+        full_catalog = json.dumps([
+            {"name": tool_name, "description": tool_info.get("description", ""),
+             "functions": list(self.tool_registry[tool_name].keys())}
+            for tool_name, tool_info in self.agent.tools.items()
+        ], indent=2)
+        catalog.record("chain", full_catalog, tools_text)
             
         prompt = f"""Given the query: "{query}"
-Available tools: {json.dumps(tool_descriptions, indent=2)}
+Available tools (name: description, then function(arguments) - description):
+{tools_text}
 
 Generate a chain of tool calls to answer the query. Each step should specify:
 - tool_name
@@ -105,33 +177,31 @@ Generate a chain of tool calls to answer the query. Each step should specify:
 
 IMPORTANT: You must respond with ONLY a valid JSON array. Example:
 [
-    {{"tool_name": "weather_tool", "function_name": "get_weather", "input_params": {{"location": "Tokyo"}}, "output_key": "weather_data"}},
-    {{"tool_name": "news_tool", "function_name": "search_news", "input_params": {{"query": "{{weather_data.location.city}} events", "max_results": 3}}, "output_key": "news_data", "condition": "weather_data['precipitation']['rain'] > 0"}}
+    {{"tool_name": "weather", "function_name": "get_weather", "input_params": {{"location": "Tokyo"}}, "output_key": "weather_data"}},
+    {{"tool_name": "news", "function_name": "search_news", "input_params": {{"query": "{{weather_data.location.city}} events", "max_results": 3}}, "output_key": "news_data", "condition": "weather_data['precipitation']['rain'] > 0"}}
 ]
 
 Ensure all tool names and functions are valid from the available tools list."""
 
         # Get chain configuration from LLM
         try:
-            llm_response = self.agent.query_llm(prompt)
-            llm_response = llm_response.strip()
-            
-            # Try to find JSON in the response
-            json_match = re.search(r'(\[.*\])', llm_response, re.DOTALL)
-            if json_match:
-                chain_config = json.loads(json_match.group(1))
-            else:
-                # Try to parse the entire response as JSON
-                chain_config = json.loads(llm_response)
+            llm_response = self.agent.query_llm(prompt, cache=True, stage="chain", schema=self.chain_schema,
+                                                speculation=speculation)
+            chain_config, errors = self.agent.structured_output.parse("chain", llm_response, self.chain_schema)
                 
-            if not isinstance(chain_config, list):
+            if chain_config is None:
                 raise ValueError("LLM response is not a valid JSON array")
+            if errors:
+                raise ValueError(f"Chain does not match its schema: {errors[0]}")
                 
             return self.define_chain(chain_config)
             
+        except SpeculationCancelled:
+            raise
         except Exception as e:
             print(f"Error generating chain: {str(e)}")
             print(f"Raw LLM response: {llm_response}")
+            self.agent.discard_llm_reply(prompt, "chain", self.chain_schema)
             # Return an empty chain to trigger the fallback in process_query
             return []
 
@@ -155,45 +225,95 @@ Ensure all tool names and functions are valid from the available tools list."""
 
     async def _execute_step(self, step: ChainStep, context: Dict[str, Any]) -> Any:
         """Execute a single chain step."""
-        # Check cache first
-        cache_key = f"{step.tool_name}.{step.function_name}.{json.dumps(step.input_params)}"
-        if cache_key in self.cache:
-            cache_entry = self.cache[cache_key]
-            if (datetime.now() - cache_entry["timestamp"]).total_seconds() < self.cache_ttl:
-                return cache_entry["result"]
-
-        # Resolve input parameters
-        resolved_params = self._resolve_params(step.input_params, context)
+        with span("chain_step", tool=step.tool_name, function=step.function_name, output_key=step.output_key):
+            # Resolve input parameters
+            resolved_params = self._resolve_params(step.input_params, context)
+            
+            # Get the tool function's adapter and check the arguments before any attempt
+            adapter = self.tool_registry[step.tool_name][step.function_name]
+            args = adapter.bind_params(resolved_params)
+            
+            # Check cache first, keyed by the arguments the call will actually receive
+            cached = self.cache.get(step.tool_name, step.function_name, args)
+            if cache_lookup("chain_step", cached is not MISSING, tool=step.tool_name):
+                return cached
+            
+            # Execute with retry for API-based tools, as long as the query's deadline allows
+            max_retries = 3
+            backoff = 1
+            for attempt in range(max_retries):
+                check_deadline(f"{step.tool_name}.{step.function_name}")
+                try:
+                    if self.pools is not None:
+                        result = await self.pools.run(step.tool_name, adapter.func, *args)
+                    else:
+                        result = await self.agent.run_blocking(adapter.func, *args)
+                    
+                    # Cache the result
+                    self.cache.set(step.tool_name, step.function_name, args, result)
+                    
+                    return result
+                except Exception as e:
+                    left = remaining()
+                    if attempt == max_retries - 1 or isinstance(e, DeadlineExceeded) or (left is not None and left <= backoff):
+                        raise
+                    await asyncio.sleep(backoff)
+                    backoff *= 2
+
+    async def _run_step(self, step: ChainStep, context: Dict[str, Any]) -> Tuple[Any, bool]:
+        """
+        Run a chain step if its condition holds, asking the LLM for an alternative if it fails.
         
-        # Get the tool function
-        tool_func = self.tool_registry[step.tool_name][step.function_name]
+        Args:
+            step: The step to run
+            context: Initial context plus the outputs of the steps it depends on
+            
+        Returns:
+            Tuple[Any, bool]: The step's output (NO_OUTPUT if its condition is false) and
+                whether the tool call succeeded
+        """
+        # Out of time: record the step as skipped so the answer uses what finished
+        if deadline_expired():
+            return {"error": "Skipped: the query ran out of time"}, False
         
-        # Execute with retry for API-based tools
-        max_retries = 3
-        backoff = 1
-        for attempt in range(max_retries):
-            try:
-                result = await asyncio.get_event_loop().run_in_executor(
-                    None, tool_func, *resolved_params.values()
-                )
+        # Check condition if present; only conditions that are not expressions go to the LLM
+        if step.condition:
+            should_execute = self.conditions.evaluate(step.condition, context)
+            if should_execute is None:
+                condition_prompt = f"""Given the context: {json.dumps(context)}
+Evaluate the condition: {step.condition}
+Return "True" or "False"."""
                 
-                # Cache the result
-                self.cache[cache_key] = {
-                    "result": result,
-                    "timestamp": datetime.now()
-                }
+                condition_result = await self.agent.aquery_llm(condition_prompt, cache=True, cache_ttl=self.cache_ttl,
+                                                             stage="condition")
+                should_execute = condition_result.strip().lower() == "true"
+            if not should_execute:
+                return NO_OUTPUT, False
                 
-                return result
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise
-                await asyncio.sleep(backoff)
-                backoff *= 2
+        start = time.perf_counter()
+        try:
+            return await self._execute_step(step, context), True
+        except Exception as e:
+            if deadline_expired():
+                return {"error": str(e)}, False
+            # Try to get alternative approach from LLM
+            error_prompt = f"""Tool {step.tool_name}.{step.function_name} failed with error: {str(e)}
+Available tools: {json.dumps(self.agent.tools)}
+Suggest an alternative approach or response."""
+            
+            alternative = await self.agent.aquery_llm(error_prompt, stage="recovery")
+            return {"error": str(e), "alternative": alternative}, False
+        finally:
+            self.stats["step_seconds"] += time.perf_counter() - start
 
     async def execute_chain(self, chain: List[ChainStep], context: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Execute a chain of tool calls.
         
+        Each step starts as soon as the steps it depends on (see chain_dependencies) have
+        finished, so independent steps run concurrently. The outputs are added to the
+        context, and the tool calls to the memory, in chain order.
+        
         Args:
             chain: List of ChainStep objects
             context: Initial context dictionary
@@ -202,46 +322,95 @@ Ensure all tool names and functions are valid from the available tools list."""
             Dict[str, Any]: Final context with all outputs
         """
         context = context or {}
+        if self.parallel:
+            dependencies = chain_dependencies(chain)
+        else:
+            dependencies = [set(range(index)) for index in range(len(chain))]
+        ancestors: List[Set[int]] = []
+        for step_dependencies in dependencies:
+            ancestors.append(step_dependencies.union(*(ancestors[index] for index in step_dependencies)))
+        outcomes: Dict[int, Tuple[Any, bool]] = {}
         
-        for step in chain:
-            # Check condition if present
-            if step.condition:
-                condition_prompt = f"""Given the context: {json.dumps(context)}
-Evaluate the condition: {step.condition}
-Return "True" or "False"."""
-                
-                should_execute = self.agent.query_llm(condition_prompt).strip().lower() == "true"
-                if not should_execute:
-                    continue
-                    
-            try:
-                result = await self._execute_step(step, context)
-                context[step.output_key] = result
-                
-                # Save to memory
-                self.memory.add_tool_usage(
+        async def run(index: int, waits: List[asyncio.Task]) -> None:
+            if waits:
+                await asyncio.gather(*waits)
+            # The step sees the initial context and the outputs of the steps it depends on
+            step_context = dict(context)
+            for ancestor in sorted(ancestors[index]):
+                output = outcomes[ancestor][0]
+                if output is not NO_OUTPUT:
+                    step_context[chain[ancestor].output_key] = output
+            outcomes[index] = await self._run_step(chain[index], step_context)
+        
+        start = time.perf_counter()
+        tasks: List[asyncio.Task] = []
+        for index, step_dependencies in enumerate(dependencies):
+            tasks.append(asyncio.ensure_future(run(index, [tasks[dependency] for dependency in sorted(step_dependencies)])))
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            self.stats["chains"] += 1
+            self.stats["steps"] += len(chain)
+            self.stats["wall_seconds"] += time.perf_counter() - start
+        
+        for index, step in enumerate(chain):
+            output, succeeded = outcomes[index]
+            if output is NO_OUTPUT:
+                continue
+            context[step.output_key] = output
+            if succeeded:
+                # Save to the memory of the query's session
+                self.agent.memory.add_tool_usage(
                     tool=step.tool_name,
                     function=step.function_name,
                     args=[str(step.input_params)],
-                    result=str(result)
+                    result=str(output)
                 )
-            except Exception as e:
-                # Try to get alternative approach from LLM
-                error_prompt = f"""Tool {step.tool_name}.{step.function_name} failed with error: {str(e)}
-Available tools: {json.dumps(self.agent.tools)}
-Suggest an alternative approach or response."""
-                
-                alternative = self.agent.query_llm(error_prompt)
-                context[step.output_key] = {"error": str(e), "alternative": alternative}
                 
         return context
 
-    def format_response(self, context: Dict[str, Any]) -> str:
-        """Format the chain execution results into a natural language response."""
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get chain execution counters.
+        
+        Returns:
+            Dict[str, Any]: Chains and steps executed, the summed duration of the steps and
+                the wall time of the chains; with independent steps running concurrently,
+                the wall time is below the step time
+        """
+        return dict(self.stats)
+
+    def format_response(self, context: Dict[str, Any], on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Format the chain execution results into a natural language response.
+        
+        Args:
+            context: Context produced by execute_chain
+            on_token: If given, the response is streamed and each token is passed
+                to this callback as it is generated
+            
+        Returns:
+            str: Natural language summary of the results, or the raw results if the
+                query ran out of time before they could be summarized
+        """
+        if deadline_expired():
+            response = "I ran out of time before I could summarize the results. Here is what I found:\n" + \
+                "\n".join(f"- {key}: {value}" for key, value in context.items())
+            if on_token:
+                on_token(response)
+            return response
+        
         prompt = f"""Given the tool outputs: {json.dumps(context)}
 Summarize the results in natural language to answer the original query.
 Keep the response concise and natural.
 Include only relevant information from the context.
 If there were any errors, explain them briefly and provide any suggested alternatives."""
 
-        return self.agent.query_llm(prompt)
+        if on_token:
+            return self.agent.stream_llm_response(prompt, on_token, cache=True, cache_ttl=self.cache_ttl,
+                                                  stage="formatting")
+        return self.agent.query_llm(prompt, cache=True, cache_ttl=self.cache_ttl, stage="formatting")
@@ -0,0 +1,132 @@
+"""
+ConditionEvaluator module evaluating chain step conditions locally instead of asking the LLM.
+
+Conditions such as weather_data['precipitation']['rain'] > 0 are parsed as Python
+expressions and accepted only if every node is on a whitelist: comparisons, boolean
+operators, negation, subscripts, names of context values and literals. Calls,
+attribute access, arithmetic and comprehensions are rejected, so a condition can
+only read the context. Accepted expressions are compiled once and evaluated with
+the context as their only namespace; a name that is not in the context, such as
+prose the LLM wrote as a condition, leaves the condition to the LLM.
+"""
+
+import ast
+import functools
+from typing import Any, Dict, Optional
+
+# Node types a condition may contain
+ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+    ast.Is, ast.IsNot, ast.Subscript, ast.Slice, ast.Name, ast.Load, ast.Constant,
+    ast.List, ast.Tuple, ast.Set, ast.Dict
+)
+
+# JSON spellings of the constants, as LLM-written conditions often use them
+JSON_CONSTANTS = {"true": True, "false": False, "null": None}
+
+# Global namespace of every condition: no builtins, only the JSON constants
+CONDITION_GLOBALS = {"__builtins__": {}, **JSON_CONSTANTS}
+
+# Errors raised by a well-formed condition over missing or differently shaped data
+EVALUATION_ERRORS = (KeyError, IndexError, TypeError, ValueError)
+
+
+class UnsupportedCondition(ValueError):
+    """Raised when a condition is not an expression the local evaluator accepts."""
+
+
+@functools.lru_cache(maxsize=256)
+def compile_condition(expression: str):
+    """
+    Parse a condition, check it against the whitelist and compile it.
+
+    Args:
+        expression (str): The condition
+
+    Returns:
+        code: The compiled expression
+
+    Raises:
+        UnsupportedCondition: If the condition is not valid Python or uses a node outside the whitelist
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except (SyntaxError, ValueError) as e:
+        raise UnsupportedCondition(f"Not an expression: {expression}") from e
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise UnsupportedCondition(f"{type(node).__name__} is not allowed in a condition: {expression}")
+        if isinstance(node, ast.Name) and node.id.startswith("__"):
+            raise UnsupportedCondition(f"Name {node.id} is not allowed in a condition: {expression}")
+    return compile(tree, "<condition>", "eval")
+
+
+def check_names(code, context: Dict[str, Any], expression: str) -> None:
+    """
+    Check that every name a compiled condition reads is a context value or a constant.
+
+    Args:
+        code: Code from compile_condition
+        context (Dict[str, Any]): Output key -> output of the steps the condition can see
+        expression (str): The condition, for the error message
+
+    Raises:
+        UnsupportedCondition: If the condition reads a name the context does not have
+    """
+    unknown = [name for name in code.co_names if name not in context and name not in CONDITION_GLOBALS]
+    if unknown:
+        raise UnsupportedCondition(f"Unknown name {unknown[0]} in a condition: {expression}")
+
+
+class ConditionEvaluator:
+    """Evaluates chain step conditions over the chain context without the LLM."""
+
+    def __init__(self):
+        """Initialize the evaluator and its counters."""
+        self.stats = {"local": 0, "true": 0, "evaluation_errors": 0, "unsupported": 0}
+
+    def evaluate(self, expression: str, context: Dict[str, Any]) -> Optional[bool]:
+        """
+        Evaluate a condition against the outputs of earlier steps.
+
+        A condition that is well-formed but fails on the data (a missing key, a
+        comparison with None) is false, so its step does not run. A condition
+        reading a name that is not in the context is left to the LLM.
+
+        Args:
+            expression (str): The condition, e.g. "weather_data['precipitation']['rain'] > 0"
+            context (Dict[str, Any]): Output key -> output of the steps the condition can see
+
+        Returns:
+            Optional[bool]: Whether the condition holds, or None if it cannot be evaluated
+                locally and the caller should ask the LLM
+        """
+        try:
+            code = compile_condition(expression)
+            check_names(code, context, expression)
+        except UnsupportedCondition:
+            self.stats["unsupported"] += 1
+            return None
+        self.stats["local"] += 1
+        try:
+            result = bool(eval(code, CONDITION_GLOBALS, context))
+        except EVALUATION_ERRORS:
+            self.stats["evaluation_errors"] += 1
+            return False
+        if result:
+            self.stats["true"] += 1
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get evaluation counters.
+
+        Returns:
+            Dict[str, Any]: Conditions evaluated locally, of those the true ones and the ones
+                that failed on the data, conditions left to the LLM, and the local share
+        """
+        stats = dict(self.stats)
+        total = stats["local"] + stats["unsupported"]
+        stats["local_rate"] = stats["local"] / total if total else 0.0
+        return stats
@@ -0,0 +1,200 @@
+"""
+Deadline module propagating a per-query time budget to LLM calls, chain steps and tool HTTP requests.
+
+The deadline of the query being handled lives in a context variable, which
+run_blocking copies into worker threads, so every stage can read how much
+time is left without it being passed through each call. Stages shrink their
+timeouts and retry waits to the remaining budget; once it is used up,
+DeadlineExceeded is raised. It is a requests Timeout, so tools that already
+fall back to cached or estimated data on request errors degrade the same way.
+"""
+
+import contextlib
+import contextvars
+import time
+from typing import Iterator, Optional, Tuple, TypeVar
+
+import requests
+
+# Shortest timeout handed to a request; less than this is treated as no time left
+MIN_TIMEOUT = 0.05
+
+# Share of the remaining budget a courtesy delay (e.g. between scraping requests) may use
+PAUSE_SHARE = 0.1
+
+TimeoutValue = TypeVar("TimeoutValue", float, Tuple[float, float])
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """Raised when the time budget of the query being handled is used up."""
+
+
+class Deadline:
+    """Point in time by which the current query must be answered."""
+
+    def __init__(self, seconds: float):
+        """
+        Start a deadline.
+
+        Args:
+            seconds (float): Time budget from now
+        """
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left, never negative."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        """Whether the budget is used up."""
+        return self.remaining() < MIN_TIMEOUT
+
+    def __repr__(self) -> str:
+        return f"<Deadline {self.remaining():.2f}s of {self.seconds:.2f}s left>"
+
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar("llmflow_deadline", default=None)
+
+
+@contextlib.contextmanager
+def query_deadline(seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """
+    Run a block under a time budget.
+
+    A block nested in another keeps the earlier of the two deadlines.
+
+    Args:
+        seconds (Optional[float]): Time budget; None keeps the enclosing deadline, if any
+
+    Yields:
+        Optional[Deadline]: The deadline in effect inside the block
+    """
+    outer = _current_deadline.get()
+    if seconds is None or (outer is not None and outer.remaining() <= seconds):
+        yield outer
+        return
+    deadline = Deadline(seconds)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """
+    Get the deadline of the query being handled.
+
+    Returns:
+        Optional[Deadline]: The deadline, or None outside a query with a budget
+    """
+    return _current_deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """
+    Get the seconds left for the query being handled.
+
+    Returns:
+        Optional[float]: Seconds left, or None if there is no deadline
+    """
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def check_deadline(what: str = "query") -> None:
+    """
+    Stop work that has no time left.
+
+    Args:
+        what (str): What was about to run, used in the error message
+
+    Raises:
+        DeadlineExceeded: If the deadline has passed
+    """
+    deadline = _current_deadline.get()
+    if deadline is not None and deadline.expired():
+        raise DeadlineExceeded(f"Deadline of {deadline.seconds:.1f}s exceeded before {what}")
+
+
+def request_timeout(timeout: TimeoutValue) -> TimeoutValue:
+    """
+    Shrink a request timeout to the remaining budget.
+
+    Args:
+        timeout (TimeoutValue): Timeout in seconds, or a (connect, read) tuple
+
+    Returns:
+        TimeoutValue: The timeout, capped at the seconds left
+
+    Raises:
+        DeadlineExceeded: If the deadline has passed
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return timeout
+    check_deadline("an HTTP request")
+    left = deadline.remaining()
+    if isinstance(timeout, tuple):
+        return tuple(min(value, left) for value in timeout)
+    return min(timeout, left)
+
+
+def budget_sleep(seconds: float) -> bool:
+    """
+    Wait before a retry, if the retry can still finish in time.
+
+    Args:
+        seconds (float): Backoff delay
+
+    Returns:
+        bool: True after waiting; False, without waiting, if the wait would leave no time
+            for the retry and the caller should give up
+    """
+    deadline = _current_deadline.get()
+    if deadline is not None and deadline.remaining() - seconds < MIN_TIMEOUT:
+        return False
+    time.sleep(seconds)
+    return True
+
+
+def pause(seconds: float) -> None:
+    """
+    Wait for a courtesy delay, shortened to a small share of the remaining budget.
+
+    Args:
+        seconds (float): Delay wanted without a deadline
+    """
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        seconds = min(seconds, deadline.remaining() * PAUSE_SHARE)
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+def wait_timeout(timeout: Optional[float] = None) -> Optional[float]:
+    """
+    Cap the time spent waiting for a result (a future, a lock) at the remaining budget.
+
+    Args:
+        timeout (Optional[float]): Timeout without a deadline; None waits indefinitely
+
+    Returns:
+        Optional[float]: Timeout to wait with
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def deadline_expired() -> bool:
+    """
+    Tell whether the query being handled ran out of time, so its result may be partial.
+
+    Returns:
+        bool: True if the query has a deadline and it has passed
+    """
+    deadline = _current_deadline.get()
+    return deadline is not None and deadline.expired()
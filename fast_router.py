@@ -0,0 +1,356 @@
+"""
+FastPathRouter module providing deterministic routing for unambiguous tool queries.
+
+Queries such as "convert 100 USD to EUR", "weather in Madrid" or "time in Tokyo"
+name one tool and carry arguments that can be checked against lexicons the tool
+modules already ship (cities, currencies, planets). Routing them with patterns
+skips the entity extraction and classification LLM calls entirely.
+"""
+
+import inspect
+import re
+import threading
+import types
+from typing import Dict, Any, List, Optional, Tuple
+
+# Words that join several requests in one query; such queries are left to the LLM
+MULTI_INTENT_PATTERN = re.compile(r"\b(and|then|also|after|before|if|unless|и|потом|затем|если)\b|;")
+
+# Filler words ignored when mining tool keywords from TOOL_EXAMPLES
+STOPWORDS = {
+    "what", "what's", "whats", "when", "where", "which", "show", "tell", "give", "find",
+    "much", "many", "about", "from", "with", "this", "that", "there", "does", "have",
+    "current", "latest", "recent", "today", "please", "information", "some", "any",
+    "how's", "hows", "over", "past"
+}
+
+# Time-of-day expressions mean a time conversion rather than "current time"
+TIME_OF_DAY_PATTERN = re.compile(r"\b\d{1,2}(?::\d{2})?\s*[ap]\.?m\b|\b\d{1,2}:\d{2}\b")
+
+# Phrasings that ask for the current time; "time" alone also appears in "a good time to visit"
+TIME_INTENT_PATTERN = re.compile(
+    r"\bwhat\s+time\b|\bwhat'?s\s+the\s+time\b|\b(?:current|local)\s+time\b"
+    r"|\btime\s+(?:is\s+it\s+)?(?:right\s+)?(?:now\s+)?in\b|\btime\s+now\b"
+)
+
+# Past-tense and date words: the query is not about current conditions
+PAST_OR_DATE_PATTERN = re.compile(
+    r"\b(?:was|were|did|been|had|yesterday|tomorrow|ago|last|next|previous|history|historical"
+    r"|monday|tuesday|wednesday|thursday|friday|saturday|sunday|january|february|march|april|may"
+    r"|june|july|august|september|october|november|december)\b|\b\d{4}\b|\b\d{1,2}/\d{1,2}\b"
+)
+
+# Words that may follow the city of a current-conditions query without qualifying it
+TRAILING_WORDS = {"today", "now", "right", "currently", "tonight", "please", "like"}
+
+# Trailing "in <place>" used when a location is not in any lexicon
+LOCATION_PATTERN = re.compile(r"\b(?:in|for|at)\s+([^\W\d_][\w\s'\-]*?)\s*[?.!]*$")
+
+WORD_PATTERN = re.compile(r"[^\W\d_][\w']*")
+
+# Upper bounds of the confidence histogram buckets reported by get_stats
+CONFIDENCE_BUCKETS = (0.5, 0.7, 0.8, 0.9, 0.95, 1.0)
+
+
+class FastPathRouter:
+    """
+    Rule-based router placed in front of the LLM classifier.
+
+    Each rule recognizes one tool function, fills its arguments from a lexicon
+    and scores how sure it is. Rules are penalized when the query also mentions
+    another tool or joins several requests. Only routes scoring at least the
+    threshold are returned; everything else falls through to the LLM.
+    """
+
+    def __init__(self, tools: Dict[str, Dict[str, Any]], tool_name_map: Dict[str, str],
+                 threshold: float = 0.9):
+        """
+        Initialize the router.
+
+        Args:
+            tools (Dict[str, Dict[str, Any]]): Tools discovered by the agent (name -> module and functions)
+            tool_name_map (Dict[str, str]): Mapping of tool name variations to canonical tool names
+            threshold (float): Minimum confidence for a route to bypass the LLM
+        """
+        self.tools = tools
+        self.threshold = threshold
+
+        self.cities: Dict[str, str] = {}
+        self.currencies: Dict[str, str] = {}
+        self.planets: Dict[str, str] = {}
+        self._load_lexicons()
+
+        self.keywords = self._build_keywords(tool_name_map)
+        self._currency_pattern = self._build_currency_pattern()
+
+        self._lock = threading.Lock()
+        self.stats = {
+            "attempts": 0,
+            "hits": 0,
+            "below_threshold": 0,
+            "no_match": 0,
+            "hit_confidence_total": 0.0,
+            "tool_hits": {},
+            "confidence_histogram": {f"<={bound}": 0 for bound in CONFIDENCE_BUCKETS}
+        }
+
+    def _tool_modules(self) -> List[Tuple[str, types.ModuleType]]:
+        """Return (tool name, module) pairs for tools backed by a real module."""
+        return [
+            (tool_name, tool_info["module"])
+            for tool_name, tool_info in self.tools.items()
+            if isinstance(tool_info.get("module"), types.ModuleType)
+        ]
+
+    def _load_lexicons(self) -> None:
+        """Collect the city, currency and planet lexicons exported by the tool modules."""
+        for _, module in self._tool_modules():
+            for city in getattr(module, "CITY_TIMEZONES", {}):
+                self.cities[city.lower()] = city.title()
+            for alias, code in getattr(module, "CURRENCY_ALIASES", {}).items():
+                # Two-letter aliases such as "US" collide with ordinary words
+                if len(alias) > 2:
+                    self.currencies[alias.lower()] = code
+                    self.currencies[code.lower()] = code
+            for planet in getattr(module, "PLANETS", {}):
+                self.planets[planet.lower()] = planet.title()
+
+    def _build_keywords(self, tool_name_map: Dict[str, str]) -> Dict[str, set]:
+        """
+        Build the keywords that signal each tool.
+
+        Keywords come from the tool name variations plus words that appear in the
+        TOOL_EXAMPLES queries of exactly one tool.
+
+        Args:
+            tool_name_map (Dict[str, str]): Mapping of tool name variations to canonical tool names
+
+        Returns:
+            Dict[str, set]: Tool name -> keywords (single words or phrases)
+        """
+        keywords: Dict[str, set] = {}
+        for variation, tool_name in tool_name_map.items():
+            if tool_name in self.tools and "tool" not in variation and "information" not in variation:
+                keywords.setdefault(tool_name, set()).add(variation.lower())
+
+        lexicon_words = set()
+        for entry in list(self.cities) + list(self.currencies) + list(self.planets):
+            lexicon_words.update(entry.split())
+
+        example_words: Dict[str, set] = {}
+        for tool_name, module in self._tool_modules():
+            for _, cls in inspect.getmembers(module, inspect.isclass):
+                if cls.__module__ != module.__name__:
+                    continue
+                for example in getattr(cls, "TOOL_EXAMPLES", []):
+                    argument_words = set(WORD_PATTERN.findall(example.get("tool_call", "").lower()))
+                    for word in WORD_PATTERN.findall(example.get("query", "").lower()):
+                        if (len(word) >= 4 and word not in STOPWORDS and word not in lexicon_words
+                                and word not in argument_words):
+                            example_words.setdefault(tool_name, set()).add(word)
+
+        for tool_name, words in example_words.items():
+            others = set().union(*(w for name, w in example_words.items() if name != tool_name))
+            keywords.setdefault(tool_name, set()).update(words - others)
+        return keywords
+
+    def _build_currency_pattern(self) -> Optional[re.Pattern]:
+        """Compile the "<amount> <currency> to <currency>" pattern from the currency lexicon."""
+        if not self.currencies:
+            return None
+        names = "|".join(re.escape(name) for name in sorted(self.currencies, key=len, reverse=True))
+        currency = rf"(?<![\w$])(?:{names})(?![\w$])"
+        return re.compile(
+            rf"(?:(?P<amount>\d[\d,]*(?:\.\d+)?)\s*)?(?P<source>{currency})"
+            rf"\s+(?:to|in|into|в|во)\s+(?P<target>{currency})"
+        )
+
+    @staticmethod
+    def _find_entries(text: str, lexicon: Dict[str, str]) -> List[str]:
+        """Find lexicon entries in text, longest first, without overlaps, in order of appearance."""
+        found = []
+        taken: List[Tuple[int, int]] = []
+        for entry in sorted(lexicon, key=len, reverse=True):
+            for match in re.finditer(rf"(?<!\w){re.escape(entry)}(?!\w)", text):
+                span = match.span()
+                if any(span[0] < end and start < span[1] for start, end in taken):
+                    continue
+                taken.append(span)
+                found.append((span[0], lexicon[entry]))
+        return [value for _, value in sorted(found)]
+
+    def _signals(self, text: str) -> set:
+        """Return the tools whose keywords occur in the text."""
+        words = set(WORD_PATTERN.findall(text))
+        signals = set()
+        for tool_name, keywords in self.keywords.items():
+            for keyword in keywords:
+                if (keyword in words if " " not in keyword
+                        else re.search(rf"(?<!\w){re.escape(keyword)}(?!\w)", text)):
+                    signals.add(tool_name)
+                    break
+        return signals
+
+    @staticmethod
+    def _trailing_words(text: str, city: str) -> set:
+        """Return the words following a city's mention in the text."""
+        match = re.search(rf"(?<!\w){re.escape(city.lower())}(?!\w)(.*)$", text)
+        return set(WORD_PATTERN.findall(match.group(1))) if match else set()
+
+    def _candidates(self, text: str, signals: set) -> List[Dict[str, Any]]:
+        """Run every rule over the query and return the routes it proposes."""
+        candidates = []
+        cities = self._find_entries(text, self.cities)
+        trailing = LOCATION_PATTERN.search(text)
+        unknown_location = trailing.group(1).strip().title() if trailing and not cities else None
+
+        if self._currency_pattern is not None:
+            match = self._currency_pattern.search(text)
+            if match:
+                amount = match.group("amount")
+                if amount:
+                    value = float(amount.replace(",", ""))
+                    amount = int(value) if value.is_integer() else value
+                candidates.append({
+                    "tool": "currency",
+                    "function": "convert_currency",
+                    "args": [amount if amount else 1, self.currencies[match.group("source")],
+                             self.currencies[match.group("target")]],
+                    "confidence": 0.97 if amount else 0.9,
+                    "consumed": match.group(0),
+                    "reason": "currency pair"
+                })
+
+        for tool_name, function_name in (("weather", "get_weather"), ("air_quality", "get_air_quality")):
+            if tool_name not in signals:
+                continue
+            if len(cities) == 1:
+                # "paris texas" or "last week" may ask about another place or time than the city now
+                qualified = (PAST_OR_DATE_PATTERN.search(text)
+                             or self._trailing_words(text, cities[0]) - TRAILING_WORDS - self.keywords[tool_name])
+                candidates.append({"tool": tool_name, "function": function_name, "args": cities,
+                                   "confidence": 0.7 if qualified else 0.95,
+                                   "reason": "qualified city" if qualified else "known city"})
+            elif unknown_location:
+                candidates.append({"tool": tool_name, "function": function_name, "args": [unknown_location],
+                                   "confidence": 0.75, "reason": "unknown location"})
+
+        if "time" in signals and not TIME_OF_DAY_PATTERN.search(text):
+            between = re.search(r"\bbetween\s+(.+?)\s+and\s+(.+)$", text)
+            if len(cities) == 2 and ("difference" in text or between):
+                candidates.append({"tool": "time", "function": "get_time_difference", "args": cities,
+                                   "confidence": 0.95, "consumed": between.group(0) if between else "",
+                                   "reason": "two known cities"})
+            elif len(cities) == 1 and "convert" not in text:
+                # Without an explicit ask for the time, "time" may be "a good time to visit"
+                explicit = TIME_INTENT_PATTERN.search(text)
+                candidates.append({"tool": "time", "function": "get_current_time", "args": cities,
+                                   "confidence": 0.95 if explicit else 0.7,
+                                   "reason": "known city" if explicit else "city without time intent"})
+            elif unknown_location:
+                candidates.append({"tool": "time", "function": "get_current_time", "args": [unknown_location],
+                                   "confidence": 0.75, "reason": "unknown location"})
+
+        planets = self._find_entries(text, self.planets)
+        if len(planets) == 1:
+            # A planet name alone may be something else ("mars bar calories")
+            confidence = 0.95 if "astronomy" in signals else 0.7
+            candidates.append({"tool": "astronomy", "function": "get_planet_info", "args": planets,
+                               "confidence": confidence, "reason": "known planet"})
+
+        return candidates
+
+    def candidates(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Score every route the rules propose for a query.
+
+        Args:
+            query (str): The user's query
+
+        Returns:
+            List[Dict[str, Any]]: Routes to available tool functions, in the format of route(),
+                best first
+        """
+        text = query.lower().strip()
+        signals = self._signals(text)
+        routes = []
+        for candidate in self._candidates(text, signals):
+            tool_name = candidate["tool"]
+            if tool_name not in self.tools or candidate["function"] not in self.tools[tool_name]["functions"]:
+                continue
+            confidence = candidate["confidence"]
+            remainder = text.replace(candidate.get("consumed") or "\0", " ")
+            if MULTI_INTENT_PATTERN.search(remainder):
+                confidence *= 0.5
+            if signals - {tool_name}:
+                confidence *= 0.6
+            routes.append({
+                "type": "tool_request",
+                "tool": tool_name,
+                "function": candidate["function"],
+                "args": candidate["args"],
+                "confidence": round(confidence, 3),
+                "explanation": f"Fast-path match on {candidate['reason']}.",
+                "router": "fast_path"
+            })
+        # Stable sort keeps rule order among equal scores
+        return sorted(routes, key=lambda route: -route["confidence"])
+
+    def match(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Find the best route for a query without applying the threshold.
+
+        Args:
+            query (str): The user's query
+
+        Returns:
+            Optional[Dict[str, Any]]: The best scoring route, or None if no rule matched
+        """
+        routes = self.candidates(query)
+        return routes[0] if routes else None
+
+    def route(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Route a query if a rule matches it confidently.
+
+        Args:
+            query (str): The user's query
+
+        Returns:
+            Optional[Dict[str, Any]]: Query info in the format of determine_query_type, or None
+                if the query should go to the LLM
+        """
+        best = self.match(query)
+        with self._lock:
+            self.stats["attempts"] += 1
+            if best is None:
+                self.stats["no_match"] += 1
+                return None
+            for bound in CONFIDENCE_BUCKETS:
+                if best["confidence"] <= bound:
+                    self.stats["confidence_histogram"][f"<={bound}"] += 1
+                    break
+            if best["confidence"] < self.threshold:
+                self.stats["below_threshold"] += 1
+                return None
+            self.stats["hits"] += 1
+            self.stats["hit_confidence_total"] += best["confidence"]
+            self.stats["tool_hits"][best["tool"]] = self.stats["tool_hits"].get(best["tool"], 0) + 1
+        return best
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get routing counters.
+
+        Returns:
+            Dict[str, Any]: Attempts, hits, hit rate, mean hit confidence and the confidence
+                histogram of the best match per query
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["tool_hits"] = dict(self.stats["tool_hits"])
+            stats["confidence_histogram"] = dict(self.stats["confidence_histogram"])
+        stats["hit_rate"] = stats["hits"] / stats["attempts"] if stats["attempts"] else 0.0
+        stats["avg_hit_confidence"] = stats.pop("hit_confidence_total") / stats["hits"] if stats["hits"] else 0.0
+        stats["threshold"] = self.threshold
+        return stats
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+AgentHTTPServer module serving LLMFlowAgent queries for many concurrent sessions over HTTP.
+
+Endpoints:
+    POST   /query            {"query": "...", "session": "id"?} -> {"session", "response", "latency", "usage"}
+    DELETE /sessions/<id>    forget a session's conversation memory
+    GET    /health           liveness check
+    GET    /stats            admission, session, latency and LLM usage counters
+    GET    /metrics          span latency histograms and cache hit/miss counters (Prometheus text format)
+
+Usage:
+    python http_server.py --port 8080 --max-in-flight 8
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from deadline import query_deadline, wait_timeout
+from main import LLMFlowAgent, ConversationMemory
+from model_tiers import collect_usage
+from tracing import PROMETHEUS_CONTENT_TYPE
+
+MAX_BODY_BYTES = 64 * 1024
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    """Error answered with an HTTP status and a JSON error body."""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Session:
+    """Conversation state of one client: its memory and a lock keeping its turns in order."""
+
+    def __init__(self, session_id: str, max_messages: int = 10):
+        self.id = session_id
+        self.memory = ConversationMemory(max_messages=max_messages)
+        self.lock = asyncio.Lock()
+        self.last_used = time.time()
+        self.queries = 0
+
+
+class SessionStore:
+    """
+    Sessions by id, with least-recently-used eviction and an idle timeout.
+
+    Only accessed from the server's event loop, so it needs no lock.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl: Optional[float] = 3600.0, max_messages: int = 10):
+        """
+        Initialize the store.
+
+        Args:
+            max_sessions (int): Sessions kept at once; the least recently used is evicted beyond this
+            ttl (Optional[float]): Seconds of inactivity after which a session is dropped; None keeps it
+            max_messages (int): Messages each session's memory keeps
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.stats = {"created": 0, "evicted": 0, "expired": 0, "deleted": 0}
+
+    def _expire(self, now: float) -> None:
+        if self.ttl is None:
+            return
+        for session_id, session in list(self.sessions.items()):
+            if now - session.last_used > self.ttl and not session.lock.locked():
+                del self.sessions[session_id]
+                self.stats["expired"] += 1
+
+    def get(self, session_id: Optional[str]) -> Session:
+        """
+        Get a session, creating it if the id is new or None.
+
+        Args:
+            session_id (Optional[str]): Client-chosen or previously returned id; None starts a session
+
+        Returns:
+            Session: The session, marked as most recently used
+        """
+        now = time.time()
+        self._expire(now)
+        session = self.sessions.get(session_id) if session_id is not None else None
+        if session is None:
+            session = Session(session_id or uuid.uuid4().hex, max_messages=self.max_messages)
+            self.sessions[session.id] = session
+            self.stats["created"] += 1
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.stats["evicted"] += 1
+        else:
+            self.sessions.move_to_end(session_id)
+        session.last_used = now
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Forget a session.
+
+        Args:
+            session_id (str): Session id
+
+        Returns:
+            bool: Whether the session existed
+        """
+        if self.sessions.pop(session_id, None) is None:
+            return False
+        self.stats["deleted"] += 1
+        return True
+
+
+class AdmissionController:
+    """
+    Limit on concurrently processed queries with a bounded wait queue.
+
+    A query is admitted at once while fewer than max_in_flight are running;
+    otherwise it waits if fewer than max_queue are already waiting, and is
+    rejected if the queue is full or it waited longer than queue_timeout.
+    Rejected clients are told to retry later instead of piling up requests
+    behind a saturated model.
+    """
+
+    def __init__(self, max_in_flight: int = 8, max_queue: int = 32, queue_timeout: float = 30.0):
+        """
+        Initialize the controller.
+
+        Args:
+            max_in_flight (int): Queries processed at once
+            max_queue (int): Queries allowed to wait for a slot
+            queue_timeout (float): Seconds a query may wait for a slot
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.stats = {"admitted": 0, "queued": 0, "rejected_full": 0, "rejected_timeout": 0,
+                      "peak_in_flight": 0, "peak_waiting": 0}
+
+    async def acquire(self) -> None:
+        """
+        Wait for a processing slot.
+
+        Raises:
+            HTTPError: 503 if the queue is full or the wait timed out
+        """
+        if self._slots.locked():
+            if self.waiting >= self.max_queue:
+                self.stats["rejected_full"] += 1
+                raise HTTPError(503, "Server is at capacity, retry later", {"Retry-After": "1"})
+            self.stats["queued"] += 1
+            self.waiting += 1
+            self.stats["peak_waiting"] = max(self.stats["peak_waiting"], self.waiting)
+            try:
+                # A query with a deadline waits no longer than its remaining budget
+                await asyncio.wait_for(self._slots.acquire(), wait_timeout(self.queue_timeout))
+            except asyncio.TimeoutError:
+                self.stats["rejected_timeout"] += 1
+                raise HTTPError(503, "Timed out waiting for capacity, retry later", {"Retry-After": "1"})
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        self.in_flight += 1
+        self.stats["admitted"] += 1
+        self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+
+    def release(self) -> None:
+        """Free a processing slot."""
+        self.in_flight -= 1
+        self._slots.release()
+
+
+class AgentHTTPServer:
+    """
+    Asyncio HTTP/1.1 front end for an LLMFlowAgent.
+
+    One agent serves every session: tool modules, the LLM response cache, the
+    tool prefetcher and the pooled Ollama connections are shared, while each
+    session's queries run with its own ConversationMemory. Turns of one
+    session are processed in order; different sessions run concurrently,
+    subject to admission control.
+    """
+
+    def __init__(self, agent: LLMFlowAgent, host: str = "127.0.0.1", port: int = 8080,
+                 max_in_flight: int = 8, max_queue: int = 32, queue_timeout: float = 30.0,
+                 max_sessions: int = 1000, session_ttl: Optional[float] = 3600.0):
+        """
+        Initialize the server.
+
+        Args:
+            agent (LLMFlowAgent): Agent answering the queries
+            host (str): Interface to listen on
+            port (int): Port to listen on; 0 picks a free port
+            max_in_flight (int): Queries processed at once
+            max_queue (int): Queries allowed to wait for a processing slot before 503s are returned
+            queue_timeout (float): Seconds a query may wait for a processing slot
+            max_sessions (int): Sessions kept at once
+            session_ttl (Optional[float]): Seconds of inactivity after which a session is dropped
+        """
+        self.agent = agent
+        self.host = host
+        self.port = port
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+
+        self.sessions: Optional[SessionStore] = None
+        self.admission: Optional[AdmissionController] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._latencies: List[float] = []
+        self.stats = {"requests": 0, "queries": 0, "errors": 0}
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running server."""
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        """Start listening on the running event loop."""
+        # Asyncio primitives belong to the loop the server runs on
+        self.sessions = SessionStore(self.max_sessions, self.session_ttl)
+        self.admission = AdmissionController(self.max_in_flight, self.max_queue, self.queue_timeout)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        """Start the server and serve until cancelled."""
+        await self.start()
+        print(f"Serving LLMFlowAgent on {self.url}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_background(self) -> "AgentHTTPServer":
+        """
+        Serve from a dedicated event loop thread.
+
+        Returns:
+            AgentHTTPServer: self, once the server is listening
+        """
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def run() -> None:
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="llmflow-http", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self) -> None:
+        """Stop a server started with start_background."""
+        if self._loop is None:
+            return
+
+        async def shutdown() -> None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """
+        Read one HTTP request.
+
+        Returns:
+            Optional[Tuple[str, str, Dict[str, str], bytes]]: Method, path, lower-cased headers
+                and body, or None if the client closed the connection
+
+        Raises:
+            HTTPError: 400 for a malformed request, 413 for an oversized body
+        """
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise HTTPError(400, "Malformed request line")
+        method, path, _ = parts
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request body exceeds {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve the requests of one keep-alive connection."""
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    self.stats["requests"] += 1
+                    status, payload, extra_headers = 200, await self._dispatch(method, path, body), {}
+                except HTTPError as e:
+                    status, payload, extra_headers = e.status, {"error": str(e)}, e.headers
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as e:
+                    print(f"Error handling HTTP request: {str(e)}")
+                    self.stats["errors"] += 1
+                    status, payload, extra_headers = 500, {"error": "Internal server error"}, {}
+
+                # Endpoints answer JSON objects, except for text such as the metrics exposition
+                if isinstance(payload, str):
+                    body_bytes, content_type = payload.encode("utf-8"), PROMETHEUS_CONTENT_TYPE
+                else:
+                    body_bytes = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json; charset=utf-8"
+                response_headers = {
+                    "Content-Type": content_type,
+                    "Content-Length": str(len(body_bytes)),
+                    "Connection": "keep-alive" if keep_alive else "close",
+                    **extra_headers
+                }
+                head = f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n" + "".join(
+                    f"{name}: {value}\r\n" for name, value in response_headers.items()
+                ) + "\r\n"
+                writer.write(head.encode("latin-1") + body_bytes)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Union[Dict[str, Any], str]:
+        """Route a request to its endpoint."""
+        path = path.split("?", 1)[0].rstrip("/") or "/"
+        if path == "/query":
+            if method != "POST":
+                raise HTTPError(405, "Use POST /query")
+            return await self._query(body)
+        if path.startswith("/sessions/"):
+            if method != "DELETE":
+                raise HTTPError(405, "Use DELETE /sessions/<id>")
+            session_id = path[len("/sessions/"):]
+            if not self.sessions.delete(session_id):
+                raise HTTPError(404, f"Unknown session: {session_id}")
+            return {"deleted": session_id}
+        if path == "/health" and method == "GET":
+            return {"status": "ok"}
+        if path == "/stats" and method == "GET":
+            return self.get_stats()
+        if path == "/metrics" and method == "GET":
+            return self.agent.tracer.prometheus()
+        raise HTTPError(404, f"No endpoint {method} {path}")
+
+    async def _query(self, body: bytes) -> Dict[str, Any]:
+        """Answer a query in its session."""
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Request body must be JSON")
+        query = request.get("query") if isinstance(request, dict) else None
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(400, "Field 'query' must be a non-empty string")
+        session_id = request.get("session")
+        if session_id is not None and not isinstance(session_id, str):
+            raise HTTPError(400, "Field 'session' must be a string")
+        deadline = request.get("deadline")
+        if deadline is not None and (isinstance(deadline, bool) or not isinstance(deadline, (int, float))
+                                     or deadline <= 0):
+            raise HTTPError(400, "Field 'deadline' must be a positive number of seconds")
+
+        session = self.sessions.get(session_id)
+        start = time.perf_counter()
+        # Turns of one session must see each other's messages; a session waiting for its
+        # previous turn does not hold a processing slot. Time spent waiting counts
+        # against the query's deadline.
+        with query_deadline(deadline if deadline is not None else self.agent.deadline):
+            async with session.lock:
+                await self.admission.acquire()
+                try:
+                    with collect_usage() as usage:
+                        response = await self.agent.aprocess_query(query, memory=session.memory)
+                finally:
+                    self.admission.release()
+        latency = time.perf_counter() - start
+        session.queries += 1
+        session.last_used = time.time()
+        self.stats["queries"] += 1
+        self._latencies.append(latency)
+        del self._latencies[:-1000]
+        return {"session": session.id, "response": response, "latency": round(latency, 4),
+                "usage": usage.summary()}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get server counters.
+
+        Returns:
+            Dict[str, Any]: Requests, answered queries, errors, admission counters (in flight,
+                waiting, admitted, queued, rejected), session counters, the mean and maximum
+                latency of the last 1000 queries, the agent's LLM usage per query type, and the
+                queue depths of the chain step tool pools and per-tool limits
+        """
+        stats = dict(self.stats)
+        if self.admission is not None:
+            stats["admission"] = dict(self.admission.stats, in_flight=self.admission.in_flight,
+                                      waiting=self.admission.waiting)
+        if self.sessions is not None:
+            stats["sessions"] = dict(self.sessions.stats, active=len(self.sessions.sessions))
+        latencies = list(self._latencies)
+        stats["avg_latency"] = sum(latencies) / len(latencies) if latencies else 0.0
+        stats["max_latency"] = max(latencies, default=0.0)
+        llm_usage = self.agent.get_llm_usage()
+        stats["llm_usage"] = {"totals": llm_usage["totals"],
+                              "query_types": {query_type: dict(values["totals"], queries=values["queries"])
+                                              for query_type, values in llm_usage["query_types"].items()}}
+        stats["tool_pools"] = self.agent.tool_pools.get_stats()
+        return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve LLMFlowAgent over HTTP for concurrent sessions")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="Queries processed at once")
+    parser.add_argument("--max-queue", type=int, default=32, help="Queries waiting for a slot before 503s")
+    parser.add_argument("--queue-timeout", type=float, default=30.0, help="Seconds a query may wait for a slot")
+    parser.add_argument("--max-sessions", type=int, default=1000, help="Sessions kept in memory")
+    parser.add_argument("--session-ttl", type=float, default=3600.0, help="Idle seconds before a session is dropped")
+    parser.add_argument("--ollama-url", default="http://localhost:11434", help="Ollama server URL")
+    parser.add_argument("--model", default=None, help="Default LLM model")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="Seconds a query may take, queueing included; requests may ask for less")
+    parser.add_argument("--trace", action="store_true", help="Record spans and serve their metrics on /metrics")
+    parser.add_argument("--trace-file", default=None, help="JSON-lines file the spans are appended to; implies --trace")
+    args = parser.parse_args(argv)
+
+    options = {"ollama_url": args.ollama_url, "max_in_flight": args.max_in_flight,
+               "pool_size": max(10, args.max_in_flight), "deadline": args.deadline,
+               "trace": args.trace, "trace_path": args.trace_file}
+    if args.model:
+        options["model"] = args.model
+    agent = LLMFlowAgent(**options)
+    agent.warm_up()
+    server = AgentHTTPServer(agent, host=args.host, port=args.port, max_in_flight=args.max_in_flight,
+                             max_queue=args.max_queue, queue_timeout=args.queue_timeout,
+                             max_sessions=args.max_sessions, session_ttl=args.session_ttl)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        agent.close()
+
+
+if __name__ == "__main__":
+    main()
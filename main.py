@@ -3,32 +3,29 @@ import re
 import json
 import asyncio
 import requests
-from typing import Dict, List, Any, Optional, Tuple, Union
-import importlib.util
-import inspect
+from typing import Dict, List, Any, Optional, Tuple, Union, Iterator, Callable
+import threading
+import time
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-# Import tool modules from the tools directory
-import sys
-sys.path.append("./tools")  # Add tools directory to path if needed
-
-# Attempt to import all tool modules
-try:
-    from currency_tool import convert_currency
-    from geolocation_tool import get_location_info, calculate_distance, find_nearby_places
-    from news_tool import search_news, get_headlines
-    from stock_tool import get_stock_quote, get_company_info, get_historical_data, get_market_summary
-    from time_tool import get_current_time, convert_time, get_time_difference, list_timezones
-    from weather_tool import get_weather
-    from wikipedia_tool import search_wikipedia, get_article_summary, get_article_content
-    from web_parser_tool import parse_webpage, get_page_summary
-    from search_tool import search_web
-    from air_quality_tool import get_air_quality, get_air_quality_by_coordinates
-    from astronomy_tool import get_celestial_events, get_visible_constellations, get_planet_info
-    print("All tools imported successfully")
-except ImportError as e:
-    print(f"Error importing tools: {e}")
-    # Continue without failing - we'll check for each tool's availability before using it
+from ollama_client import OllamaClient
+from caching import DEFAULT_TTL, LLMResponseCache, StepResultCache
+from fast_router import FastPathRouter, MULTI_INTENT_PATTERN
+from semantic_router import SemanticToolRouter
+from prompt_catalog import ToolCatalog
+from model_tiers import ModelTiers, DEFAULT_MODEL, LLMUsage, collect_usage, record_timing
+from model_residency import ModelResidencyManager
+from structured_output import StructuredOutput, entity_schema, routing_schema, analysis_schema, validate
+from speculation import SpeculativeExecutor, SpeculationCancelled, SpeculationHandle
+from prefetch import ToolPrefetcher, predict_from_entities
+from tool_loader import ToolLoader
+from tool_registry import ToolRegistry, ToolArgumentError
+from tool_pools import ToolPools
+from deadline import DeadlineExceeded, check_deadline, deadline_expired, query_deadline, wait_timeout
+from tracing import TRACER, cache_lookup, span, traced
 
 class Message:
     """Simple class to represent a message in the conversation."""
@@ -57,6 +54,23 @@ class ConversationMemory:
         self.max_messages = max_messages
         self.user_info: Dict[str, Any] = {}
         self.recent_tools_used: List[Dict[str, Any]] = []
+        self.total_messages = 0
+        
+        # Ollama KV context of the conversational LLM turns of this session
+        self.llm_context: Optional[List[int]] = None
+        self.llm_context_model: Optional[str] = None
+        self.llm_context_position = 0
+        self.llm_stats = {
+            "llm_turns": 0,
+            "context_turns": 0,
+            "prompt_eval_tokens": 0,
+            "context_prompt_eval_tokens": 0,
+            "eval_tokens": 0
+        }
+        
+        # Ollama token counts and durations of every LLM call of this session, and of its last query
+        self.llm_usage = LLMUsage()
+        self.last_query_usage: Optional[LLMUsage] = None
     
     def add_message(self, role: str, content: str) -> None:
         """
@@ -67,6 +81,7 @@ class ConversationMemory:
             content (str): The message content
         """
         self.messages.append(Message(role, content))
+        self.total_messages += 1
         # Trim if exceeding max messages
         if len(self.messages) > self.max_messages:
             self.messages.pop(0)
@@ -132,6 +147,68 @@ class ConversationMemory:
         
         return "\n".join(context)
     
+    def get_llm_context(self, model: str, max_tokens: Optional[int] = None) -> Optional[List[int]]:
+        """
+        Get the Ollama context to continue this session's conversation with.
+        
+        Args:
+            model (str): Model the next turn is sent to
+            max_tokens (Optional[int]): Largest context to reuse; a longer context is dropped
+                so the next turn starts over from a full prompt
+            
+        Returns:
+            Optional[List[int]]: Context tokens, or None if the turn needs a full prompt
+        """
+        if not self.llm_context or self.llm_context_model != model:
+            return None
+        if max_tokens is not None and len(self.llm_context) > max_tokens:
+            self.reset_llm_context()
+            return None
+        return self.llm_context
+    
+    def get_messages_since_context(self) -> List[Dict[str, str]]:
+        """
+        Get the messages added after the stored Ollama context was captured.
+        
+        Returns:
+            List[Dict[str, str]]: Messages the stored context has not seen, oldest first
+        """
+        unseen = self.total_messages - self.llm_context_position
+        if unseen <= 0:
+            return []
+        return [msg.to_dict() for msg in self.messages[-unseen:]]
+    
+    def record_llm_turn(self, model: str, data: Dict[str, Any], reused_context: bool) -> None:
+        """
+        Store the context returned by a conversational LLM turn and count its tokens.
+        
+        Args:
+            model (str): Model that produced the response
+            data (Dict[str, Any]): Final Ollama response body with "context" and token counts
+            reused_context (bool): Whether the turn continued the stored context
+        """
+        prompt_eval = data.get("prompt_eval_count", 0) or 0
+        self.llm_stats["llm_turns"] += 1
+        self.llm_stats["prompt_eval_tokens"] += prompt_eval
+        self.llm_stats["eval_tokens"] += data.get("eval_count", 0) or 0
+        if reused_context:
+            self.llm_stats["context_turns"] += 1
+            self.llm_stats["context_prompt_eval_tokens"] += prompt_eval
+        
+        if not data.get("context"):
+            self.reset_llm_context()
+            return
+        self.llm_context = data["context"]
+        self.llm_context_model = model
+        # The reply is part of the returned context but is added to the history afterwards
+        self.llm_context_position = self.total_messages + 1
+    
+    def reset_llm_context(self) -> None:
+        """Drop the stored Ollama context so the next turn sends a full prompt."""
+        self.llm_context = None
+        self.llm_context_model = None
+        self.llm_context_position = 0
+    
     def detect_language(self) -> Optional[str]:
         """
         Detect the language being used in the conversation.
@@ -178,21 +255,178 @@ class LLMFlowAgent:
     casual conversation and tool requests, and maintains conversation context.
     """
     
-    def __init__(self, ollama_url="http://localhost:11434"):
+    ROUTING_MODES = ("single_call", "two_step")
+    QUERY_TYPES = ("tool_request", "chain_query", "casual_conversation", "exit")
+    
+    # Tool-specific prompt instructions; only those of the shortlisted tools are sent
+    TOOL_INSTRUCTIONS = {
+        "astronomy": [
+            "For queries about constellations, stars, the night sky or planets, ALWAYS use the astronomy tool.",
+            "For queries about eclipses or celestial events in a specific location (e.g., \"eclipse Barcelona\"), "
+            "use the astronomy.get_celestial_events function. DO NOT use non-existent functions like \"get_eclipse_details\"."
+        ],
+        "currency": [
+            "For currency conversion queries:\n"
+            "   - Always include amount as first argument, even if not explicitly mentioned (use 1 as default)\n"
+            "   - \"курс евро к рублю\" -> tool: currency, function: convert_currency, args: [1, \"EUR\", \"RUB\"]"
+        ]
+    }
+    TRANSLATION_INSTRUCTION = (
+        "For queries in non-English languages, normalize and translate location names to English:\n"
+        "   - \"погода в Барселоне\" -> tool: weather, args: [\"Barcelona\"]\n"
+        "   - \"качество воздуха в Мадриде\" -> tool: air_quality, args: [\"Madrid\"]"
+    )
+    
+    def __init__(self, ollama_url="http://localhost:11434", pool_size: int = 10,
+                 connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 max_workers: int = 16, routing_mode: str = "single_call",
+                 cache_size: int = 1024, cache_ttl: Optional[float] = 3600,
+                 cache_path: Optional[str] = None, fast_path_threshold: Optional[float] = 0.9,
+                 semantic_top_k: Optional[int] = 3, catalog_top_k: Optional[int] = 3,
+                 chain_catalog_top_k: Optional[int] = 5, max_context_tokens: Optional[int] = 4096,
+                 model: str = DEFAULT_MODEL, stage_models: Optional[Dict[str, Union[str, Dict[str, Any]]]] = None,
+                 keep_alive: Optional[Union[str, float]] = "10m", keep_alive_interval: float = 60.0,
+                 structured_output: bool = True, speculative: bool = False,
+                 max_in_flight: Optional[int] = 4, prefetch_tools: bool = False,
+                 prefetch_ttl: float = 30.0, lazy_tools: bool = True,
+                 preload_tools: Optional[List[str]] = None, deadline: Optional[float] = None,
+                 trace: bool = False, trace_path: Optional[str] = None, parallel_chains: bool = True,
+                 step_cache_size: int = 512, step_cache_ttls: Optional[Dict[str, Optional[float]]] = None,
+                 tool_pool_sizes: Optional[Dict[str, int]] = None,
+                 tool_pool_classes: Optional[Dict[str, str]] = None,
+                 tool_concurrency: Optional[Dict[str, Optional[int]]] = None,
+                 tool_service_concurrency: Optional[Dict[str, Optional[int]]] = None):
         """
         Initialize the LLMFlowAgent.
         
         Args:
             ollama_url (str): URL for the LLM API
+            pool_size (int): Maximum number of pooled connections to the LLM API
+            connect_timeout (float): Seconds to wait when connecting to the LLM API
+            read_timeout (float): Seconds to wait for the LLM to respond
+            max_workers (int): Threads available for blocking LLM and tool calls
+            routing_mode (str): "single_call" extracts entities and classifies the query in
+                one LLM call; "two_step" uses separate extraction and classification calls
+            cache_size (int): Maximum number of LLM responses cached in memory
+            cache_ttl (Optional[float]): Default seconds a cached LLM response stays valid
+            cache_path (Optional[str]): SQLite file persisting cached LLM responses across runs
+            fast_path_threshold (Optional[float]): Minimum confidence for the rule-based router to
+                route a query without the LLM; None disables the fast path
+            semantic_top_k (Optional[int]): Maximum number of tools the local semantic router
+                shortlists for the LLM routing prompts; None disables the semantic router
+            catalog_top_k (Optional[int]): Maximum number of shortlisted tools described in
+                routing and tool analysis prompts; None describes every shortlisted tool
+            chain_catalog_top_k (Optional[int]): Maximum number of tools described in chain
+                generation prompts; None describes every candidate tool
+            max_context_tokens (Optional[int]): Largest Ollama context reused to continue a
+                conversation; None sends every conversational turn as a full prompt
+            model (str): Default LLM model
+            stage_models (Optional[Dict[str, Union[str, Dict[str, Any]]]]): Per LLM stage
+                ("extraction", "classification", "analysis", "chain", "condition", "recovery",
+                "formatting", "casual"), a model name or a dict with "model" and/or "options"
+            keep_alive (Optional[Union[str, float]]): How long Ollama keeps a model loaded after
+                each request (e.g. "10m", -1 for forever); None uses the Ollama default
+            keep_alive_interval (float): Seconds between background checks that reload or extend
+                the residency of models in use, once warm_up() has started them
+            structured_output (bool): Constrain the JSON-returning LLM stages with per-call JSON
+                schemas sent as Ollama's "format"
+            speculative (bool): While an LLM classifies the query, draft the casual reply (and
+                the tool chain for multi-intent queries) concurrently; the draft matching the
+                classification is used and the others are cancelled
+            max_in_flight (Optional[int]): Maximum concurrent Ollama requests; speculative stages
+                only start while a slot stays free for the stages the query waits on
+            prefetch_tools (bool): While an LLM routes the query, run the read-only tool calls its
+                entities point to (e.g. weather for a known city) so execute_tool finds them done
+            prefetch_ttl (float): Seconds a prefetched tool result stays usable
+            lazy_tools (bool): Import each tool module on the first call of one of its functions
+                instead of at startup; routing only needs metadata read from the sources
+            preload_tools (Optional[List[str]]): Tools imported by warm_up, so their first call
+                does not pay the import
+            deadline (Optional[float]): Seconds each query may take end to end; LLM calls, chain
+                steps and tool requests shrink their timeouts and retries to what is left.
+                None means no limit
+            trace (bool): Record spans of LLM calls, tool calls, chain steps, HTTP requests and
+                cache lookups; the metrics are served by tracer.prometheus()
+            trace_path (Optional[str]): JSON-lines file the spans are appended to; implies trace
+            parallel_chains (bool): Run the steps of a tool chain that do not depend on each
+                other's output concurrently
+            step_cache_size (int): Maximum number of chain step results cached across queries
+            step_cache_ttls (Optional[Dict[str, Optional[float]]]): Tool name -> seconds its chain
+                step results stay cached (0 disables caching), overriding caching.STEP_RESULT_TTLS
+            tool_pool_sizes (Optional[Dict[str, int]]): Threads per chain step pool class ("io",
+                "parsing"), overriding tool_pools.POOL_SIZES
+            tool_pool_classes (Optional[Dict[str, str]]): Tool name -> pool class its chain steps
+                run on, overriding tool_pools.TOOL_POOL_CLASSES
+            tool_concurrency (Optional[Dict[str, Optional[int]]]): Tool name -> concurrent calls
+                allowed (None for no limit), overriding tool_pools.TOOL_CONCURRENCY
+            tool_service_concurrency (Optional[Dict[str, Optional[int]]]): Upstream service ->
+                concurrent calls allowed across the tools calling it (None for no limit),
+                overriding tool_pools.SERVICE_CONCURRENCY
         """
+        if routing_mode not in self.ROUTING_MODES:
+            raise ValueError(f"Unknown routing mode: {routing_mode}")
+        # Spans of the hot path; the tracer is process-wide so that tools can report to it
+        self.tracer = TRACER
+        self.trace = trace or trace_path is not None
+        if self.trace:
+            self.tracer.enable(trace_path)
+        self.tool_loader = ToolLoader(lazy=lazy_tools)
+        self.preload_tools = preload_tools
         self.tools = self._discover_tools()
+        # Call adapters (argument checks, coercion, JSON schemas) compiled once per tool function
+        self.tool_registry = ToolRegistry(self.tools)
         self.ollama_url = ollama_url
-        self.model = "gemma3:12b"
+        self.model = model
+        self.model_tiers = ModelTiers(model, stage_models)
+        self.llm_client = OllamaClient(
+            ollama_url,
+            pool_size=pool_size,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            keep_alive=keep_alive,
+            max_in_flight=max_in_flight
+        )
+        self.speculative = speculative
+        self.speculator = SpeculativeExecutor(self.llm_client)
+        self.residency = ModelResidencyManager(
+            self.llm_client,
+            self.model_tiers.models(),
+            keep_alive=keep_alive if keep_alive is not None else "5m",
+            refresh_interval=keep_alive_interval
+        )
+        self.llm_cache = LLMResponseCache(max_entries=cache_size, default_ttl=cache_ttl, db_path=cache_path)
+        # Ollama token counts and durations of the processed queries, in total and per query type
+        self.llm_usage = LLMUsage()
+        self.query_type_usage: Dict[str, LLMUsage] = {}
+        self._usage_lock = threading.Lock()
+        # Queries run with a session's memory see it here instead of the agent's own
+        self._session_memory: contextvars.ContextVar = contextvars.ContextVar(
+            f"llmflow_session_memory_{id(self)}", default=None
+        )
         self.memory = ConversationMemory()
+        self.max_context_tokens = max_context_tokens
+        self.routing_mode = routing_mode
         
         # Create tool descriptions for the LLM
         self.tool_descriptions = self._create_tool_descriptions()
         
+        # JSON schemas constraining the structured LLM stages
+        self.structured_output = StructuredOutput(enabled=structured_output)
+        self.entity_schema = entity_schema()
+        self.routing_schemas = {
+            "single_call": routing_schema(self.tool_descriptions, self.QUERY_TYPES, entities=True),
+            "two_step": routing_schema(self.tool_descriptions, self.QUERY_TYPES)
+        }
+        
+        # Local vector index that shortlists tools before any LLM call
+        self.semantic_router = (
+            SemanticToolRouter(self.tool_descriptions, self.tools, top_k=semantic_top_k)
+            if semantic_top_k else None
+        )
+        
+        # Compact per-tool prompt serializations, rendered for the shortlisted tools only
+        self.tool_catalog = ToolCatalog(self.tool_descriptions, top_k=catalog_top_k, chain_top_k=chain_catalog_top_k)
+        
         # Tool name mapping dictionary
         self.tool_name_map = {
             # Weather variations
@@ -265,58 +499,53 @@ class LLMFlowAgent:
             'eclipse': 'astronomy'
         }
         
+        # Rule-based router tried before the LLM classifier
+        self.fast_router = (
+            FastPathRouter(self.tools, self.tool_name_map, threshold=fast_path_threshold)
+            if fast_path_threshold is not None else None
+        )
+        
+        # Read-only tool calls predicted from entities, run while the LLM is routing
+        self.prefetch_tools = prefetch_tools
+        self.deadline = deadline
+        self.tool_pools = ToolPools(tool_pool_sizes, tool_pool_classes, tool_concurrency,
+                                    service_concurrency=tool_service_concurrency)
+        self.prefetcher = ToolPrefetcher(self.tools, ttl=prefetch_ttl, pools=self.tool_pools)
+        
+        # Blocking LLM and tool calls run on this pool; queries run on one
+        # long-lived event loop that is started on first use
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llmflow")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+        
         # Initialize chain orchestrator
         from chain_orchestrator import ChainOrchestrator
-        self.orchestrator = ChainOrchestrator(self)
+        self.step_cache = StepResultCache(max_entries=step_cache_size, ttls=step_cache_ttls)
+        self.orchestrator = ChainOrchestrator(self, parallel=parallel_chains, cache=self.step_cache,
+                                              pools=self.tool_pools)
         
+    @property
+    def memory(self) -> ConversationMemory:
+        """Conversation memory of the query being handled: its session's, or the agent's own."""
+        session_memory = self._session_memory.get()
+        return session_memory if session_memory is not None else self._memory
+    
+    @memory.setter
+    def memory(self, memory: ConversationMemory) -> None:
+        self._memory = memory
+    
     def _discover_tools(self) -> Dict[str, Dict[str, Any]]:
         """
         Discover available tools and their functions.
         
+        With lazy tool loading the modules are not imported here: functions are
+        proxies that import their module on first call.
+        
         Returns:
             Dict[str, Dict[str, Any]]: Dictionary of tools and their functions
         """
-        tools = {}
-        
-        # Define the tool modules and their main functions
-        tool_modules = {
-            "currency": {"module": "currency_tool", "functions": ["convert_currency"]},
-            "geolocation": {"module": "geolocation_tool", "functions": ["get_location_info", "calculate_distance", "find_nearby_places"]},
-            "news": {"module": "news_tool", "functions": ["search_news", "get_headlines"]},
-            "stock": {"module": "stock_tool", "functions": ["get_stock_quote", "get_company_info", "get_historical_data", "get_market_summary"]},
-            "time": {"module": "time_tool", "functions": ["get_current_time", "convert_time", "get_time_difference", "list_timezones"]},
-            "weather": {"module": "weather_tool", "functions": ["get_weather"]},
-            "wikipedia": {"module": "wikipedia_tool", "functions": ["search_wikipedia", "get_article_summary", "get_article_content"]},
-            "web_parser": {"module": "web_parser_tool", "functions": ["parse_webpage", "get_page_summary"]},
-            "search": {"module": "search_tool", "functions": ["search_web"]},
-            "air_quality": {"module": "air_quality_tool", "functions": ["get_air_quality", "get_air_quality_by_coordinates"]},
-            "astronomy": {"module": "astronomy_tool", "functions": ["get_celestial_events", "get_visible_constellations", "get_planet_info"]},
-        }
-        
-        # Check if each tool is available
-        for tool_name, tool_info in tool_modules.items():
-            module_name = tool_info["module"]
-            try:
-                # Try to import the module
-                module = importlib.import_module(module_name)
-                
-                # Get the functions from the module
-                tool_functions = {}
-                for func_name in tool_info["functions"]:
-                    if hasattr(module, func_name):
-                        tool_functions[func_name] = getattr(module, func_name)
-                
-                # Add the tool to the available tools
-                if tool_functions:
-                    tools[tool_name] = {
-                        "module": module,
-                        "functions": tool_functions
-                    }
-                    print(f"Loaded tool: {tool_name} with {len(tool_functions)} functions")
-            except (ImportError, AttributeError) as e:
-                print(f"Could not load tool {tool_name}: {e}")
-        
-        return tools
+        return self.tool_loader.discover()
     
     def _create_tool_descriptions(self) -> Dict[str, Dict[str, Any]]:
         """
@@ -549,6 +778,7 @@ class LLMFlowAgent:
         # If no matches found, return original name
         return tool_name
     
+    @traced("extract_entities_with_llm")
     def extract_entities_with_llm(self, query: str) -> Dict[str, Any]:
         """
         Extract entities from the query using the LLM (cities, dates, objects, etc.).
@@ -587,25 +817,340 @@ Respond ONLY with a JSON object containing the extracted entities. For example:
 }}
 """
     
-        llm_response = self.query_llm(prompt)
+        llm_response = self.query_llm(prompt, cache=True, stage="extraction", schema=self.entity_schema)
+        
+        extracted, errors = self.structured_output.parse("extraction", llm_response, self.entity_schema)
+        if extracted is not None and not errors:
+            print(f"Extracted entities: {extracted}")
+            return extracted
+        
+        print("Error extracting entities: no valid JSON object in response")
+        self.discard_llm_reply(prompt, "extraction", self.entity_schema)
+        return {}
+    
+    def _apply_query_corrections(self, result: Dict[str, Any], extracted_entities: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Normalize and correct the tool, function and arguments chosen by the LLM.
         
+        Args:
+            result (Dict[str, Any]): Parsed classification from the LLM
+            extracted_entities (Dict[str, Any]): Entities extracted from the query
+            
+        Returns:
+            Dict[str, Any]: The corrected classification
+        """
+        # Normalize tool names
+        if 'tool' in result and result['tool'] is not None:
+            normalized_tool = self.normalize_tool_name(result['tool'])
+            print(f"Tool name normalized: '{result['tool']}' -> '{normalized_tool}'")
+            result['tool'] = normalized_tool
+
+        # Check and correct functions
+        if 'tool' in result and 'function' in result and result['tool'] is not None and result['function'] is not None:
+            # Check if the function exists in the tool
+            if result['tool'] in self.tools:
+                available_functions = list(self.tools[result['tool']]['functions'].keys())
+
+                # For eclipse and astronomical event queries
+                if result['tool'] == 'astronomy' and result['function'] == 'get_eclipse_details':
+                    print(f"Correcting function: '{result['function']}' -> 'get_celestial_events'")
+                    result['function'] = 'get_celestial_events'
+
+                # Check if the specified function exists
+                elif result['function'] not in available_functions:
+                    print(f"Function '{result['function']}' not found in tool '{result['tool']}'")
+                    # Try to find a suitable function by purpose
+                    if result['tool'] == 'astronomy':
+                        result['function'] = 'get_celestial_events'
+                    elif result['tool'] == 'weather':
+                        result['function'] = 'get_weather'
+                    elif result['tool'] == 'air_quality':
+                        result['function'] = 'get_air_quality'
+                    print(f"Using alternative function: '{result['function']}'")
+
+        # For currency queries
+        if result.get('tool') == 'currency':
+            # Check if correction is needed (less than 3 args)
+            if len(result.get('args', [])) < 3:
+                # Get currencies from entities if needed
+                amount = extracted_entities.get('amount', 1)  # Default to 1 if no amount specified
+                from_curr = extracted_entities.get('from_currency')
+                to_curr = extracted_entities.get('to_currency')
+
+                # Start with a fresh list
+                corrected_args = [amount if amount is not None else 1]  # Always start with amount, default to 1 if None
+
+                # Add currencies based on what we have
+                if len(result.get('args', [])) == 0:
+                    # No args provided, use entities
+                    if from_curr: corrected_args.append(from_curr)
+                    if to_curr: corrected_args.append(to_curr)
+                elif len(result.get('args', [])) == 1:
+                    # One currency provided
+                    corrected_args.append(result.get('args', [])[0])
+                    if to_curr: corrected_args.append(to_curr)
+                elif len(result.get('args', [])) == 2:
+                    # Both currencies provided but no amount
+                    corrected_args.extend(result.get('args', []))
+
+                # Ensure we have exactly 3 arguments
+                while len(corrected_args) < 3:
+                    corrected_args.append(None)
+
+                result['args'] = corrected_args[:3]  # Take only first 3 arguments
+
+        # Check arguments for astronomy
+        if result.get('tool') == 'astronomy' and result.get('function') == 'get_celestial_events':
+            # Check if the first argument is a valid date or None
+            if result.get('args') and len(result.get('args')) > 0:
+                first_arg = result['args'][0]
+                # If first argument doesn't look like a date (YYYY-MM-DD), replace with None
+                if first_arg and not re.match(r'\d{4}-\d{2}-\d{2}', str(first_arg)):
+                    print(f"Replaced invalid date parameter '{first_arg}' with None")
+                    result['args'][0] = None
+
+        # Add or correct arguments based on extracted entities
+        if 'args' in result and 'location' in extracted_entities and extracted_entities['location']:
+            # For weather, air quality and astronomy queries
+            if result.get('tool') in ['weather', 'air_quality'] and result.get('function', '').startswith('get_'):
+                # Add/replace first argument (location)
+                if not result.get('args'):
+                    result['args'] = [extracted_entities['location']]
+                else:
+                    result['args'][0] = extracted_entities['location']
+
+            # For astronomical event queries
+            elif result.get('tool') == 'astronomy' and result.get('function') == 'get_celestial_events':
+                if 'location' in extracted_entities:
+                    # If no arguments or only date
+                    if not result.get('args'):
+                        result['args'] = [None, extracted_entities['location']]
+                    elif len(result.get('args', [])) == 1:
+                        result['args'].append(extracted_entities['location'])
+        
+        return result
+    
+    def _format_function_list(self) -> str:
+        """
+        List the available tools with their exact function names for routing prompts.
+        
+        Returns:
+            str: One line per tool, e.g. "- Air quality: get_air_quality, ..."
+        """
+        return "\n".join([
+            f"- {tool_name.replace('_', ' ').capitalize()}: {', '.join(tool_desc['functions'].keys())}"
+            for tool_name, tool_desc in self.tool_descriptions.items()
+        ])
+    
+    def shortlist_tools(self, query: str, top_k: Optional[int] = None, pick: bool = True) -> List[Dict[str, Any]]:
+        """
+        Shortlist the tools most likely to answer a query without calling the LLM.
+        
+        Any object with a shortlist(query, top_k=None, pick=True) method can be
+        plugged in as self.semantic_router; set it to None to disable this stage.
+        
+        Args:
+            query (str): User query
+            top_k (Optional[int]): Maximum number of candidates; the router's default if None
+            pick (bool): Whether a dominant tool may be returned alone
+            
+        Returns:
+            List[Dict[str, Any]]: Candidate tools with their best function and score, best first
+        """
+        if self.semantic_router is None:
+            return []
         try:
-            # Extract JSON from response
-            json_match = re.search(r'(\{.*\})', llm_response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(1)
-                extracted = json.loads(json_str)
-                print(f"Extracted entities: {extracted}")
-                return extracted
+            candidates = self.semantic_router.shortlist(query, top_k=top_k, pick=pick)
         except Exception as e:
-            print(f"Error extracting entities: {e}")
+            print(f"Error in semantic tool routing: {str(e)}")
+            return []
+        print(f"Tool shortlist: {[(c['tool'], c['function'], round(c['score'], 2)) for c in candidates]}")
+        return candidates
     
-        return {}
+    def _format_tool_hint(self, candidates: List[Dict[str, Any]]) -> str:
+        """
+        Describe the shortlisted tools for a routing prompt.
+        
+        Args:
+            candidates (List[Dict[str, Any]]): Shortlist from shortlist_tools
+            
+        Returns:
+            str: Prompt paragraph naming the candidates, or an empty string
+        """
+        if not candidates:
+            return ""
+        entries = ", ".join(
+            f"{c['tool']}.{c['function']} ({c['score']:.2f})" if c.get('function') else f"{c['tool']} ({c['score']:.2f})"
+            for c in candidates
+        )
+        return f"Most likely tools for this query by local similarity (score): {entries}\n\n"
+    
+    def _format_instructions(self, tool_names: List[str], query: str, language: str) -> str:
+        """
+        Build the numbered instruction block for the given tools.
+        
+        Args:
+            tool_names (List[str]): Tools described in the prompt
+            query (str): User query
+            language (str): Detected language code
+            
+        Returns:
+            str: "IMPORTANT INSTRUCTIONS" block, or an empty string if no instruction applies
+        """
+        instructions = []
+        for tool_name in tool_names:
+            instructions.extend(self.TOOL_INSTRUCTIONS.get(tool_name, []))
+        if language != "en" or not query.isascii():
+            instructions.append(self.TRANSLATION_INSTRUCTION)
+        if not instructions:
+            return ""
+        numbered = "\n".join(f"{i}. {text}" for i, text in enumerate(instructions, 1))
+        return f"IMPORTANT INSTRUCTIONS:\n\n{numbered}\n\n"
     
+    def _routing_catalog(self, query: str, candidates: List[Dict[str, Any]], language: str) -> str:
+        """
+        Build the tool list and instructions of a routing prompt.
+        
+        Every tool is listed by its function names so that any tool can still be
+        chosen, but only the instructions of the shortlisted tools are included.
+        
+        Args:
+            query (str): User query
+            candidates (List[Dict[str, Any]]): Tool shortlist
+            language (str): Detected language code
+            
+        Returns:
+            str: Prompt section starting with the function list
+        """
+        function_list = self._format_function_list()
+        selected = self.tool_catalog.select(candidates, self.tool_catalog.top_k)
+        section = f"{function_list}\n\n{self._format_tool_hint(candidates)}{self._format_instructions(selected, query, language)}"
+        full = f"{function_list}\n\n{self._format_instructions(list(self.tool_descriptions), query, language)}"
+        self.tool_catalog.record("routing", full, section)
+        return section
+    
+    def route_query_single_call(self, query: str,
+                                candidates: Optional[List[Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Extract entities and classify the query with a single LLM call.
+        
+        Args:
+            query (str): User query (lowercased and stripped)
+            candidates (Optional[List[Dict[str, Any]]]): Tool shortlist; computed if not given
+            
+        Returns:
+            Optional[Dict[str, Any]]: Query type and action details including the
+                extracted entities, or None if the response could not be used
+        """
+        if candidates is None:
+            candidates = self.shortlist_tools(query)
+        
+        # Get conversation history for context
+        conversation_history = self.memory.get_conversation_history(max_items=5)
+        conversation_text = "\n".join([
+            f"{msg['role']}: {msg['content']}" for msg in conversation_history
+        ])
+        
+        # Detect the language
+        language = self.memory.detect_language() or "en"
+        
+        prompt = f"""You are the router for an assistant that can handle casual conversations and use tools to provide information.
+In a single step, extract the key entities from the user's query and decide how to handle it.
+
+Entity extraction:
+- For queries about weather, air quality, or celestial events, extract the location name in standard English form
+- If the location is in a non-standard case or form (e.g., "Барселоне" instead of "Барселона"), normalize it first
+- For currency queries, extract from_currency and to_currency as ISO codes and the amount if given
+- "eclipse Barcelona" -> location: "Barcelona", event_type: "eclipse"
+- "курс евро к рублю" -> from_currency: "EUR", to_currency: "RUB"
+
+Query types:
+1. "chain_query": multiple tools in sequence (e.g., "check weather in Tokyo and find news if raining")
+2. "tool_request": a single tool (e.g., "what's the weather in London")
+3. "casual_conversation": just casual conversation (e.g., "how are you")
+
+Available tools and their exact function names:
+{self._routing_catalog(query, candidates, language)}Detected language: {language}
+
+Recent conversation:
+{conversation_text}
+
+User query: "{query}"
+
+IMPORTANT: You must respond with ONLY a valid JSON object, no other text. The JSON must contain these exact fields:
+{{
+  "entities": {{"location": "...", "event_type": "...", "from_currency": "...", "to_currency": "...", "amount": 1}},
+  "type": "tool_request" or "chain_query" or "casual_conversation",
+  "tool": "tool_name (if applicable)",
+  "function": "function_name (if applicable)",
+  "args": ["arg1", "arg2", ... (if applicable)],
+  "explanation": "Brief explanation for the classification",
+  "language": "language_code",
+  "translation": "English translation if needed, otherwise null"
+}}
+Use null for entities that are not present in the query.
+"""
+
+        schema = self.routing_schemas["single_call"]
+        llm_response = self.query_llm(prompt, cache=True, stage="classification", schema=schema)
+        
+        try:
+            result, _ = self.structured_output.parse("classification", llm_response, schema)
+            if result is None:
+                raise ValueError("No valid JSON found in response")
+            if result.get("type") not in self.QUERY_TYPES:
+                raise ValueError(f"Invalid query type: {result.get('type')}")
+            
+            # Keep only the entities that were actually found
+            entities = result.get("entities") or {}
+            if not isinstance(entities, dict):
+                entities = {}
+            extracted_entities = {key: value for key, value in entities.items() if value is not None}
+            print(f"Extracted entities: {extracted_entities}")
+            
+            result.setdefault("args", [])
+            result = self._apply_query_corrections(result, extracted_entities)
+            self._check_routing(result, schema)
+            result['entities'] = extracted_entities
+            result['candidates'] = candidates
+            
+            print(f"Query Info: {result}")
+            return result
+            
+        except Exception as e:
+            print(f"Error parsing single-call routing response: {str(e)}")
+            print(f"Raw response: {llm_response}")
+            self.discard_llm_reply(prompt, "classification", schema)
+            return None
+    
+    @staticmethod
+    def _check_routing(result: Dict[str, Any], schema: Dict[str, Any]) -> None:
+        """
+        Check a corrected routing decision against its schema.
+        
+        Tool names are normalized and functions corrected first, so only what the
+        corrections cannot repair makes the decision unusable.
+        
+        Args:
+            result (Dict[str, Any]): Routing decision after _apply_query_corrections
+            schema (Dict[str, Any]): Schema of the routing reply
+            
+        Raises:
+            ValueError: If the decision violates the schema
+        """
+        errors = validate(result, schema)
+        if errors:
+            raise ValueError(f"Routing decision does not match its schema: {errors[0]}")
+    
+    @traced("determine_query_type")
     def determine_query_type(self, query: str) -> Dict[str, Any]:
         """
         Determine the type of query and appropriate action.
         
+        In "single_call" routing mode one structured LLM call returns the entities
+        and the routing decision; the two-step path (entity extraction followed by
+        classification) is used in "two_step" mode and as a fallback.
+        
         Args:
             query (str): User query
             
@@ -618,8 +1163,19 @@ Respond ONLY with a JSON object containing the extracted entities. For example:
         if query in ['exit', 'quit', 'stop']:
             return {"type": "exit"}
         
+        # Shortlist likely tools locally before any LLM call
+        candidates = self.shortlist_tools(query)
+        
+        # Try the single structured routing call first, falling back to the two-step path
+        if self.routing_mode == "single_call":
+            result = self.route_query_single_call(query, candidates=candidates)
+            if result is not None:
+                return result
+            print("Single-call routing failed, falling back to two-step routing")
+        
         # Extract entities from the query to help with classification
         extracted_entities = self.extract_entities_with_llm(query)
+        self._prefetch_for_entities(extracted_entities, candidates)
         
         # Get conversation history for context
         conversation_history = self.memory.get_conversation_history(max_items=5)
@@ -642,30 +1198,7 @@ Extracted entities from query:
 {json.dumps(extracted_entities, indent=2)}
 
 Available tools and their exact function names:
-- Currency: convert_currency
-- Geolocation: get_location_info, calculate_distance, find_nearby_places
-- News: search_news, get_headlines
-- Stock: get_stock_quote, get_company_info, get_historical_data, get_market_summary
-- Time: get_current_time, convert_time, get_time_difference, list_timezones
-- Weather: get_weather
-- Wikipedia: search_wikipedia, get_article_summary, get_article_content
-- Web parser: parse_webpage, get_page_summary
-- Search: search_web
-- Air quality: get_air_quality, get_air_quality_by_coordinates
-- Astronomy: get_celestial_events, get_visible_constellations, get_planet_info
-
-IMPORTANT INSTRUCTIONS:
-
-1. For queries about constellations, stars, the night sky or planets, ALWAYS use the astronomy tool.
-2. For queries about eclipses or celestial events in a specific location (e.g., "eclipse Barcelona"), use the astronomy.get_celestial_events function. DO NOT use non-existent functions like "get_eclipse_details".
-3. For queries in non-English languages, normalize and translate location names to English:
-   - "погода в Барселоне" -> tool: weather, args: ["Barcelona"]
-   - "качество воздуха в Мадриде" -> tool: air_quality, args: ["Madrid"]
-4. For currency conversion queries:
-   - Always include amount as first argument, even if not explicitly mentioned (use 1 as default)
-   - "курс евро к рублю" -> tool: currency, function: convert_currency, args: [1, "EUR", "RUB"]
-
-Detected language: {language}
+{self._routing_catalog(query, candidates, language)}Detected language: {language}
 
 Recent conversation:
 {conversation_text}
@@ -685,110 +1218,20 @@ IMPORTANT: You must respond with ONLY a valid JSON object, no other text. The JS
 """
 
         # Get the LLM's response
-        llm_response = self.query_llm(prompt)
+        schema = self.routing_schemas["two_step"]
+        llm_response = self.query_llm(prompt, cache=True, stage="classification", schema=schema)
         
         try:
-            # Clean the response to ensure it's valid JSON
-            llm_response = llm_response.strip()
-            if not llm_response.startswith('{'):
-                # Try to find JSON in the response
-                json_match = re.search(r'(\{.*\})', llm_response, re.DOTALL)
-                if json_match:
-                    llm_response = json_match.group(1)
-                else:
-                    raise ValueError("No valid JSON found in response")
-            
             # Parse the JSON
-            result = json.loads(llm_response)
-            
-            # Normalize tool names
-            if 'tool' in result and result['tool'] is not None:
-                normalized_tool = self.normalize_tool_name(result['tool'])
-                print(f"Tool name normalized: '{result['tool']}' -> '{normalized_tool}'")
-                result['tool'] = normalized_tool
-            
-            # Check and correct functions
-            if 'tool' in result and 'function' in result and result['tool'] is not None and result['function'] is not None:
-                # Check if the function exists in the tool
-                if result['tool'] in self.tools:
-                    available_functions = list(self.tools[result['tool']]['functions'].keys())
-                    
-                    # For eclipse and astronomical event queries
-                    if result['tool'] == 'astronomy' and result['function'] == 'get_eclipse_details':
-                        print(f"Correcting function: '{result['function']}' -> 'get_celestial_events'")
-                        result['function'] = 'get_celestial_events'
-                    
-                    # Check if the specified function exists
-                    elif result['function'] not in available_functions:
-                        print(f"Function '{result['function']}' not found in tool '{result['tool']}'")
-                        # Try to find a suitable function by purpose
-                        if result['tool'] == 'astronomy':
-                            result['function'] = 'get_celestial_events'
-                        elif result['tool'] == 'weather':
-                            result['function'] = 'get_weather'
-                        elif result['tool'] == 'air_quality':
-                            result['function'] = 'get_air_quality'
-                        print(f"Using alternative function: '{result['function']}'")
-            
-            # For currency queries
-            if result.get('tool') == 'currency':
-                # Check if correction is needed (less than 3 args)
-                if len(result.get('args', [])) < 3:
-                    # Get currencies from entities if needed
-                    amount = extracted_entities.get('amount', 1)  # Default to 1 if no amount specified
-                    from_curr = extracted_entities.get('from_currency')
-                    to_curr = extracted_entities.get('to_currency')
-
-                    # Start with a fresh list
-                    corrected_args = [amount if amount is not None else 1]  # Always start with amount, default to 1 if None
-                    
-                    # Add currencies based on what we have
-                    if len(result.get('args', [])) == 0:
-                        # No args provided, use entities
-                        if from_curr: corrected_args.append(from_curr)
-                        if to_curr: corrected_args.append(to_curr)
-                    elif len(result.get('args', [])) == 1:
-                        # One currency provided
-                        corrected_args.append(result.get('args', [])[0])
-                        if to_curr: corrected_args.append(to_curr)
-                    elif len(result.get('args', [])) == 2:
-                        # Both currencies provided but no amount
-                        corrected_args.extend(result.get('args', []))
-                    
-                    # Ensure we have exactly 3 arguments
-                    while len(corrected_args) < 3:
-                        corrected_args.append(None)
-                    
-                    result['args'] = corrected_args[:3]  # Take only first 3 arguments
-            
-            # Check arguments for astronomy
-            if result.get('tool') == 'astronomy' and result.get('function') == 'get_celestial_events':
-                # Check if the first argument is a valid date or None
-                if result.get('args') and len(result.get('args')) > 0:
-                    first_arg = result['args'][0]
-                    # If first argument doesn't look like a date (YYYY-MM-DD), replace with None
-                    if first_arg and not re.match(r'\d{4}-\d{2}-\d{2}', str(first_arg)):
-                        print(f"Replaced invalid date parameter '{first_arg}' with None")
-                        result['args'][0] = None
+            result, _ = self.structured_output.parse("classification", llm_response, schema)
+            if result is None:
+                raise ValueError("No valid JSON found in response")
             
-            # Add or correct arguments based on extracted entities
-            if 'args' in result and 'location' in extracted_entities and extracted_entities['location']:
-                # For weather, air quality and astronomy queries
-                if result.get('tool') in ['weather', 'air_quality'] and result.get('function', '').startswith('get_'):
-                    # Add/replace first argument (location)
-                    if not result.get('args'):
-                        result['args'] = [extracted_entities['location']]
-                    else:
-                        result['args'][0] = extracted_entities['location']
-                        
-                # For astronomical event queries
-                elif result.get('tool') == 'astronomy' and result.get('function') == 'get_celestial_events':
-                    if 'location' in extracted_entities:
-                        # If no arguments or only date
-                        if not result.get('args'):
-                            result['args'] = [None, extracted_entities['location']]
-                        elif len(result.get('args', [])) == 1:
-                            result['args'].append(extracted_entities['location'])
+            # Apply tool name, function and argument corrections, then check the corrected decision
+            result = self._apply_query_corrections(result, extracted_entities)
+            self._check_routing(result, schema)
+            result['entities'] = extracted_entities
+            result['candidates'] = candidates
             
             # Debug output
             print(f"Query Info: {result}")
@@ -798,6 +1241,7 @@ IMPORTANT: You must respond with ONLY a valid JSON object, no other text. The JS
         except Exception as e:
             print(f"Error parsing LLM response: {str(e)}")
             print(f"Raw response: {llm_response}")
+            self.discard_llm_reply(prompt, "classification", schema)
             # Return a default response that will handle the query as a casual conversation
             return {
                 "type": "casual_conversation",
@@ -806,39 +1250,303 @@ IMPORTANT: You must respond with ONLY a valid JSON object, no other text. The JS
                 "translation": None
             }
     
-    def query_llm(self, prompt: str) -> str:
+    def query_llm(self, prompt: str, cache: bool = False, cache_ttl: Any = DEFAULT_TTL,
+                  stage: str = "default", schema: Optional[Dict[str, Any]] = None,
+                  speculation: Optional[SpeculationHandle] = None) -> str:
         """
         Query the LLM with a given prompt.
         
         Args:
             prompt (str): The prompt to send to the LLM
+            cache (bool): Answer repeats of the same prompt from the response cache
+            cache_ttl (Optional[float]): Seconds the cached response stays valid; None means no
+                expiry; defaults to the cache's default TTL
+            stage (str): LLM stage whose model and generation options are used
+            schema (Optional[Dict[str, Any]]): JSON schema the response must follow; sent as
+                Ollama's "format" when structured output is enabled
+            speculation (Optional[SpeculationHandle]): Set when the call is made speculatively;
+                the response is then streamed, so the generation stops as soon as it is cancelled
             
         Returns:
             str: The LLM's response
+            
+        Raises:
+            SpeculationCancelled: If the speculation was cancelled before the response completed
         """
+        config = self.model_tiers.get(stage)
+        with span("query_llm", stage=stage, model=config.model) as llm_span:
+            extra = self._format_fields(schema)
+            cache_key = None
+            if cache:
+                cache_key = self._llm_cache_key(prompt, stage, schema)
+                cached = self.llm_cache.get(cache_key)
+                if cache_lookup("llm", cached is not None, stage=stage):
+                    self.model_tiers.record(stage, cached=True)
+                    llm_span.set(cached=True)
+                    return cached
+            
+            start = time.perf_counter()
+            try:
+                if speculation is not None:
+                    data = self._generate_cancellable(config.model, prompt, config.options, speculation, stage,
+                                                      **extra)
+                else:
+                    data = self.llm_client.generate(config.model, prompt, options=config.options, **extra)
+                self.model_tiers.record(stage, time.perf_counter() - start, data)
+                response = data.get("response", "")
+                if cache_key is not None:
+                    self.llm_cache.set(cache_key, response, ttl=cache_ttl)
+                return response
+            except SpeculationCancelled:
+                llm_span.cancel()
+                raise
+            except Exception as e:
+                self.model_tiers.record(stage, time.perf_counter() - start, error=True)
+                print(f"Error querying LLM: {str(e)}")
+                llm_span.fail(f"{type(e).__name__}: {str(e)}")
+                return f"Error: Could not query the LLM - {str(e)}"
+    
+    def _format_fields(self, schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Get the request fields constraining a reply to a schema, if structured output is enabled."""
+        output_format = self.structured_output.format_for(schema) if schema is not None else None
+        return {"format": output_format} if output_format is not None else {}
+    
+    def _llm_cache_key(self, prompt: str, stage: str, schema: Optional[Dict[str, Any]] = None) -> str:
+        """Get the response cache key of a query_llm call."""
+        config = self.model_tiers.get(stage)
+        return self.llm_cache.make_key(config.model, prompt, dict(config.options, **self._format_fields(schema)))
+    
+    def discard_llm_reply(self, prompt: str, stage: str = "default", schema: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Remove a cached reply its caller could not parse or validate, so a repeat asks the model again.
+        
+        Args:
+            prompt (str): The prompt the reply was cached for
+            stage (str): LLM stage of the call
+            schema (Optional[Dict[str, Any]]): JSON schema the call was made with
+        """
+        self.llm_cache.delete(self._llm_cache_key(prompt, stage, schema))
+    
+    def _generate_cancellable(self, model: str, prompt: str, options: Dict[str, Any],
+                              speculation: SpeculationHandle, stage: str, **extra: Any) -> Dict[str, Any]:
+        """
+        Run a completion as a stream that is dropped as soon as a speculation is cancelled.
+        
+        Args:
+            model (str): Name of the Ollama model
+            prompt (str): Prompt to send
+            options (Dict[str, Any]): Ollama generation options
+            speculation (SpeculationHandle): Handle of the speculative stage
+            stage (str): LLM stage, used in the cancellation error
+            **extra: Additional top-level request fields
+            
+        Returns:
+            Dict[str, Any]: The final chunk, with the complete "response"
+            
+        Raises:
+            SpeculationCancelled: If the speculation was cancelled before the response completed
+        """
+        tokens = []
+        data: Dict[str, Any] = {}
+        stream = self.llm_client.generate_stream(model, prompt, options=options, **extra)
         try:
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False
-                },
-                timeout=60
-            )
-            response.raise_for_status()
-            return response.json().get("response", "")
-        except Exception as e:
-            print(f"Error querying LLM: {str(e)}")
-            return f"Error: Could not query the LLM - {str(e)}"
+            for chunk in stream:
+                # Closing the stream drops the connection, which stops the generation
+                if speculation.is_cancelled():
+                    raise SpeculationCancelled(stage)
+                tokens.append(chunk.get("response", ""))
+                if chunk.get("done"):
+                    data = chunk
+        finally:
+            stream.close()
+        return dict(data, response="".join(tokens))
     
-    def analyze_tool_query(self, query: str, translation: Optional[str] = None) -> Tuple[Optional[str], Optional[str], List[str]]:
+    def query_llm_stream(self, prompt: str, stage: str = "default") -> Iterator[str]:
+        """
+        Query the LLM and yield response tokens as they are generated.
+        
+        Args:
+            prompt (str): The prompt to send to the LLM
+            stage (str): LLM stage whose model and generation options are used
+            
+        Yields:
+            str: Response tokens in the order they arrive
+        """
+        config = self.model_tiers.get(stage)
+        start = time.perf_counter()
+        streamed = False
+        # Not activated: the generator yields inside the span, back into the caller's context
+        with span("query_llm", activate=False, stage=stage, model=config.model, stream=True) as llm_span:
+            try:
+                for chunk in self.llm_client.generate_stream(config.model, prompt, options=config.options):
+                    token = chunk.get("response", "")
+                    if token:
+                        streamed = True
+                        yield token
+                    if chunk.get("done"):
+                        self.model_tiers.record(stage, time.perf_counter() - start, chunk)
+            except DeadlineExceeded as e:
+                # Keep what was generated before the deadline; only report an error if nothing was
+                self.model_tiers.record(stage, time.perf_counter() - start, error=True)
+                print(f"LLM response cut short: {str(e)}")
+                llm_span.fail(f"{type(e).__name__}: {str(e)}")
+                if not streamed:
+                    yield f"Error: Could not query the LLM - {str(e)}"
+            except Exception as e:
+                self.model_tiers.record(stage, time.perf_counter() - start, error=True)
+                print(f"Error querying LLM: {str(e)}")
+                llm_span.fail(f"{type(e).__name__}: {str(e)}")
+                yield f"Error: Could not query the LLM - {str(e)}"
+    
+    def stream_llm_response(self, prompt: str, on_token: Callable[[str], None],
+                            cache: bool = False, cache_ttl: Any = DEFAULT_TTL,
+                            stage: str = "default") -> str:
+        """
+        Stream an LLM response to a callback and return the full text.
+        
+        Args:
+            prompt (str): The prompt to send to the LLM
+            on_token (Callable[[str], None]): Called with each token as it arrives
+            cache (bool): Answer repeats of the same prompt from the response cache
+            cache_ttl (Optional[float]): Seconds the cached response stays valid; None means no
+                expiry; defaults to the cache's default TTL
+            stage (str): LLM stage whose model and generation options are used
+            
+        Returns:
+            str: The complete LLM response
+        """
+        config = self.model_tiers.get(stage)
+        cache_key = None
+        if cache:
+            cache_key = self.llm_cache.make_key(config.model, prompt, config.options)
+            cached = self.llm_cache.get(cache_key)
+            if cache_lookup("llm", cached is not None, stage=stage):
+                self.model_tiers.record(stage, cached=True)
+                on_token(cached)
+                return cached
+        
+        tokens = []
+        failed = False
+        for token in self.query_llm_stream(prompt, stage=stage):
+            tokens.append(token)
+            on_token(token)
+            failed = token.startswith("Error: Could not query the LLM")
+        response = "".join(tokens)
+        # A response cut short by the deadline is not cached
+        if cache_key is not None and not failed and not deadline_expired():
+            self.llm_cache.set(cache_key, response, ttl=cache_ttl)
+        return response
+    
+    def query_llm_session(self, prompt: str, turn_prompt: str,
+                          on_token: Optional[Callable[[str], None]] = None,
+                          speculation: Optional[SpeculationHandle] = None) -> str:
+        """
+        Query the LLM as the next turn of the conversation in memory.
+        
+        The first turn sends the full prompt. Ollama returns the evaluated tokens as
+        "context", which is kept in memory; later turns send that context with only
+        the turn prompt, so Ollama reuses its KV cache for the shared prefix and
+        evaluates just the new tokens.
+        
+        Args:
+            prompt (str): Full prompt with instructions and conversation history
+            turn_prompt (str): Prompt with only what is new since the stored context
+            on_token (Optional[Callable[[str], None]]): If given, the response is streamed
+                and each token is passed to this callback as it is generated
+            speculation (Optional[SpeculationHandle]): Set when the turn is drafted speculatively;
+                the response is streamed to its relay, abandoned once it is cancelled, and the
+                session context is only stored once it is adopted
+            
+        Returns:
+            str: The LLM's response
+            
+        Raises:
+            SpeculationCancelled: If the speculation was cancelled before the response completed
+        """
+        if speculation is not None:
+            on_token = speculation.relay
+        config = self.model_tiers.get("casual")
+        context = None
+        if self.max_context_tokens is not None:
+            context = self.memory.get_llm_context(config.model, self.max_context_tokens)
+        extra = {"context": context} if context else {}
+        request_prompt = turn_prompt if context else prompt
+        
+        with span("query_llm", stage="casual", model=config.model, session_context=bool(context)) as llm_span:
+            start = time.perf_counter()
+            try:
+                if on_token:
+                    tokens = []
+                    data: Dict[str, Any] = {}
+                    stream = self.llm_client.generate_stream(config.model, request_prompt,
+                                                             options=config.options, **extra)
+                    try:
+                        for chunk in stream:
+                            # Closing the stream drops the connection, which stops the generation
+                            if speculation is not None and speculation.is_cancelled():
+                                raise SpeculationCancelled("casual")
+                            token = chunk.get("response", "")
+                            if token:
+                                tokens.append(token)
+                                if on_token:
+                                    on_token(token)
+                            if chunk.get("done"):
+                                data = chunk
+                    finally:
+                        stream.close()
+                    response = "".join(tokens)
+                else:
+                    data = self.llm_client.generate(config.model, request_prompt, options=config.options, **extra)
+                    response = data.get("response", "")
+            except SpeculationCancelled:
+                llm_span.cancel()
+                raise
+            except DeadlineExceeded as e:
+                self.model_tiers.record("casual", time.perf_counter() - start, error=True)
+                self.memory.reset_llm_context()
+                llm_span.fail(f"{type(e).__name__}: {str(e)}")
+                if on_token and tokens:
+                    # Answer with what was generated before the deadline
+                    print(f"LLM response cut short: {str(e)}")
+                    return "".join(tokens)
+                print(f"Error querying LLM: {str(e)}")
+                error_msg = f"Error: Could not query the LLM - {str(e)}"
+                if on_token:
+                    on_token(error_msg)
+                return error_msg
+            except Exception as e:
+                self.model_tiers.record("casual", time.perf_counter() - start, error=True)
+                print(f"Error querying LLM: {str(e)}")
+                self.memory.reset_llm_context()
+                llm_span.fail(f"{type(e).__name__}: {str(e)}")
+                error_msg = f"Error: Could not query the LLM - {str(e)}"
+                if on_token:
+                    on_token(error_msg)
+                return error_msg
+            
+            self.model_tiers.record("casual", time.perf_counter() - start, data)
+            if self.max_context_tokens is not None:
+                record_turn = functools.partial(self.memory.record_llm_turn, config.model, data,
+                                                reused_context=bool(context))
+                if speculation is not None:
+                    speculation.defer(record_turn)
+                else:
+                    record_turn()
+            return response
+    
+    def analyze_tool_query(self, query: str, translation: Optional[str] = None,
+                           extracted_entities: Optional[Dict[str, Any]] = None,
+                           candidates: Optional[List[Dict[str, Any]]] = None) -> Tuple[Optional[str], Optional[str], List[str]]:
         """
         Analyze a tool request query to determine which tool, function, and arguments to use.
         
         Args:
             query (str): The user's query
             translation (Optional[str]): English translation of the query, if applicable
+            extracted_entities (Optional[Dict[str, Any]]): Entities already extracted for this
+                query (e.g. the "entities" of determine_query_type); extracted with the LLM if None
+            candidates (Optional[List[Dict[str, Any]]]): Tool shortlist (e.g. the "candidates" of
+                determine_query_type); computed with the semantic router if None
             
         Returns:
             Tuple[Optional[str], Optional[str], List[str]]: 
@@ -847,16 +1555,30 @@ IMPORTANT: You must respond with ONLY a valid JSON object, no other text. The JS
         # Use the translation if available
         effective_query = translation if translation else query
         
-        # Extract entities from the query
-        extracted_entities = self.extract_entities_with_llm(query)
+        # Extract entities from the query unless the router already did
+        if extracted_entities is None:
+            extracted_entities = self.extract_entities_with_llm(query)
         
-        # Create a prompt for the LLM
-        tools_json = json.dumps(self.tool_descriptions, indent=2)
+        # Describe only the shortlisted tools
+        if candidates is None:
+            candidates = self.shortlist_tools(effective_query)
+        self._prefetch_for_entities(extracted_entities, candidates)
+        selected = self.tool_catalog.select(candidates, self.tool_catalog.top_k)
+        language = self.memory.detect_language() or "en"
+        tools_text = self.tool_catalog.render(selected)
+        instructions = self._format_instructions(selected, query, language)
+        self.tool_catalog.record(
+            "analysis",
+            f"{self.tool_catalog.full_catalog_json()}\n{self._format_function_list()}\n"
+            f"{self._format_instructions(list(self.tool_descriptions), query, language)}",
+            f"{tools_text}\n{instructions}"
+        )
+        tool_names = ", ".join(f'"{tool_name}"' for tool_name in selected)
         
         prompt = f"""You are a tool-use assistant. Analyze the user query and determine which tool and function to use.
 
-Available tools:
-{tools_json}
+Available tools (name: description, then function(arguments) - description; example):
+{tools_text}
 
 Original user query: "{query}"
 Translated query (if applicable): "{effective_query}"
@@ -864,37 +1586,8 @@ Translated query (if applicable): "{effective_query}"
 Extracted entities from query:
 {json.dumps(extracted_entities, indent=2)}
 
-Available tools and their exact function names:
-- Currency: convert_currency
-- Geolocation: get_location_info, calculate_distance, find_nearby_places
-- News: search_news, get_headlines
-- Stock: get_stock_quote, get_company_info, get_historical_data, get_market_summary
-- Time: get_current_time, convert_time, get_time_difference, list_timezones
-- Weather: get_weather
-- Wikipedia: search_wikipedia, get_article_summary, get_article_content
-- Web parser: parse_webpage, get_page_summary
-- Search: search_web
-- Air quality: get_air_quality, get_air_quality_by_coordinates
-- Astronomy: get_celestial_events, get_visible_constellations, get_planet_info
-
-IMPORTANT INSTRUCTIONS:
-
-1. For queries about constellations, stars, night sky, or planets, ALWAYS use the astronomy tool.
-2. For queries about eclipses or astronomical events (including lunar or solar eclipses), ALWAYS use the astronomy.get_celestial_events function. DO NOT use non-existent functions like "get_eclipse_details".
-3. For queries in languages other than English, normalize and translate location names to their standard English form:
-   - "погода в Барселоне" -> location: "Barcelona" (NOT "Барселоне")
-   - "качество воздуха в Мадриде" -> location: "Madrid" (NOT "Мадриде")
-4. For currency conversion queries:
-   - Always include amount as first argument, even if not explicitly mentioned (use 1 as default)
-   - "курс евро к рублю" -> tool: currency, function: convert_currency, args: [1, "EUR", "RUB"]
-
-ALWAYS choose from these available functions for astronomy tool:
-- get_celestial_events: For ALL types of celestial events including eclipses
-- get_visible_constellations: For queries about constellations visible from a location
-- get_planet_info: For queries about specific planets
-
-Respond ONLY with a JSON object containing the following fields:
-- "tool": The name of the tool to use (use the exact tool name: "weather", "time", "currency", "geolocation", "news", "stock", "wikipedia", "web_parser", "search", "air_quality", "astronomy")
+{instructions}Respond ONLY with a JSON object containing the following fields:
+- "tool": The name of the tool to use (use the exact tool name: {tool_names})
 - "function": The function name to call
 - "arguments": An array of argument values in the correct order for the function
 - "reasoning": A brief explanation of your selection
@@ -910,15 +1603,13 @@ Format:
 DO NOT include any other text in your response, ONLY the JSON object.
 """
 
-        # Get the LLM's response
-        llm_response = self.query_llm(prompt)
+        # Get the LLM's response, constrained to the functions of the described tools
+        schema = analysis_schema(self.tool_descriptions, selected)
+        llm_response = self.query_llm(prompt, cache=True, stage="analysis", schema=schema)
         
         try:
-            # Extract the JSON part of the response
-            json_match = re.search(r'(\{.*\})', llm_response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(1)
-                result = json.loads(json_str)
+            result, _ = self.structured_output.parse("analysis", llm_response, schema)
+            if result is not None:
                 
                 tool_name = result.get("tool")
                 function_name = result.get("function")
@@ -1009,16 +1700,25 @@ DO NOT include any other text in your response, ONLY the JSON object.
                         elif len(arguments) == 1:
                             arguments.append(extracted_entities['location'])
                 
+                # Only a decision that matches the schema once corrected is used
+                errors = validate(dict(result, tool=tool_name, function=function_name, arguments=arguments), schema)
+                if errors:
+                    print(f"Tool analysis does not match its schema: {errors[0]}")
+                    self.discard_llm_reply(prompt, "analysis", schema)
+                    return None, None, []
+                
                 print(f"LLM reasoning: {reasoning}")
                 
                 return tool_name, function_name, arguments
             else:
                 print("Could not extract JSON from LLM response")
                 print(f"Raw response: {llm_response}")
+                self.discard_llm_reply(prompt, "analysis", schema)
                 return None, None, []
         except Exception as e:
             print(f"Error parsing LLM response: {str(e)}")
             print(f"Raw response: {llm_response}")
+            self.discard_llm_reply(prompt, "analysis", schema)
             return None, None, []
     
     def execute_tool(self, tool_name: str, function_name: str, args: List[Any]) -> str:
@@ -1035,41 +1735,64 @@ DO NOT include any other text in your response, ONLY the JSON object.
         """
         print(f"Executing tool: {tool_name}.{function_name} with args: {args}")
         
-        if tool_name not in self.tools or function_name not in self.tools[tool_name]["functions"]:
-            return f"Error: Tool '{tool_name}' or function '{function_name}' not available"
-        
-        # Get the function to call
-        func = self.tools[tool_name]["functions"][function_name]
-        
-        try:
-            # Get the function's signature to determine how many arguments it expects
-            sig = inspect.signature(func)
-            params = list(sig.parameters.values())
-            min_args = sum(1 for param in params if param.default == param.empty and param.kind not in (param.VAR_POSITIONAL, param.VAR_KEYWORD))
+        with span("execute_tool", tool=tool_name, function=function_name) as tool_span:
+            if tool_name not in self.tools or function_name not in self.tools[tool_name]["functions"]:
+                tool_span.fail("unknown tool or function")
+                return f"Error: Tool '{tool_name}' or function '{function_name}' not available"
             
-            # Check if we have enough arguments
-            if len(args) < min_args:
-                return f"Error: Not enough arguments for {function_name}, need at least {min_args}, got {len(args)}"
+            # Get the precompiled adapter of the function to call
+            adapter = self.tool_registry.adapter(tool_name, function_name, self.tools[tool_name]["functions"][function_name])
             
-            # Call the function with the provided arguments
-            result = func(*args[:len(params)])
-            
-            # Add to memory
-            self.memory.add_tool_usage(tool_name, function_name, args, str(result))
-            
-            return result
-        except Exception as e:
-            error_msg = f"Error executing {function_name}: {str(e)}"
-            print(error_msg)
-            return error_msg
+            try:
+                # Check the argument count and coerce the arguments to the parameter types
+                try:
+                    call_args = adapter.bind(args)
+                    check_deadline(f"{tool_name}.{function_name}")
+                except (ToolArgumentError, DeadlineExceeded) as e:
+                    tool_span.fail(f"{type(e).__name__}: {str(e)}")
+                    return f"Error: {str(e)}"
+                
+                # Use the prefetched call if there is one, otherwise call the function
+                prefetched = None
+                if self.prefetch_tools:
+                    prefetched = self.prefetcher.take(tool_name, function_name, args)
+                    cache_lookup("prefetch", prefetched is not None, tool=tool_name)
+                result = None
+                start = time.perf_counter()
+                if prefetched is not None:
+                    try:
+                        result = prefetched.result(timeout=wait_timeout())
+                        tool_span.set(prefetched=True)
+                    except Exception as e:
+                        print(f"Prefetched {function_name} failed, calling it again: {str(e)}")
+                        prefetched = None
+                if prefetched is None:
+                    with self.tool_pools.limited(tool_name):
+                        result = adapter.func(*call_args)
+                record_timing("tool", time.perf_counter() - start)
+                
+                # Add to memory
+                self.memory.add_tool_usage(tool_name, function_name, args, str(result))
+                
+                return result
+            except Exception as e:
+                error_msg = f"Error executing {function_name}: {str(e)}"
+                print(error_msg)
+                tool_span.fail(f"{type(e).__name__}: {str(e)}")
+                return error_msg
     
-    def handle_casual_conversation(self, query: str, query_info: Dict[str, Any]) -> str:
+    def handle_casual_conversation(self, query: str, query_info: Dict[str, Any],
+                                   on_token: Optional[Callable[[str], None]] = None,
+                                   speculation: Optional[SpeculationHandle] = None) -> str:
         """
         Use the LLM to respond to casual conversation.
         
         Args:
             query (str): The user's query
             query_info (Dict[str, Any]): Information about the query
+            on_token (Optional[Callable[[str], None]]): If given, the response is streamed
+                and each token is passed to this callback as it is generated
+            speculation (Optional[SpeculationHandle]): Set when the reply is drafted speculatively
             
         Returns:
             str: Response to the casual conversation
@@ -1104,28 +1827,178 @@ Detected language: {language}
 Respond directly to the user in their language.
 """
 
+        # When the session continues a stored Ollama context, the instructions and earlier
+        # turns are already evaluated; only messages since then and the new one are sent
+        new_messages = self.memory.get_messages_since_context()
+        if new_messages and new_messages[-1] == {"role": "user", "content": query}:
+            new_messages = new_messages[:-1]
+        new_text = "\n".join(f"{msg['role']}: {msg['content']}" for msg in new_messages)
+        turn_prompt = f"""{new_text}
+
+User's message: "{query}"
+
+Detected language: {language}
+Respond directly to the user in their language.
+""".lstrip()
+
         # Get the LLM's response
-        response = self.query_llm(prompt)
+        return self.query_llm_session(prompt, turn_prompt, on_token=on_token, speculation=speculation)
+    
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Get the agent's long-lived event loop, starting it on first use.
         
-        return response
+        Returns:
+            asyncio.AbstractEventLoop: Event loop running in a background thread
+        """
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="llmflow-loop", daemon=True)
+                thread.start()
+                self._loop = loop
+                self._loop_thread = thread
+            return self._loop
+    
+    def run_coroutine(self, coro) -> Any:
+        """
+        Run a coroutine on the agent's event loop and wait for its result.
+        
+        Safe to call from any number of threads at once; all coroutines share
+        the same loop, so their I/O overlaps.
+        
+        Args:
+            coro: Coroutine to run
+            
+        Returns:
+            Any: The coroutine's result
+        """
+        if self._loop_thread is not None and threading.current_thread() is self._loop_thread:
+            coro.close()
+            raise RuntimeError("Cannot block on the agent event loop from inside it; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
     
-    def process_query(self, query: str) -> str:
+    async def run_blocking(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking callable on the agent's thread pool without blocking the event loop.
+        
+        Args:
+            func (Callable): The blocking function
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+            
+        Returns:
+            Any: The function's result
+        """
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+    
+    async def aquery_llm(self, prompt: str, **kwargs: Any) -> str:
+        """
+        Query the LLM without blocking the event loop.
+        
+        Args:
+            prompt (str): The prompt to send to the LLM
+            **kwargs: Options accepted by query_llm
+            
+        Returns:
+            str: The LLM's response
+        """
+        return await self.run_blocking(self.query_llm, prompt, **kwargs)
+    
+    async def aexecute_tool(self, tool_name: str, function_name: str, args: List[Any]) -> str:
+        """
+        Execute a tool function without blocking the event loop.
+        
+        Args:
+            tool_name (str): Name of the tool
+            function_name (str): Name of the function to call
+            args (List[Any]): Arguments to pass to the function
+            
+        Returns:
+            str: Result from the tool
+        """
+        return await self.run_blocking(self.execute_tool, tool_name, function_name, args)
+    
+    def process_query(self, query: str, on_token: Optional[Callable[[str], None]] = None,
+                      memory: Optional[ConversationMemory] = None, deadline: Optional[float] = None) -> str:
         """
         Process a user query and return the result.
         
+        Thin synchronous wrapper around aprocess_query running on the agent's
+        long-lived event loop.
+        
+        Args:
+            query (str): The user's query
+            on_token (Optional[Callable[[str], None]]): If given, LLM-generated answers are
+                streamed and each token is passed to this callback as it is generated
+            memory (Optional[ConversationMemory]): Memory of the conversation the query belongs
+                to; the agent's own memory if None
+            deadline (Optional[float]): Seconds the query may take; the agent's deadline if None
+            
+        Returns:
+            str: Response to the query
+        """
+        return self.run_coroutine(self.aprocess_query(query, on_token=on_token, memory=memory, deadline=deadline))
+    
+    async def aprocess_query(self, query: str, on_token: Optional[Callable[[str], None]] = None,
+                             memory: Optional[ConversationMemory] = None, deadline: Optional[float] = None) -> str:
+        """
+        Process a user query asynchronously and return the result.
+        
+        Queries of different sessions can run concurrently on one agent, sharing
+        its caches and connection pool; each sees only its session's memory.
+        
+        With a deadline, every stage runs under the query's remaining budget and
+        the answer may be built from partial results once it is used up.
+        
         Args:
             query (str): The user's query
+            on_token (Optional[Callable[[str], None]]): If given, LLM-generated answers are
+                streamed and each token is passed to this callback as it is generated
+            memory (Optional[ConversationMemory]): Memory of the conversation the query belongs
+                to; the agent's own memory if None
+            deadline (Optional[float]): Seconds the query may take; the agent's deadline if None
             
         Returns:
             str: Response to the query
         """
+        if memory is not None:
+            token = self._session_memory.set(memory)
+            try:
+                return await self.aprocess_query(query, on_token=on_token, deadline=deadline)
+            finally:
+                self._session_memory.reset(token)
+        
+        usage = LLMUsage()
+        usage.queries = 1
+        with query_deadline(deadline if deadline is not None else self.deadline), span("query"), \
+                collect_usage(usage):
+            try:
+                return await self._aprocess_query(query, on_token, usage)
+            finally:
+                self._record_query_usage(usage)
+    
+    async def _aprocess_query(self, query: str, on_token: Optional[Callable[[str], None]],
+                              usage: LLMUsage) -> str:
+        """Process a query in the session and under the deadline set up by aprocess_query."""
         # Add the query to memory
         self.memory.add_message("user", query)
+        speculative: Dict[str, Any] = {}
         
         try:
-            # First, determine if this is a tool request, chain query, or casual conversation
-            query_info = self.determine_query_type(query)
+            # First, determine if this is a tool request, chain query, or casual conversation;
+            # unambiguous tool requests are routed by rules without calling the LLM
+            query_info = self.fast_router.route(query) if self.fast_router else None
+            if query_info:
+                print(f"Fast-path route (confidence {query_info['confidence']}): "
+                      f"{query_info['tool']}.{query_info['function']}")
+            else:
+                self._prefetch_for_query(query)
+                speculative = self._start_speculation(query)
+                query_info = await self.run_blocking(self.determine_query_type, query)
             query_type = query_info.get("type", "casual_conversation")
+            usage.query_type = query_type
             
             # Handle exit command
             if query_type == "exit":
@@ -1135,15 +2008,18 @@ Respond directly to the user in their language.
             if query_type == "chain_query":
                 try:
                     # Generate and execute a chain of tool calls
-                    chain = self.orchestrator.generate_chain(query)
+                    if "chain" in speculative:
+                        chain = await self.speculator.adopt(speculative.pop("chain"))
+                    else:
+                        chain = await self.run_blocking(self.orchestrator.generate_chain, query)
                     if not chain:
                         raise ValueError("Failed to generate a valid chain of tool calls")
                     
-                    context = asyncio.run(self.orchestrator.execute_chain(chain))
+                    context = await self.orchestrator.execute_chain(chain)
                     if not context:
                         raise ValueError("Failed to execute the chain of tool calls")
                     
-                    response = self.orchestrator.format_response(context)
+                    response = await self.run_blocking(self.orchestrator.format_response, context, on_token=on_token)
                     if not response:
                         raise ValueError("Failed to format the response")
                         
@@ -1155,7 +2031,7 @@ Respond directly to the user in their language.
                     args = query_info.get("args", [])
                     
                     if tool_name and function_name:
-                        response = self.execute_tool(tool_name, function_name, args)
+                        response = await self.aexecute_tool(tool_name, function_name, args)
                     else:
                         response = "I apologize, but I encountered an error while trying to process your request. Could you please try rephrasing your question?"
                         
@@ -1169,10 +2045,13 @@ Respond directly to the user in their language.
                     response = "I understand you're asking me to use a tool, but I'm not sure which one would help. Could you please be more specific about what information you're looking for?"
                 else:
                     # Execute the tool
-                    response = self.execute_tool(tool_name, function_name, args)
+                    response = await self.aexecute_tool(tool_name, function_name, args)
+            elif "casual" in speculative:
+                # Continue the reply drafted while the query was being classified
+                response = await self.speculator.adopt(speculative.pop("casual"), on_token)
             else:
                 # Handle casual conversation
-                response = self.handle_casual_conversation(query, query_info)
+                response = await self.run_blocking(self.handle_casual_conversation, query, query_info, on_token=on_token)
             
             # Add response to memory
             self.memory.add_message("assistant", response)
@@ -1184,6 +2063,163 @@ Respond directly to the user in their language.
             print(error_msg)
             self.memory.add_message("assistant", error_msg)
             return error_msg
+        
+        finally:
+            for task in speculative.values():
+                self.speculator.discard(task)
+    
+    def _record_query_usage(self, usage: LLMUsage) -> None:
+        """Add the LLM usage of a processed query to its session's, the agent's and its query type's."""
+        self.memory.llm_usage.merge(usage)
+        self.memory.last_query_usage = usage
+        self.llm_usage.merge(usage)
+        with self._usage_lock:
+            query_type_usage = self.query_type_usage.setdefault(usage.query_type or "unrouted", LLMUsage())
+        query_type_usage.merge(usage)
+    
+    def get_llm_usage(self) -> Dict[str, Any]:
+        """
+        Get the Ollama token counts and durations of the processed queries.
+        
+        Returns:
+            Dict[str, Any]: "queries" processed, "totals" and "stages" (name -> usage) over all
+                queries, and "query_types" (type -> queries, totals and stages); each usage has
+                calls, cache hits, errors, prompt and generated tokens, and Ollama's load, prompt
+                evaluation, generation and total seconds
+        """
+        stats = self.llm_usage.get_stats()
+        with self._usage_lock:
+            query_type_usage = dict(self.query_type_usage)
+        stats["query_types"] = {query_type: usage.get_stats() for query_type, usage in sorted(query_type_usage.items())}
+        return stats
+    
+    def _prefetch_for_query(self, query: str) -> None:
+        """
+        Prefetch the tool calls the rule-based router proposes for a query it could not route.
+        
+        Args:
+            query (str): The user's query
+        """
+        if self.prefetch_tools and self.fast_router is not None:
+            self.prefetcher.prefetch(self.fast_router.candidates(query))
+    
+    def _prefetch_for_entities(self, entities: Dict[str, Any], candidates: Optional[List[Dict[str, Any]]]) -> None:
+        """
+        Prefetch the tool calls predicted from extracted entities and the tool shortlist.
+        
+        Args:
+            entities (Dict[str, Any]): Extracted entities
+            candidates (Optional[List[Dict[str, Any]]]): Tool shortlist of the query
+        """
+        if self.prefetch_tools and entities:
+            self.prefetcher.prefetch(predict_from_entities(entities, candidates))
+    
+    def _start_speculation(self, query: str) -> Dict[str, Any]:
+        """
+        Launch the stages whose need depends on the pending classification.
+        
+        Args:
+            query (str): The user's query
+            
+        Returns:
+            Dict[str, Any]: Launched SpeculativeTask per stage ("casual", "chain")
+        """
+        if not self.speculative:
+            return {}
+        tasks = {}
+        language = self.memory.detect_language() or "en"
+        tasks["casual"] = self.speculator.launch(
+            "casual",
+            lambda handle: self.run_blocking(
+                self.handle_casual_conversation, query, {"language": language}, speculation=handle
+            )
+        )
+        if MULTI_INTENT_PATTERN.search(query.lower()):
+            tasks["chain"] = self.speculator.launch(
+                "chain",
+                lambda handle: self.run_blocking(self.orchestrator.generate_chain, query, speculation=handle)
+            )
+        return {stage: task for stage, task in tasks.items() if task is not None}
+    
+    def prewarm_tools(self, tools: Optional[List[str]] = None) -> Dict[str, Union[float, str]]:
+        """
+        Import tool modules ahead of their first use.
+        
+        Args:
+            tools (Optional[List[str]]): Tools to import; defaults to all of them
+            
+        Returns:
+            Dict[str, Union[float, str]]: Import seconds per tool, or an error string for tools
+                that could not be imported
+        """
+        return self.tool_loader.prewarm(tools)
+    
+    def warm_up(self, background: bool = True) -> Dict[str, Any]:
+        """
+        Load every configured model, and import the preload_tools, before the first query.
+        
+        Args:
+            background (bool): Also start the background thread that keeps the models in use loaded
+            
+        Returns:
+            Dict[str, Any]: Load seconds per model, or an error string for models that failed to load
+        """
+        if self.preload_tools:
+            for tool_name, result in self.prewarm_tools(self.preload_tools).items():
+                if not isinstance(result, float):
+                    print(f"Could not pre-warm tool {tool_name}: {result}")
+        results = self.residency.warm_up()
+        if background:
+            self.residency.start()
+        return results
+    
+    def close(self) -> None:
+        """Stop the event loop and release the worker threads, tool pools, prefetcher, LLM cache, pooled LLM connections and trace file."""
+        self.residency.stop()
+        with self._loop_lock:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop_thread.join()
+                self._loop.close()
+            self._loop = None
+            self._loop_thread = None
+        self._executor.shutdown(wait=False)
+        self.tool_pools.close()
+        self.prefetcher.close()
+        self.llm_cache.close()
+        self.llm_client.close()
+        if self.trace:
+            self.tracer.disable()
+
+def format_llm_usage(usage: Dict[str, Any]) -> str:
+    """
+    Render LLM usage as a text table, showing whether prompt evaluation or generation dominates.
+    
+    Args:
+        usage (Dict[str, Any]): Report from LLMFlowAgent.get_llm_usage() or LLMUsage.get_stats()
+        
+    Returns:
+        str: One row for all queries, one per query type and one per stage
+    """
+    def row(label: str, count: int, values: Dict[str, Any]) -> str:
+        prompt, generation = values["prompt_eval_seconds"], values["eval_seconds"]
+        dominant = "prompt" if prompt > generation else "generation" if generation > prompt else "-"
+        return (f"  {label:<20} {count:>6}  {values['prompt_eval_tokens']:>8} {prompt:>8.2f}s  "
+                f"{values['eval_tokens']:>8} {generation:>8.2f}s  {values['load_seconds']:>7.2f}s  {dominant}")
+    
+    totals = usage["totals"]
+    header = f"  {'':<20} {'count':>6}  {'prompt tokens / time':>18}  {'generated tokens / time':>18}  {'load':>8}  dominant"
+    lines = [f"LLM usage over {usage['queries']} queries: {totals['calls']} LLM calls, "
+             f"{totals['cache_hits']} answered from cache, {totals['errors']} failed",
+             header, row("all queries", usage["queries"], totals)]
+    query_types = usage.get("query_types", {})
+    if query_types:
+        lines.append("By query type (count = queries):")
+        lines += [row(query_type, values["queries"], values["totals"]) for query_type, values in query_types.items()]
+    if usage["stages"]:
+        lines.append("By stage (count = calls):")
+        lines += [row(stage, values["calls"], values) for stage, values in sorted(usage["stages"].items())]
+    return "\n".join(lines)
 
 # Interactive CLI for testing the agent
 def main():
@@ -1191,6 +2227,13 @@ def main():
     agent = LLMFlowAgent()
     print(f"Agent started with {len(agent.tools)} available tools")
     
+    # Load the models now so the first query does not wait for them
+    for model, result in agent.warm_up().items():
+        if isinstance(result, float):
+            print(f"Model {model} ready in {result:.2f}s")
+        else:
+            print(f"Model {model} not loaded: {result}")
+    
     print("\nYou can make queries such as:")
     print("- 'What's the weather in Madrid?'")
     print("- 'Convert 100 USD to EUR'")
@@ -1204,18 +2247,34 @@ def main():
     print("- 'Tell me about Jupiter'")
     print("- 'What astronomical events are happening soon?'")
     print("- Or simply chat with me like 'Hello, how are you?'")
-    print("\nType 'exit' or 'quit' to end.")
+    print("\nType '/usage' for LLM tokens and time per query type and stage, 'exit' or 'quit' to end.")
     
     while True:
         try:
             query = input("\nQuery: ")
             if query.lower() in ["exit", "quit", "q"]:
                 break
+            if query.strip().lower() == "/usage":
+                print(format_llm_usage(agent.get_llm_usage()))
+                continue
                 
-            response = agent.process_query(query)
+            # Print LLM-generated answers token by token as they are produced
+            streamed = []
+            def print_token(token: str) -> None:
+                if not streamed:
+                    print("\nResponse:")
+                streamed.append(token)
+                print(token, end="", flush=True)
+            
+            response = agent.process_query(query, on_token=print_token)
             if response == "exit":
                 print("Thank you for using the LLMFlowAgent!")
                 break
+            
+            if streamed:
+                print()
+                if "".join(streamed) == response:
+                    continue
                 
             print("\nResponse:")
             print(response)
@@ -0,0 +1,234 @@
+"""
+ModelResidency module warming up Ollama models and keeping the ones in use loaded.
+"""
+
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Union
+
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_keep_alive(value: Union[str, int, float, None]) -> Optional[float]:
+    """
+    Convert an Ollama keep_alive value to seconds.
+
+    Args:
+        value (Union[str, int, float, None]): Seconds, or a duration such as "10m", "1h30m" or "-1"
+
+    Returns:
+        Optional[float]: Seconds the model stays loaded; None means forever (negative values)
+
+    Raises:
+        ValueError: If the duration string cannot be parsed
+    """
+    if value is None:
+        return 300.0
+    if isinstance(value, (int, float)):
+        return None if value < 0 else float(value)
+    text = value.strip()
+    if re.fullmatch(r"-?\d+(\.\d+)?", text):
+        return parse_keep_alive(float(text))
+    if text.startswith("-"):
+        return None
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", text)
+    if not parts or "".join(number + unit for number, unit in parts) != text:
+        raise ValueError(f"Invalid keep_alive duration: {value}")
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def parse_expires_at(value: str) -> Optional[float]:
+    """
+    Convert an /api/ps "expires_at" timestamp to a Unix time.
+
+    Args:
+        value (str): RFC 3339 timestamp, possibly with nanosecond precision
+
+    Returns:
+        Optional[float]: Unix time, or None if the timestamp cannot be parsed
+    """
+    # Python only parses up to microseconds
+    text = re.sub(r"(\.\d{6})\d+", r"\1", value.replace("Z", "+00:00"))
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return None
+
+
+class ModelResidencyManager:
+    """
+    Warm-up and keep-alive manager for the models an agent uses.
+
+    warm_up() loads every configured model before the first query by sending
+    an empty prompt with keep_alive, which makes Ollama load the weights
+    without generating. A background thread then polls /api/ps and reissues
+    the keep-alive for every model used within active_window whose residency
+    is about to expire or that was unloaded, so idle gaps between queries do
+    not turn into cold loads.
+    """
+
+    def __init__(self, client, models: Iterable[str], keep_alive: Union[str, float] = "10m",
+                 refresh_interval: float = 60.0, active_window: float = 1800.0):
+        """
+        Initialize the manager.
+
+        Args:
+            client: OllamaClient used for preload and /api/ps requests
+            models (Iterable[str]): Models the agent is configured to use
+            keep_alive (Union[str, float]): Residency requested for each load, in Ollama format
+            refresh_interval (float): Seconds between background residency checks
+            active_window (float): Seconds after its last use a model is still kept loaded
+        """
+        self.client = client
+        self.models = list(dict.fromkeys(models))
+        self.keep_alive = keep_alive
+        self.refresh_interval = refresh_interval
+        self.active_window = active_window
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.resident: Dict[str, Optional[float]] = {}
+        self.stats = {
+            "warmups": 0,
+            "refreshes": 0,
+            "reloads": 0,
+            "checks": 0,
+            "errors": 0,
+            "load_latency": {}
+        }
+
+    def preload(self, model: str) -> float:
+        """
+        Load a model (or extend its residency) without generating any tokens.
+
+        Args:
+            model (str): Model name
+
+        Returns:
+            float: Seconds the request took, which includes the load when the model was cold
+        """
+        start = time.perf_counter()
+        self.client.load(model, keep_alive=self.keep_alive)
+        latency = time.perf_counter() - start
+        seconds = parse_keep_alive(self.keep_alive)
+        with self._lock:
+            self.resident[model] = time.time() + seconds if seconds is not None else None
+            self.stats["load_latency"][model] = latency
+        return latency
+
+    def warm_up(self, models: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Preload models so the first query does not pay the load.
+
+        Args:
+            models (Optional[Iterable[str]]): Models to load; defaults to the configured models
+
+        Returns:
+            Dict[str, Any]: Seconds per model, or an error string for models that failed to load
+        """
+        results: Dict[str, Any] = {}
+        for model in list(dict.fromkeys(models or self.models)):
+            try:
+                results[model] = self.preload(model)
+                with self._lock:
+                    self.stats["warmups"] += 1
+                self.client.mark_used(model)
+            except Exception as e:
+                print(f"Error warming up model {model}: {str(e)}")
+                with self._lock:
+                    self.stats["errors"] += 1
+                results[model] = f"Error: {str(e)}"
+        return results
+
+    def active_models(self) -> List[str]:
+        """
+        Get the models used within the active window.
+
+        Returns:
+            List[str]: Model names, most recently used first
+        """
+        now = time.time()
+        last_used = self.client.get_last_used()
+        return [
+            model for model, used_at in sorted(last_used.items(), key=lambda item: item[1], reverse=True)
+            if now - used_at <= self.active_window
+        ]
+
+    def refresh(self) -> List[str]:
+        """
+        Reissue the keep-alive for active models that are unloaded or about to expire.
+
+        Returns:
+            List[str]: Models that were preloaded
+        """
+        with self._lock:
+            self.stats["checks"] += 1
+        try:
+            running = self.client.list_running()
+        except Exception as e:
+            print(f"Error checking model residency: {str(e)}")
+            with self._lock:
+                self.stats["errors"] += 1
+            return []
+
+        resident = {}
+        for entry in running:
+            name = entry.get("model") or entry.get("name")
+            resident[name] = parse_expires_at(entry.get("expires_at", ""))
+        with self._lock:
+            self.resident = dict(resident)
+
+        refreshed = []
+        horizon = time.time() + 2 * self.refresh_interval
+        for model in self.active_models():
+            expires_at = resident.get(model)
+            if model in resident and (expires_at is None or expires_at > horizon):
+                continue
+            try:
+                self.preload(model)
+            except Exception as e:
+                print(f"Error refreshing model {model}: {str(e)}")
+                with self._lock:
+                    self.stats["errors"] += 1
+                continue
+            with self._lock:
+                self.stats["refreshes" if model in resident else "reloads"] += 1
+            refreshed.append(model)
+        return refreshed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def start(self) -> None:
+        """Start the background keep-alive thread if it is not running."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="llmflow-residency", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background keep-alive thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get warm-up and keep-alive counters.
+
+        Returns:
+            Dict[str, Any]: Warm-ups, refreshes of expiring models, reloads of unloaded models,
+                checks, errors, last preload latency per model and the resident models seen last
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["load_latency"] = dict(self.stats["load_latency"])
+            stats["resident"] = sorted(self.resident)
+        stats["running"] = self._thread is not None and self._thread.is_alive()
+        return stats
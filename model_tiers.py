@@ -0,0 +1,341 @@
+"""
+ModelTiers module assigning an Ollama model and generation options to each LLM stage.
+"""
+
+import contextlib
+import contextvars
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Any, Iterator, List, Optional, Union
+
+DEFAULT_MODEL = "gemma3:12b"
+
+# Output caps per stage; structured stages only ever need a short JSON object or one word
+DEFAULT_STAGE_OPTIONS: Dict[str, Dict[str, Any]] = {
+    "default": {},
+    "extraction": {"num_predict": 128},
+    "classification": {"num_predict": 256},
+    "analysis": {"num_predict": 192},
+    "chain": {"num_predict": 512},
+    "condition": {"num_predict": 4},
+    "recovery": {"num_predict": 256},
+    "formatting": {},
+    "casual": {}
+}
+
+
+class StageTimings:
+    """Seconds spent per stage while handling one query."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        """Add the duration of one call of a stage."""
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def as_dict(self) -> Dict[str, float]:
+        """Get the seconds per stage."""
+        with self._lock:
+            return dict(self.seconds)
+
+
+# Collector of the query being handled; copied into worker threads by run_blocking
+_current_timings: contextvars.ContextVar = contextvars.ContextVar("llmflow_stage_timings", default=None)
+
+
+@contextlib.contextmanager
+def collect_timings() -> Iterator[StageTimings]:
+    """
+    Collect the stage timings recorded in the current context.
+
+    Yields:
+        StageTimings: Receives every record_timing call made until the block exits
+    """
+    timings = StageTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def record_timing(stage: str, seconds: float) -> None:
+    """
+    Record the duration of a stage for the query being handled, if timings are collected.
+
+    Args:
+        stage (str): Stage name (an LLM stage, or e.g. "tool")
+        seconds (float): Duration of the call
+    """
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+# Ollama response fields reported in nanoseconds -> usage field in seconds
+USAGE_DURATIONS = {
+    "load_duration": "load_seconds",
+    "prompt_eval_duration": "prompt_eval_seconds",
+    "eval_duration": "eval_seconds",
+    "total_duration": "total_seconds"
+}
+
+
+# Usage fields reported with each answer by the batch runner and the HTTP server
+SUMMARY_FIELDS = ("prompt_eval_tokens", "eval_tokens", "prompt_eval_seconds", "eval_seconds", "load_seconds")
+
+
+def _empty_usage() -> Dict[str, Any]:
+    return {"calls": 0, "cache_hits": 0, "errors": 0, "prompt_eval_tokens": 0, "eval_tokens": 0,
+            "load_seconds": 0.0, "prompt_eval_seconds": 0.0, "eval_seconds": 0.0, "total_seconds": 0.0,
+            "latency": 0.0}
+
+
+class LLMUsage:
+    """
+    Ollama token counts and durations per LLM stage, summed over the calls of a query or session.
+
+    Prompt evaluation and generation are reported separately (tokens and
+    Ollama-measured seconds), together with model load time and the wall-clock
+    latency seen by the agent, so it shows which one dominates.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.queries = 0
+        # Set on the usage of one query once it has been routed
+        self.query_type: Optional[str] = None
+
+    def add(self, stage: str, latency: float = 0.0, data: Optional[Dict[str, Any]] = None,
+            error: bool = False, cached: bool = False) -> None:
+        """
+        Add one LLM call of a stage.
+
+        Args:
+            stage (str): Stage name
+            latency (float): Seconds the call took
+            data (Optional[Dict[str, Any]]): Final Ollama response body with counts and durations
+            error (bool): Whether the call failed
+            cached (bool): Whether the call was answered from the response cache
+        """
+        data = data or {}
+        with self._lock:
+            usage = self.stages.get(stage)
+            if usage is None:
+                usage = self.stages[stage] = _empty_usage()
+            usage["calls"] += 1
+            usage["cache_hits"] += int(cached)
+            usage["errors"] += int(error)
+            usage["prompt_eval_tokens"] += data.get("prompt_eval_count", 0) or 0
+            usage["eval_tokens"] += data.get("eval_count", 0) or 0
+            for field_name, key in USAGE_DURATIONS.items():
+                usage[key] += (data.get(field_name, 0) or 0) / 1e9
+            usage["latency"] += latency
+
+    def merge(self, other: "LLMUsage") -> None:
+        """
+        Add the calls and queries of another usage.
+
+        Args:
+            other (LLMUsage): Usage to add, e.g. that of one query
+        """
+        stages, queries = other.as_dict(), other.queries
+        with self._lock:
+            for stage, values in stages.items():
+                usage = self.stages.setdefault(stage, _empty_usage())
+                for key, value in values.items():
+                    usage[key] += value
+            self.queries += queries
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Get the usage per stage."""
+        with self._lock:
+            return {stage: dict(values) for stage, values in self.stages.items()}
+
+    def totals(self) -> Dict[str, Any]:
+        """
+        Get the usage summed over stages.
+
+        Returns:
+            Dict[str, Any]: Calls, cache hits, errors, prompt and generated tokens, Ollama load,
+                prompt evaluation, generation and total seconds, and wall-clock latency
+        """
+        totals = _empty_usage()
+        for values in self.as_dict().values():
+            for key, value in values.items():
+                totals[key] += value
+        return totals
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Get the totals that tell prompt evaluation and generation apart, rounded for reports.
+
+        Returns:
+            Dict[str, float]: Prompt and generated tokens, and prompt evaluation, generation
+                and model load seconds
+        """
+        totals = self.totals()
+        return {key: round(totals[key], 4) for key in SUMMARY_FIELDS}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the usage totals and per stage.
+
+        Returns:
+            Dict[str, Any]: "queries" counted, "totals" and "stages" (name -> usage)
+        """
+        return {"queries": self.queries, "totals": self.totals(), "stages": self.as_dict()}
+
+
+# Usages collecting the calls of the code being run, innermost last; copied into worker threads by run_blocking
+_current_usage: contextvars.ContextVar = contextvars.ContextVar("llmflow_llm_usage", default=())
+
+
+@contextlib.contextmanager
+def collect_usage(usage: Optional[LLMUsage] = None) -> Iterator[LLMUsage]:
+    """
+    Collect the LLM usage recorded in the current context.
+
+    Blocks can be nested, e.g. a query's usage inside its session's: every
+    enclosing collector receives each call.
+
+    Args:
+        usage (Optional[LLMUsage]): Usage to add the calls to; a new one if None
+
+    Yields:
+        LLMUsage: Receives every LLM call recorded until the block exits
+    """
+    usage = usage if usage is not None else LLMUsage()
+    token = _current_usage.set(_current_usage.get() + (usage,))
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def record_usage(stage: str, latency: float = 0.0, data: Optional[Dict[str, Any]] = None,
+                 error: bool = False, cached: bool = False) -> None:
+    """
+    Record one LLM call in the usages being collected, if any.
+
+    Args:
+        stage (str): Stage name
+        latency (float): Seconds the call took
+        data (Optional[Dict[str, Any]]): Final Ollama response body with counts and durations
+        error (bool): Whether the call failed
+        cached (bool): Whether the call was answered from the response cache
+    """
+    for usage in _current_usage.get():
+        usage.add(stage, latency, data, error=error, cached=cached)
+
+
+@dataclass
+class StageConfig:
+    """Model and generation options used for one LLM stage."""
+    model: str
+    options: Dict[str, Any] = field(default_factory=dict)
+
+
+class ModelTiers:
+    """
+    Per-stage model configuration and usage accounting.
+
+    Every LLM call names its stage (entity extraction, classification, chain
+    generation, condition evaluation, formatting, casual chat, ...). Stages
+    default to one model with stage-specific output caps, and any stage can be
+    moved to a smaller, faster model. Calls, cache hits, token counts, Ollama's
+    durations and latency are tracked per stage, and every call is also added
+    to the LLMUsage collectors of the query being handled.
+    """
+
+    STAGES = tuple(DEFAULT_STAGE_OPTIONS)
+
+    def __init__(self, default_model: str = DEFAULT_MODEL,
+                 overrides: Optional[Dict[str, Union[str, Dict[str, Any]]]] = None):
+        """
+        Initialize the stage configuration.
+
+        Args:
+            default_model (str): Model used by stages without an override
+            overrides (Optional[Dict[str, Union[str, Dict[str, Any]]]]): Per stage, either a model
+                name or a dict with "model" and/or "options"; options are merged over the defaults
+
+        Raises:
+            ValueError: If an override names an unknown stage
+        """
+        self.default_model = default_model
+        self.stages: Dict[str, StageConfig] = {
+            stage: StageConfig(default_model, dict(options))
+            for stage, options in DEFAULT_STAGE_OPTIONS.items()
+        }
+        for stage, override in (overrides or {}).items():
+            if stage not in self.stages:
+                raise ValueError(f"Unknown LLM stage: {stage}")
+            if isinstance(override, str):
+                override = {"model": override}
+            config = self.stages[stage]
+            config.model = override.get("model", config.model)
+            config.options.update(override.get("options", {}))
+
+        # Calls of every stage since the agent started
+        self.usage = LLMUsage()
+
+    def get(self, stage: str) -> StageConfig:
+        """
+        Get the configuration of a stage.
+
+        Args:
+            stage (str): Stage name; unknown stages use the default configuration
+
+        Returns:
+            StageConfig: Model and options for the stage
+        """
+        return self.stages.get(stage, self.stages["default"])
+
+    def models(self) -> List[str]:
+        """
+        Get the distinct models used by any stage.
+
+        Returns:
+            List[str]: Model names, the default model first
+        """
+        return list(dict.fromkeys([self.default_model] + [config.model for config in self.stages.values()]))
+
+    def record(self, stage: str, latency: float = 0.0, data: Optional[Dict[str, Any]] = None,
+               error: bool = False, cached: bool = False) -> None:
+        """
+        Record one LLM call of a stage.
+
+        Args:
+            stage (str): Stage name
+            latency (float): Seconds the call took
+            data (Optional[Dict[str, Any]]): Final Ollama response body with token counts
+            error (bool): Whether the call failed
+            cached (bool): Whether the call was answered from the response cache
+        """
+        record_timing(stage, latency)
+        record_usage(stage, latency, data, error=error, cached=cached)
+        self.usage.add(stage, latency, data, error=error, cached=cached)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get usage per stage.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per stage: model, calls, cache hits, errors, prompt and
+                response tokens, Ollama's model load, prompt evaluation, generation and total
+                seconds, and total and average latency of calls sent to the model
+        """
+        stats = self.usage.as_dict()
+        for stage, values in stats.items():
+            values["total_latency"] = values.pop("latency")
+            model_calls = values["calls"] - values["cache_hits"]
+            values["model"] = self.get(stage).model
+            values["avg_latency"] = values["total_latency"] / model_calls if model_calls else 0.0
+        return stats
@@ -0,0 +1,303 @@
+"""
+OllamaClient module providing a persistent, pooled HTTP client for the Ollama API.
+"""
+
+import json
+import threading
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from deadline import DeadlineExceeded, check_deadline, deadline_expired, request_timeout, wait_timeout
+
+
+class OllamaClient:
+    """
+    Keep-alive HTTP client for the Ollama API.
+
+    A single requests.Session is shared by every call, so the TCP connection to
+    Ollama is reused across the entity extraction, classification, chain and
+    formatting calls that make up one user query.
+    """
+
+    def __init__(self, base_url: str = "http://localhost:11434", pool_size: int = 10,
+                 connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 keep_alive: Optional[Union[str, float]] = None, max_in_flight: Optional[int] = None):
+        """
+        Initialize the OllamaClient.
+
+        Args:
+            base_url (str): URL of the Ollama API
+            pool_size (int): Maximum number of pooled connections kept open to Ollama
+            connect_timeout (float): Seconds to wait for a connection to be established
+            read_timeout (float): Seconds to wait for Ollama to send a response
+            keep_alive (Optional[Union[str, float]]): How long Ollama keeps a model loaded after
+                each request (e.g. "10m"); None uses the server default
+            max_in_flight (Optional[int]): Maximum concurrent generate requests; further requests
+                wait for a slot. None means no limit
+        """
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keep_alive = keep_alive
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.max_in_flight = max_in_flight
+        self._slots = threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+        self.in_flight = 0
+
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "errors": 0,
+            "total_latency": 0.0,
+            "stream_requests": 0,
+            "total_ttft": 0.0,
+            "prompt_eval_tokens": 0,
+            "eval_tokens": 0,
+            "peak_in_flight": 0
+        }
+        self.last_used: Dict[str, float] = {}
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """Return the (connect, read) timeout tuple used for requests, capped at the query's deadline."""
+        return request_timeout((self.connect_timeout, self.read_timeout))
+
+    def generate(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None,
+                 **extra: Any) -> Dict[str, Any]:
+        """
+        Run a non-streaming completion through /api/generate.
+
+        Args:
+            model (str): Name of the Ollama model
+            prompt (str): Prompt to send
+            options (Optional[Dict[str, Any]]): Ollama generation options
+            **extra: Additional top-level request fields
+
+        Returns:
+            Dict[str, Any]: Decoded JSON body returned by Ollama
+        """
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False
+        }
+        if options:
+            payload["options"] = options
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        payload.update(extra)
+        self.mark_used(model)
+        return self._post("/api/generate", payload)
+
+    def generate_stream(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None,
+                        **extra: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Run a streaming completion through /api/generate.
+
+        Ollama answers with newline-delimited JSON chunks; each decoded chunk is
+        yielded as soon as it arrives. The final chunk has "done": true and
+        carries the generation statistics.
+
+        Args:
+            model (str): Name of the Ollama model
+            prompt (str): Prompt to send
+            options (Optional[Dict[str, Any]]): Ollama generation options
+            **extra: Additional top-level request fields
+
+        Yields:
+            Dict[str, Any]: Decoded NDJSON chunks
+        """
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True
+        }
+        if options:
+            payload["options"] = options
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        payload.update(extra)
+        self.mark_used(model)
+
+        self._acquire_slot()
+        start = time.perf_counter()
+        ttft = None
+        try:
+            with self.session.post(
+                f"{self.base_url}/api/generate",
+                json=payload,
+                timeout=self.timeout,
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if ttft is None and chunk.get("response"):
+                        ttft = time.perf_counter() - start
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+                    if chunk.get("done"):
+                        self._record_usage(chunk)
+                        yield chunk
+                        break
+                    yield chunk
+                    # The read timeout bounds each chunk, not the whole generation
+                    if deadline_expired():
+                        raise DeadlineExceeded("Deadline exceeded while streaming the LLM response")
+        except Exception:
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        finally:
+            self._release_slot()
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats["total_latency"] += time.perf_counter() - start
+                if ttft is not None:
+                    self.stats["stream_requests"] += 1
+                    self.stats["total_ttft"] += ttft
+
+    def load(self, model: str, keep_alive: Optional[Union[str, float]] = None) -> Dict[str, Any]:
+        """
+        Load a model into memory, or extend its residency, without generating.
+
+        Args:
+            model (str): Name of the Ollama model
+            keep_alive (Optional[Union[str, float]]): Residency to request; defaults to the client's
+
+        Returns:
+            Dict[str, Any]: Decoded JSON body returned by Ollama
+        """
+        payload = {"model": model, "prompt": "", "stream": False}
+        keep_alive = keep_alive if keep_alive is not None else self.keep_alive
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return self._post("/api/generate", payload)
+
+    def list_running(self) -> List[Dict[str, Any]]:
+        """
+        List the models Ollama currently has loaded, via /api/ps.
+
+        Returns:
+            List[Dict[str, Any]]: One entry per loaded model, including "expires_at"
+        """
+        start = time.perf_counter()
+        try:
+            response = self.session.get(f"{self.base_url}/api/ps", timeout=self.timeout)
+            response.raise_for_status()
+            return response.json().get("models", [])
+        except Exception:
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats["total_latency"] += time.perf_counter() - start
+
+    def mark_used(self, model: str) -> None:
+        """Record that a model was just used."""
+        with self._lock:
+            self.last_used[model] = time.time()
+
+    def get_last_used(self) -> Dict[str, float]:
+        """
+        Get when each model was last used by this client.
+
+        Returns:
+            Dict[str, float]: Unix time of the last generate call per model
+        """
+        with self._lock:
+            return dict(self.last_used)
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a JSON POST request over the pooled session and decode the reply."""
+        self._acquire_slot()
+        start = time.perf_counter()
+        try:
+            response = self.session.post(
+                f"{self.base_url}{path}",
+                json=payload,
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            data = response.json()
+            self._record_usage(data)
+            return data
+        except Exception:
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        finally:
+            self._release_slot()
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats["total_latency"] += time.perf_counter() - start
+
+    def _acquire_slot(self) -> None:
+        """
+        Wait for a free request slot and count the request as in flight.
+
+        Raises:
+            DeadlineExceeded: If the query's deadline passes while waiting
+        """
+        if self._slots is not None:
+            check_deadline("an LLM request")
+            timeout = wait_timeout()
+            if not self._slots.acquire(timeout=timeout if timeout is not None else -1):
+                raise DeadlineExceeded("Deadline exceeded while waiting for an LLM request slot")
+        with self._lock:
+            self.in_flight += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+
+    def _release_slot(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def available_slots(self) -> Optional[int]:
+        """
+        Get the number of requests that can start without waiting.
+
+        Returns:
+            Optional[int]: Free request slots, or None if in-flight requests are not limited
+        """
+        if self.max_in_flight is None:
+            return None
+        with self._lock:
+            return max(self.max_in_flight - self.in_flight, 0)
+
+    def _record_usage(self, data: Dict[str, Any]) -> None:
+        """Add the prompt and response token counts Ollama reports on a finished generation."""
+        with self._lock:
+            self.stats["prompt_eval_tokens"] += data.get("prompt_eval_count", 0) or 0
+            self.stats["eval_tokens"] += data.get("eval_count", 0) or 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get request counters for this client.
+
+        Returns:
+            Dict[str, Any]: Request, error, latency, time-to-first-token and token counters
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        stats["avg_latency"] = stats["total_latency"] / stats["requests"] if stats["requests"] else 0.0
+        stats["avg_ttft"] = stats["total_ttft"] / stats["stream_requests"] if stats["stream_requests"] else 0.0
+        return stats
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
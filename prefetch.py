@@ -0,0 +1,234 @@
+"""
+Prefetch module running likely tool calls while the LLM is still routing a query.
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from tool_pools import ToolPools
+
+# Read-only tool functions that are safe to run before the LLM has chosen them; the current
+# time is left out, as a prefetched answer would be stale by the time it is used
+PREFETCHABLE = {
+    ("weather", "get_weather"),
+    ("air_quality", "get_air_quality"),
+    ("geolocation", "get_location_info"),
+    ("currency", "convert_currency"),
+    ("astronomy", "get_planet_info")
+}
+
+# Tool function answering a query about a location, used with the "location" entity
+LOCATION_FUNCTIONS = {
+    "weather": "get_weather",
+    "air_quality": "get_air_quality",
+    "geolocation": "get_location_info"
+}
+
+
+def call_key(tool_name: str, function_name: str, args: Iterable[Any]) -> Tuple[str, str, Tuple[str, ...]]:
+    """
+    Build the key identifying a tool call, ignoring case and surrounding whitespace of arguments.
+
+    Args:
+        tool_name (str): Name of the tool
+        function_name (str): Name of the function
+        args (Iterable[Any]): Call arguments
+
+    Returns:
+        Tuple[str, str, Tuple[str, ...]]: Hashable key
+    """
+    return tool_name, function_name, tuple(str(arg).strip().lower() for arg in args)
+
+
+def predict_from_entities(entities: Dict[str, Any], candidates: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Predict tool calls from extracted entities.
+
+    A currency pair predicts a conversion. A location predicts the location
+    function of each shortlisted tool that takes one; without a shortlist it
+    predicts nothing, since a bare location does not say which tool is meant.
+
+    Args:
+        entities (Dict[str, Any]): Entities from entity extraction or single-call routing
+        candidates (Optional[List[Dict[str, Any]]]): Tool shortlist of the query
+
+    Returns:
+        List[Dict[str, Any]]: Predicted calls with "tool", "function" and "args"
+    """
+    predictions = []
+    from_currency = entities.get("from_currency")
+    to_currency = entities.get("to_currency")
+    if isinstance(from_currency, str) and isinstance(to_currency, str) and from_currency and to_currency:
+        amount = entities.get("amount")
+        predictions.append({
+            "tool": "currency",
+            "function": "convert_currency",
+            "args": [amount if isinstance(amount, (int, float)) and not isinstance(amount, bool) else 1,
+                     from_currency.upper(), to_currency.upper()]
+        })
+
+    location = entities.get("location")
+    if isinstance(location, str) and location.strip():
+        for candidate in candidates or []:
+            function_name = LOCATION_FUNCTIONS.get(candidate.get("tool"))
+            if function_name:
+                predictions.append({"tool": candidate["tool"], "function": function_name, "args": [location.strip()]})
+    return predictions
+
+
+class ToolPrefetcher:
+    """
+    Speculative executor for idempotent tool calls.
+
+    While an LLM call decides how to answer a query, the tool calls its
+    entities already point to (weather for a known city, a currency
+    pair, a planet) are started on a small dedicated pool. Results are kept
+    for one use and a short time: execute_tool takes a matching prefetch,
+    waiting for it if it is still running, instead of calling the tool again.
+    Prefetches that expire or are evicted unused are counted as wasted.
+    """
+
+    def __init__(self, tools: Dict[str, Dict[str, Any]], max_workers: int = 4, ttl: float = 30.0,
+                 max_entries: int = 64, allowed: Optional[Iterable[Tuple[str, str]]] = None,
+                 pools: Optional[ToolPools] = None):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            tools (Dict[str, Dict[str, Any]]): Tools discovered by the agent (name -> module and functions)
+            max_workers (int): Threads running prefetched calls
+            ttl (float): Seconds a prefetched result stays usable
+            max_entries (int): Maximum number of prefetched results kept; the oldest are evicted
+            allowed (Optional[Iterable[Tuple[str, str]]]): (tool, function) pairs that may be
+                prefetched; defaults to PREFETCHABLE
+            pools (Optional[ToolPools]): Concurrency limits the prefetched calls hold, so they
+                count against the same service limits as the tool calls they stand in for
+        """
+        self.tools = tools
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.allowed = set(allowed) if allowed is not None else set(PREFETCHABLE)
+        self.pools = pools
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llmflow-prefetch")
+        self._lock = threading.Lock()
+        self.entries: Dict[Tuple[str, str, Tuple[str, ...]], Tuple[Future, float]] = {}
+        self.stats = {
+            "predicted": 0,
+            "launched": 0,
+            "duplicates": 0,
+            "hits": 0,
+            "hits_in_flight": 0,
+            "misses": 0,
+            "wasted": 0,
+            "errors": 0
+        }
+
+    def _sweep(self, now: float) -> None:
+        """Drop expired entries, and the oldest ones beyond max_entries; caller holds the lock."""
+        for key, (_, created) in list(self.entries.items()):
+            if now - created > self.ttl:
+                del self.entries[key]
+                self.stats["wasted"] += 1
+        while len(self.entries) > self.max_entries:
+            del self.entries[next(iter(self.entries))]
+            self.stats["wasted"] += 1
+
+    def _run(self, tool_name: str, func, args: List[Any]) -> Any:
+        try:
+            if self.pools is None:
+                return func(*args)
+            with self.pools.limited(tool_name):
+                return func(*args)
+        except Exception:
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+
+    def prefetch(self, calls: Iterable[Dict[str, Any]]) -> int:
+        """
+        Start predicted tool calls in the background.
+
+        Calls to unknown or non-prefetchable functions, and calls already
+        prefetched, are skipped.
+
+        Args:
+            calls (Iterable[Dict[str, Any]]): Predicted calls with "tool", "function" and "args"
+
+        Returns:
+            int: Number of calls started
+        """
+        started = 0
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            for call in calls:
+                tool_name, function_name, args = call["tool"], call["function"], list(call.get("args", []))
+                if (tool_name, function_name) not in self.allowed:
+                    continue
+                func = self.tools.get(tool_name, {}).get("functions", {}).get(function_name)
+                if func is None:
+                    continue
+                self.stats["predicted"] += 1
+                key = call_key(tool_name, function_name, args)
+                if key in self.entries:
+                    self.stats["duplicates"] += 1
+                    continue
+                # Run under the caller's context, so the query's deadline and trace reach the call
+                call = functools.partial(contextvars.copy_context().run, self._run, tool_name, func, args)
+                self.entries[key] = (self._executor.submit(call), now)
+                self.stats["launched"] += 1
+                started += 1
+            self._sweep(now)
+        if started:
+            print(f"Prefetching {started} tool call(s)")
+        return started
+
+    def take(self, tool_name: str, function_name: str, args: List[Any]) -> Optional[Future]:
+        """
+        Claim the prefetch of a tool call, if there is one.
+
+        Args:
+            tool_name (str): Name of the tool
+            function_name (str): Name of the function
+            args (List[Any]): Call arguments
+
+        Returns:
+            Optional[Future]: The prefetched call, possibly still running, or None on a miss
+        """
+        with self._lock:
+            self._sweep(time.time())
+            entry = self.entries.pop(call_key(tool_name, function_name, args), None)
+            if entry is None:
+                if (tool_name, function_name) in self.allowed:
+                    self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self.stats["hits_in_flight"] += int(not entry[0].done())
+        return entry[0]
+
+    def close(self) -> None:
+        """Stop accepting prefetches and release the worker threads."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get prefetch counters.
+
+        Returns:
+            Dict[str, Any]: Predicted and launched calls, hits (and how many were still running
+                when claimed), misses of prefetchable calls, wasted prefetches, errors, pending
+                entries, the fraction of launched prefetches that were used and the fraction of
+                prefetchable tool calls that were served by a prefetch
+        """
+        with self._lock:
+            self._sweep(time.time())
+            stats = dict(self.stats)
+            stats["pending"] = len(self.entries)
+        stats["hit_rate"] = stats["hits"] / stats["launched"] if stats["launched"] else 0.0
+        served = stats["hits"] + stats["misses"]
+        stats["coverage"] = stats["hits"] / served if served else 0.0
+        return stats
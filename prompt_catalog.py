@@ -0,0 +1,143 @@
+"""
+ToolCatalog module providing compact, query-specific tool catalogs for LLM prompts.
+"""
+
+import json
+import threading
+from typing import Dict, Any, List, Optional
+
+# Rough characters-per-token ratio of BPE tokenizers on English and JSON text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of prompt tokens in a text.
+
+    Args:
+        text (str): Prompt text
+
+    Returns:
+        int: Approximate token count
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class ToolCatalog:
+    """
+    Prompt builder that serializes only the candidate tools for a query.
+
+    Each tool is rendered once at construction as a few compact lines
+    (description, then one signature line per function), so building a prompt
+    is a dictionary lookup and a join. Every build records the estimated size
+    of the full catalog the prompt would otherwise have carried, which gives
+    the token savings per prompt stage.
+    """
+
+    def __init__(self, tool_descriptions: Dict[str, Dict[str, Any]], top_k: Optional[int] = 3,
+                 chain_top_k: Optional[int] = 5):
+        """
+        Initialize the catalog.
+
+        Args:
+            tool_descriptions (Dict[str, Dict[str, Any]]): Tool descriptions from the agent
+            top_k (Optional[int]): Maximum number of tools in single-tool prompts; None includes all tools
+            chain_top_k (Optional[int]): Maximum number of tools in chain generation prompts; None includes all
+        """
+        self.tool_descriptions = tool_descriptions
+        self.top_k = top_k
+        self.chain_top_k = chain_top_k
+        self.entries = {
+            tool_name: self._serialize(tool_name, tool_desc, examples=True)
+            for tool_name, tool_desc in tool_descriptions.items()
+        }
+        self.signature_entries = {
+            tool_name: self._serialize(tool_name, tool_desc, examples=False)
+            for tool_name, tool_desc in tool_descriptions.items()
+        }
+
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def _serialize(tool_name: str, tool_desc: Dict[str, Any], examples: bool) -> str:
+        """Render one tool as a description line followed by one line per function."""
+        lines = [f"{tool_name}: {tool_desc.get('description', '')}"]
+        for function_name, function_desc in tool_desc.get("functions", {}).items():
+            line = f"  {function_name}({', '.join(function_desc.get('arguments', []))})"
+            if function_desc.get("description"):
+                line += f" - {function_desc['description']}"
+            if examples and function_desc.get("example"):
+                line += f"; e.g. {function_desc['example']}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def select(self, candidates: List[Dict[str, Any]], k: Optional[int] = None) -> List[str]:
+        """
+        Choose the tools to include in a prompt.
+
+        Args:
+            candidates (List[Dict[str, Any]]): Ranked candidates with a "tool" key, best first
+            k (Optional[int]): Maximum number of tools; None means no limit
+
+        Returns:
+            List[str]: Tool names in candidate order, or every tool if no candidate is known
+        """
+        selected = []
+        for candidate in candidates:
+            tool_name = candidate.get("tool")
+            if tool_name in self.entries and tool_name not in selected:
+                selected.append(tool_name)
+        if not selected:
+            return list(self.entries)
+        return selected[:k] if k else selected
+
+    def render(self, tool_names: List[str], examples: bool = True) -> str:
+        """
+        Render the catalog section for the given tools.
+
+        Args:
+            tool_names (List[str]): Tools to include
+            examples (bool): Whether to include a call example per function
+
+        Returns:
+            str: Compact catalog text
+        """
+        entries = self.entries if examples else self.signature_entries
+        return "\n".join(entries[tool_name] for tool_name in tool_names if tool_name in entries)
+
+    def full_catalog_json(self) -> str:
+        """Return the full catalog as indented JSON, the format prompts used before compaction."""
+        return json.dumps(self.tool_descriptions, indent=2)
+
+    def record(self, stage: str, full_text: str, prompt_text: str) -> None:
+        """
+        Record the catalog size a prompt stage would have sent against what it sent.
+
+        Args:
+            stage (str): Prompt stage name (e.g. "routing", "analysis", "chain")
+            full_text (str): Catalog and instruction text of the uncompacted prompt
+            prompt_text (str): Catalog and instruction text actually sent
+        """
+        with self._lock:
+            stage_stats = self.stats.setdefault(stage, {"calls": 0, "full_tokens": 0, "prompt_tokens": 0})
+            stage_stats["calls"] += 1
+            stage_stats["full_tokens"] += estimate_tokens(full_text)
+            stage_stats["prompt_tokens"] += estimate_tokens(prompt_text)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get estimated token savings per prompt stage.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per stage: calls, full and sent catalog tokens, tokens saved
+                in total and per call, and the saved fraction
+        """
+        with self._lock:
+            stats = {stage: dict(values) for stage, values in self.stats.items()}
+        for values in stats.values():
+            saved = values["full_tokens"] - values["prompt_tokens"]
+            values["saved_tokens"] = saved
+            values["saved_per_call"] = saved / values["calls"] if values["calls"] else 0.0
+            values["saved_ratio"] = saved / values["full_tokens"] if values["full_tokens"] else 0.0
+        return stats
@@ -0,0 +1,213 @@
+"""
+SemanticToolRouter module providing a local vector index over tool descriptions and examples.
+"""
+
+import inspect
+import re
+import threading
+import time
+import types
+import zlib
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r"[^\W_][\w']*")
+
+# Function name in a TOOL_EXAMPLES tool_call such as "weather_tool.get_weather('London')"
+TOOL_CALL_FUNCTION_PATTERN = re.compile(r"\.(\w+)\(")
+
+
+class SemanticToolRouter:
+    """
+    TF-IDF router over hashed word and character n-gram features.
+
+    Every tool contributes documents for its agent description, each function,
+    its class metadata and docstring, and each TOOL_EXAMPLES query. Documents are hashed into a fixed-size
+    vector space, weighted by IDF and L2-normalized into a NumPy matrix, so
+    scoring a query is one sparse-to-dense featurization and one mat-vec
+    product. Nothing leaves the process and no model has to be loaded.
+    """
+
+    def __init__(self, tool_descriptions: Dict[str, Dict[str, Any]],
+                 tools: Optional[Dict[str, Dict[str, Any]]] = None, dim: int = 4096,
+                 ngram_range: Tuple[int, int] = (2, 4), top_k: int = 3,
+                 min_score: float = 0.1, pick_margin: float = 0.15):
+        """
+        Build the index.
+
+        Args:
+            tool_descriptions (Dict[str, Dict[str, Any]]): Tool descriptions from the agent
+            tools (Optional[Dict[str, Dict[str, Any]]]): Discovered tools; their modules supply TOOL_EXAMPLES
+            dim (int): Number of hashed feature dimensions
+            ngram_range (Tuple[int, int]): Smallest and largest character n-gram length
+            top_k (int): Maximum number of tools in a shortlist
+            min_score (float): Minimum cosine similarity for a tool to be shortlisted
+            pick_margin (float): Lead over the runner-up at which only the top tool is shortlisted
+        """
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.top_k = top_k
+        self.min_score = min_score
+        self.pick_margin = pick_margin
+
+        self.documents = self._collect_documents(tool_descriptions, tools or {})
+        self.tool_names = list(dict.fromkeys(tool for tool, _, _ in self.documents))
+        self._doc_functions = [function for _, function, _ in self.documents]
+        self._tool_offsets = np.array(
+            [[tool for tool, _, _ in self.documents].index(tool) for tool in self.tool_names], dtype=np.int64
+        )
+        # Per tool, the indices of documents that name a function
+        self._function_docs = [
+            np.array([i for i, (doc_tool, function, _) in enumerate(self.documents)
+                      if doc_tool == tool and function is not None], dtype=np.int64)
+            for tool in self.tool_names
+        ]
+
+        counts = np.stack([self._hash_counts(text) for _, _, text in self.documents]) \
+            if self.documents else np.zeros((0, dim), dtype=np.float32)
+        df = np.count_nonzero(counts, axis=0)
+        self.idf = (np.log((1 + len(self.documents)) / (1 + df)) + 1).astype(np.float32)
+        self.matrix = self._weight(counts)
+
+        self._lock = threading.Lock()
+        self.stats = {
+            "queries": 0,
+            "total_latency": 0.0,
+            "picks": 0
+        }
+
+    @staticmethod
+    def _collect_documents(tool_descriptions: Dict[str, Dict[str, Any]],
+                           tools: Dict[str, Dict[str, Any]]) -> List[Tuple[str, Optional[str], str]]:
+        """
+        Turn tool descriptions, tool class metadata and TOOL_EXAMPLES into (tool, function, text) documents.
+
+        Documents of one tool are contiguous, which rank relies on.
+
+        Args:
+            tool_descriptions (Dict[str, Dict[str, Any]]): Tool descriptions from the agent
+            tools (Dict[str, Dict[str, Any]]): Discovered tools
+
+        Returns:
+            List[Tuple[str, Optional[str], str]]: Documents; function is None for tool-level text
+        """
+        documents = []
+        for tool_name, tool_desc in tool_descriptions.items():
+            name_words = tool_name.replace("_", " ")
+            documents.append((tool_name, None, f"{name_words} {tool_desc.get('description', '')}"))
+            for function_name, function_desc in tool_desc.get("functions", {}).items():
+                documents.append((
+                    tool_name,
+                    function_name,
+                    f"{name_words} {function_name.replace('_', ' ')} {function_desc.get('description', '')}"
+                ))
+
+            module = tools.get(tool_name, {}).get("module")
+            if not isinstance(module, types.ModuleType):
+                continue
+            for _, cls in inspect.getmembers(module, inspect.isclass):
+                if cls.__module__ != module.__name__ or not hasattr(cls, "TOOL_EXAMPLES"):
+                    continue
+                metadata = [getattr(cls, "TOOL_DESCRIPTION", "")]
+                metadata.extend(parameter.get("description", "") for parameter in getattr(cls, "TOOL_PARAMETERS", []))
+                documents.append((tool_name, None, " ".join(metadata)))
+                if cls.__doc__:
+                    documents.append((tool_name, None, cls.__doc__))
+                for example in cls.TOOL_EXAMPLES:
+                    match = TOOL_CALL_FUNCTION_PATTERN.search(example.get("tool_call", ""))
+                    function_name = match.group(1) if match else None
+                    if function_name not in tool_desc.get("functions", {}):
+                        function_name = None
+                    documents.append((tool_name, function_name, example.get("query", "")))
+        return documents
+
+    def _hash_counts(self, text: str) -> np.ndarray:
+        """Count hashed word and character n-gram features of a text."""
+        features: Counter = Counter()
+        low, high = self.ngram_range
+        for word in WORD_PATTERN.findall(text.lower()):
+            features["w:" + word] += 1
+            padded = f" {word} "
+            for n in range(low, high + 1):
+                for i in range(len(padded) - n + 1):
+                    features[padded[i:i + n]] += 1
+        counts = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in features.items():
+            counts[zlib.crc32(feature.encode("utf-8")) % self.dim] += count
+        return counts
+
+    def _weight(self, counts: np.ndarray) -> np.ndarray:
+        """Apply sublinear TF, IDF and L2 normalization to raw feature counts."""
+        weighted = np.log1p(counts) * self.idf
+        norms = np.linalg.norm(weighted, axis=-1, keepdims=True)
+        return weighted / np.where(norms == 0, 1, norms)
+
+    def rank(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Score every tool against a query.
+
+        Args:
+            query (str): The user's query
+
+        Returns:
+            List[Dict[str, Any]]: One entry per tool with its best matching function and
+                cosine similarity, sorted by score
+        """
+        start = time.perf_counter()
+        if not self.documents:
+            return []
+        similarities = self.matrix @ self._weight(self._hash_counts(query))
+        tool_scores = np.maximum.reduceat(similarities, self._tool_offsets)
+        ranking = []
+        for index in np.argsort(-tool_scores, kind="stable"):
+            function_docs = self._function_docs[index]
+            function_name = (self._doc_functions[function_docs[np.argmax(similarities[function_docs])]]
+                             if len(function_docs) else None)
+            ranking.append({
+                "tool": self.tool_names[index],
+                "function": function_name,
+                "score": float(tool_scores[index])
+            })
+        with self._lock:
+            self.stats["queries"] += 1
+            self.stats["total_latency"] += time.perf_counter() - start
+        return ranking
+
+    def shortlist(self, query: str, top_k: Optional[int] = None, pick: bool = True) -> List[Dict[str, Any]]:
+        """
+        Pick or shortlist the tools most likely to answer a query.
+
+        A single tool is returned when it leads the runner-up by at least
+        pick_margin; otherwise up to top_k tools scoring at least min_score.
+
+        Args:
+            query (str): The user's query
+            top_k (Optional[int]): Maximum number of tools; defaults to the router's top_k
+            pick (bool): Whether a dominant tool is returned alone (disable for multi-tool queries)
+
+        Returns:
+            List[Dict[str, Any]]: Shortlisted tools as returned by rank; empty if nothing matches
+        """
+        top_k = top_k or self.top_k
+        ranking = [entry for entry in self.rank(query) if entry["score"] >= self.min_score]
+        if pick and (len(ranking) == 1 or
+                     (len(ranking) > 1 and ranking[0]["score"] - ranking[1]["score"] >= self.pick_margin)):
+            with self._lock:
+                self.stats["picks"] += 1
+            return ranking[:1]
+        return ranking[:top_k]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get router counters.
+
+        Returns:
+            Dict[str, Any]: Query count, single-tool picks, index size and mean scoring latency
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        stats["documents"] = len(self.documents)
+        stats["avg_latency_us"] = stats["total_latency"] / stats["queries"] * 1e6 if stats["queries"] else 0.0
+        return stats
@@ -0,0 +1,212 @@
+"""
+Speculation module running independent LLM stages of a turn concurrently with classification.
+"""
+
+import asyncio
+import threading
+from typing import Dict, Any, Callable, Optional
+
+
+class SpeculationCancelled(Exception):
+    """Raised inside a speculative LLM call once its result is known to be unneeded."""
+
+
+class TokenRelay:
+    """
+    Token callback for a speculative streamed answer.
+
+    Tokens are buffered until the answer is adopted; adopting replays the
+    buffer to the real callback and forwards every later token directly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tokens = []
+        self.target: Optional[Callable[[str], None]] = None
+
+    def __call__(self, token: str) -> None:
+        with self._lock:
+            self.tokens.append(token)
+            if self.target is not None:
+                self.target(token)
+
+    def adopt(self, on_token: Optional[Callable[[str], None]]) -> None:
+        """
+        Replay the buffered tokens and forward the rest to a callback.
+
+        Args:
+            on_token (Optional[Callable[[str], None]]): Callback of the real answer; None only buffers
+        """
+        with self._lock:
+            if on_token is not None:
+                for token in self.tokens:
+                    on_token(token)
+            self.target = on_token
+
+
+class SpeculationHandle:
+    """
+    What a speculative stage sees of its own fate.
+
+    The stage checks is_cancelled() while it works and streams tokens to
+    relay. Side effects that must only happen if its result is used (such as
+    storing conversation state) are passed to defer(); they run on adoption,
+    or immediately if the stage was already adopted, and are dropped on
+    cancellation.
+    """
+
+    def __init__(self):
+        self.cancel_event = threading.Event()
+        self.relay = TokenRelay()
+        self._lock = threading.Lock()
+        self._deferred = []
+        self.adopted = False
+
+    def is_cancelled(self) -> bool:
+        """Check whether the stage's result is no longer needed."""
+        return self.cancel_event.is_set()
+
+    def defer(self, action: Callable[[], None]) -> None:
+        """
+        Run an action once the stage is adopted.
+
+        Args:
+            action (Callable[[], None]): Side effect of the stage's result
+        """
+        with self._lock:
+            if not self.adopted:
+                if not self.cancel_event.is_set():
+                    self._deferred.append(action)
+                return
+        action()
+
+    def adopt(self, on_token: Optional[Callable[[str], None]]) -> None:
+        """Forward tokens to the real callback and run the deferred side effects."""
+        self.relay.adopt(on_token)
+        with self._lock:
+            self.adopted = True
+            deferred, self._deferred = self._deferred, []
+        for action in deferred:
+            action()
+
+    def cancel(self) -> None:
+        """Flag the stage as unneeded and drop its deferred side effects."""
+        with self._lock:
+            self.cancel_event.set()
+            self._deferred = []
+
+
+class SpeculativeTask:
+    """A launched speculative stage: its future and handle."""
+
+    def __init__(self, stage: str, future: "asyncio.Future", handle: SpeculationHandle):
+        self.stage = stage
+        self.future = future
+        self.handle = handle
+
+
+class SpeculativeExecutor:
+    """
+    Launcher for speculative stages under a cap on in-flight Ollama requests.
+
+    A speculative stage is only launched while the LLM client has more free
+    request slots than reserve, so speculation never delays the stage the
+    turn is waiting for. Once classification resolves, the matching stage is
+    adopted and the others are cancelled; streamed stages stop at their next
+    token, which closes the connection and lets Ollama abort the generation.
+    """
+
+    def __init__(self, client, reserve: int = 1):
+        """
+        Initialize the executor.
+
+        Args:
+            client: OllamaClient whose in-flight request cap is respected
+            reserve (int): Request slots left free for the non-speculative stages
+        """
+        self.client = client
+        self.reserve = reserve
+        self._lock = threading.Lock()
+        self.active = 0
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, stage: str, outcome: str) -> None:
+        with self._lock:
+            stage_stats = self.stats.setdefault(stage, {"launched": 0, "adopted": 0, "cancelled": 0, "skipped": 0})
+            stage_stats[outcome] += 1
+
+    def can_launch(self) -> bool:
+        """Check whether a speculative stage fits under the in-flight cap."""
+        available = self.client.available_slots()
+        if available is None:
+            return True
+        with self._lock:
+            return available - self.active > self.reserve
+
+    def launch(self, stage: str, factory: Callable[[SpeculationHandle], Any]) -> Optional[SpeculativeTask]:
+        """
+        Start a speculative stage on the running event loop.
+
+        Args:
+            stage (str): Stage name used for the counters
+            factory (Callable[[SpeculationHandle], Any]): Builds the stage's awaitable from its handle
+
+        Returns:
+            Optional[SpeculativeTask]: The launched task, or None if the in-flight cap leaves no room
+        """
+        if not self.can_launch():
+            self._count(stage, "skipped")
+            return None
+        handle = SpeculationHandle()
+        future = asyncio.ensure_future(factory(handle))
+        with self._lock:
+            self.active += 1
+        future.add_done_callback(self._finished)
+        self._count(stage, "launched")
+        return SpeculativeTask(stage, future, handle)
+
+    def _finished(self, future: "asyncio.Future") -> None:
+        with self._lock:
+            self.active -= 1
+        # Retrieve the outcome so discarded failures are not reported as unhandled
+        if not future.cancelled():
+            future.exception()
+
+    async def adopt(self, task: SpeculativeTask, on_token: Optional[Callable[[str], None]] = None) -> Any:
+        """
+        Use the result of a speculative stage.
+
+        Args:
+            task (SpeculativeTask): Launched task
+            on_token (Optional[Callable[[str], None]]): Receives the stage's streamed tokens
+
+        Returns:
+            Any: The stage's result
+        """
+        self._count(task.stage, "adopted")
+        task.handle.adopt(on_token)
+        return await task.future
+
+    def discard(self, task: SpeculativeTask) -> None:
+        """
+        Cancel a speculative stage whose result is not needed.
+
+        Args:
+            task (SpeculativeTask): Launched task
+        """
+        self._count(task.stage, "cancelled")
+        task.handle.cancel()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get speculation outcomes per stage.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per stage: launched, adopted, cancelled, skipped for lack of
+                capacity, and the fraction of launches that were adopted
+        """
+        with self._lock:
+            stats = {stage: dict(values) for stage, values in self.stats.items()}
+        for values in stats.values():
+            values["hit_rate"] = values["adopted"] / values["launched"] if values["launched"] else 0.0
+        return stats
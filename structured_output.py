@@ -0,0 +1,286 @@
+"""
+StructuredOutput module building JSON schemas for Ollama's "format" option and parsing constrained replies.
+"""
+
+import json
+import re
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Tuple, Union
+
+# Argument values the tools accept
+JSON_SCALAR = ["string", "number", "integer", "boolean", "null"]
+
+ENTITY_FIELDS = ("location", "event_type", "other_parameters", "from_currency", "to_currency", "amount")
+
+_TYPE_CHECKS = {
+    "string": lambda value: isinstance(value, str),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list)
+}
+
+
+def entity_schema() -> Dict[str, Any]:
+    """Schema of the entity object returned by entity extraction."""
+    properties = {name: {"type": ["string", "null"]} for name in ENTITY_FIELDS}
+    properties["amount"] = {"type": ["number", "null"]}
+    return {"type": "object", "properties": properties}
+
+
+def routing_schema(tool_descriptions: Dict[str, Dict[str, Any]], query_types: Iterable[str],
+                   entities: bool = False) -> Dict[str, Any]:
+    """
+    Schema of a routing decision.
+
+    Args:
+        tool_descriptions (Dict[str, Dict[str, Any]]): Tool descriptions from the agent
+        query_types (Iterable[str]): Allowed values of "type"
+        entities (bool): Whether the reply also carries the extracted entities
+
+    Returns:
+        Dict[str, Any]: JSON schema
+    """
+    functions = sorted({
+        function_name
+        for tool_desc in tool_descriptions.values()
+        for function_name in tool_desc.get("functions", {})
+    })
+    properties = {
+        "type": {"type": "string", "enum": list(query_types)},
+        "tool": {"type": ["string", "null"], "enum": list(tool_descriptions) + [None]},
+        "function": {"type": ["string", "null"], "enum": functions + [None]},
+        "args": {"type": "array", "items": {"type": JSON_SCALAR}},
+        "explanation": {"type": "string"},
+        "language": {"type": "string"},
+        "translation": {"type": ["string", "null"]}
+    }
+    required = ["type", "tool", "function", "args", "explanation", "language"]
+    if entities:
+        properties = {"entities": entity_schema(), **properties}
+        required.insert(0, "entities")
+    return {"type": "object", "properties": properties, "required": required}
+
+
+def analysis_schema(tool_descriptions: Dict[str, Dict[str, Any]], tool_names: Iterable[str]) -> Dict[str, Any]:
+    """
+    Schema of a tool analysis reply, with one alternative per function of the given tools.
+
+    Each alternative pins the tool and function names and caps the number of
+    arguments at the function's parameter count.
+
+    Args:
+        tool_descriptions (Dict[str, Dict[str, Any]]): Tool descriptions from the agent
+        tool_names (Iterable[str]): Tools the prompt describes
+
+    Returns:
+        Dict[str, Any]: JSON schema
+    """
+    alternatives = []
+    for tool_name in tool_names:
+        for function_name, function_desc in tool_descriptions.get(tool_name, {}).get("functions", {}).items():
+            alternatives.append({
+                "type": "object",
+                "properties": {
+                    "tool": {"const": tool_name},
+                    "function": {"const": function_name},
+                    "arguments": {
+                        "type": "array",
+                        "items": {"type": JSON_SCALAR},
+                        "maxItems": len(function_desc.get("arguments", []))
+                    },
+                    "reasoning": {"type": "string"}
+                },
+                "required": ["tool", "function", "arguments", "reasoning"]
+            })
+    if not alternatives:
+        return {"type": "object"}
+    return alternatives[0] if len(alternatives) == 1 else {"anyOf": alternatives}
+
+
+def chain_schema(tool_registry: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Schema of a generated chain: an array of steps naming registered tool functions.
+
+    Args:
+        tool_registry (Dict[str, Dict[str, Any]]): Tool name to {function name: callable}
+
+    Returns:
+        Dict[str, Any]: JSON schema
+    """
+    alternatives = [
+        {
+            "type": "object",
+            "properties": {
+                "tool_name": {"const": tool_name},
+                "function_name": {"type": "string", "enum": list(functions)},
+                "input_params": {"type": "object"},
+                "output_key": {"type": "string"},
+                "condition": {"type": ["string", "null"]}
+            },
+            "required": ["tool_name", "function_name", "input_params", "output_key"]
+        }
+        for tool_name, functions in tool_registry.items() if functions
+    ]
+    step = {"anyOf": alternatives} if len(alternatives) > 1 else (alternatives[0] if alternatives else {"type": "object"})
+    return {"type": "array", "items": step, "minItems": 1}
+
+
+def validate(value: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """
+    Check a value against the JSON schema subset used by this module.
+
+    Supports type, enum, const, properties, required, items, minItems, maxItems and anyOf.
+
+    Args:
+        value (Any): Decoded JSON value
+        schema (Dict[str, Any]): JSON schema
+        path (str): Location of the value, used in error messages
+
+    Returns:
+        List[str]: Validation errors; empty if the value conforms
+    """
+    if "anyOf" in schema:
+        branch_errors = [validate(value, branch, path) for branch in schema["anyOf"]]
+        if any(not errors for errors in branch_errors):
+            return []
+        return [f"{path}: matches none of {len(branch_errors)} alternatives ({min(branch_errors, key=len)[0]})"]
+
+    errors = []
+    types = schema.get("type")
+    if types is not None:
+        types = [types] if isinstance(types, str) else types
+        if not any(_TYPE_CHECKS[type_name](value) for type_name in types):
+            return [f"{path}: expected {'/'.join(types)}, got {type(value).__name__}"]
+    if "const" in schema and value != schema["const"]:
+        errors.append(f"{path}: expected {schema['const']!r}, got {value!r}")
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path}: {value!r} is not one of {schema['enum']}")
+
+    if isinstance(value, dict):
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}: missing required field '{key}'")
+        for key, subschema in schema.get("properties", {}).items():
+            if key in value:
+                errors.extend(validate(value[key], subschema, f"{path}.{key}"))
+    elif isinstance(value, list):
+        if len(value) < schema.get("minItems", 0):
+            errors.append(f"{path}: expected at least {schema['minItems']} items")
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            errors.append(f"{path}: expected at most {schema['maxItems']} items")
+        if "items" in schema:
+            for index, item in enumerate(value):
+                errors.extend(validate(item, schema["items"], f"{path}[{index}]"))
+    return errors
+
+
+def extract_json(text: str, container: type = dict) -> Any:
+    """
+    Pull a JSON object or array out of free text, as prompts did before constrained output.
+
+    Args:
+        text (str): LLM response
+        container (type): dict for an object, list for an array
+
+    Returns:
+        Any: Decoded value, or None if no JSON of the expected kind was found
+    """
+    pattern = r'(\{.*\})' if container is dict else r'(\[.*\])'
+    match = re.search(pattern, text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        value = json.loads(match.group(1))
+    except ValueError:
+        return None
+    return value if isinstance(value, container) else None
+
+
+class StructuredOutput:
+    """
+    Structured-output mode for the LLM stages that return JSON.
+
+    When enabled, each structured call sends its schema as Ollama's "format",
+    so generation is constrained to conforming JSON and the reply is decoded
+    directly. Replies that still fail to decode fall back to extracting JSON
+    from free text; decode failures and schema violations are counted per
+    stage.
+    """
+
+    def __init__(self, enabled: bool = True):
+        """
+        Initialize structured output.
+
+        Args:
+            enabled (bool): Send schemas as Ollama's "format"; if False prompts rely on instructions only
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def format_for(self, schema: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Get the "format" value to send for a schema.
+
+        Args:
+            schema (Dict[str, Any]): JSON schema of the reply
+
+        Returns:
+            Optional[Dict[str, Any]]: The schema, or None when structured output is disabled
+        """
+        return schema if self.enabled else None
+
+    def parse(self, stage: str, text: str, schema: Dict[str, Any]) -> Tuple[Any, List[str]]:
+        """
+        Decode and validate a structured reply.
+
+        Args:
+            stage (str): LLM stage name used for the counters
+            text (str): LLM response
+            schema (Dict[str, Any]): JSON schema of the reply
+
+        Returns:
+            Tuple[Any, List[str]]: The decoded value (None if no JSON of the schema's type could
+                be decoded) and the schema violations found in it
+        """
+        container = list if schema.get("type") == "array" else dict
+        failed = False
+        try:
+            value = json.loads(text)
+            if not isinstance(value, container):
+                raise ValueError(f"expected a JSON {container.__name__}")
+        except ValueError:
+            failed = True
+            value = extract_json(text, container)
+
+        errors = validate(value, schema) if value is not None else []
+        with self._lock:
+            stage_stats = self.stats.setdefault(stage, {
+                "calls": 0, "parse_failures": 0, "recovered": 0, "schema_violations": 0
+            })
+            stage_stats["calls"] += 1
+            stage_stats["parse_failures"] += int(failed)
+            stage_stats["recovered"] += int(failed and value is not None)
+            stage_stats["schema_violations"] += int(bool(errors))
+        if errors:
+            print(f"Structured {stage} reply does not match its schema: {errors[0]}")
+        return value, errors
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get parse outcomes per stage.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per stage: calls, replies that were not plain JSON, of those
+                the ones recovered from free text, schema violations, and the failure rates
+        """
+        with self._lock:
+            stats = {stage: dict(values) for stage, values in self.stats.items()}
+        for values in stats.values():
+            calls = values["calls"]
+            values["parse_failure_rate"] = values["parse_failures"] / calls if calls else 0.0
+            values["unusable_rate"] = (values["parse_failures"] - values["recovered"]) / calls if calls else 0.0
+        return stats
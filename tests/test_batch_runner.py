@@ -0,0 +1,150 @@
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+
+from batch_runner import BatchRunner, load_completed, load_records, percentile
+from chain_orchestrator import ChainStep
+from main import LLMFlowAgent
+
+
+def write_jsonl(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows), encoding="utf-8")
+
+
+def read_jsonl(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+@pytest.fixture
+def agent():
+    with patch.object(LLMFlowAgent, '_discover_tools', return_value={}), \
+         patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
+        agent = LLMFlowAgent(cache_size=0, fast_path_threshold=None)
+
+    def determine_query_type(query):
+        time.sleep(0.05)
+        agent.model_tiers.record("classification", 0.05)
+        return {"type": "casual_conversation"}
+
+    def handle_casual_conversation(query, query_info, on_token=None):
+        # Answer with the number of earlier turns this session's memory holds
+        return f"{query} after {len(agent.memory.get_conversation_history()) - 1} messages"
+
+    agent.determine_query_type = determine_query_type
+    agent.handle_casual_conversation = handle_casual_conversation
+    yield agent
+    agent.close()
+
+
+class TestHelpers:
+
+    def test_percentile(self):
+        """Test interpolated percentiles."""
+        values = [float(i) for i in range(1, 101)]
+        assert percentile(values, 50) == pytest.approx(50.5)
+        assert percentile(values, 99) == pytest.approx(99.01)
+        assert percentile([3.0], 95) == 3.0
+        assert percentile([], 50) == 0.0
+
+    def test_load_records(self, tmp_path):
+        """Test ids, sessions and skipped lines."""
+        path = tmp_path / "in.jsonl"
+        path.write_text('{"query": "hi", "session": "a"}\nnot json\n{"id": 7, "query": "yo"}\n{"text": "x"}\n',
+                        encoding="utf-8")
+        assert load_records(str(path)) == [
+            {"id": "line-1", "session": "a", "query": "hi"},
+            {"id": "7", "session": None, "query": "yo"}
+        ]
+
+    def test_load_completed_drops_partial_line(self, tmp_path):
+        """Test that a line cut off by an interruption is removed before appending."""
+        path = tmp_path / "out.jsonl"
+        path.write_text('{"id": "1", "response": "ok"}\n{"id": "2", "resp', encoding="utf-8")
+        assert list(load_completed(str(path))) == ["1"]
+        assert path.read_text(encoding="utf-8") == '{"id": "1", "response": "ok"}\n'
+
+
+class TestBatchRunner:
+
+    def test_results_and_summary(self, agent, tmp_path):
+        """Test that every record gets a result line with latency and stage timings."""
+        records = [{"id": str(i), "session": None, "query": f"q{i}"} for i in range(4)]
+        output = tmp_path / "out.jsonl"
+        summary = BatchRunner(agent, concurrency=4).run(records, str(output))
+
+        results = read_jsonl(output)
+        assert sorted(result["id"] for result in results) == ["0", "1", "2", "3"]
+        assert all(result["response"] == f"{result['query']} after 0 messages" for result in results)
+        assert all(result["stages"]["classification"] == pytest.approx(0.05) for result in results)
+        assert summary["processed"] == 4
+        assert summary["errors"] == 0
+        # Four independent queries overlapped
+        assert summary["elapsed"] < 4 * 0.05
+        assert set(summary["latency"]) == {"p50", "p95", "p99"}
+        assert "llm_cache" in summary["hit_rates"]
+
+    def test_sessions_keep_their_own_memory(self, agent, tmp_path):
+        """Test that turns of a session run in order on that session's memory only."""
+        records = [
+            {"id": "a1", "session": "a", "query": "a-first"},
+            {"id": "b1", "session": "b", "query": "b-first"},
+            {"id": "a2", "session": "a", "query": "a-second"}
+        ]
+        output = tmp_path / "out.jsonl"
+        BatchRunner(agent, concurrency=2).run(records, str(output))
+
+        responses = {result["id"]: result["response"] for result in read_jsonl(output)}
+        assert responses == {"a1": "a-first after 0 messages", "b1": "b-first after 0 messages",
+                             "a2": "a-second after 2 messages"}
+        assert agent.memory.get_conversation_history() == []
+
+    def test_chain_sessions_keep_their_own_tool_usage(self, tmp_path):
+        """Test that chain steps of each session are recorded in that session's memory only."""
+        tools = {"weather": {"module": None, "functions": {"get_weather": lambda location: f"Sunny in {location}"}}}
+        with patch.object(LLMFlowAgent, '_discover_tools', return_value=tools), \
+             patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
+            agent = LLMFlowAgent(cache_size=0, fast_path_threshold=None, semantic_top_k=None)
+        agent.determine_query_type = lambda query: {"type": "chain_query"}
+        agent.orchestrator.generate_chain = lambda query: [
+            ChainStep("weather", "get_weather", {"location": query}, "weather")]
+        # Answer with every tool result the session's memory holds
+        agent.orchestrator.format_response = lambda context, on_token=None: ", ".join(
+            usage["result"] for usage in agent.memory.recent_tools_used)
+        records = [
+            {"id": "a1", "session": "a", "query": "Tokyo"},
+            {"id": "b1", "session": "b", "query": "Oslo"},
+            {"id": "a2", "session": "a", "query": "Lima"}
+        ]
+        output = tmp_path / "out.jsonl"
+        try:
+            BatchRunner(agent, concurrency=2).run(records, str(output))
+        finally:
+            agent.close()
+
+        responses = {result["id"]: result["response"] for result in read_jsonl(output)}
+        assert responses == {"a1": "Sunny in Tokyo", "b1": "Sunny in Oslo", "a2": "Sunny in Tokyo, Sunny in Lima"}
+        assert agent.memory.recent_tools_used == []
+
+    def test_resume_skips_completed_and_restores_memory(self, agent, tmp_path):
+        """Test that a rerun only processes missing records, with earlier turns replayed into memory."""
+        records = [
+            {"id": "a1", "session": "a", "query": "a-first"},
+            {"id": "a2", "session": "a", "query": "a-second"}
+        ]
+        output = tmp_path / "out.jsonl"
+        write_jsonl(output, [{"id": "a1", "session": "a", "query": "a-first", "response": "earlier"}])
+
+        summary = BatchRunner(agent).run(records, str(output))
+        results = read_jsonl(output)
+        assert [result["id"] for result in results] == ["a1", "a2"]
+        assert results[1]["response"] == "a-second after 2 messages"
+        assert (summary["processed"], summary["skipped"]) == (1, 1)
+
+    def test_no_resume_overwrites(self, agent, tmp_path):
+        """Test that resume=False starts the output over."""
+        output = tmp_path / "out.jsonl"
+        write_jsonl(output, [{"id": "1", "response": "old"}])
+        BatchRunner(agent).run([{"id": "1", "session": None, "query": "q"}], str(output), resume=False)
+        assert [result["response"] for result in read_jsonl(output)] == ["q after 0 messages"]
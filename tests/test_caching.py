@@ -0,0 +1,178 @@
+import time
+
+import pytest
+
+from caching import LRUCache, LLMResponseCache, MISSING, StepResultCache
+
+
+class TestLRUCache:
+
+    def test_get_set(self):
+        """Test basic storage and hit/miss counting."""
+        cache = LRUCache(max_entries=4)
+        assert cache.get("a") is MISSING
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_none_is_cacheable(self):
+        """Test that None is distinguishable from a miss."""
+        cache = LRUCache()
+        cache.set("a", None)
+        assert cache.get("a") is None
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = LRUCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # a is now most recently used
+        cache.set("c", 3)
+        assert cache.get("b") is MISSING
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_ttl_expiry(self):
+        """Test that expired entries are treated as misses."""
+        cache = LRUCache(default_ttl=0.05)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=10)
+        time.sleep(0.06)
+        assert cache.get("a") is MISSING
+        assert cache.get("b") == 2
+        assert cache.get_stats()["expirations"] == 1
+
+    def test_explicit_none_ttl_never_expires(self):
+        """Test that ttl=None overrides the default TTL instead of falling back to it."""
+        cache = LRUCache(default_ttl=0.05)
+        cache.set("a", 1, ttl=None)
+        time.sleep(0.06)
+        assert cache.get("a") == 1
+
+
+class TestLLMResponseCache:
+
+    def test_key_depends_on_model_prompt_and_options(self):
+        """Test that the content address covers every input that changes the output."""
+        key = LLMResponseCache.make_key("m", "p", {"temperature": 0})
+        assert key == LLMResponseCache.make_key("m", "p", {"temperature": 0})
+        assert key != LLMResponseCache.make_key("other", "p", {"temperature": 0})
+        assert key != LLMResponseCache.make_key("m", "other", {"temperature": 0})
+        assert key != LLMResponseCache.make_key("m", "p", {"temperature": 1})
+
+    def test_memory_hit_and_miss(self):
+        """Test memory tier hit/miss counters."""
+        cache = LLMResponseCache()
+        key = cache.make_key("m", "p")
+        assert cache.get(key) is None
+        cache.set(key, "answer")
+        assert cache.get(key) == "answer"
+        stats = cache.get_stats()
+        assert stats["memory_hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_disk_tier_persists(self, tmp_path):
+        """Test that responses survive a restart through the SQLite tier."""
+        db_path = str(tmp_path / "llm_cache.sqlite")
+        cache = LLMResponseCache(db_path=db_path)
+        key = cache.make_key("m", "p")
+        cache.set(key, "persisted")
+        cache.close()
+
+        reopened = LLMResponseCache(db_path=db_path)
+        assert reopened.get(key) == "persisted"
+        assert reopened.get(key) == "persisted"
+        stats = reopened.get_stats()
+        assert stats["disk_hits"] == 1
+        assert stats["memory_hits"] == 1
+        reopened.close()
+
+    def test_disk_tier_ttl(self, tmp_path):
+        """Test that expired disk entries are not returned."""
+        cache = LLMResponseCache(db_path=str(tmp_path / "c.sqlite"), default_ttl=0.05)
+        key = cache.make_key("m", "p")
+        cache.set(key, "stale")
+        cache.memory.clear()
+        time.sleep(0.06)
+        assert cache.get(key) is None
+        cache.close()
+
+    def test_delete_removes_both_tiers(self, tmp_path):
+        """Test that a discarded response is gone from memory and disk."""
+        cache = LLMResponseCache(db_path=str(tmp_path / "c.sqlite"))
+        key = cache.make_key("m", "p")
+        cache.set(key, "unusable")
+        cache.delete(key)
+        cache.delete(cache.make_key("m", "other"))
+        assert cache.get(key) is None
+        stats = cache.get_stats()
+        assert stats["discarded"] == 1 and stats["misses"] == 1
+        cache.close()
+
+    def test_disk_entry_without_expiry_stays_in_memory(self, tmp_path):
+        """Test that a disk hit stored with ttl=None is promoted without the default TTL."""
+        cache = LLMResponseCache(db_path=str(tmp_path / "c.sqlite"), default_ttl=0.05)
+        key = cache.make_key("m", "p")
+        cache.set(key, "forever", ttl=None)
+        cache.memory.clear()
+        assert cache.get(key) == "forever"
+        time.sleep(0.06)
+        assert cache.get(key) == "forever"
+        stats = cache.get_stats()
+        assert stats["disk_hits"] == 1
+        assert stats["memory_hits"] == 1
+        cache.close()
+
+
+class TestStepResultCache:
+
+    def test_keyed_by_resolved_arguments(self):
+        """Test that a result is shared by equal calls only."""
+        cache = StepResultCache()
+        cache.set("weather", "get_weather", ["Tokyo"], "Sunny")
+        assert cache.get("weather", "get_weather", ["Tokyo"]) == "Sunny"
+        assert cache.get("weather", "get_weather", ["Oslo"]) is MISSING
+        cache.set("currency", "convert_currency", [100.0, "USD", "EUR"], 92.0)
+        assert cache.get("currency", "convert_currency", [100.0, "USD", "EUR"]) == 92.0
+        assert cache.get("currency", "convert_currency", [100.0, "EUR", "USD"]) is MISSING
+        assert cache.get_stats()["tools"]["weather"] == {"hits": 1, "misses": 1, "uncached": 0}
+
+    def test_per_tool_ttl(self):
+        """Test that each tool's results expire after its own TTL, and TTL 0 disables caching."""
+        cache = StepResultCache(default_ttl=60, ttls={"stock": 0.05})
+        cache.set("stock", "get_stock_price", ["AAPL"], "190")
+        cache.set("news", "search_news", ["AI"], "headlines")
+        cache.set("time", "get_current_time", ["Tokyo"], "12:00")
+        time.sleep(0.06)
+        assert cache.get("stock", "get_stock_price", ["AAPL"]) is MISSING
+        assert cache.get("news", "search_news", ["AI"]) == "headlines"
+        assert cache.get("time", "get_current_time", ["Tokyo"]) is MISSING
+        stats = cache.get_stats()
+        assert stats["expirations"] == 1
+        assert stats["tools"]["time"]["uncached"] == 1
+
+    def test_tool_ttl_none_never_expires(self):
+        """Test that a tool configured with TTL None keeps its results past the default TTL."""
+        cache = StepResultCache(default_ttl=0.05, ttls={"wikipedia": None})
+        cache.set("wikipedia", "search_wikipedia", ["Python"], "summary")
+        cache.set("calculator", "calculate", ["2+2"], 4)
+        time.sleep(0.06)
+        assert cache.get("wikipedia", "search_wikipedia", ["Python"]) == "summary"
+        assert cache.get("calculator", "calculate", ["2+2"]) is MISSING
+
+    def test_bounded_and_errors_not_cached(self):
+        """Test LRU eviction and that failed calls are retried rather than reused."""
+        cache = StepResultCache(max_entries=2)
+        for city in ("Tokyo", "Oslo", "Lima"):
+            cache.set("weather", "get_weather", [city], f"Sunny in {city}")
+        cache.set("news", "search_news", ["AI"], "Error: feed unavailable")
+        cache.set("news", "search_news", ["ML"], {"error": "timeout"})
+        stats = cache.get_stats()
+        assert stats["size"] == 2 and stats["evictions"] == 1
+        assert cache.get("weather", "get_weather", ["Tokyo"]) is MISSING
+        assert cache.get("news", "search_news", ["AI"]) is MISSING
+
@@ -0,0 +1,275 @@
+import asyncio
+import inspect
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+from caching import StepResultCache
+from chain_orchestrator import ChainOrchestrator, ChainStep, chain_dependencies
+from condition_evaluator import ConditionEvaluator
+from main import ConversationMemory, LLMFlowAgent
+from structured_output import StructuredOutput
+from tool_pools import ToolPools
+from tool_registry import ToolRegistry
+
+
+def make_tool(signature, result=None, delay=0.0, calls=None):
+    """A tool function that records when it ran and returns result (or its argument)."""
+    def func(*args):
+        if calls is not None:
+            calls.append(("start", args))
+        time.sleep(delay)
+        if calls is not None:
+            calls.append(("end", args))
+        return result if result is not None else f"result for {args[0]}"
+    tool = MagicMock(side_effect=func)
+    tool.__signature__ = inspect.signature(signature)
+    return tool
+
+
+def make_orchestrator(tools, parallel=True, cache=None, pools=None):
+    agent = MagicMock(tools=tools, tool_registry=ToolRegistry(tools))
+
+    async def run_blocking(func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+    agent.run_blocking = run_blocking
+    return ChainOrchestrator(agent, parallel=parallel, cache=cache, pools=pools)
+
+
+class TestChainDependencies:
+
+    def test_dependencies_from_placeholders_and_conditions(self):
+        """Test that steps depend only on the earlier outputs they refer to."""
+        chain = [ChainStep("weather", "get_weather", {"location": "Tokyo"}, "weather_data"),
+                 ChainStep("news", "search_news", {"query": "Tokyo"}, "news_data"),
+                 ChainStep("news", "search_news", {"query": "{{weather_data.location.city}} events"}, "events"),
+                 ChainStep("news", "search_news", {"query": "rain"}, "rain_news",
+                           condition="news_data['count'] > 0"),
+                 ChainStep("news", "search_news", {"query": "any"}, "summary", condition="it is raining")]
+        assert chain_dependencies(chain) == [set(), set(), {0}, {1}, {0, 1, 2, 3}]
+
+    def test_overwritten_output_waits_for_readers(self):
+        """Test that a step reusing an output_key waits for the steps writing and reading it."""
+        chain = [ChainStep("weather", "get_weather", {"location": "Tokyo"}, "data"),
+                 ChainStep("news", "search_news", {"query": "{{data}}"}, "news"),
+                 ChainStep("weather", "get_weather", {"location": "Oslo"}, "data")]
+        assert chain_dependencies(chain) == [set(), {0}, {0, 1}]
+
+
+class TestParallelChain:
+
+    def test_independent_steps_run_concurrently(self):
+        """Test that independent steps overlap and the context keeps chain order."""
+        calls = []
+        tools = {"weather": {"functions": {"get_weather": make_tool(lambda location: None, delay=0.2, calls=calls)}},
+                 "news": {"functions": {"search_news": make_tool(lambda query: None, delay=0.05, calls=calls)}}}
+        orchestrator = make_orchestrator(tools)
+        chain = [ChainStep("weather", "get_weather", {"location": "Tokyo"}, "weather"),
+                 ChainStep("news", "search_news", {"query": "Tokyo"}, "news")]
+
+        start = time.perf_counter()
+        context = asyncio.run(orchestrator.execute_chain(chain))
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.24
+        assert calls[:2] == [("start", ("Tokyo",)), ("start", ("Tokyo",))]
+        assert list(context) == ["weather", "news"]
+        recorded = [call.kwargs["tool"] for call in orchestrator.agent.memory.add_tool_usage.call_args_list]
+        assert recorded == ["weather", "news"]
+        stats = orchestrator.get_stats()
+        assert stats["steps"] == 2 and stats["wall_seconds"] < stats["step_seconds"]
+
+    def test_dependent_step_waits_and_sees_only_its_inputs(self):
+        """Test that a dependent step gets its producer's output and an LLM condition sees its dependencies only."""
+        calls = []
+        tools = {"weather": {"functions": {"get_weather": make_tool(lambda location: None, delay=0.05, calls=calls)}},
+                 "news": {"functions": {"search_news": make_tool(lambda query: None, calls=calls)}}}
+        orchestrator = make_orchestrator(tools)
+        conditions = []
+
+        async def aquery_llm(prompt, **kwargs):
+            conditions.append(prompt)
+            return "True"
+        orchestrator.agent.aquery_llm = aquery_llm
+        chain = [ChainStep("weather", "get_weather", {"location": "Tokyo"}, "weather"),
+                 ChainStep("weather", "get_weather", {"location": "Oslo"}, "oslo"),
+                 ChainStep("news", "search_news", {"query": "{{weather}}"}, "news", condition="the weather is nice")]
+
+        context = asyncio.run(orchestrator.execute_chain(chain))
+
+        assert context["news"] == "result for result for Tokyo"
+        assert calls.index(("start", ("result for Tokyo",))) > calls.index(("end", ("Tokyo",)))
+        assert "result for Tokyo" in conditions[0] and "Oslo" not in conditions[0]
+
+    def test_sequential_mode(self):
+        """Test that parallel=False runs each step after the one before it."""
+        calls = []
+        tools = {"weather": {"functions": {"get_weather": make_tool(lambda location: None, delay=0.02, calls=calls)}}}
+        orchestrator = make_orchestrator(tools, parallel=False)
+        chain = [ChainStep("weather", "get_weather", {"location": city}, city) for city in ("Tokyo", "Oslo", "Lima")]
+
+        context = asyncio.run(orchestrator.execute_chain(chain))
+
+        assert [event for event, _ in calls] == ["start", "end"] * 3
+        assert list(context) == ["Tokyo", "Oslo", "Lima"]
+
+
+class TestConditions:
+
+    def test_expressions_evaluated_locally(self):
+        """Test comparisons, boolean operators, subscripts and literals over the context."""
+        evaluator = ConditionEvaluator()
+        context = {"weather_data": {"precipitation": {"rain": 1.5}, "conditions": "Rain", "alerts": []},
+                   "stock": {"change": -2}}
+        assert evaluator.evaluate("weather_data['precipitation']['rain'] > 0", context) is True
+        assert evaluator.evaluate("weather_data['conditions'] in ('Rain', 'Snow') and not weather_data['alerts']",
+                                  context) is True
+        assert evaluator.evaluate("stock['change'] >= -1 or weather_data['alerts'] == true", context) is False
+        assert evaluator.evaluate("weather_data['wind'] > 3", context) is False
+        assert evaluator.get_stats()["evaluation_errors"] == 1
+
+    def test_unsafe_or_unparsable_conditions_left_to_the_llm(self):
+        """Test that calls, attributes, arithmetic and prose are not evaluated."""
+        evaluator = ConditionEvaluator()
+        for condition in ("__import__('os').system('true')", "weather_data.__class__", "[1] * 10 ** 9",
+                          "len(weather_data) > 0", "the weather is nice", "__builtins__"):
+            assert evaluator.evaluate(condition, {"weather_data": {}}) is None
+        assert evaluator.get_stats()["unsupported"] == 6
+
+    def test_unknown_names_left_to_the_llm(self):
+        """Test that a condition reading a name outside the context is not taken as false."""
+        evaluator = ConditionEvaluator()
+        context = {"weather": {"rain": 0}}
+        assert evaluator.evaluate("raining", context) is None
+        assert evaluator.evaluate("weather['rain'] > 0 or snowing", context) is None
+        assert evaluator.evaluate("weather['rain'] == 0 and true", context) is True
+        stats = evaluator.get_stats()
+        assert stats["unsupported"] == 2 and stats["evaluation_errors"] == 0
+
+    def test_chain_condition_with_unknown_name_asks_the_llm(self):
+        """Test that a step whose condition names no context value runs if the LLM says so."""
+        tools = {"weather": {"functions": {"get_weather": make_tool(lambda location: None, result={"rain": 0})}},
+                 "news": {"functions": {"search_news": make_tool(lambda query: None)}}}
+        orchestrator = make_orchestrator(tools)
+        prompts = []
+
+        async def aquery_llm(prompt, **kwargs):
+            prompts.append(prompt)
+            return "True"
+        orchestrator.agent.aquery_llm = aquery_llm
+        chain = [ChainStep("weather", "get_weather", {"location": "Tokyo"}, "weather"),
+                 ChainStep("news", "search_news", {"query": "parks"}, "parks", condition="sunny")]
+
+        context = asyncio.run(orchestrator.execute_chain(chain))
+
+        assert list(context) == ["weather", "parks"]
+        assert len(prompts) == 1 and "sunny" in prompts[0]
+
+    def test_chain_condition_without_llm(self):
+        """Test that a chain step runs or is skipped on its condition without an LLM call."""
+        tools = {"weather": {"functions": {"get_weather": make_tool(lambda location: None, result={"rain": 0})}},
+                 "news": {"functions": {"search_news": make_tool(lambda query: None)}}}
+        orchestrator = make_orchestrator(tools)
+        chain = [ChainStep("weather", "get_weather", {"location": "Tokyo"}, "weather"),
+                 ChainStep("news", "search_news", {"query": "umbrellas"}, "umbrellas", condition="weather['rain'] > 0"),
+                 ChainStep("news", "search_news", {"query": "parks"}, "parks", condition="weather['rain'] == 0")]
+
+        context = asyncio.run(orchestrator.execute_chain(chain))
+
+        assert list(context) == ["weather", "parks"]
+        orchestrator.agent.aquery_llm.assert_not_called()
+        assert orchestrator.conditions.get_stats()["local"] == 2
+
+
+class TestStepCache:
+
+    def test_cache_keyed_by_resolved_placeholders(self):
+        """Test that steps with the same placeholder but different resolved inputs do not share a result."""
+        lookup = make_tool(lambda location: None)
+        tools = {"weather": {"functions": {"get_weather": lookup}}}
+        orchestrator = make_orchestrator(tools)
+        chain = [ChainStep("weather", "get_weather", {"location": "{{city}}"}, "weather")]
+
+        first = asyncio.run(orchestrator.execute_chain(chain, {"city": "Tokyo"}))
+        second = asyncio.run(orchestrator.execute_chain(chain, {"city": "Oslo"}))
+        again = asyncio.run(orchestrator.execute_chain(chain, {"city": "Tokyo"}))
+
+        assert (first["weather"], second["weather"]) == ("result for Tokyo", "result for Oslo")
+        assert again["weather"] == "result for Tokyo"
+        assert lookup.call_count == 2
+        assert orchestrator.cache.get_stats()["hits"] == 1
+
+    def test_cache_shared_across_orchestrators(self):
+        """Test that chains run by different orchestrators reuse one cache."""
+        lookup = make_tool(lambda location: None)
+        tools = {"weather": {"functions": {"get_weather": lookup}}}
+        cache = StepResultCache()
+        chain = [ChainStep("weather", "get_weather", {"location": "Tokyo"}, "weather")]
+        for _ in range(2):
+            asyncio.run(make_orchestrator(tools, cache=cache).execute_chain(chain))
+        assert lookup.call_count == 1
+
+
+class TestStepPools:
+
+    def test_steps_run_under_tool_limits(self):
+        """Test that independent steps of a rate-limited tool run one at a time while other tools overlap."""
+        calls = []
+        tools = {"geolocation": {"functions": {"get_location_info": make_tool(lambda location: None, delay=0.05,
+                                                                               calls=calls)}},
+                 "weather": {"functions": {"get_weather": make_tool(lambda location: None, delay=0.05)}}}
+        pools = ToolPools()
+        orchestrator = make_orchestrator(tools, pools=pools)
+        chain = [ChainStep("geolocation", "get_location_info", {"location": city}, f"place_{city}")
+                 for city in ("Tokyo", "Oslo", "Lima")]
+        chain.append(ChainStep("weather", "get_weather", {"location": "Tokyo"}, "weather"))
+
+        context = asyncio.run(orchestrator.execute_chain(chain))
+        pools.close()
+
+        assert [event for event, _ in calls] == ["start", "end"] * 3
+        assert list(context) == ["place_Tokyo", "place_Oslo", "place_Lima", "weather"]
+        stats = pools.get_stats()
+        assert stats["services"]["nominatim"]["waited"] == 2
+        assert stats["pools"]["io"]["finished"] == 4
+
+
+class TestGenerateChain:
+
+    def test_schema_violation_returns_empty_chain(self):
+        """Test that a generated chain violating the schema is not run."""
+        tools = {"weather": {"functions": {"get_weather": make_tool(lambda location: None)}}}
+        orchestrator = make_orchestrator(tools)
+        orchestrator.agent.structured_output = StructuredOutput()
+        step = {"tool_name": "weather", "function_name": "get_weather", "input_params": {"location": "Tokyo"},
+                "output_key": "weather"}
+        orchestrator.agent.query_llm.return_value = json.dumps([step])
+        assert [s.output_key for s in orchestrator.generate_chain("weather in tokyo")] == ["weather"]
+
+        orchestrator.agent.query_llm.return_value = json.dumps([dict(step, condition=1)])
+        assert orchestrator.generate_chain("weather in tokyo") == []
+        assert orchestrator.agent.structured_output.get_stats()["chain"]["schema_violations"] == 1
+
+
+class TestSessionMemory:
+
+    def test_chain_tool_usage_recorded_in_each_session(self):
+        """Test that chain steps are recorded in the memory of the session that ran the chain."""
+        tools = {"weather": {"module": None, "functions": {"get_weather": lambda location: f"Sunny in {location}"}}}
+        with patch.object(LLMFlowAgent, '_discover_tools', return_value=tools), \
+             patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
+            agent = LLMFlowAgent(fast_path_threshold=None, semantic_top_k=None)
+        agent.determine_query_type = lambda query: {"type": "chain_query"}
+        agent.orchestrator.generate_chain = lambda query: [
+            ChainStep("weather", "get_weather", {"location": query}, "weather")]
+        agent.orchestrator.format_response = lambda context, on_token=None: str(context["weather"])
+        first, second = ConversationMemory(), ConversationMemory()
+        try:
+            assert agent.process_query("Tokyo", memory=first) == "Sunny in Tokyo"
+            assert agent.process_query("Oslo", memory=second) == "Sunny in Oslo"
+        finally:
+            agent.close()
+
+        assert [usage["result"] for usage in first.recent_tools_used] == ["Sunny in Tokyo"]
+        assert [usage["result"] for usage in second.recent_tools_used] == ["Sunny in Oslo"]
+        assert agent.memory.recent_tools_used == []
@@ -0,0 +1,157 @@
+import asyncio
+import inspect
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from benchmarks.stub_ollama import StubOllamaServer
+from chain_orchestrator import ChainOrchestrator, ChainStep
+from deadline import (DeadlineExceeded, budget_sleep, check_deadline, current_deadline, pause,
+                      query_deadline, remaining, request_timeout, wait_timeout)
+from main import LLMFlowAgent
+from ollama_client import OllamaClient
+from tool_registry import ToolRegistry
+
+
+class TestDeadline:
+
+    def test_no_deadline_leaves_timeouts_alone(self):
+        """Test that without a deadline every helper behaves as before."""
+        assert current_deadline() is None
+        assert remaining() is None
+        assert request_timeout(10) == 10
+        assert request_timeout((5.0, 60.0)) == (5.0, 60.0)
+        assert wait_timeout() is None
+        check_deadline()
+
+    def test_timeouts_capped_at_remaining_budget(self):
+        """Test that timeouts shrink to the budget and fail once it is used up."""
+        with query_deadline(0.5):
+            assert request_timeout(10) <= 0.5
+            connect, read = request_timeout((0.1, 60.0))
+            assert connect == 0.1 and read <= 0.5
+            assert wait_timeout(30) <= 0.5
+        with query_deadline(0.01):
+            time.sleep(0.02)
+            with pytest.raises(DeadlineExceeded, match="before an HTTP request"):
+                request_timeout(10)
+
+    def test_deadline_exceeded_is_a_request_timeout(self):
+        """Test that tools handling request timeouts also handle the deadline."""
+        assert issubclass(DeadlineExceeded, requests.exceptions.Timeout)
+
+    def test_nested_deadline_keeps_the_earlier(self):
+        """Test that an inner block cannot extend the enclosing budget."""
+        with query_deadline(0.5) as outer:
+            with query_deadline(10) as inner:
+                assert inner is outer
+            with query_deadline(0.1) as inner:
+                assert inner is not outer and remaining() <= 0.1
+            assert current_deadline() is outer
+        assert current_deadline() is None
+
+    def test_sleeps(self):
+        """Test that retry waits are skipped and courtesy delays shortened near the deadline."""
+        with query_deadline(0.2):
+            assert budget_sleep(1.0) is False
+            start = time.perf_counter()
+            pause(5.0)
+            assert time.perf_counter() - start < 0.1
+            assert budget_sleep(0.01) is True
+
+
+class TestDeadlinePropagation:
+
+    @pytest.fixture
+    def agent(self):
+        with patch.object(LLMFlowAgent, '_discover_tools', return_value={}), \
+             patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
+            agent = LLMFlowAgent(cache_size=0, fast_path_threshold=None, deadline=0.2)
+        yield agent
+        agent.close()
+
+    def test_deadline_reaches_worker_threads(self, agent):
+        """Test that the query's deadline is visible in blocking calls run on the agent's pool."""
+        seen = []
+
+        def determine_query_type(query):
+            seen.append(remaining())
+            return {"type": "tool_request", "tool": "weather", "function": "get_weather", "args": ["Oslo"]}
+
+        agent.determine_query_type = determine_query_type
+        agent.execute_tool = MagicMock(return_value="Sunny")
+        assert agent.process_query("weather in Oslo", deadline=0.1) == "Sunny"
+        assert 0 < seen[0] <= 0.1
+
+    def test_tool_not_started_after_deadline(self, agent):
+        """Test that a tool call is refused once the budget is used up."""
+        get_weather = MagicMock(return_value="Sunny")
+        agent.tools["weather"] = {"functions": {"get_weather": get_weather}}
+
+        def determine_query_type(query):
+            time.sleep(0.25)
+            return {"type": "tool_request", "tool": "weather", "function": "get_weather", "args": ["Oslo"]}
+
+        agent.determine_query_type = determine_query_type
+        response = agent.process_query("weather in Oslo")
+        assert response.startswith("Error: Deadline of 0.2s exceeded before weather.get_weather")
+        get_weather.assert_not_called()
+
+    def test_llm_timeout_capped(self):
+        """Test that the Ollama client's timeouts shrink to the deadline."""
+        client = OllamaClient(connect_timeout=5.0, read_timeout=60.0)
+        with query_deadline(1.0):
+            connect, read = client.timeout
+        assert connect <= 1.0 and read <= 1.0
+        client.close()
+
+    def test_streamed_answer_cut_at_deadline(self):
+        """Test that a streamed answer keeps the tokens generated before the deadline."""
+        with StubOllamaServer(responder=lambda payload: "one two three four five six seven eight",
+                              token_latency=0.05) as stub:
+            with patch.object(LLMFlowAgent, '_discover_tools', return_value={}), \
+                 patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
+                agent = LLMFlowAgent(ollama_url=stub.url, cache_size=0)
+            tokens = []
+            with query_deadline(0.17):
+                response = agent.stream_llm_response("Say something", tokens.append)
+            agent.close()
+        assert response == "".join(tokens)
+        assert response.startswith("one two") and not response.endswith("eight")
+
+
+class TestChainDeadline:
+
+    def test_remaining_steps_skipped_and_results_listed(self):
+        """Test that steps after the deadline are skipped and the results are formatted without the LLM."""
+        def slow_lookup(location):
+            time.sleep(0.15)
+            return f"Sunny in {location}"
+        slow = MagicMock(side_effect=slow_lookup)
+        slow.__signature__ = inspect.signature(slow_lookup)
+        never = MagicMock(return_value="headlines")
+        never.__signature__ = inspect.signature(lambda query: None)
+        tools = {"weather": {"functions": {"get_weather": slow}},
+                 "news": {"functions": {"search_news": never}}}
+        agent = MagicMock(tools=tools, tool_registry=ToolRegistry(tools))
+
+        async def run_blocking(func, *args):
+            return func(*args)
+        agent.run_blocking = run_blocking
+        orchestrator = ChainOrchestrator(agent)
+        chain = [ChainStep("weather", "get_weather", {"location": "Oslo"}, "weather"),
+                 ChainStep("news", "search_news", {"query": "{{weather}}"}, "news")]
+
+        async def run():
+            with query_deadline(0.1):
+                context = await orchestrator.execute_chain(chain)
+                return context, orchestrator.format_response(context)
+
+        context, response = asyncio.run(run())
+        assert context["weather"] == "Sunny in Oslo"
+        assert context["news"] == {"error": "Skipped: the query ran out of time"}
+        never.assert_not_called()
+        agent.query_llm.assert_not_called()
+        assert "weather: Sunny in Oslo" in response
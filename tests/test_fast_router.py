@@ -0,0 +1,198 @@
+import types
+
+import pytest
+
+from fast_router import FastPathRouter
+
+
+def make_module(name, cls_name, examples, **lexicons):
+    """Build a stand-in tool module with TOOL_EXAMPLES and lexicon constants."""
+    module = types.ModuleType(name)
+    cls = type(cls_name, (), {"TOOL_EXAMPLES": examples, "__module__": name})
+    setattr(module, cls_name, cls)
+    for attr, value in lexicons.items():
+        setattr(module, attr, value)
+    return module
+
+
+@pytest.fixture
+def tools():
+    """Tools backed by small stand-in modules carrying the lexicons the router reads."""
+    time_module = make_module(
+        "time_tool", "TimeTool",
+        [{"query": "What time is it in Tokyo?", "tool_call": "time_tool.get_current_time('Tokyo')"},
+         {"query": "What's the time difference between Dubai and Singapore?",
+          "tool_call": "time_tool.get_time_difference('Dubai', 'Singapore')"}],
+        CITY_TIMEZONES={"tokyo": "Asia/Tokyo", "madrid": "Europe/Madrid", "new york": "America/New_York",
+                        "dubai": "Asia/Dubai", "singapore": "Asia/Singapore", "london": "Europe/London",
+                        "paris": "Europe/Paris"}
+    )
+    weather_module = make_module(
+        "weather_tool", "WeatherTool",
+        [{"query": "What's the weather in London?", "tool_call": "weather_tool.get_weather('London')"},
+         {"query": "Is it raining in Paris?", "tool_call": "weather_tool.get_weather('Paris')"}]
+    )
+    currency_module = make_module(
+        "currency_tool", "CurrencyTool",
+        [{"query": "Exchange rate from British Pounds to Canadian Dollars",
+          "tool_call": "currency_tool.convert_currency(1, 'GBP', 'CAD')"}],
+        CURRENCY_ALIASES={"EURO": "EUR", "EUROS": "EUR", "DOLLARS": "USD", "US": "USD", "YEN": "JPY"}
+    )
+    astronomy_module = make_module("astronomy_tool", "AstronomyTool", [], PLANETS={"jupiter": None, "mars": None})
+    news_module = make_module(
+        "news_tool", "NewsTool",
+        [{"query": "Any news about SpaceX?", "tool_call": "news_tool.search_news('SpaceX')"}]
+    )
+    return {
+        "time": {"module": time_module, "functions": {"get_current_time": None, "get_time_difference": None}},
+        "weather": {"module": weather_module, "functions": {"get_weather": None}},
+        "currency": {"module": currency_module, "functions": {"convert_currency": None}},
+        "astronomy": {"module": astronomy_module, "functions": {"get_planet_info": None}},
+        "news": {"module": news_module, "functions": {"search_news": None}},
+    }
+
+
+@pytest.fixture
+def router(tools):
+    tool_name_map = {"weather": "weather", "weather tool": "weather", "time": "time", "currency": "currency",
+                     "news": "news", "planet": "astronomy"}
+    return FastPathRouter(tools, tool_name_map)
+
+
+class TestFastPathRouter:
+
+    def test_currency_conversion(self, router):
+        """Test that an amount and a currency pair are routed to convert_currency."""
+        route = router.route("convert 100 USD to EUR")
+        assert route["type"] == "tool_request"
+        assert (route["tool"], route["function"], route["args"]) == ("currency", "convert_currency", [100, "USD", "EUR"])
+        assert route["router"] == "fast_path"
+
+    def test_currency_aliases_and_thousands(self, router):
+        """Test that currency names from the lexicon and grouped amounts are recognized."""
+        route = router.route("how much is 1,250.5 euros in yen?")
+        assert route["args"] == [1250.5, "EUR", "JPY"]
+
+    def test_weather_known_city(self, router):
+        """Test that a weather keyword plus a known city routes to get_weather."""
+        route = router.route("What's the weather in Madrid?")
+        assert (route["tool"], route["function"], route["args"]) == ("weather", "get_weather", ["Madrid"])
+
+    def test_example_keywords_signal_tool(self, router):
+        """Test that distinctive words mined from TOOL_EXAMPLES act as tool keywords."""
+        assert "raining" in router.keywords["weather"]
+        route = router.route("is it raining in new york")
+        assert route["args"] == ["New York"]
+
+    def test_current_time(self, router):
+        """Test that a time query with one known city routes to get_current_time."""
+        route = router.route("time in Tokyo")
+        assert (route["function"], route["args"]) == ("get_current_time", ["Tokyo"])
+
+    def test_time_difference(self, router):
+        """Test that "between A and B" is not mistaken for a multi-intent query."""
+        route = router.route("time difference between Dubai and Singapore")
+        assert (route["function"], route["args"]) == ("get_time_difference", ["Dubai", "Singapore"])
+
+    def test_time_of_day_left_to_llm(self, router):
+        """Test that time conversions are not routed as current-time queries."""
+        assert router.route("convert 3pm Tokyo time to Madrid") is None
+
+    @pytest.mark.parametrize("query", [
+        "what's a good time to visit tokyo",
+        "is it a good time to call london",
+        "I lived in london for a long time",
+    ])
+    def test_time_without_time_intent_left_to_llm(self, router, query):
+        """Test that "time" plus a city is not routed unless the query asks for the time."""
+        assert router.match(query)["confidence"] < router.threshold
+        assert router.route(query) is None
+
+    @pytest.mark.parametrize("query", ["what time is it in london?", "current time in Tokyo", "time now in paris"])
+    def test_explicit_time_intent(self, router, query):
+        """Test that explicit requests for the current time are routed."""
+        assert router.route(query)["function"] == "get_current_time"
+
+    def test_planet(self, router):
+        """Test that a query naming one planet and an astronomy word routes to get_planet_info."""
+        route = router.route("tell me about the planet jupiter")
+        assert (route["tool"], route["function"], route["args"]) == ("astronomy", "get_planet_info", ["Jupiter"])
+
+    @pytest.mark.parametrize("query", ["mars bar calories", "tell me about jupiter"])
+    def test_planet_without_astronomy_word_left_to_llm(self, router, query):
+        """Test that a planet name alone stays below the threshold."""
+        route = router.match(query)
+        assert route["tool"] == "astronomy" and route["confidence"] < router.threshold
+        assert router.route(query) is None
+
+    @pytest.mark.parametrize("query", [
+        "what is the weather like in paris texas",
+        "what was the weather in london last week",
+        "weather in madrid yesterday",
+        "is it raining in tokyo in march",
+    ])
+    def test_qualified_weather_left_to_llm(self, router, query):
+        """Test that a further location qualifier or a past or date reference keeps weather off the fast path."""
+        route = router.match(query)
+        assert route["tool"] == "weather" and route["confidence"] < router.threshold
+        assert router.route(query) is None
+
+    def test_weather_with_current_time_words(self, router):
+        """Test that words about the present after the city do not lower the confidence."""
+        route = router.route("what's the weather like in london right now?")
+        assert route["args"] == ["London"]
+
+    def test_multi_intent_left_to_llm(self, router):
+        """Test that queries joining several requests fall through to the LLM."""
+        assert router.route("weather in Madrid and then convert 100 USD to EUR") is None
+
+    def test_candidates_of_multi_intent_query(self, router):
+        """Test that every rule's route is scored even when none passes the threshold."""
+        routes = router.candidates("weather in Madrid and then convert 100 USD to EUR")
+        calls = {(route["tool"], route["function"], tuple(route["args"])) for route in routes}
+        assert calls == {("weather", "get_weather", ("Madrid",)), ("currency", "convert_currency", (100, "USD", "EUR"))}
+        assert all(route["confidence"] < router.threshold for route in routes)
+        assert routes == sorted(routes, key=lambda route: -route["confidence"])
+
+    def test_conflicting_tool_keywords_lower_confidence(self, router):
+        """Test that mentioning another tool keeps the query off the fast path."""
+        assert router.match("news about the weather in Madrid")["confidence"] < router.threshold
+        assert router.route("news about the weather in Madrid") is None
+
+    def test_unknown_location_below_threshold(self, router):
+        """Test that locations missing from the lexicons are reported but not routed."""
+        match = router.match("weather in Springfield")
+        assert match["args"] == ["Springfield"]
+        assert match["confidence"] < router.threshold
+        assert router.route("weather in Springfield") is None
+
+    def test_unavailable_tool_not_routed(self, tools):
+        """Test that routes are only emitted for tools the agent has loaded."""
+        router = FastPathRouter(tools, {"weather": "weather"})
+        del tools["weather"]
+        assert router.route("weather in Madrid") is None
+
+    def test_casual_query_not_routed(self, router):
+        """Test that queries without a matching rule go to the LLM."""
+        assert router.route("hello, how are you?") is None
+
+    def test_threshold(self, tools):
+        """Test that raising the threshold sends lower-confidence routes to the LLM."""
+        router = FastPathRouter(tools, {}, threshold=0.99)
+        assert router.route("convert 100 USD to EUR") is None
+
+    def test_stats(self, router):
+        """Test that hit rate and the confidence histogram are tracked."""
+        router.route("convert 100 USD to EUR")
+        router.route("weather in Springfield")
+        router.route("hello")
+        stats = router.get_stats()
+        assert stats["attempts"] == 3
+        assert stats["hits"] == 1
+        assert stats["below_threshold"] == 1
+        assert stats["no_match"] == 1
+        assert stats["hit_rate"] == pytest.approx(1 / 3)
+        assert stats["avg_hit_confidence"] == pytest.approx(0.97)
+        assert stats["tool_hits"] == {"currency": 1}
+        assert stats["confidence_histogram"]["<=1.0"] == 1
+        assert stats["confidence_histogram"]["<=0.8"] == 1
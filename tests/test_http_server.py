@@ -0,0 +1,162 @@
+import http.client
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from http_server import AgentHTTPServer, SessionStore
+from main import LLMFlowAgent
+from tracing import TRACER
+
+
+def request(server, method, path, body=None):
+    """Send one request and return the status, headers and decoded JSON body."""
+    connection = http.client.HTTPConnection(server.host, server.port, timeout=5)
+    try:
+        payload = json.dumps(body) if isinstance(body, dict) else body
+        connection.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), json.loads(response.read())
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def agent():
+    with patch.object(LLMFlowAgent, '_discover_tools', return_value={}), \
+         patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
+        agent = LLMFlowAgent(cache_size=0, fast_path_threshold=None)
+
+    def handle_casual_conversation(query, query_info, on_token=None):
+        if query.startswith("slow"):
+            time.sleep(0.3)
+        history = agent.memory.get_conversation_history()
+        return f"{query} after {[message['content'] for message in history[:-1]]}"
+
+    agent.determine_query_type = lambda query: {"type": "casual_conversation"}
+    agent.handle_casual_conversation = handle_casual_conversation
+    yield agent
+    agent.close()
+
+
+@pytest.fixture
+def server(agent):
+    server = AgentHTTPServer(agent, port=0, max_in_flight=2, max_queue=1).start_background()
+    yield server
+    server.stop()
+
+
+class TestSessionStore:
+
+    def test_lru_eviction(self):
+        """Test that the least recently used session is evicted first."""
+        store = SessionStore(max_sessions=2)
+        store.get("a")
+        store.get("b")
+        store.get("a")
+        store.get("c")
+        assert list(store.sessions) == ["a", "c"]
+        assert store.stats["evicted"] == 1
+
+    def test_new_session_ids(self):
+        """Test that a session without an id gets a fresh one."""
+        store = SessionStore()
+        assert store.get(None).id != store.get(None).id
+
+
+class TestAgentHTTPServer:
+
+    def test_sessions_are_isolated(self, server):
+        """Test that each session only sees its own conversation."""
+        status, _, first = request(server, "POST", "/query", {"query": "hello"})
+        assert status == 200
+        session = first["session"]
+        request(server, "POST", "/query", {"query": "other", "session": "someone-else"})
+        _, _, second = request(server, "POST", "/query", {"query": "again", "session": session})
+
+        assert second["session"] == session
+        assert second["response"] == f"again after {['hello', first['response']]}"
+
+    def test_concurrent_sessions(self, server):
+        """Test that two sessions are processed concurrently."""
+        results = []
+        threads = [
+            threading.Thread(target=lambda i=i: results.append(
+                request(server, "POST", "/query", {"query": "slow", "session": f"s{i}"})))
+            for i in range(2)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert [status for status, _, _ in results] == [200, 200]
+        assert time.perf_counter() - start < 0.55
+
+    def test_admission_control(self, server):
+        """Test that requests beyond the in-flight limit and queue are rejected with 503."""
+        results = []
+        threads = [
+            threading.Thread(target=lambda i=i: results.append(
+                request(server, "POST", "/query", {"query": "slow", "session": f"s{i}"})))
+            for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join()
+
+        statuses = sorted(status for status, _, _ in results)
+        assert statuses == [200, 200, 200, 503]
+        rejected = next(headers for status, headers, _ in results if status == 503)
+        assert rejected["Retry-After"] == "1"
+        admission = request(server, "GET", "/stats")[2]["admission"]
+        assert admission["rejected_full"] == 1
+        assert admission["peak_in_flight"] == 2
+
+    def test_bad_requests(self, server):
+        """Test errors for malformed bodies, missing queries and unknown endpoints."""
+        assert request(server, "POST", "/query", "not json")[0] == 400
+        assert request(server, "POST", "/query", {"session": "x"})[0] == 400
+        assert request(server, "GET", "/query")[0] == 405
+        assert request(server, "GET", "/nowhere")[0] == 404
+        assert request(server, "GET", "/health")[2] == {"status": "ok"}
+
+    def test_delete_session(self, server):
+        """Test that a deleted session starts over."""
+        request(server, "POST", "/query", {"query": "hello", "session": "s"})
+        assert request(server, "DELETE", "/sessions/s")[0] == 200
+        assert request(server, "DELETE", "/sessions/s")[0] == 404
+        _, _, reply = request(server, "POST", "/query", {"query": "again", "session": "s"})
+        assert reply["response"] == "again after []"
+
+    def test_keep_alive_connection(self, server):
+        """Test that several requests can share one connection."""
+        connection = http.client.HTTPConnection(server.host, server.port, timeout=5)
+        for query in ("one", "two"):
+            connection.request("POST", "/query", body=json.dumps({"query": query, "session": "k"}))
+            response = connection.getresponse()
+            assert response.status == 200
+            response.read()
+        connection.close()
+
+    def test_metrics_endpoint(self, server):
+        """Test that /metrics serves the tracer's aggregates as Prometheus text."""
+        TRACER.reset()
+        TRACER.enable()
+        try:
+            request(server, "POST", "/query", {"query": "hello"})
+            connection = http.client.HTTPConnection(server.host, server.port, timeout=5)
+            connection.request("GET", "/metrics")
+            response = connection.getresponse()
+            text = response.read().decode("utf-8")
+            connection.close()
+        finally:
+            TRACER.disable()
+            TRACER.reset()
+        assert response.status == 200
+        assert response.getheader("Content-Type").startswith("text/plain; version=0.0.4")
+        assert 'llmflow_span_duration_seconds_count{span="query"} 1' in text
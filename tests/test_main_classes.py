@@ -1,14 +1,20 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, ANY, call
 from datetime import datetime
 import requests
 import json
 import inspect
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 # Import classes from main.py
 # Assuming main.py is in the root directory relative to tests/
 # Also import ChainStep for mocking
 from chain_orchestrator import ChainStep
+from prompt_catalog import ToolCatalog
+from model_tiers import ModelTiers
+from structured_output import routing_schema
 try:
     from main import ConversationMemory, Message, LLMFlowAgent
 except ImportError:
@@ -220,8 +226,40 @@ class TestConversationMemory:
         memory.add_message("user", "مرحبا بالعالم") # Marhaban bialalam
         assert memory.detect_language() == "ar"
 
+    def test_llm_context_tracks_model_and_position(self):
+        """Test that the stored context is only reused for its model and sees later messages."""
+        memory = ConversationMemory(max_messages=3)
+        memory.add_message("user", "Hi")
+        memory.record_llm_turn("small", {"context": [7, 8]}, reused_context=False)
+        memory.add_message("assistant", "Hello!")
+        memory.add_message("user", "weather?")
+        memory.add_message("assistant", "Sunny")
+        assert memory.get_llm_context("large") is None
+        assert memory.get_llm_context("small") == [7, 8]
+        assert memory.get_messages_since_context() == [
+            {"role": "user", "content": "weather?"}, {"role": "assistant", "content": "Sunny"}
+        ]
+
+    def test_llm_context_reset_without_context(self):
+        """Test that a response without context clears the stored one."""
+        memory = ConversationMemory()
+        memory.record_llm_turn("small", {"context": [1]}, reused_context=False)
+        memory.record_llm_turn("small", {"response": "x"}, reused_context=True)
+        assert memory.get_llm_context("small") is None
+        assert memory.llm_stats["context_turns"] == 1
+
 # --- Tests for LLMFlowAgent ---
 
+# Tool descriptions the routing schemas of agent_instance are built from
+ROUTING_TOOLS = {
+    "time": {"functions": {"get_current_time": {"arguments": ["location"]}}},
+    "weather": {"functions": {"get_weather": {"arguments": ["location"]}}},
+    "air_quality": {"functions": {"get_air_quality": {"arguments": ["location"]}}},
+    "currency": {"functions": {"convert_currency": {"arguments": ["amount", "from_currency", "to_currency"]}}},
+    "astronomy": {"functions": {"get_celestial_events": {"arguments": ["date", "location"]},
+                                "get_planet_info": {"arguments": ["planet"]}}}
+}
+
 # We need an instance of the agent to test its methods.
 # We can create a dummy instance or mock its dependencies if needed.
 @pytest.fixture
@@ -230,7 +268,9 @@ def agent_instance():
     # Mock dependencies like _discover_tools if they are complex or external
     with patch.object(LLMFlowAgent, '_discover_tools', return_value={}), \
          patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
-        agent = LLMFlowAgent() # Assuming __init__ doesn't have heavy side effects
+        # The determine_query_type tests below exercise the two-step (extract, then
+        # classify) path; single-call routing has its own tests
+        agent = LLMFlowAgent(routing_mode="two_step") # Assuming __init__ doesn't have heavy side effects
         # Manually set the tool_name_map for testing normalize_tool_name
         agent.tool_name_map = {
             'weather information': 'weather',
@@ -241,6 +281,11 @@ def agent_instance():
             'currency converter': 'currency',
             'currency': 'currency',
         }
+        # Routing replies are checked against the tools the tests add after construction
+        agent.routing_schemas = {
+            "single_call": routing_schema(ROUTING_TOOLS, agent.QUERY_TYPES, entities=True),
+            "two_step": routing_schema(ROUTING_TOOLS, agent.QUERY_TYPES)
+        }
         return agent
 
 class TestLLMFlowAgent:
@@ -311,6 +356,12 @@ class TestLLMFlowAgent:
         mock_query_llm.assert_called_once()
         assert entities == {} # Should return empty dict on error
 
+    @patch.object(LLMFlowAgent, 'query_llm', return_value='{"location": "Oslo", "amount": "ten"}')
+    def test_extract_entities_schema_violation(self, mock_query_llm, agent_instance):
+        """Test that entities violating the schema are discarded like unparsable ones."""
+        assert agent_instance.extract_entities_with_llm("ten crowns in oslo") == {}
+        assert agent_instance.structured_output.get_stats()["extraction"]["schema_violations"] == 1
+
     # --- Tests for determine_query_type ---
 
     @patch.object(LLMFlowAgent, 'query_llm')
@@ -489,6 +540,167 @@ class TestLLMFlowAgent:
         # Check args were corrected: [date, location]
         assert result['args'] == ["2024-04-25", 'Sydney']
 
+    # --- Tests for single-call routing ---
+
+    @patch.object(LLMFlowAgent, 'query_llm')
+    @patch.object(LLMFlowAgent, 'extract_entities_with_llm')
+    def test_determine_query_type_single_call(self, mock_extract_entities, mock_query_llm, agent_instance):
+        """Test single-call routing returns entities and classification from one LLM call."""
+        agent_instance.routing_mode = "single_call"
+        agent_instance.tools['currency'] = {'functions': {'convert_currency': None}}
+        mock_query_llm.return_value = '{"entities": {"from_currency": "EUR", "to_currency": "RUB", "amount": null, "location": null}, "type": "tool_request", "tool": "currency converter", "function": "convert_currency", "args": [], "explanation": "Exchange rate.", "language": "ru", "translation": "euro to ruble rate"}'
+
+        result = agent_instance.determine_query_type("курс евро к рублю")
+
+        mock_query_llm.assert_called_once()
+        mock_extract_entities.assert_not_called()
+        assert result['type'] == 'tool_request'
+        assert result['tool'] == 'currency'
+        assert result['args'] == [1, "EUR", "RUB"]
+        assert result['entities'] == {"from_currency": "EUR", "to_currency": "RUB"}
+
+    @patch.object(LLMFlowAgent, 'query_llm')
+    @patch.object(LLMFlowAgent, 'extract_entities_with_llm', return_value={"location": "Paris"})
+    def test_determine_query_type_single_call_fallback(self, mock_extract_entities, mock_query_llm, agent_instance):
+        """Test that an unusable single-call response falls back to the two-step path."""
+        agent_instance.routing_mode = "single_call"
+        mock_query_llm.side_effect = [
+            "I cannot answer that.",
+            '{"type": "tool_request", "tool": "weather", "function": "get_weather", "args": ["paris"], '
+            '"explanation": "Weather.", "language": "en"}'
+        ]
+
+        result = agent_instance.determine_query_type("weather in paris")
+
+        assert mock_query_llm.call_count == 2
+        mock_extract_entities.assert_called_once()
+        assert result['tool'] == 'weather'
+        assert result['args'] == ["Paris"]
+
+    @patch.object(LLMFlowAgent, 'query_llm')
+    @patch.object(LLMFlowAgent, 'extract_entities_with_llm', return_value={"location": "Paris"})
+    def test_determine_query_type_schema_violation_falls_back(self, mock_extract_entities, mock_query_llm,
+                                                              agent_instance):
+        """Test that a routing decision the corrections cannot bring into the schema is not used."""
+        agent_instance.routing_mode = "single_call"
+        invalid = ('{"entities": {}, "type": "tool_request", "tool": "weather", "function": "get_weather", '
+                   '"args": ["paris"], "explanation": "Weather.", "language": null}')
+        mock_query_llm.side_effect = [invalid, invalid]
+
+        result = agent_instance.determine_query_type("weather in paris")
+
+        assert mock_query_llm.call_count == 2
+        mock_extract_entities.assert_called_once()
+        assert result['type'] == 'casual_conversation'
+
+    # --- Tests for the semantic shortlist stage ---
+
+    @patch.object(LLMFlowAgent, 'query_llm')
+    def test_determine_query_type_includes_shortlist(self, mock_query_llm, agent_instance):
+        """Test that the semantic shortlist is computed once and passed to the routing prompt."""
+        agent_instance.routing_mode = "single_call"
+        agent_instance.semantic_router = MagicMock()
+        agent_instance.semantic_router.shortlist.return_value = [
+            {"tool": "weather", "function": "get_weather", "score": 0.62}
+        ]
+        mock_query_llm.return_value = '{"entities": {"location": "Paris"}, "type": "tool_request", "tool": "weather", "function": "get_weather", "args": ["Paris"], "explanation": "Weather.", "language": "en"}'
+
+        result = agent_instance.determine_query_type("weather in paris")
+
+        agent_instance.semantic_router.shortlist.assert_called_once_with("weather in paris", top_k=None, pick=True)
+        prompt = mock_query_llm.call_args[0][0]
+        assert "Most likely tools for this query by local similarity (score): weather.get_weather (0.62)" in prompt
+        assert result['candidates'][0]['tool'] == 'weather'
+
+    @patch.object(LLMFlowAgent, 'query_llm')
+    def test_shortlist_errors_do_not_block_routing(self, mock_query_llm, agent_instance):
+        """Test that a failing shortlist stage leaves routing to the LLM alone."""
+        agent_instance.routing_mode = "single_call"
+        agent_instance.semantic_router = MagicMock()
+        agent_instance.semantic_router.shortlist.side_effect = RuntimeError("index missing")
+        mock_query_llm.return_value = '{"entities": {}, "type": "casual_conversation", "tool": null, "function": null, "args": [], "explanation": "Greeting.", "language": "en"}'
+
+        result = agent_instance.determine_query_type("hello")
+
+        assert result['type'] == 'casual_conversation'
+        assert result['candidates'] == []
+        assert "Most likely tools" not in mock_query_llm.call_args[0][0]
+
+    def test_invalid_routing_mode(self):
+        """Test that an unknown routing mode is rejected."""
+        with patch.object(LLMFlowAgent, '_discover_tools', return_value={}), \
+             patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
+            with pytest.raises(ValueError):
+                LLMFlowAgent(routing_mode="three_step")
+
+    @patch.object(LLMFlowAgent, 'query_llm')
+    @patch.object(LLMFlowAgent, 'extract_entities_with_llm')
+    def test_analyze_tool_query_reuses_entities(self, mock_extract_entities, mock_query_llm, agent_instance):
+        """Test analyze_tool_query skips extraction when entities are supplied."""
+        mock_query_llm.return_value = '{"tool": "weather", "function": "get_weather", "arguments": ["x"]}'
+        agent_instance.tools['weather'] = {'functions': {'get_weather': lambda x: None}}
+
+        tool, func, args = agent_instance.analyze_tool_query("weather in Rome", extracted_entities={"location": "Rome"})
+
+        mock_extract_entities.assert_not_called()
+        assert args == ["Rome"]
+
+    # --- Tests for the top-k tool catalog ---
+
+    @staticmethod
+    def _use_catalog(agent):
+        """Give the agent a two-tool catalog."""
+        agent.tool_descriptions = {
+            "weather": {"description": "Weather data", "functions": {
+                "get_weather": {"description": "Get weather", "arguments": ["location"], "example": "get_weather('London')"}}},
+            "astronomy": {"description": "Astronomy data", "functions": {
+                "get_planet_info": {"description": "Planet facts", "arguments": ["planet"], "example": "get_planet_info('Mars')"}}}
+        }
+        agent.tool_catalog = ToolCatalog(agent.tool_descriptions, top_k=1)
+
+    @patch.object(LLMFlowAgent, 'query_llm')
+    def test_analyze_tool_query_describes_shortlisted_tools_only(self, mock_query_llm, agent_instance):
+        """Test that the analysis prompt carries only the shortlisted tools and their instructions."""
+        self._use_catalog(agent_instance)
+        agent_instance.tools['weather'] = {'functions': {'get_weather': lambda x: None}}
+        mock_query_llm.return_value = '{"tool": "weather", "function": "get_weather", "arguments": ["Rome"]}'
+
+        agent_instance.analyze_tool_query("weather in Rome", extracted_entities={},
+                                          candidates=[{"tool": "weather", "function": "get_weather", "score": 0.5}])
+
+        prompt = mock_query_llm.call_args[0][0]
+        assert "get_weather(location) - Get weather; e.g. get_weather('London')" in prompt
+        assert "get_planet_info" not in prompt
+        assert "astronomy tool" not in prompt
+        assert agent_instance.tool_catalog.get_stats()["analysis"]["calls"] == 1
+
+    @patch.object(LLMFlowAgent, 'query_llm')
+    def test_routing_prompt_filters_instructions(self, mock_query_llm, agent_instance):
+        """Test that routing lists every tool but only the shortlisted tools' instructions."""
+        self._use_catalog(agent_instance)
+        mock_query_llm.return_value = '{"entities": {}, "type": "tool_request", "tool": "weather", "function": "get_weather", "args": ["Rome"]}'
+
+        agent_instance.route_query_single_call("weather in rome", candidates=[{"tool": "weather", "score": 0.5}])
+        prompt = mock_query_llm.call_args[0][0]
+        assert "- Astronomy: get_planet_info" in prompt
+        assert "ALWAYS use the astronomy tool" not in prompt
+
+        agent_instance.route_query_single_call("tell me about mars", candidates=[{"tool": "astronomy", "score": 0.5}])
+        assert "ALWAYS use the astronomy tool" in mock_query_llm.call_args[0][0]
+        assert agent_instance.tool_catalog.get_stats()["routing"]["calls"] == 2
+
+    @patch.object(LLMFlowAgent, 'query_llm')
+    def test_routing_prompt_translation_instruction(self, mock_query_llm, agent_instance):
+        """Test that the translation instruction is only sent for non-English queries."""
+        self._use_catalog(agent_instance)
+        mock_query_llm.return_value = '{"entities": {}, "type": "casual_conversation", "tool": null, "function": null, "args": [], "explanation": "Greeting.", "language": "en"}'
+
+        agent_instance.route_query_single_call("hello", candidates=[])
+        assert "normalize and translate location names" not in mock_query_llm.call_args[0][0]
+
+        agent_instance.route_query_single_call("погода в барселоне", candidates=[])
+        assert "normalize and translate location names" in mock_query_llm.call_args[0][0]
+
     # --- Tests for _discover_tools ---
 
     @patch('importlib.import_module')
@@ -515,8 +727,9 @@ class TestLLMFlowAgent:
                 raise ImportError(f"No module named {module_name}")
         mock_import.side_effect = import_side_effect
 
-        # Reset agent's tools before discovery
+        # Reset agent's tools before discovery, importing eagerly
         agent_instance.tools = {}
+        agent_instance.tool_loader.lazy = False
         discovered_tools = agent_instance._discover_tools()
         
         assert "currency" in discovered_tools
@@ -543,6 +756,7 @@ class TestLLMFlowAgent:
         mock_import.side_effect = import_side_effect
 
         agent_instance.tools = {}
+        agent_instance.tool_loader.lazy = False
         discovered_tools = agent_instance._discover_tools()
 
         assert "news" not in discovered_tools # Failed import
@@ -565,6 +779,7 @@ class TestLLMFlowAgent:
         mock_import.side_effect = import_side_effect
 
         agent_instance.tools = {}
+        agent_instance.tool_loader.lazy = False
         discovered_tools = agent_instance._discover_tools()
         
         assert "stock" in discovered_tools
@@ -619,7 +834,7 @@ class TestLLMFlowAgent:
         assert len(descriptions) == 2 
 
     # --- Tests for query_llm ---
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_query_llm_success(self, mock_post, agent_instance):
         """Test query_llm successful response."""
         mock_response = MagicMock()
@@ -632,7 +847,7 @@ class TestLLMFlowAgent:
         mock_post.assert_called_once()
         assert response == "LLM says hi"
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_query_llm_request_exception(self, mock_post, agent_instance):
         """Test query_llm handling requests.exceptions.RequestException."""
         mock_post.side_effect = requests.exceptions.RequestException("Connection error")
@@ -642,7 +857,7 @@ class TestLLMFlowAgent:
         mock_post.assert_called_once()
         assert "Error: Could not query the LLM - Connection error" in response
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_query_llm_http_error(self, mock_post, agent_instance):
         """Test query_llm handling HTTPError."""
         mock_response = MagicMock()
@@ -655,7 +870,7 @@ class TestLLMFlowAgent:
         mock_response.raise_for_status.assert_called_once()
         assert "Error: Could not query the LLM - 404 Client Error" in response
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_query_llm_json_decode_error(self, mock_post, agent_instance):
         """Test query_llm handling JSONDecodeError."""
         mock_response = MagicMock()
@@ -669,6 +884,131 @@ class TestLLMFlowAgent:
         # The JSON error happens internally, the function catches the parent Exception
         assert "Error: Could not query the LLM - Expecting value" in response
 
+    @patch('requests.Session.post')
+    def test_query_llm_cache_skips_model_on_repeat(self, mock_post, agent_instance):
+        """Test that an opted-in call site is answered from the cache on a repeat."""
+        mock_response = MagicMock()
+        mock_response.raise_for_status.return_value = None
+        mock_response.json.return_value = {"response": '{"location": "Paris"}'}
+        mock_post.return_value = mock_response
+
+        first = agent_instance.query_llm("extract", cache=True)
+        second = agent_instance.query_llm("extract", cache=True)
+        uncached = agent_instance.query_llm("extract")
+
+        assert first == second == uncached
+        assert mock_post.call_count == 2
+        assert agent_instance.llm_cache.get_stats()["hits"] == 1
+
+    @patch('requests.Session.post')
+    def test_query_llm_cache_ignores_errors(self, mock_post, agent_instance):
+        """Test that failed LLM calls are not cached."""
+        mock_post.side_effect = requests.exceptions.RequestException("down")
+
+        agent_instance.query_llm("extract", cache=True)
+        agent_instance.query_llm("extract", cache=True)
+
+        assert mock_post.call_count == 2
+
+    def test_warm_up_preloads_stage_models(self, agent_instance):
+        """Test that warm-up loads every stage model and starts the keep-alive thread."""
+        agent_instance.residency.models = ModelTiers("big", {"condition": "small"}).models()
+        load = agent_instance.llm_client.load = MagicMock(return_value={"done": True})
+
+        results = agent_instance.warm_up()
+
+        assert [call_args[0][0] for call_args in load.call_args_list] == ["big", "small"]
+        assert set(results) == {"big", "small"}
+        assert agent_instance.residency.get_stats()["running"]
+        agent_instance.close()
+        assert not agent_instance.residency.get_stats()["running"]
+
+    def test_query_llm_uses_stage_model_and_options(self, agent_instance):
+        """Test that each stage sends its own model and options and is accounted separately."""
+        agent_instance.model_tiers = ModelTiers("big", {"condition": "small"})
+        generate = agent_instance.llm_client.generate = MagicMock(
+            return_value={"response": "True", "prompt_eval_count": 40, "eval_count": 1})
+
+        agent_instance.query_llm("is it raining?", stage="condition")
+        agent_instance.query_llm("hello")
+
+        assert generate.call_args_list[0][0][0] == "small"
+        assert generate.call_args_list[0][1]["options"] == {"num_predict": 4}
+        assert generate.call_args_list[1][0][0] == "big"
+        stats = agent_instance.model_tiers.get_stats()
+        assert stats["condition"]["prompt_eval_tokens"] == 40
+        assert stats["default"]["calls"] == 1
+
+    def test_structured_stage_sends_schema_as_format(self, agent_instance):
+        """Test that structured calls constrain Ollama with their schema and decode the reply directly."""
+        generate = agent_instance.llm_client.generate = MagicMock(
+            return_value={"response": '{"location": "Oslo", "amount": null}'})
+
+        entities = agent_instance.extract_entities_with_llm("weather in oslo")
+
+        assert entities == {"location": "Oslo", "amount": None}
+        assert generate.call_args[1]["format"] == agent_instance.entity_schema
+        stats = agent_instance.structured_output.get_stats()["extraction"]
+        assert stats["calls"] == 1 and stats["parse_failures"] == 0
+
+    def test_structured_output_disabled(self, agent_instance):
+        """Test that without structured output no format is sent and free text is still parsed."""
+        agent_instance.structured_output.enabled = False
+        generate = agent_instance.llm_client.generate = MagicMock(
+            return_value={"response": 'Entities: {"location": "Oslo"}'})
+
+        assert agent_instance.extract_entities_with_llm("weather in oslo") == {"location": "Oslo"}
+        assert "format" not in generate.call_args[1]
+        assert agent_instance.structured_output.get_stats()["extraction"]["recovered"] == 1
+
+    def test_unusable_structured_replies_are_not_replayed(self, agent_instance):
+        """Test that a cached reply the stage cannot parse or validate is evicted, so a repeat asks the model."""
+        generate = agent_instance.llm_client.generate = MagicMock(side_effect=[
+            {"response": "I could not find any entities."},
+            {"response": '{"location": "Oslo", "amount": "ten"}'},
+            {"response": '{"location": "Oslo"}'}
+        ])
+
+        assert agent_instance.extract_entities_with_llm("weather in oslo") == {}
+        assert agent_instance.extract_entities_with_llm("weather in oslo") == {}
+        assert agent_instance.extract_entities_with_llm("weather in oslo") == {"location": "Oslo"}
+        assert agent_instance.extract_entities_with_llm("weather in oslo") == {"location": "Oslo"}
+
+        assert generate.call_count == 3
+        stats = agent_instance.llm_cache.get_stats()
+        assert stats["discarded"] == 2 and stats["hits"] == 1
+
+    def test_unusable_routing_reply_is_not_replayed(self, agent_instance):
+        """Test that a classification reply that fails to parse is asked for again on a repeat."""
+        agent_instance.extract_entities_with_llm = MagicMock(return_value={})
+        generate = agent_instance.llm_client.generate = MagicMock(return_value={"response": "Not sure."})
+
+        for _ in range(2):
+            assert agent_instance.determine_query_type("tell me something")["type"] == "casual_conversation"
+
+        assert generate.call_count == 2
+
+    def test_query_llm_cache_key_includes_schema(self, agent_instance):
+        """Test that the same prompt with and without a schema is cached separately."""
+        generate = agent_instance.llm_client.generate = MagicMock(return_value={"response": "{}"})
+
+        agent_instance.query_llm("extract", cache=True, schema={"type": "object"})
+        agent_instance.query_llm("extract", cache=True)
+
+        assert generate.call_count == 2
+
+    def test_query_llm_cache_is_per_stage_model(self, agent_instance):
+        """Test that a cached response of one model is not served to a stage on another model."""
+        agent_instance.model_tiers = ModelTiers("big", {"extraction": "small"})
+        generate = agent_instance.llm_client.generate = MagicMock(return_value={"response": "{}"})
+
+        agent_instance.query_llm("extract", cache=True, stage="extraction")
+        agent_instance.query_llm("extract", cache=True, stage="classification")
+        agent_instance.query_llm("extract", cache=True, stage="extraction")
+
+        assert generate.call_count == 2
+        assert agent_instance.model_tiers.get_stats()["extraction"]["cache_hits"] == 1
+
     # --- Tests for analyze_tool_query ---
     @patch.object(LLMFlowAgent, 'query_llm')
     @patch.object(LLMFlowAgent, 'extract_entities_with_llm') # Also mock this dependency
@@ -729,6 +1069,18 @@ class TestLLMFlowAgent:
         assert func is None
         assert args == []
 
+    @patch.object(LLMFlowAgent, 'query_llm')
+    def test_analyze_tool_query_schema_violation(self, mock_query_llm, agent_instance):
+        """Test that an analysis with more arguments than the function takes is not used."""
+        self._use_catalog(agent_instance)
+        agent_instance.tools['astronomy'] = {'functions': {'get_planet_info': None}}
+        mock_query_llm.return_value = ('{"tool": "astronomy", "function": "get_planet_info", '
+                                       '"arguments": ["Mars", "moons"], "reasoning": "Planet."}')
+
+        result = agent_instance.analyze_tool_query("mars moons", extracted_entities={},
+                                                   candidates=[{"tool": "astronomy", "score": 0.5}])
+        assert result == (None, None, [])
+
     # --- Tests for execute_tool ---
     def test_execute_tool_success(self, agent_instance):
         """Test successful tool execution."""
@@ -778,13 +1130,13 @@ class TestLLMFlowAgent:
         assert "Error executing get_weather: Tool failed" in result
 
     # --- Tests for handle_casual_conversation ---
-    @patch.object(LLMFlowAgent, 'query_llm')
-    def test_handle_casual_conversation(self, mock_query_llm, agent_instance):
+    def test_handle_casual_conversation(self, agent_instance):
         """Test casual conversation handling calls LLM with correct prompt."""
         query = "Hi there!"
         query_info = {"language": "en"}
         mock_llm_response = "Hello! How can I help you today?"
-        mock_query_llm.return_value = mock_llm_response
+        mock_query_llm = agent_instance.llm_client.generate = MagicMock(
+            return_value={"response": mock_llm_response, "done": True})
         
         # Add some history/context
         agent_instance.memory.add_message("user", query)
@@ -793,7 +1145,7 @@ class TestLLMFlowAgent:
         response = agent_instance.handle_casual_conversation(query, query_info)
         
         mock_query_llm.assert_called_once()
-        prompt_arg = mock_query_llm.call_args[0][0]
+        prompt_arg = mock_query_llm.call_args[0][1]
         # Check that the prompt includes key elements
         assert "You are a helpful and friendly conversational assistant" in prompt_arg
         assert "Recent conversation:" in prompt_arg
@@ -803,6 +1155,92 @@ class TestLLMFlowAgent:
         assert "User's message: " + f'"{query}"' in prompt_arg
         assert response == mock_llm_response
 
+    def test_handle_casual_conversation_streaming(self, agent_instance):
+        """Test casual conversation streams tokens to the callback when one is given."""
+        mock_generate = agent_instance.llm_client.generate = MagicMock()
+        chunks = [
+            {"response": "Hello", "done": False},
+            {"response": "! ", "done": False},
+            {"response": "Nice to meet you.", "done": False},
+            {"response": "", "done": True, "context": [1, 2, 3]}
+        ]
+        mock_stream = agent_instance.llm_client.generate_stream = MagicMock(
+            return_value=(chunk for chunk in chunks))
+        tokens = []
+
+        response = agent_instance.handle_casual_conversation("Hi", {"language": "en"}, on_token=tokens.append)
+
+        mock_generate.assert_not_called()
+        mock_stream.assert_called_once()
+        assert tokens == ["Hello", "! ", "Nice to meet you."]
+        assert response == "Hello! Nice to meet you."
+        assert agent_instance.memory.llm_context == [1, 2, 3]
+
+    def test_casual_conversation_reuses_session_context(self, agent_instance):
+        """Test that follow-up turns send the stored context and only the new messages."""
+        generate = agent_instance.llm_client.generate = MagicMock(side_effect=[
+            {"response": "Hello!", "context": [1, 2, 3], "prompt_eval_count": 300, "eval_count": 3},
+            {"response": "Sure.", "context": [1, 2, 3, 4, 5], "prompt_eval_count": 20, "eval_count": 2}
+        ])
+        memory = agent_instance.memory
+        memory.add_message("user", "Hi")
+        memory.add_message("assistant", agent_instance.handle_casual_conversation("Hi", {"language": "en"}))
+        memory.add_message("user", "weather in Oslo")
+        memory.add_message("assistant", "Oslo: 3°C, snow")
+        memory.add_message("user", "Thanks!")
+
+        agent_instance.handle_casual_conversation("Thanks!", {"language": "en"})
+
+        first_prompt = generate.call_args_list[0][0][1]
+        second_call = generate.call_args_list[1]
+        assert "context" not in generate.call_args_list[0][1]
+        assert "You are a helpful" in first_prompt
+        assert second_call[1]["context"] == [1, 2, 3]
+        turn_prompt = second_call[0][1]
+        assert "You are a helpful" not in turn_prompt
+        assert "user: weather in Oslo\nassistant: Oslo: 3°C, snow" in turn_prompt
+        assert "user: Hi\n" not in turn_prompt
+        assert 'User\'s message: "Thanks!"' in turn_prompt
+        assert memory.llm_stats == {
+            "llm_turns": 2, "context_turns": 1, "prompt_eval_tokens": 320,
+            "context_prompt_eval_tokens": 20, "eval_tokens": 5
+        }
+
+    def test_session_context_dropped_when_too_long(self, agent_instance):
+        """Test that an oversized or failed context falls back to a full prompt."""
+        agent_instance.max_context_tokens = 2
+        agent_instance.memory.llm_context = [1, 2, 3]
+        agent_instance.memory.llm_context_model = agent_instance.model
+        generate = agent_instance.llm_client.generate = MagicMock(
+            side_effect=requests.exceptions.ConnectionError("Connection refused"))
+
+        response = agent_instance.handle_casual_conversation("Hi", {"language": "en"})
+
+        assert "context" not in generate.call_args[1]
+        assert response.startswith("Error: Could not query the LLM")
+        assert agent_instance.memory.llm_context is None
+
+    def test_session_context_disabled(self, agent_instance):
+        """Test that max_context_tokens=None never sends or stores a context."""
+        agent_instance.max_context_tokens = None
+        generate = agent_instance.llm_client.generate = MagicMock(
+            return_value={"response": "Hello!", "context": [1, 2, 3]})
+
+        agent_instance.handle_casual_conversation("Hi", {"language": "en"})
+        agent_instance.handle_casual_conversation("Hi again", {"language": "en"})
+
+        assert all("context" not in call_args[1] for call_args in generate.call_args_list)
+        assert agent_instance.memory.llm_context is None
+
+    def test_query_llm_stream_error(self, agent_instance):
+        """Test query_llm_stream yields an error message when the LLM is unreachable."""
+        agent_instance.llm_client.generate_stream = MagicMock(
+            side_effect=requests.exceptions.ConnectionError("Connection refused"))
+
+        tokens = list(agent_instance.query_llm_stream("Hello"))
+
+        assert tokens == ["Error: Could not query the LLM - Connection refused"]
+
     # --- Tests for process_query ---
     @patch.object(LLMFlowAgent, 'determine_query_type')
     @patch.object(LLMFlowAgent, 'execute_tool')
@@ -835,7 +1273,7 @@ class TestLLMFlowAgent:
         response = agent_instance.process_query(query)
         
         mock_determine_query_type.assert_called_once_with(query)
-        mock_handle_casual.assert_called_once_with(query, query_info)
+        mock_handle_casual.assert_called_once_with(query, query_info, on_token=None)
         assert response == "Hi there!"
         assert agent_instance.memory.messages[-1].content == response
 
@@ -891,6 +1329,112 @@ class TestLLMFlowAgent:
         assert f"I apologize, but I encountered an error while processing your request: {error_message}" in response
         assert agent_instance.memory.messages[-1].content == response
 
+    @patch.object(LLMFlowAgent, 'determine_query_type')
+    @patch.object(LLMFlowAgent, 'execute_tool')
+    def test_process_query_fast_path_skips_llm(self, mock_execute_tool, mock_determine_query_type, agent_instance):
+        """Test that a confident fast-path route executes the tool without LLM routing."""
+        agent_instance.fast_router = MagicMock()
+        agent_instance.fast_router.route.return_value = {
+            "type": "tool_request", "tool": "currency", "function": "convert_currency",
+            "args": [100, "USD", "EUR"], "confidence": 0.97, "router": "fast_path"
+        }
+        mock_execute_tool.return_value = "100 USD = 92 EUR"
+
+        response = agent_instance.process_query("convert 100 USD to EUR")
+
+        mock_determine_query_type.assert_not_called()
+        mock_execute_tool.assert_called_once_with("currency", "convert_currency", [100, "USD", "EUR"])
+        assert response == "100 USD = 92 EUR"
+
+    @patch.object(LLMFlowAgent, 'determine_query_type')
+    @patch.object(LLMFlowAgent, 'handle_casual_conversation')
+    def test_process_query_fast_path_miss_uses_llm(self, mock_handle_casual, mock_determine_query_type, agent_instance):
+        """Test that queries the fast path cannot route go through determine_query_type."""
+        mock_determine_query_type.return_value = {"type": "casual_conversation"}
+        mock_handle_casual.return_value = "Hi!"
+
+        agent_instance.process_query("hello")
+
+        mock_determine_query_type.assert_called_once_with("hello")
+        assert agent_instance.fast_router.get_stats()["attempts"] == 1
+
+    def test_fast_path_disabled(self):
+        """Test that fast_path_threshold=None disables the fast path."""
+        with patch.object(LLMFlowAgent, '_discover_tools', return_value={}), \
+             patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
+            agent = LLMFlowAgent(fast_path_threshold=None)
+        assert agent.fast_router is None
+        agent.close()
+
+# --- Tests for the async API ---
+
+class TestAsyncAgent:
+
+    @patch.object(LLMFlowAgent, 'determine_query_type')
+    @patch.object(LLMFlowAgent, 'execute_tool')
+    def test_aprocess_query_on_caller_loop(self, mock_execute_tool, mock_determine_query_type, agent_instance):
+        """Test aprocess_query can be awaited from an external event loop."""
+        mock_determine_query_type.return_value = {
+            "type": "tool_request", "tool": "weather", "function": "get_weather", "args": ["Oslo"]
+        }
+        mock_execute_tool.return_value = "Snowing in Oslo."
+
+        response = asyncio.run(agent_instance.aprocess_query("weather Oslo"))
+
+        mock_execute_tool.assert_called_once_with("weather", "get_weather", ["Oslo"])
+        assert response == "Snowing in Oslo."
+        assert agent_instance.memory.messages[-1].content == response
+
+    @patch.object(LLMFlowAgent, 'determine_query_type')
+    @patch.object(LLMFlowAgent, 'handle_casual_conversation')
+    def test_process_query_reuses_event_loop(self, mock_handle_casual, mock_determine_query_type, agent_instance):
+        """Test that repeated sync calls run on one long-lived event loop."""
+        mock_determine_query_type.return_value = {"type": "casual_conversation"}
+        loops = []
+        def record_loop(*args, **kwargs):
+            loops.append(agent_instance._loop)
+            return "ok"
+        mock_handle_casual.side_effect = record_loop
+
+        agent_instance.process_query("hi")
+        agent_instance.process_query("hi again")
+
+        assert len(loops) == 2
+        assert loops[0] is loops[1]
+        assert loops[0].is_running()
+
+    @patch.object(LLMFlowAgent, 'determine_query_type')
+    @patch.object(LLMFlowAgent, 'handle_casual_conversation')
+    def test_process_query_concurrent_callers(self, mock_handle_casual, mock_determine_query_type, agent_instance):
+        """Test that queries from several threads are served concurrently."""
+        mock_determine_query_type.return_value = {"type": "casual_conversation"}
+        def slow_reply(*args, **kwargs):
+            time.sleep(0.2)
+            return "done"
+        mock_handle_casual.side_effect = slow_reply
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            results = list(pool.map(agent_instance.process_query, ["q"] * 5))
+        elapsed = time.perf_counter() - start
+
+        assert results == ["done"] * 5
+        assert elapsed < 0.2 * 5
+
+    def test_run_coroutine_rejects_loop_thread(self, agent_instance):
+        """Test that blocking on the agent loop from inside it raises instead of deadlocking."""
+        async def nested():
+            return agent_instance.run_coroutine(asyncio.sleep(0))
+
+        with pytest.raises(RuntimeError):
+            agent_instance.run_coroutine(nested())
+
+    @patch.object(LLMFlowAgent, 'query_llm', return_value="pong")
+    def test_aquery_llm(self, mock_query_llm, agent_instance):
+        """Test aquery_llm delegates to query_llm off the event loop."""
+        assert asyncio.run(agent_instance.aquery_llm("ping")) == "pong"
+        mock_query_llm.assert_called_once_with("ping")
+
 # --- Tests for main function ---
 # FIX: Use context managers for patching
 
@@ -930,11 +1474,32 @@ def test_main_loop_query_response():
         assert mock_input.call_count == 2
         # FIX: process_query called only once
         assert mock_agent_instance.process_query.call_count == 1 
-        mock_agent_instance.process_query.assert_called_once_with("hello")
+        mock_agent_instance.process_query.assert_called_once_with("hello", on_token=ANY)
         # FIX: assert_any_call("exit") removed
         mock_print.assert_any_call("\nResponse:")
         mock_print.assert_any_call("Hi there!")
 
+def test_main_loop_streamed_response():
+    """Test the main loop prints streamed tokens as they arrive and not the response again."""
+    def fake_process_query(query, on_token=None):
+        for token in ["Hi ", "there!"]:
+            on_token(token)
+        return "Hi there!"
+
+    with patch('builtins.input', side_effect=["hello", "exit"]), \
+         patch('builtins.print') as mock_print, \
+         patch('main.LLMFlowAgent') as MockAgent:
+
+        MockAgent.return_value.process_query.side_effect = fake_process_query
+
+        from main import main
+        main()
+
+        mock_print.assert_any_call("\nResponse:")
+        mock_print.assert_any_call("Hi ", end="", flush=True)
+        mock_print.assert_any_call("there!", end="", flush=True)
+        assert call("Hi there!") not in mock_print.call_args_list
+
 def test_main_loop_unicode_error():
     """Test the main loop handles UnicodeDecodeError during input."""
     with patch('builtins.input', side_effect=[UnicodeDecodeError("codec", b'\x80abc', 1, 2, "reason"), "exit"]) as mock_input, \
@@ -971,7 +1536,7 @@ def test_main_loop_general_exception():
         assert mock_input.call_count == 2
         # FIX: process_query called only once
         assert mock_agent_instance.process_query.call_count == 1 
-        mock_agent_instance.process_query.assert_called_once_with("a query")
+        mock_agent_instance.process_query.assert_called_once_with("a query", on_token=ANY)
         # FIX: assert_any_call("exit") removed
         mock_print.assert_any_call(f"\nError occurred: {error_message}")
 
@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+from benchmarks.stub_ollama import StubOllamaServer
+from model_residency import ModelResidencyManager, parse_expires_at, parse_keep_alive
+from ollama_client import OllamaClient
+
+
+@pytest.fixture
+def stub_server():
+    """Run a stub Ollama server whose models take 50ms to load."""
+    with StubOllamaServer(load_latency=0.05) as stub:
+        yield stub
+
+
+@pytest.fixture
+def client(stub_server):
+    client = OllamaClient(stub_server.url, keep_alive="10m")
+    yield client
+    client.close()
+
+
+class TestParsing:
+
+    def test_parse_keep_alive(self):
+        """Test Ollama duration formats."""
+        assert parse_keep_alive("10m") == 600
+        assert parse_keep_alive("1h30m") == 5400
+        assert parse_keep_alive("250ms") == 0.25
+        assert parse_keep_alive(30) == 30
+        assert parse_keep_alive("45") == 45
+        assert parse_keep_alive(-1) is None
+        assert parse_keep_alive("-1m") is None
+        assert parse_keep_alive(None) == 300
+        with pytest.raises(ValueError):
+            parse_keep_alive("ten minutes")
+
+    def test_parse_expires_at(self):
+        """Test RFC 3339 timestamps with nanoseconds and offsets."""
+        assert parse_expires_at("1970-01-01T00:00:10.123456789Z") == pytest.approx(10.123456)
+        assert parse_expires_at("1970-01-01T01:00:00+01:00") == 0
+        assert parse_expires_at("soon") is None
+
+
+class TestModelResidencyManager:
+
+    def test_warm_up_loads_models(self, stub_server, client):
+        """Test that warm-up loads each model once without generating."""
+        manager = ModelResidencyManager(client, ["big", "small", "big"])
+        results = manager.warm_up()
+        assert set(results) == {"big", "small"}
+        assert all(latency >= 0.05 for latency in results.values())
+        assert stub_server.loads == 2
+        assert all(request["payload"]["prompt"] == "" for request in stub_server.requests)
+        assert all(request["payload"]["keep_alive"] == "10m" for request in stub_server.requests)
+        assert manager.get_stats()["warmups"] == 2
+
+    def test_first_query_after_warm_up_is_warm(self, stub_server, client):
+        """Test that a warmed model answers without paying the load."""
+        ModelResidencyManager(client, ["big"]).warm_up()
+        start = time.perf_counter()
+        client.generate("big", "hello")
+        assert time.perf_counter() - start < 0.05
+        assert stub_server.loads == 1
+
+    def test_warm_up_error(self, client):
+        """Test that a failed load is reported instead of raised."""
+        client.base_url = "http://127.0.0.1:1"
+        results = ModelResidencyManager(client, ["big"]).warm_up()
+        assert results["big"].startswith("Error:")
+
+    def test_refresh_reloads_evicted_active_model(self, stub_server, client):
+        """Test that an active model that was unloaded is reloaded in the background check."""
+        manager = ModelResidencyManager(client, ["big", "small"])
+        client.generate("big", "hello")
+        stub_server.unload("big")
+        assert manager.refresh() == ["big"]
+        assert stub_server.loads == 2
+        assert manager.get_stats()["reloads"] == 1
+        assert "big" in manager.get_stats()["resident"]
+
+    def test_refresh_extends_expiring_model(self, stub_server, client):
+        """Test that a model close to expiry gets its keep-alive reissued, and idle ones do not."""
+        client.keep_alive = "1s"
+        client.generate("big", "hello")
+        client.generate("idle", "hello")
+        client.last_used["idle"] -= 3600
+        manager = ModelResidencyManager(client, ["big"], keep_alive="10m", refresh_interval=5)
+        assert manager.refresh() == ["big"]
+        assert manager.get_stats()["refreshes"] == 1
+        assert manager.refresh() == []
+
+    def test_preload_is_not_a_use(self, client):
+        """Test that keep-alive loads do not keep a model active on their own."""
+        ModelResidencyManager(client, ["big"]).preload("big")
+        assert client.get_last_used() == {}
+
+    def test_background_thread(self, stub_server, client):
+        """Test that the background thread keeps an evicted active model loaded."""
+        manager = ModelResidencyManager(client, ["big"], refresh_interval=0.02)
+        manager.warm_up()
+        manager.start()
+        stub_server.unload("big")
+        deadline = time.time() + 2
+        while manager.get_stats()["reloads"] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        manager.stop()
+        assert manager.get_stats()["reloads"] >= 1
+        assert not manager.get_stats()["running"]
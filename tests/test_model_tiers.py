@@ -0,0 +1,121 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.stub_ollama import StubOllamaServer
+from main import LLMFlowAgent, format_llm_usage
+from model_tiers import ModelTiers, DEFAULT_MODEL, LLMUsage, collect_usage
+
+
+class TestModelTiers:
+
+    def test_defaults(self):
+        """Test that every stage uses the default model with its own output cap."""
+        tiers = ModelTiers()
+        assert tiers.get("condition").model == DEFAULT_MODEL
+        assert tiers.get("condition").options == {"num_predict": 4}
+        assert tiers.get("casual").options == {}
+
+    def test_overrides(self):
+        """Test model-name and dict overrides, with options merged over the defaults."""
+        tiers = ModelTiers("big", {
+            "condition": "small",
+            "extraction": {"model": "small", "options": {"temperature": 0}},
+            "formatting": {"options": {"num_predict": 300}}
+        })
+        assert tiers.get("condition").model == "small"
+        assert tiers.get("extraction").options == {"num_predict": 128, "temperature": 0}
+        assert tiers.get("formatting").model == "big"
+        assert tiers.get("formatting").options == {"num_predict": 300}
+        assert tiers.get("classification").model == "big"
+
+    def test_overrides_do_not_leak_between_instances(self):
+        """Test that option overrides do not modify the module defaults."""
+        ModelTiers(overrides={"chain": {"options": {"num_predict": 1}}})
+        assert ModelTiers().get("chain").options == {"num_predict": 512}
+
+    def test_unknown_stage(self):
+        """Test that unknown stages are rejected in overrides and use the default config on lookup."""
+        with pytest.raises(ValueError):
+            ModelTiers(overrides={"summarize": "small"})
+        assert ModelTiers("big").get("summarize").model == "big"
+
+    def test_stats_per_stage(self):
+        """Test that calls, cache hits, tokens and latency are accumulated per stage."""
+        tiers = ModelTiers("big", {"condition": "small"})
+        tiers.record("condition", 0.2, {"prompt_eval_count": 50, "eval_count": 1})
+        tiers.record("condition", 0.4, {"prompt_eval_count": 70, "eval_count": 2})
+        tiers.record("condition", cached=True)
+        tiers.record("chain", 1.0, error=True)
+        stats = tiers.get_stats()
+        assert stats["condition"]["model"] == "small"
+        assert stats["condition"]["calls"] == 3
+        assert stats["condition"]["cache_hits"] == 1
+        assert stats["condition"]["prompt_eval_tokens"] == 120
+        assert stats["condition"]["eval_tokens"] == 3
+        assert stats["condition"]["avg_latency"] == pytest.approx(0.3)
+        assert stats["chain"]["errors"] == 1
+
+
+class TestLLMUsage:
+
+    def test_calls_accounted_per_stage_in_seconds(self):
+        """Test that Ollama's counts and nanosecond durations are summed per stage."""
+        usage = LLMUsage()
+        usage.add("extraction", 0.3, {"prompt_eval_count": 200, "eval_count": 10, "load_duration": 1_000_000_000,
+                                      "prompt_eval_duration": 150_000_000, "eval_duration": 100_000_000})
+        usage.add("extraction", cached=True)
+        usage.add("casual", 0.9, {"prompt_eval_count": 20, "eval_count": 80, "eval_duration": 800_000_000})
+        stages = usage.as_dict()
+        assert stages["extraction"]["calls"] == 2 and stages["extraction"]["cache_hits"] == 1
+        assert stages["extraction"]["load_seconds"] == pytest.approx(1.0)
+        assert stages["extraction"]["prompt_eval_seconds"] == pytest.approx(0.15)
+        assert usage.totals()["eval_tokens"] == 90
+        assert usage.summary() == {"prompt_eval_tokens": 220, "eval_tokens": 90, "prompt_eval_seconds": 0.15,
+                                   "eval_seconds": 0.9, "load_seconds": 1.0}
+
+    def test_nested_collectors_and_merge(self):
+        """Test that every enclosing collector receives a call and that usages merge."""
+        tiers = ModelTiers()
+        with collect_usage() as session:
+            with collect_usage() as query:
+                tiers.record("chain", 0.1, {"eval_count": 5, "eval_duration": 50_000_000})
+            tiers.record("formatting", 0.1, {"eval_count": 7})
+        tiers.record("formatting", 0.1, {"eval_count": 100})
+        assert query.totals()["eval_tokens"] == 5
+        assert session.totals()["eval_tokens"] == 12
+        assert tiers.get_stats()["chain"]["eval_seconds"] == pytest.approx(0.05)
+
+        query.queries = 1
+        session.merge(query)
+        assert session.queries == 1
+        assert session.as_dict()["chain"]["eval_tokens"] == 10
+
+
+class TestAgentUsage:
+
+    def test_usage_per_query_session_and_query_type(self):
+        """Test that a query's Ollama usage reaches the session, the agent and its query type."""
+        route = {"type": "tool_request", "tool": "weather", "function": "get_weather", "args": ["Oslo"],
+                 "entities": {}, "explanation": "", "language": "en", "translation": None}
+        tools = {"weather": {"module": None, "functions": {"get_weather": lambda location: f"Sunny in {location}"}}}
+        with StubOllamaServer(responder=lambda payload: json.dumps(route)) as stub:
+            with patch.object(LLMFlowAgent, '_discover_tools', return_value=tools):
+                agent = LLMFlowAgent(ollama_url=stub.url, fast_path_threshold=None, semantic_top_k=None)
+            try:
+                assert agent.process_query("weather please") == "Sunny in Oslo"
+                agent.process_query("weather please")
+            finally:
+                agent.close()
+
+        last = agent.memory.last_query_usage
+        assert last.query_type == "tool_request"
+        assert last.totals()["calls"] > 0 and last.totals()["eval_tokens"] > 0
+        session = agent.memory.llm_usage
+        assert session.queries == 2 and session.totals()["prompt_eval_tokens"] > 0
+        usage = agent.get_llm_usage()
+        assert usage["totals"] == session.totals()
+        assert usage["query_types"]["tool_request"]["queries"] == 2
+        table = format_llm_usage(usage)
+        assert "tool_request" in table and "prompt" in table
@@ -0,0 +1,98 @@
+import pytest
+import requests
+
+from benchmarks.stub_ollama import StubOllamaServer
+from ollama_client import OllamaClient
+
+
+@pytest.fixture
+def stub_server():
+    """Run a local stub Ollama server for the duration of a test."""
+    with StubOllamaServer(responder=lambda payload: f"echo: {payload['prompt']}") as stub:
+        yield stub
+
+
+class TestOllamaClient:
+
+    def test_generate_returns_response(self, stub_server):
+        """Test that generate returns the decoded Ollama body."""
+        client = OllamaClient(stub_server.url)
+        data = client.generate("gemma3:12b", "hello")
+        assert data["response"] == "echo: hello"
+        assert stub_server.requests[0]["payload"]["model"] == "gemma3:12b"
+        assert stub_server.requests[0]["payload"]["stream"] is False
+        client.close()
+
+    def test_generate_passes_options(self, stub_server):
+        """Test that generation options and extra fields are forwarded."""
+        client = OllamaClient(stub_server.url)
+        client.generate("m", "hi", options={"num_predict": 5}, keep_alive="5m")
+        payload = stub_server.requests[0]["payload"]
+        assert payload["options"] == {"num_predict": 5}
+        assert payload["keep_alive"] == "5m"
+        client.close()
+
+    def test_connection_reused_across_calls(self, stub_server):
+        """Test that sequential calls share one pooled keep-alive connection."""
+        client = OllamaClient(stub_server.url)
+        for _ in range(5):
+            client.generate("m", "ping")
+        assert stub_server.connections == 1
+        assert client.get_stats()["requests"] == 5
+        client.close()
+
+    def test_timeout_tuple(self):
+        """Test that connect and read timeouts are configured separately."""
+        client = OllamaClient(connect_timeout=1.5, read_timeout=30)
+        assert client.timeout == (1.5, 30)
+        client.close()
+
+    def test_pool_size_configures_adapter(self):
+        """Test that pool_size controls the connection pool of the session."""
+        client = OllamaClient(pool_size=3)
+        adapter = client.session.get_adapter("http://localhost:11434")
+        assert adapter._pool_maxsize == 3
+        client.close()
+
+    def test_error_is_counted_and_raised(self):
+        """Test that connection errors propagate and are counted."""
+        client = OllamaClient("http://127.0.0.1:1", connect_timeout=0.5)
+        with pytest.raises(requests.exceptions.RequestException):
+            client.generate("m", "ping")
+        stats = client.get_stats()
+        assert stats["errors"] == 1
+        assert stats["requests"] == 1
+        client.close()
+
+    def test_generate_stream_yields_chunks(self, stub_server):
+        """Test that streaming yields NDJSON chunks ending with a done chunk."""
+        client = OllamaClient(stub_server.url)
+        chunks = list(client.generate_stream("m", "hello world"))
+        assert "".join(chunk["response"] for chunk in chunks) == "echo: hello world"
+        assert chunks[-1]["done"] is True
+        assert stub_server.requests[0]["payload"]["stream"] is True
+        client.close()
+
+    def test_generate_stream_records_ttft(self):
+        """Test that time-to-first-token is recorded next to total latency."""
+        with StubOllamaServer(responder=lambda payload: "one two three", latency=0.05,
+                              token_latency=0.02) as stub:
+            client = OllamaClient(stub.url)
+            list(client.generate_stream("m", "hi"))
+            stats = client.get_stats()
+            client.close()
+        assert stats["stream_requests"] == 1
+        assert 0.05 <= stats["avg_ttft"] < stats["avg_latency"]
+
+    def test_token_counts_recorded(self, stub_server):
+        """Test that prompt and response token counts are summed over generate and stream calls."""
+        client = OllamaClient(stub_server.url)
+        first = client.generate("m", "hello world")
+        chunks = list(client.generate_stream("m", "again", context=first["context"]))
+        stats = client.get_stats()
+        client.close()
+        assert first["prompt_eval_count"] == 2
+        # The second call's context is already in the stub's KV cache
+        assert chunks[-1]["prompt_eval_count"] == 1
+        assert stats["prompt_eval_tokens"] == 3
+        assert stats["eval_tokens"] == first["eval_count"] + chunks[-1]["eval_count"]
@@ -0,0 +1,169 @@
+import threading
+import time
+import types
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from deadline import query_deadline, remaining
+from main import LLMFlowAgent
+from prefetch import ToolPrefetcher, call_key, predict_from_entities
+
+
+def slow_tool(result, delay=0.0):
+    """Build a tool function returning result after delay seconds and counting its calls."""
+    def func(*args):
+        time.sleep(delay)
+        return f"{result} {' '.join(str(arg) for arg in args)}"
+    return MagicMock(side_effect=func)
+
+
+@pytest.fixture
+def tools():
+    weather_module = types.ModuleType("weather_tool")
+    weather_module.CITY_TIMEZONES = {"oslo": "Europe/Oslo", "madrid": "Europe/Madrid"}
+    return {
+        "weather": {"module": weather_module, "functions": {"get_weather": slow_tool("Sunny in", 0.1)}},
+        "currency": {"module": None, "functions": {"convert_currency": slow_tool("Converted")}},
+        "news": {"module": None, "functions": {"search_news": slow_tool("Headlines")}}
+    }
+
+
+class TestPredictFromEntities:
+
+    def test_currency_pair(self):
+        """Test that a currency pair predicts a conversion, defaulting the amount to 1."""
+        assert predict_from_entities({"from_currency": "usd", "to_currency": "EUR", "amount": None}) == [
+            {"tool": "currency", "function": "convert_currency", "args": [1, "USD", "EUR"]}
+        ]
+
+    def test_location_needs_shortlist(self):
+        """Test that a location predicts calls only for shortlisted location tools."""
+        entities = {"location": " Oslo "}
+        assert predict_from_entities(entities) == []
+        candidates = [{"tool": "weather"}, {"tool": "news"}, {"tool": "time"}, {"tool": "air_quality"}]
+        assert predict_from_entities(entities, candidates) == [
+            {"tool": "weather", "function": "get_weather", "args": ["Oslo"]},
+            {"tool": "air_quality", "function": "get_air_quality", "args": ["Oslo"]}
+        ]
+
+
+class TestToolPrefetcher:
+
+    def test_hit_is_single_use(self, tools):
+        """Test that a prefetched call is served once, even while it is still running."""
+        prefetcher = ToolPrefetcher(tools)
+        assert prefetcher.prefetch([{"tool": "weather", "function": "get_weather", "args": ["Oslo"]}]) == 1
+
+        future = prefetcher.take("weather", "get_weather", ["oslo"])
+        assert future.result() == "Sunny in Oslo"
+        assert prefetcher.take("weather", "get_weather", ["Oslo"]) is None
+        assert tools["weather"]["functions"]["get_weather"].call_count == 1
+
+        stats = prefetcher.get_stats()
+        assert (stats["launched"], stats["hits"], stats["hits_in_flight"], stats["misses"]) == (1, 1, 1, 1)
+        assert stats["hit_rate"] == 1.0
+        assert stats["coverage"] == 0.5
+        prefetcher.close()
+
+    def test_only_allowed_functions(self, tools):
+        """Test that functions outside the allow-list, unknown tools and duplicates are not started."""
+        prefetcher = ToolPrefetcher(tools)
+        started = prefetcher.prefetch([
+            {"tool": "news", "function": "search_news", "args": ["Oslo"]},
+            {"tool": "stock", "function": "get_stock_price", "args": ["AAPL"]},
+            {"tool": "currency", "function": "convert_currency", "args": [1, "USD", "EUR"]},
+            {"tool": "currency", "function": "convert_currency", "args": [1, "usd", "eur"]}
+        ])
+        assert started == 1
+        assert prefetcher.get_stats()["duplicates"] == 1
+        assert prefetcher.take("news", "search_news", ["Oslo"]) is None
+        assert prefetcher.get_stats()["misses"] == 0
+        prefetcher.close()
+
+    def test_unused_prefetches_are_wasted(self, tools):
+        """Test that expired and evicted prefetches count as wasted."""
+        prefetcher = ToolPrefetcher(tools, ttl=0.05, max_entries=1)
+        prefetcher.prefetch([
+            {"tool": "currency", "function": "convert_currency", "args": [1, "USD", "EUR"]},
+            {"tool": "currency", "function": "convert_currency", "args": [1, "USD", "GBP"]}
+        ])
+        assert prefetcher.get_stats()["wasted"] == 1
+        time.sleep(0.1)
+        stats = prefetcher.get_stats()
+        assert (stats["wasted"], stats["pending"], stats["hit_rate"]) == (2, 0, 0.0)
+        prefetcher.close()
+
+    def test_prefetch_runs_in_callers_context(self, tools):
+        """Test that a prefetched call sees the deadline of the query that started it."""
+        seen = []
+        tools["currency"]["functions"]["convert_currency"].side_effect = lambda *args: seen.append(remaining())
+        prefetcher = ToolPrefetcher(tools)
+        with query_deadline(5.0):
+            prefetcher.prefetch([{"tool": "currency", "function": "convert_currency", "args": [1, "USD", "EUR"]}])
+        prefetcher.take("currency", "convert_currency", [1, "USD", "EUR"]).result(timeout=1)
+        assert seen[0] is not None and 0 < seen[0] <= 5.0
+        prefetcher.close()
+
+    def test_call_key_normalizes_arguments(self):
+        """Test that argument case and padding do not affect the key."""
+        assert call_key("weather", "get_weather", [" Oslo"]) == call_key("weather", "get_weather", ["OSLO"])
+        assert call_key("currency", "convert_currency", [1]) != call_key("currency", "convert_currency", [2])
+
+
+@pytest.fixture
+def agent(tools):
+    with patch.object(LLMFlowAgent, '_discover_tools', return_value=tools), \
+         patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
+        agent = LLMFlowAgent(cache_size=0, prefetch_tools=True)
+    yield agent
+    agent.close()
+
+
+class TestPrefetchingAgent:
+
+    def test_tool_prefetched_during_routing(self, agent, tools):
+        """Test that the weather lookup runs while the LLM routes a query the fast path declined."""
+        routed = threading.Event()
+
+        def determine_query_type(query):
+            time.sleep(0.1)
+            routed.set()
+            return {"type": "tool_request", "tool": "weather", "function": "get_weather", "args": ["Oslo"]}
+
+        agent.determine_query_type = MagicMock(side_effect=determine_query_type)
+        start = time.perf_counter()
+        response = agent.process_query("weather in Oslo and then the news")
+        elapsed = time.perf_counter() - start
+
+        assert response == "Sunny in Oslo"
+        assert routed.is_set()
+        assert tools["weather"]["functions"]["get_weather"].call_count == 1
+        # Routing and the 0.1s tool call overlapped
+        assert elapsed < 0.19
+        assert agent.prefetcher.get_stats()["hits"] == 1
+
+    def test_prefetch_from_extracted_entities(self, agent, tools):
+        """Test that two-step routing prefetches from the LLM-extracted entities."""
+        agent.extract_entities_with_llm = MagicMock(return_value={"from_currency": "EUR", "to_currency": "NOK",
+                                                                  "amount": 20})
+        agent.query_llm = MagicMock(return_value='{"type": "tool_request", "tool": "currency", '
+                                                 '"function": "convert_currency", "args": [20, "EUR", "NOK"]}')
+        agent.routing_mode = "two_step"
+        agent.determine_query_type("twenty euros in crowns")
+
+        assert agent.execute_tool("currency", "convert_currency", [20, "EUR", "NOK"]) == "Converted 20 EUR NOK"
+        assert tools["currency"]["functions"]["convert_currency"].call_count == 1
+        assert agent.prefetcher.get_stats()["hits"] == 1
+
+    def test_disabled_by_default(self, tools):
+        """Test that tools are not prefetched unless enabled."""
+        with patch.object(LLMFlowAgent, '_discover_tools', return_value=tools), \
+             patch.object(LLMFlowAgent, '_create_tool_descriptions', return_value={}):
+            agent = LLMFlowAgent(cache_size=0)
+        agent.determine_query_type = MagicMock(return_value={"type": "casual_conversation"})
+        agent.handle_casual_conversation = MagicMock(return_value="Hi")
+        agent.process_query("weather in Oslo and then the news")
+        assert tools["weather"]["functions"]["get_weather"].call_count == 0
+        assert agent.prefetcher.get_stats()["launched"] == 0
+        agent.close()
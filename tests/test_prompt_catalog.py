@@ -0,0 +1,86 @@
+import pytest
+
+from prompt_catalog import ToolCatalog, estimate_tokens
+
+TOOL_DESCRIPTIONS = {
+    "weather": {
+        "description": "Retrieves current weather data",
+        "functions": {
+            "get_weather": {
+                "description": "Get current weather for a location",
+                "arguments": ["location"],
+                "example": "get_weather('London')"
+            }
+        }
+    },
+    "currency": {
+        "description": "Convert amounts between currencies",
+        "functions": {
+            "convert_currency": {
+                "description": "Convert an amount from one currency to another",
+                "arguments": ["amount", "from_currency", "to_currency"],
+                "example": "convert_currency(100, 'USD', 'EUR')"
+            }
+        }
+    },
+    "news": {
+        "description": "Retrieves the latest news",
+        "functions": {
+            "search_news": {"description": "Search news", "arguments": ["query"], "example": "search_news('AI')"}
+        }
+    }
+}
+
+
+@pytest.fixture
+def catalog():
+    return ToolCatalog(TOOL_DESCRIPTIONS, top_k=2)
+
+
+class TestToolCatalog:
+
+    def test_entries_precomputed(self, catalog):
+        """Test that every tool is serialized once at construction."""
+        assert catalog.entries["weather"] == (
+            "weather: Retrieves current weather data\n"
+            "  get_weather(location) - Get current weather for a location; e.g. get_weather('London')"
+        )
+        assert "e.g." not in catalog.signature_entries["currency"]
+
+    def test_select_follows_candidates(self, catalog):
+        """Test that tools are selected in candidate order and capped at k."""
+        candidates = [{"tool": "news"}, {"tool": "unknown"}, {"tool": "weather"}, {"tool": "currency"}]
+        assert catalog.select(candidates, 2) == ["news", "weather"]
+        assert catalog.select(candidates) == ["news", "weather", "currency"]
+
+    def test_select_without_candidates_uses_all_tools(self, catalog):
+        """Test that an empty shortlist falls back to the full catalog."""
+        assert catalog.select([], 2) == ["weather", "currency", "news"]
+
+    def test_render_subset(self, catalog):
+        """Test that only the selected tools are rendered."""
+        text = catalog.render(["currency"])
+        assert "convert_currency(amount, from_currency, to_currency)" in text
+        assert "weather" not in text
+
+    def test_compact_is_smaller_than_json(self, catalog):
+        """Test that the compact serialization of all tools beats the indented JSON dump."""
+        assert estimate_tokens(catalog.render(list(TOOL_DESCRIPTIONS))) < estimate_tokens(catalog.full_catalog_json())
+
+    def test_stats_per_stage(self, catalog):
+        """Test that token savings are accumulated per prompt stage."""
+        catalog.record("analysis", "x" * 400, "x" * 100)
+        catalog.record("analysis", "x" * 400, "x" * 100)
+        catalog.record("chain", "x" * 40, "x" * 40)
+        stats = catalog.get_stats()
+        assert stats["analysis"] == {
+            "calls": 2, "full_tokens": 200, "prompt_tokens": 50,
+            "saved_tokens": 150, "saved_per_call": 75.0, "saved_ratio": 0.75
+        }
+        assert stats["chain"]["saved_tokens"] == 0
+
+    def test_estimate_tokens(self):
+        """Test the characters-per-token estimate."""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("abcd") == 1
+        assert estimate_tokens("abcde") == 2
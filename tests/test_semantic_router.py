@@ -0,0 +1,111 @@
+import types
+
+import numpy as np
+import pytest
+
+from semantic_router import SemanticToolRouter
+
+TOOL_DESCRIPTIONS = {
+    "weather": {
+        "description": "Get current weather conditions and temperature for a location",
+        "functions": {
+            "get_weather": {"description": "Get the weather forecast, temperature and rain for a city"}
+        }
+    },
+    "currency": {
+        "description": "Convert amounts between different currencies using exchange rates",
+        "functions": {
+            "convert_currency": {"description": "Convert an amount of money from one currency to another"}
+        }
+    },
+    "news": {
+        "description": "Retrieve the latest news articles and headlines",
+        "functions": {
+            "search_news": {"description": "Search news articles on a topic"},
+            "get_headlines": {"description": "Get the latest headlines by category"}
+        }
+    }
+}
+
+
+def make_tools():
+    """Tools whose stand-in modules carry TOOL_EXAMPLES."""
+    module = types.ModuleType("news_tool")
+    module.NewsTool = type("NewsTool", (), {
+        "__module__": "news_tool",
+        "TOOL_DESCRIPTION": "News from RSS feeds",
+        "TOOL_EXAMPLES": [
+            {"query": "Any news about SpaceX?", "tool_call": "news_tool.search_news('SpaceX')"},
+            {"query": "Show me technology headlines", "tool_call": "news_tool.get_headlines('technology')"}
+        ]
+    })
+    return {"news": {"module": module, "functions": {}}}
+
+
+@pytest.fixture
+def router():
+    return SemanticToolRouter(TOOL_DESCRIPTIONS, make_tools())
+
+
+class TestSemanticToolRouter:
+
+    def test_documents_include_examples_and_metadata(self, router):
+        """Test that descriptions, class metadata and TOOL_EXAMPLES are all indexed."""
+        texts = [text for _, _, text in router.documents]
+        assert "Any news about SpaceX?" in texts
+        assert any("News from RSS feeds" in text for text in texts)
+        assert router.matrix.shape == (len(router.documents), router.dim)
+        assert np.allclose(np.linalg.norm(router.matrix, axis=1), 1.0)
+
+    def test_example_maps_to_function(self, router):
+        """Test that examples are attributed to the function in their tool_call."""
+        assert ("news", "search_news", "Any news about SpaceX?") in router.documents
+
+    def test_rank_orders_tools(self, router):
+        """Test that the matching tool ranks first with its best function."""
+        ranking = router.rank("what's the temperature in Madrid")
+        assert ranking[0]["tool"] == "weather"
+        assert ranking[0]["function"] == "get_weather"
+        assert [entry["score"] for entry in ranking] == sorted((entry["score"] for entry in ranking), reverse=True)
+        assert {entry["tool"] for entry in ranking} == {"weather", "currency", "news"}
+
+    def test_function_level_ranking(self, router):
+        """Test that the best function within a tool is reported."""
+        assert router.rank("latest technology headlines")[0]["function"] == "get_headlines"
+
+    def test_shortlist_picks_dominant_tool(self, router):
+        """Test that a clear winner is returned alone."""
+        shortlist = router.shortlist("convert 100 dollars into another currency")
+        assert [entry["tool"] for entry in shortlist] == ["currency"]
+
+    def test_shortlist_caps_and_filters(self):
+        """Test that the shortlist respects top_k and min_score."""
+        router = SemanticToolRouter(TOOL_DESCRIPTIONS, top_k=2, min_score=0.0, pick_margin=1.0)
+        assert len(router.shortlist("news about the weather")) == 2
+        router = SemanticToolRouter(TOOL_DESCRIPTIONS, min_score=0.99)
+        assert router.shortlist("news about the weather") == []
+
+    def test_featurization_is_deterministic(self, router):
+        """Test that hashing does not depend on the per-process string hash seed."""
+        other = SemanticToolRouter(TOOL_DESCRIPTIONS, make_tools())
+        assert np.array_equal(router.matrix, other.matrix)
+
+    def test_empty_index(self):
+        """Test that a router without tools returns no candidates."""
+        router = SemanticToolRouter({})
+        assert router.rank("weather in Paris") == []
+        assert router.shortlist("weather in Paris") == []
+
+    def test_stats(self, router):
+        """Test that queries and scoring latency are counted."""
+        router.shortlist("weather in Paris")
+        router.rank("news")
+        stats = router.get_stats()
+        assert stats["queries"] == 2
+        assert stats["documents"] == len(router.documents)
+        assert stats["avg_latency_us"] > 0
+
+    def test_shortlist_without_pick(self, router):
+        """Test that multi-tool callers can ask for a ranked shortlist instead of a single pick."""
+        query = "convert 100 dollars into another currency"
+        assert len(router.shortlist(query, pick=False, top_k=3)) > 1
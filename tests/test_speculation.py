@@ -0,0 +1,179 @@
+import asyncio
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from benchmarks.stub_ollama import StubOllamaServer
+from main import LLMFlowAgent
+from speculation import SpeculationHandle, SpeculativeExecutor, TokenRelay
+
+ROUTE = {"entities": {}, "tool": None, "function": None, "args": [], "explanation": "",
+         "language": "en", "translation": None}
+
+
+class FakeClient:
+    def __init__(self, available=None):
+        self.available = available
+
+    def available_slots(self):
+        return self.available
+
+
+class TestTokenRelay:
+
+    def test_buffers_until_adopted(self):
+        """Test that tokens are replayed on adoption and forwarded afterwards."""
+        relay = TokenRelay()
+        relay("Hel")
+        relay("lo")
+        received = []
+        relay.adopt(received.append)
+        relay("!")
+        assert received == ["Hel", "lo", "!"]
+        assert relay.tokens == ["Hel", "lo", "!"]
+
+
+class TestSpeculationHandle:
+
+    def test_deferred_until_adopted(self):
+        """Test that side effects run on adoption, immediately afterwards, and never if cancelled."""
+        calls = []
+        handle = SpeculationHandle()
+        handle.defer(lambda: calls.append("early"))
+        assert calls == []
+        handle.adopt(None)
+        handle.defer(lambda: calls.append("late"))
+        assert calls == ["early", "late"]
+
+        cancelled = SpeculationHandle()
+        cancelled.defer(lambda: calls.append("dropped"))
+        cancelled.cancel()
+        cancelled.defer(lambda: calls.append("dropped"))
+        assert calls == ["early", "late"]
+
+
+class TestSpeculativeExecutor:
+
+    def test_capacity_reserve(self):
+        """Test that a slot is always left for the non-speculative stage."""
+        assert SpeculativeExecutor(FakeClient(None)).can_launch()
+        assert SpeculativeExecutor(FakeClient(2)).can_launch()
+        assert not SpeculativeExecutor(FakeClient(1)).can_launch()
+
+    def test_launch_adopt_discard(self):
+        """Test outcome counters and the cancel flag."""
+        executor = SpeculativeExecutor(FakeClient(3))
+
+        async def scenario():
+            async def stage(handle):
+                handle.relay("draft")
+                return "result"
+            adopted = executor.launch("casual", stage)
+            discarded = executor.launch("chain", stage)
+            # Two slots are taken by running stages; the third is reserved
+            assert executor.launch("casual", stage) is None
+            tokens = []
+            result = await executor.adopt(adopted, tokens.append)
+            executor.discard(discarded)
+            await discarded.future
+            return result, tokens, discarded
+
+        result, tokens, discarded = asyncio.run(scenario())
+        assert result == "result"
+        assert tokens == ["draft"]
+        assert discarded.handle.is_cancelled()
+        stats = executor.get_stats()
+        assert stats["casual"] == {"launched": 1, "adopted": 1, "cancelled": 0, "skipped": 1, "hit_rate": 1.0}
+        assert stats["chain"]["cancelled"] == 1
+        assert executor.active == 0
+
+
+def respond(payload):
+    """Route by prompt: routing prompts get a slow JSON decision, casual prompts a reply."""
+    prompt = payload["prompt"]
+    if prompt.startswith("You are the router"):
+        time.sleep(0.2)
+        if "hello" in prompt:
+            return json.dumps(dict(ROUTE, type="casual_conversation"))
+        return json.dumps(dict(ROUTE, type="tool_request", tool="weather", function="get_weather", args=["Oslo"]))
+    if prompt.startswith("Given the query"):
+        # A chain draft long enough to still be generating when the routing decision arrives
+        return " ".join(["step"] * 100)
+    return "Hi there, nice to meet you again today"
+
+
+@pytest.fixture
+def stub_server():
+    with StubOllamaServer(responder=respond, token_latency=0.02) as stub:
+        yield stub
+
+
+@pytest.fixture
+def agent(stub_server):
+    # The weather tool is described, so a routing decision naming it matches the routing schema
+    tools = {"weather": {"module": None, "functions": {"get_weather": lambda location: f"Sunny in {location}"}}}
+    with patch.object(LLMFlowAgent, '_discover_tools', return_value=tools):
+        agent = LLMFlowAgent(ollama_url=stub_server.url, cache_size=0, speculative=True, max_in_flight=3)
+    yield agent
+    agent.close()
+
+
+class TestSpeculativeAgent:
+
+    def test_casual_draft_adopted(self, agent, stub_server):
+        """Test that the reply drafted during classification is used as the answer."""
+        tokens = []
+        start = time.perf_counter()
+        response = agent.process_query("hello", on_token=tokens.append)
+        elapsed = time.perf_counter() - start
+
+        assert response == "Hi there, nice to meet you again today"
+        assert "".join(tokens) == response
+        # Two LLM requests (routing, casual) ran concurrently
+        assert len([r for r in stub_server.requests if r["path"] == "/api/generate"]) == 2
+        assert agent.llm_client.get_stats()["peak_in_flight"] == 2
+        assert elapsed < 0.2 + 8 * 0.02
+        assert agent.speculator.get_stats()["casual"]["adopted"] == 1
+
+    def test_casual_draft_cancelled_for_tool_request(self, agent):
+        """Test that the draft is cancelled when the query turns out to need a tool."""
+        agent.execute_tool = MagicMock(return_value="Sunny")
+        response = agent.process_query("what is it like outside")
+
+        assert response == "Sunny"
+        assert agent.speculator.get_stats()["casual"]["cancelled"] == 1
+        deadline = time.time() + 2
+        while agent.speculator.active and time.time() < deadline:
+            time.sleep(0.01)
+        assert agent.speculator.active == 0
+        assert agent.memory.llm_context is None
+
+    def test_in_flight_cap_skips_speculation(self, agent):
+        """Test that no draft starts when it would take the last free request slot."""
+        agent.llm_client.max_in_flight = 1
+        assert agent.process_query("hello") == "Hi there, nice to meet you again today"
+        assert agent.speculator.get_stats()["casual"]["skipped"] == 1
+
+    def test_multi_intent_query_drafts_chain(self, agent):
+        """Test that chain generation is speculated only for multi-intent queries."""
+        agent.orchestrator.generate_chain = MagicMock(return_value=[])
+        agent.process_query("hello and then more")
+        agent.process_query("hello")
+        assert agent.speculator.get_stats()["chain"]["launched"] == 1
+        assert agent.speculator.get_stats()["chain"]["cancelled"] == 1
+
+    def test_discarded_chain_draft_stops_generating(self, agent):
+        """Test that a cancelled chain draft drops its LLM request instead of running to completion."""
+        start = time.perf_counter()
+        assert agent.process_query("hello and then more") == "Hi there, nice to meet you again today"
+        deadline = time.time() + 2
+        while agent.speculator.active and time.time() < deadline:
+            time.sleep(0.01)
+
+        # The full draft would take 100 tokens x 0.02s
+        assert time.perf_counter() - start < 1.0
+        assert agent.speculator.active == 0
+        assert agent.speculator.get_stats()["chain"]["cancelled"] == 1
+        assert "chain" not in agent.model_tiers.get_stats()
@@ -0,0 +1,94 @@
+import pytest
+
+from structured_output import (
+    StructuredOutput, analysis_schema, chain_schema, entity_schema, extract_json, routing_schema, validate
+)
+
+TOOL_DESCRIPTIONS = {
+    "weather": {
+        "description": "Weather",
+        "functions": {"get_weather": {"arguments": ["location"]}}
+    },
+    "currency": {
+        "description": "Currency",
+        "functions": {"convert_currency": {"arguments": ["amount", "from_currency", "to_currency"]}}
+    }
+}
+QUERY_TYPES = ("tool_request", "chain_query", "casual_conversation", "exit")
+
+
+class TestSchemas:
+
+    def test_routing_schema_enumerates_registry(self):
+        """Test that tool and function names are limited to the known tools."""
+        schema = routing_schema(TOOL_DESCRIPTIONS, QUERY_TYPES, entities=True)
+        assert schema["properties"]["tool"]["enum"] == ["weather", "currency", None]
+        assert schema["properties"]["function"]["enum"] == ["convert_currency", "get_weather", None]
+        assert schema["required"][0] == "entities"
+        assert "entities" not in routing_schema(TOOL_DESCRIPTIONS, QUERY_TYPES)["properties"]
+
+    def test_analysis_schema_per_function(self):
+        """Test that each function pins its tool and caps its argument count."""
+        schema = analysis_schema(TOOL_DESCRIPTIONS, ["currency", "weather"])
+        assert len(schema["anyOf"]) == 2
+        reply = {"tool": "currency", "function": "convert_currency", "arguments": [1, "USD", "EUR"], "reasoning": "r"}
+        assert validate(reply, schema) == []
+        reply["function"] = "get_weather"
+        assert validate(reply, schema)
+        single = analysis_schema(TOOL_DESCRIPTIONS, ["weather"])
+        assert single["properties"]["arguments"]["maxItems"] == 1
+
+    def test_chain_schema(self):
+        """Test that chain steps must name registered functions of their tool."""
+        schema = chain_schema({"weather": {"get_weather": None}, "news": {"search_news": None}})
+        step = {"tool_name": "weather", "function_name": "get_weather", "input_params": {}, "output_key": "w"}
+        assert validate([step], schema) == []
+        assert validate([dict(step, function_name="search_news")], schema)
+        assert validate([], schema)
+
+    def test_validate_types(self):
+        """Test type, enum, required and nullable checks."""
+        schema = entity_schema()
+        assert validate({"location": "Paris", "amount": 1.5}, schema) == []
+        assert validate({"amount": "ten"}, schema) == ["$.amount: expected number/null, got str"]
+        assert validate({"amount": True}, schema)
+        assert validate([], schema) == ["$: expected object, got list"]
+        assert validate({"type": "other"}, {"properties": {"type": {"enum": ["a"]}}, "required": ["x"]}) == [
+            "$: missing required field 'x'", "$.type: 'other' is not one of ['a']"
+        ]
+
+
+class TestStructuredOutput:
+
+    def test_extract_json(self):
+        """Test free-text extraction of objects and arrays."""
+        assert extract_json('Here: {"a": 1} done') == {"a": 1}
+        assert extract_json('```json\n[{"a": 1}]\n```', list) == [{"a": 1}]
+        assert extract_json("no json") is None
+        assert extract_json('{"a": 1}', list) is None
+
+    def test_parse_counts_outcomes(self):
+        """Test that decode failures, recoveries and schema violations are counted per stage."""
+        structured = StructuredOutput()
+        schema = entity_schema()
+        assert structured.parse("extraction", '{"location": "Oslo"}', schema) == ({"location": "Oslo"}, [])
+        assert structured.parse("extraction", 'Sure! {"location": "Oslo"}', schema)[0] == {"location": "Oslo"}
+        assert structured.parse("extraction", "not json", schema) == (None, [])
+        value, errors = structured.parse("extraction", '{"amount": "ten"}', schema)
+        assert value == {"amount": "ten"} and errors
+        stats = structured.get_stats()["extraction"]
+        assert stats["calls"] == 4
+        assert stats["parse_failures"] == 2
+        assert stats["recovered"] == 1
+        assert stats["schema_violations"] == 1
+        assert stats["unusable_rate"] == pytest.approx(0.25)
+
+    def test_parse_rejects_wrong_container(self):
+        """Test that an object is not accepted where an array is expected."""
+        value, _ = StructuredOutput().parse("chain", '{"tool_name": "weather"}', {"type": "array"})
+        assert value is None
+
+    def test_disabled_sends_no_format(self):
+        """Test that disabled structured output leaves the request unconstrained."""
+        assert StructuredOutput(enabled=False).format_for({"type": "object"}) is None
+        assert StructuredOutput().format_for({"type": "object"}) == {"type": "object"}
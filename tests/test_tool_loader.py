@@ -0,0 +1,132 @@
+import inspect
+import sys
+import types
+
+import pytest
+
+from fast_router import FastPathRouter
+from tool_loader import LazyFunction, ToolLoader, read_metadata
+
+SOURCE = '''"""Demo tool."""
+import json
+
+CITY_TIMEZONES = {"tokyo": "Asia/Tokyo"}
+PLANETS = {"mars": PlanetInfo(name="Mars")}
+LOADED = []
+
+
+class DemoTool:
+    """Tool used by the loader tests."""
+    TOOL_DESCRIPTION = "Demo lookups"
+    TOOL_EXAMPLES = [{"query": "What time is it in Tokyo?", "tool_call": "demo_tool.lookup('Tokyo')"}]
+    TOOL_HANDLER = object()
+
+
+def lookup(location, units="metric"):
+    """Look a location up."""
+    return f"{location} in {units}"
+'''
+
+
+@pytest.fixture
+def tools_dir(tmp_path):
+    module_name = f"demo_tool_{tmp_path.name}"
+    (tmp_path / f"{module_name}.py").write_text(
+        SOURCE.replace("PlanetInfo(", "dict(") + "\nLOADED.append(True)\n", encoding="utf-8")
+    (tmp_path / "broken_tool.py").write_text("import not_an_installed_module\ndef go(:\n", encoding="utf-8")
+    yield tmp_path, module_name
+    sys.modules.pop(module_name, None)
+    if str(tmp_path) in sys.path:
+        sys.path.remove(str(tmp_path))
+
+
+def make_loader(tools_dir, lazy=True):
+    path, module_name = tools_dir
+    return ToolLoader({
+        "demo": {"module": module_name, "functions": ["lookup", "missing"]},
+        "broken": {"module": "broken_tool", "functions": ["go"]}
+    }, tools_dir=str(path), lazy=lazy)
+
+
+class TestReadMetadata:
+
+    def test_constants_classes_and_signatures(self, tmp_path):
+        """Test that metadata is read from the source without running it."""
+        path = tmp_path / "demo.py"
+        path.write_text(SOURCE, encoding="utf-8")
+        metadata = read_metadata(str(path), "demo")
+
+        assert isinstance(metadata, types.ModuleType)
+        assert metadata.__doc__ == "Demo tool."
+        assert metadata.CITY_TIMEZONES == {"tokyo": "Asia/Tokyo"}
+        assert metadata.PLANETS == {"mars": None}
+        assert metadata.DemoTool.__module__ == "demo"
+        assert metadata.DemoTool.__doc__ == "Tool used by the loader tests."
+        assert metadata.DemoTool.TOOL_DESCRIPTION == "Demo lookups"
+        assert not hasattr(metadata.DemoTool, "TOOL_HANDLER")
+        signature, doc = metadata.__signatures__["lookup"]
+        assert str(signature) == "(location, units='metric')"
+        assert doc == "Look a location up."
+
+
+class TestToolLoader:
+
+    def test_lazy_discovery_defers_import(self, tools_dir):
+        """Test that discovery registers proxies and the first call imports the module."""
+        loader = make_loader(tools_dir)
+        tools = loader.discover()
+        module_name = tools_dir[1]
+
+        assert module_name not in sys.modules
+        lookup = tools["demo"]["functions"]["lookup"]
+        assert isinstance(lookup, LazyFunction)
+        assert list(tools["demo"]["functions"]) == ["lookup"]
+        assert list(inspect.signature(lookup).parameters) == ["location", "units"]
+
+        assert lookup("Tokyo") == "Tokyo in metric"
+        assert sys.modules[module_name].LOADED == [True]
+        assert lookup("Oslo", "imperial") == "Oslo in imperial"
+        assert sys.modules[module_name].LOADED == [True]
+        assert loader.get_stats()["imported"] == ["demo"]
+
+    def test_unparsable_source_is_imported(self, tools_dir):
+        """Test that a tool whose source cannot be parsed falls back to importing, and is skipped on failure."""
+        tools = make_loader(tools_dir).discover()
+        assert "broken" not in tools
+
+    def test_metadata_feeds_router(self, tools_dir):
+        """Test that the router reads lexicons and examples from the metadata stand-in."""
+        tools = make_loader(tools_dir).discover()
+        router = FastPathRouter(tools, {"demo": "demo"})
+        assert router.cities == {"tokyo": "Tokyo"}
+        assert router.planets == {"mars": "Mars"}
+        assert tools_dir[1] not in sys.modules
+
+    def test_prewarm_selected_tools(self, tools_dir):
+        """Test that prewarm imports only the selected tools and reports errors."""
+        loader = make_loader(tools_dir)
+        loader.discover()
+        results = loader.prewarm(["demo", "nope"])
+
+        assert isinstance(results["demo"], float)
+        assert results["nope"].startswith("Error: unknown tool")
+        assert loader.prewarm(["demo"]) == {"demo": 0.0}
+        assert loader.prewarm(["broken"])["broken"].startswith("Error:")
+        assert tools_dir[1] in sys.modules
+
+    def test_eager_discovery(self, tools_dir):
+        """Test that lazy=False imports at discovery and returns the real functions."""
+        loader = make_loader(tools_dir, lazy=False)
+        tools = loader.discover()
+        assert not isinstance(tools["demo"]["functions"]["lookup"], LazyFunction)
+        assert tools["demo"]["module"] is sys.modules[tools_dir[1]]
+        assert "demo" in loader.get_stats()["import_seconds"]
+
+    def test_repo_tools_register_without_import(self):
+        """Test that every shipped tool is described from its source alone."""
+        loader = ToolLoader()
+        tools = loader.discover()
+        assert len(tools) == len(loader.tool_modules)
+        assert loader.get_stats()["imported"] == []
+        assert "tokyo" in tools["time"]["module"].CITY_TIMEZONES
+        assert "mars" in {planet.lower() for planet in tools["astronomy"]["module"].PLANETS}
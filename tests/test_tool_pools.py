@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from deadline import DeadlineExceeded, query_deadline
+from tool_pools import ConcurrencyLimit, ToolPools
+
+
+def tracked(delay, active, peak, lock):
+    """A tool function that records how many of its calls overlap."""
+    def func(name):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(delay)
+        with lock:
+            active[0] -= 1
+        return name
+    return func
+
+
+class TestToolPools:
+
+    def test_per_tool_limit(self):
+        """Test that a tool's concurrent calls stay within its limit and the waits are counted."""
+        pools = ToolPools(concurrency={"wikipedia": 1})
+        active, peak, lock = [0], [0], threading.Lock()
+        lookup = tracked(0.03, active, peak, lock)
+
+        async def run():
+            return await asyncio.gather(*(pools.run("wikipedia", lookup, str(index)) for index in range(4)))
+
+        assert asyncio.run(run()) == ["0", "1", "2", "3"]
+        assert peak[0] == 1
+        stats = pools.get_stats()["tools"]["wikipedia"]
+        assert stats["waited"] == 3 and stats["max_waiting"] == 3
+        assert stats["active"] == 0 and stats["waiting"] == 0
+        pools.close()
+
+    def test_service_limit_shared_across_tools(self):
+        """Test that tools calling the same upstream service share its limit."""
+        pools = ToolPools(concurrency={"geolocation": None})
+        active, peak, lock = [0], [0], threading.Lock()
+        lookup = tracked(0.03, active, peak, lock)
+
+        async def run():
+            return await asyncio.gather(*(pools.run(tool_name, lookup, tool_name)
+                                          for tool_name in ("geolocation", "astronomy", "geolocation")))
+
+        assert asyncio.run(run()) == ["geolocation", "astronomy", "geolocation"]
+        assert peak[0] == 1
+        stats = pools.get_stats()["services"]["nominatim"]
+        assert stats["acquired"] == 3 and stats["waited"] == 2
+        pools.close()
+
+    def test_synchronous_calls_hold_the_limits(self):
+        """Test that calls made outside the pools wait for the same limits as chain steps."""
+        pools = ToolPools()
+        active, peak, lock = [0], [0], threading.Lock()
+        lookup = tracked(0.03, active, peak, lock)
+
+        def direct(name):
+            with pools.limited("geolocation"):
+                return lookup(name)
+
+        async def run():
+            threads = [threading.Thread(target=direct, args=(str(index),)) for index in range(2)]
+            for thread in threads:
+                thread.start()
+            await pools.run("astronomy", lookup, "step")
+            for thread in threads:
+                thread.join()
+
+        asyncio.run(run())
+        assert peak[0] == 1
+        stats = pools.get_stats()["services"]["nominatim"]
+        assert stats["acquired"] == 3 and stats["active"] == 0 and stats["waiting"] == 0
+        pools.close()
+
+    def test_slow_parsing_tools_do_not_starve_io_tools(self):
+        """Test that calls of a busy pool class queue there while other tools run at once."""
+        pools = ToolPools(pool_sizes={"io": 2, "parsing": 1}, concurrency={"web_parser": None})
+        slow = lambda url: time.sleep(0.2) or url
+
+        async def run():
+            scrapes = [asyncio.ensure_future(pools.run("web_parser", slow, f"page{index}")) for index in range(3)]
+            await asyncio.sleep(0.02)
+            start = time.perf_counter()
+            await pools.run("weather", lambda location: location, "Oslo")
+            fast = time.perf_counter() - start
+            parsing = pools.get_stats()["pools"]["parsing"]
+            await asyncio.gather(*scrapes)
+            return fast, parsing
+
+        fast, parsing = asyncio.run(run())
+        assert fast < 0.1
+        assert parsing["running"] == 1 and parsing["queued"] == 2 and parsing["max_queued"] == 2
+        assert pools.get_stats()["pools"]["io"]["submitted"] == 1
+        pools.close()
+
+    def test_wait_bounded_by_deadline(self):
+        """Test that waiting for a slot ends at the deadline and frees nothing it did not hold."""
+        limit = ConcurrencyLimit(1)
+
+        async def run():
+            await limit.acquire()
+            with query_deadline(0.05):
+                with pytest.raises(DeadlineExceeded):
+                    await limit.acquire()
+            limit.release()
+            await limit.acquire()
+            limit.release()
+
+        asyncio.run(run())
+        assert limit.get_stats()["active"] == 0
+
+    def test_blocking_wait_bounded_by_deadline(self):
+        """Test that a thread waiting for a slot gives up at the deadline."""
+        limit = ConcurrencyLimit(1)
+        limit.acquire_blocking()
+        with query_deadline(0.05):
+            with pytest.raises(DeadlineExceeded):
+                limit.acquire_blocking()
+        limit.release()
+        limit.acquire_blocking()
+        limit.release()
+        assert limit.get_stats()["active"] == 0 and limit.get_stats()["waiting"] == 0
+
+    def test_unknown_pool_class(self):
+        """Test that a tool cannot be assigned to a pool that does not exist."""
+        with pytest.raises(ValueError, match="Unknown pool class"):
+            ToolPools(tool_classes={"news": "gpu"})
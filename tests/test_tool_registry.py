@@ -0,0 +1,111 @@
+import asyncio
+import inspect
+from typing import Optional
+from unittest.mock import MagicMock
+
+import pytest
+
+from chain_orchestrator import ChainOrchestrator, ChainStep
+from tool_loader import read_metadata
+from tool_registry import ToolAdapter, ToolArgumentError, ToolRegistry
+
+
+def convert_currency(amount: float, from_currency: str, to_currency: str):
+    return amount, from_currency, to_currency
+
+
+def find_nearby_places(location, category, radius_km=2.0):
+    return location, category, radius_km
+
+
+def get_celestial_events(date: Optional[str] = None, location: Optional[str] = None):
+    return date, location
+
+
+def search_news(query, max_results=5):
+    return query, max_results
+
+
+class TestToolAdapter:
+
+    def test_coerces_annotated_and_defaulted_parameters(self):
+        """Test that arguments are coerced to the annotation, or to the type of the default."""
+        assert ToolAdapter("currency", "convert_currency", convert_currency).bind(["100", "USD", "EUR"]) == [100.0, "USD", "EUR"]
+        assert ToolAdapter("geolocation", "find_nearby_places", find_nearby_places).bind(["Paris", "cafe", "1.5"]) == ["Paris", "cafe", 1.5]
+        assert ToolAdapter("news", "search_news", search_news).bind(["AI", "3"]) == ["AI", 3]
+
+    def test_nullable_and_extra_arguments(self):
+        """Test that null-like strings become None for Optional parameters and extra arguments are dropped."""
+        adapter = ToolAdapter("astronomy", "get_celestial_events", get_celestial_events)
+        assert adapter.bind(["null", "London", "ignored"]) == [None, "London"]
+        assert adapter.bind([]) == []
+
+    def test_validation_errors(self):
+        """Test that missing and unconvertible arguments raise ToolArgumentError."""
+        adapter = ToolAdapter("currency", "convert_currency", convert_currency)
+        with pytest.raises(ToolArgumentError, match="need at least 3, got 1"):
+            adapter.bind(["100"])
+        with pytest.raises(ToolArgumentError, match="'amount' of convert_currency must be number"):
+            adapter.bind(["a lot", "USD", "EUR"])
+        with pytest.raises(ToolArgumentError, match="must be integer"):
+            ToolAdapter("news", "search_news", search_news).bind(["AI", 2.5])
+
+    def test_schema(self):
+        """Test the JSON schema of the arguments."""
+        schema = ToolAdapter("geolocation", "find_nearby_places", find_nearby_places).schema
+        assert schema["required"] == ["location", "category"]
+        assert schema["properties"]["radius_km"] == {"type": "number", "default": 2.0}
+        schema = ToolAdapter("astronomy", "get_celestial_events", get_celestial_events).schema
+        assert schema["properties"]["date"] == {"type": ["string", "null"], "default": None}
+
+    def test_string_annotations_from_lazy_metadata(self, tmp_path):
+        """Test that annotations read from source by the lazy loader drive coercion."""
+        path = tmp_path / "demo.py"
+        path.write_text("def convert(amount: float, count: 'int' = 1, date: Optional[str] = None):\n    pass\n",
+                        encoding="utf-8")
+        signature, _ = read_metadata(str(path), "demo").__signatures__["convert"]
+        func = MagicMock(return_value="ok")
+        func.__signature__ = signature
+        assert ToolAdapter("demo", "convert", func).bind(["2", "3", "none"]) == [2.0, 3, None]
+
+    def test_bind_params_by_name_or_position(self):
+        """Test that named arguments are matched by name, or by position when the names are unknown."""
+        adapter = ToolAdapter("news", "search_news", search_news)
+        assert adapter.bind_params({"max_results": "2", "query": "AI"}) == ["AI", 2]
+        assert adapter.bind_params({"topic": "AI"}) == ["AI"]
+        with pytest.raises(ToolArgumentError, match="Missing argument 'query'"):
+            adapter.bind_params({"max_results": 2})
+
+
+class TestToolRegistry:
+
+    def test_compiled_once_and_recompiled_on_replacement(self):
+        """Test that adapters are reused until the registered function is replaced."""
+        tools = {"news": {"functions": {"search_news": search_news}}}
+        registry = ToolRegistry(tools)
+        adapter = registry.adapter("news", "search_news", search_news)
+        assert registry.adapter("news", "search_news", search_news) is adapter
+        assert registry.compiled == 1
+
+        replacement = MagicMock(return_value="news")
+        assert registry.adapter("news", "search_news", replacement).func is replacement
+        assert registry.compiled == 2
+        assert registry.schemas()["news"]["search_news"] == {"type": "object", "properties": {}, "required": []}
+
+    def test_chain_step_uses_adapter(self):
+        """Test that chain steps bind and coerce their parameters through the registry."""
+        func = MagicMock(return_value="places")
+        func.__signature__ = inspect.signature(find_nearby_places)
+        tools = {"geolocation": {"functions": {"find_nearby_places": func}}}
+        agent = MagicMock(tools=tools, tool_registry=ToolRegistry(tools))
+
+        async def run_blocking(f, *args):
+            return f(*args)
+        agent.run_blocking = run_blocking
+        orchestrator = ChainOrchestrator(agent)
+        step = ChainStep("geolocation", "find_nearby_places",
+                         {"location": "{{start.city}}", "category": "cafe", "radius_km": "0.5"}, "places")
+
+        result = asyncio.run(orchestrator._execute_step(step, {"start": {"city": "Paris"}}))
+        assert result == "places"
+        func.assert_called_once_with("Paris", "cafe", 0.5)
@@ -0,0 +1,120 @@
+import json
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from benchmarks.stub_ollama import StubOllamaServer
+from main import LLMFlowAgent
+from tracing import NOOP_SPAN, TRACER, Tracer, cache_lookup, span, traced
+
+ROUTE = {"type": "tool_request", "tool": "weather", "function": "get_weather", "args": ["Oslo"],
+         "entities": {}, "explanation": "", "language": "en", "translation": None}
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    TRACER.reset()
+    path = tmp_path / "trace.jsonl"
+    TRACER.enable(str(path))
+    yield path
+    TRACER.disable()
+    TRACER.reset()
+
+
+def read_spans(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+class TestTracer:
+
+    def test_disabled_tracing_records_nothing(self):
+        """Test that a disabled tracer hands out the no-op span and passes lookups through."""
+        assert not TRACER.enabled
+        assert span("query_llm", stage="default") is NOOP_SPAN
+        with span("query_llm") as noop:
+            noop.set(cached=True)
+            noop.fail("ignored")
+        assert cache_lookup("weather", {"temp": 3}) == {"temp": 3}
+        assert traced("demo")(lambda x: x + 1)(1) == 2
+        assert TRACER.get_stats()["spans"] == 0
+
+    def test_spans_nest_and_are_written(self, tracer):
+        """Test that child spans share the trace id, point to their parent and record failures."""
+        with span("query"):
+            with span("execute_tool", tool="weather") as tool_span:
+                cache_lookup("weather", False, key="Oslo")
+                tool_span.fail("Error: boom")
+            with pytest.raises(ValueError):
+                with span("chain_step"):
+                    raise ValueError("bad step")
+
+        records = {record["name"]: record for record in read_spans(tracer)}
+        query = records["query"]
+        assert query["parent_id"] is None
+        assert {records[name]["trace_id"] for name in records} == {query["trace_id"]}
+        assert records["execute_tool"]["parent_id"] == query["span_id"]
+        assert records["cache_lookup"]["parent_id"] == records["execute_tool"]["span_id"]
+        assert records["cache_lookup"]["attributes"] == {"key": "Oslo", "cache": "weather", "hit": False}
+        assert records["execute_tool"]["status"] == "error"
+        assert records["chain_step"]["attributes"]["error"] == "ValueError: bad step"
+
+    def test_prometheus_exposition(self):
+        """Test the histogram, error and cache lookup series of the text format."""
+        tracer = Tracer()
+        tracer.enable()
+        for _ in range(2):
+            with tracer.span("query_llm", stage="extraction"):
+                pass
+        with tracer.span("http", host='a"b'):
+            pass
+        tracer.record_cache_lookup("llm", True, {})
+        tracer.record_cache_lookup("llm", False, {})
+        tracer.disable()
+
+        text = tracer.prometheus()
+        assert 'llmflow_span_duration_seconds_bucket{span="query_llm",stage="extraction",le="+Inf"} 2' in text
+        assert 'llmflow_span_duration_seconds_count{span="query_llm",stage="extraction"} 2' in text
+        assert 'llmflow_span_duration_seconds_count{span="http",host="a\\"b"} 1' in text
+        assert 'llmflow_cache_lookups_total{cache="llm",result="hit"} 1' in text
+        assert tracer.get_stats()["cache_lookups"] == {"llm": {"hit": 1, "miss": 1}}
+
+
+class TestAgentTracing:
+
+    def test_query_spans_cross_worker_threads(self, tmp_path):
+        """Test that one query's routing, LLM, HTTP and tool spans form a single trace."""
+        path = tmp_path / "trace.jsonl"
+        tools = {"weather": {"module": None, "functions": {"get_weather": lambda location: f"Sunny in {location}"}}}
+        with StubOllamaServer(responder=lambda payload: json.dumps(ROUTE)) as stub:
+            with patch.object(LLMFlowAgent, '_discover_tools', return_value=tools):
+                agent = LLMFlowAgent(ollama_url=stub.url, fast_path_threshold=None, semantic_top_k=None,
+                                     trace_path=str(path))
+            try:
+                assert agent.process_query("weather please") == "Sunny in Oslo"
+                metrics = agent.tracer.prometheus()
+            finally:
+                agent.close()
+                TRACER.reset()
+
+        records = read_spans(path)
+        names = [record["name"] for record in records]
+        for name in ("query", "determine_query_type", "query_llm", "http", "execute_tool", "cache_lookup"):
+            assert name in names
+        assert len({record["trace_id"] for record in records}) == 1
+        by_id = {record["span_id"]: record for record in records}
+        http = next(record for record in records if record["name"] == "http")
+        assert http["attributes"]["status_code"] == 200
+        assert by_id[http["parent_id"]]["name"] == "query_llm"
+        assert 'llmflow_cache_lookups_total{cache="llm",result="miss"}' in metrics
+        assert not TRACER.enabled
+
+    def test_requests_traced_only_while_enabled(self, tracer):
+        """Test that outbound requests made by tools become http spans."""
+        with StubOllamaServer(responder=lambda payload: "ok") as stub:
+            requests.get(f"{stub.url}/api/tags", timeout=5)
+            TRACER.disable()
+            requests.get(f"{stub.url}/api/tags", timeout=5)
+        http = [record for record in read_spans(tracer) if record["name"] == "http"]
+        assert len(http) == 1
+        assert http[0]["attributes"]["path"] == "/api/tags"
@@ -0,0 +1,347 @@
+"""
+ToolLoader module deferring tool module imports until a tool is first used.
+
+The tool modules pull in heavy dependencies (BeautifulSoup, feedparser,
+newspaper, readability, pandas, ephem, pytz, ...) at import time. The routers
+only need their metadata: the TOOL_* class attributes, the lexicons such as
+CITY_TIMEZONES, and the names and signatures of the tool functions. All of
+that is read from the module source with the ast module, and the import
+happens on the first call of one of the tool's functions.
+"""
+
+import ast
+import importlib
+import inspect
+import os
+import sys
+import threading
+import time
+import types
+from typing import Dict, Any, Callable, Iterable, List, Optional, Union
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tools")
+
+# Tool name -> module name and the functions the agent exposes
+TOOL_MODULES = {
+    "currency": {"module": "currency_tool", "functions": ["convert_currency"]},
+    "geolocation": {"module": "geolocation_tool", "functions": ["get_location_info", "calculate_distance", "find_nearby_places"]},
+    "news": {"module": "news_tool", "functions": ["search_news", "get_headlines"]},
+    "stock": {"module": "stock_tool", "functions": ["get_stock_quote", "get_company_info", "get_historical_data", "get_market_summary"]},
+    "time": {"module": "time_tool", "functions": ["get_current_time", "convert_time", "get_time_difference", "list_timezones"]},
+    "weather": {"module": "weather_tool", "functions": ["get_weather"]},
+    "wikipedia": {"module": "wikipedia_tool", "functions": ["search_wikipedia", "get_article_summary", "get_article_content"]},
+    "web_parser": {"module": "web_parser_tool", "functions": ["parse_webpage", "get_page_summary"]},
+    "search": {"module": "search_tool", "functions": ["search_web"]},
+    "air_quality": {"module": "air_quality_tool", "functions": ["get_air_quality", "get_air_quality_by_coordinates"]},
+    "astronomy": {"module": "astronomy_tool", "functions": ["get_celestial_events", "get_visible_constellations", "get_planet_info"]},
+}
+
+# Placeholder for a default value that is not a literal
+NON_LITERAL = object()
+
+
+def _literal(node: ast.AST) -> Any:
+    """Evaluate a literal expression, returning NON_LITERAL for anything else."""
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return NON_LITERAL
+
+
+def _constant_value(node: ast.AST) -> Any:
+    """
+    Evaluate a module-level constant.
+
+    A dict whose keys are literals but whose values are not (PLANETS maps names
+    to dataclass instances) keeps its keys, with None values.
+    """
+    value = _literal(node)
+    if value is NON_LITERAL and isinstance(node, ast.Dict):
+        keys = [_literal(key) if key is not None else NON_LITERAL for key in node.keys]
+        if all(key is not NON_LITERAL for key in keys):
+            return dict.fromkeys(keys)
+    return value
+
+
+def _annotation(arg: ast.arg) -> Any:
+    """Source text of an argument annotation, as `from __future__ import annotations` would keep it."""
+    return ast.unparse(arg.annotation) if arg.annotation is not None else inspect.Parameter.empty
+
+
+def _signature(node: Union[ast.FunctionDef, ast.AsyncFunctionDef]) -> inspect.Signature:
+    """
+    Build a function signature from its definition.
+
+    Non-literal defaults become NON_LITERAL and annotations are kept as strings.
+    """
+    arguments = node.args
+    parameters = []
+    positional = arguments.posonlyargs + arguments.args
+    defaults = [None] * (len(positional) - len(arguments.defaults)) + list(arguments.defaults)
+    for index, (arg, default) in enumerate(zip(positional, defaults)):
+        kind = inspect.Parameter.POSITIONAL_ONLY if index < len(arguments.posonlyargs) else inspect.Parameter.POSITIONAL_OR_KEYWORD
+        parameters.append(inspect.Parameter(arg.arg, kind, annotation=_annotation(arg),
+                                            default=inspect.Parameter.empty if default is None else _literal(default)))
+    if arguments.vararg:
+        parameters.append(inspect.Parameter(arguments.vararg.arg, inspect.Parameter.VAR_POSITIONAL,
+                                            annotation=_annotation(arguments.vararg)))
+    for arg, default in zip(arguments.kwonlyargs, arguments.kw_defaults):
+        parameters.append(inspect.Parameter(arg.arg, inspect.Parameter.KEYWORD_ONLY, annotation=_annotation(arg),
+                                            default=inspect.Parameter.empty if default is None else _literal(default)))
+    if arguments.kwarg:
+        parameters.append(inspect.Parameter(arguments.kwarg.arg, inspect.Parameter.VAR_KEYWORD,
+                                            annotation=_annotation(arguments.kwarg)))
+    returns = ast.unparse(node.returns) if node.returns is not None else inspect.Signature.empty
+    return inspect.Signature(parameters, return_annotation=returns)
+
+
+def read_metadata(path: str, module_name: str) -> types.ModuleType:
+    """
+    Read the metadata of a tool module without importing it.
+
+    Args:
+        path (str): Source file of the module
+        module_name (str): Name the module is imported under
+
+    Returns:
+        types.ModuleType: Stand-in module holding the module-level constants, a class per
+            top-level class with its literal TOOL_* attributes and docstring, and a
+            "__signatures__" dict of function name -> (inspect.Signature, docstring)
+
+    Raises:
+        OSError: If the source cannot be read
+        SyntaxError: If the source cannot be parsed
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    metadata = types.ModuleType(module_name, ast.get_docstring(tree))
+    metadata.__file__ = path
+    signatures = {}
+    for node in tree.body:
+        if isinstance(node, (ast.Assign, ast.AnnAssign)) and node.value is not None:
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name) and target.id.isupper():
+                    value = _constant_value(node.value)
+                    if value is not NON_LITERAL:
+                        setattr(metadata, target.id, value)
+        elif isinstance(node, ast.ClassDef):
+            attributes = {"__module__": module_name, "__doc__": ast.get_docstring(node)}
+            for statement in node.body:
+                if (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                        and isinstance(statement.targets[0], ast.Name) and statement.targets[0].id.startswith("TOOL_")):
+                    value = _literal(statement.value)
+                    if value is not NON_LITERAL:
+                        attributes[statement.targets[0].id] = value
+            setattr(metadata, node.name, type(node.name, (), attributes))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            signatures[node.name] = (_signature(node), ast.get_docstring(node))
+    metadata.__signatures__ = signatures
+    return metadata
+
+
+class LazyFunction:
+    """
+    Callable standing in for a tool function until its module is imported.
+
+    It carries the name, docstring and signature of the real function, so
+    argument checks work before the import; the first call imports the module
+    through the loader and every call is forwarded to the real function.
+    """
+
+    def __init__(self, loader: "ToolLoader", tool_name: str, function_name: str,
+                 signature: inspect.Signature, doc: Optional[str] = None):
+        self._loader = loader
+        self.tool_name = tool_name
+        self.__name__ = function_name
+        self.__qualname__ = function_name
+        self.__doc__ = doc
+        self.__signature__ = signature
+
+    def __call__(self, *args, **kwargs):
+        return self._loader.resolve(self.tool_name, self.__name__)(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"<lazy tool function {self.tool_name}.{self.__name__}>"
+
+
+class ToolLoader:
+    """
+    Registry of the tool modules, importing each one on first use.
+
+    In lazy mode discover() only parses the module sources; tool functions are
+    LazyFunction proxies and "module" is the metadata stand-in the routers read.
+    A module whose source cannot be parsed is imported right away. prewarm()
+    imports selected tools ahead of time, and the seconds spent importing each
+    module are recorded either way.
+    """
+
+    def __init__(self, tool_modules: Optional[Dict[str, Dict[str, Any]]] = None,
+                 tools_dir: str = TOOLS_DIR, lazy: bool = True):
+        """
+        Initialize the loader.
+
+        Args:
+            tool_modules (Optional[Dict[str, Dict[str, Any]]]): Tool name -> "module" and
+                "functions"; defaults to TOOL_MODULES
+            tools_dir (str): Directory holding the tool modules
+            lazy (bool): Defer imports until a tool function is first called
+        """
+        self.tool_modules = tool_modules if tool_modules is not None else TOOL_MODULES
+        self.tools_dir = tools_dir
+        self.lazy = lazy
+        self._lock = threading.Lock()
+        self.modules: Dict[str, types.ModuleType] = {}
+        self.import_seconds: Dict[str, float] = {}
+        self.metadata_seconds = 0.0
+        self.errors: Dict[str, str] = {}
+
+    def _ensure_path(self) -> None:
+        """Make the tool modules importable by their bare names."""
+        if self.tools_dir not in sys.path:
+            sys.path.append(self.tools_dir)
+
+    def load(self, tool_name: str) -> types.ModuleType:
+        """
+        Import the module of a tool, once.
+
+        Args:
+            tool_name (str): Name of the tool
+
+        Returns:
+            types.ModuleType: The imported module
+
+        Raises:
+            ImportError: If the module cannot be imported (the error is remembered and raised again)
+            KeyError: If the tool is unknown
+        """
+        module = self.modules.get(tool_name)
+        if module is not None:
+            return module
+        module_name = self.tool_modules[tool_name]["module"]
+        with self._lock:
+            if tool_name in self.modules:
+                return self.modules[tool_name]
+            if tool_name in self.errors:
+                raise ImportError(self.errors[tool_name])
+            self._ensure_path()
+            start = time.perf_counter()
+            try:
+                module = importlib.import_module(module_name)
+            except Exception as e:
+                self.errors[tool_name] = f"Could not import {module_name}: {str(e)}"
+                raise ImportError(self.errors[tool_name]) from e
+            self.import_seconds[tool_name] = time.perf_counter() - start
+            self.modules[tool_name] = module
+        if self.lazy:
+            print(f"Imported tool {tool_name} in {self.import_seconds[tool_name]:.3f}s")
+        return module
+
+    def resolve(self, tool_name: str, function_name: str) -> Callable:
+        """
+        Get the real function of a tool, importing its module if needed.
+
+        Args:
+            tool_name (str): Name of the tool
+            function_name (str): Name of the function
+
+        Returns:
+            Callable: The function
+
+        Raises:
+            ImportError: If the module cannot be imported or lacks the function
+        """
+        module = self.load(tool_name)
+        func = getattr(module, function_name, None)
+        if func is None:
+            raise ImportError(f"{module.__name__} has no function {function_name}")
+        return func
+
+    def _discover_lazy(self, tool_name: str, module_name: str, function_names: List[str]) -> Optional[Dict[str, Any]]:
+        """Describe a tool from its source, or return None if the source cannot be read."""
+        path = os.path.join(self.tools_dir, f"{module_name}.py")
+        start = time.perf_counter()
+        try:
+            metadata = read_metadata(path, module_name)
+        except (OSError, SyntaxError, ValueError) as e:
+            print(f"Could not read metadata of tool {tool_name}, importing it: {e}")
+            return None
+        finally:
+            self.metadata_seconds += time.perf_counter() - start
+        functions = {
+            name: LazyFunction(self, tool_name, name, *metadata.__signatures__[name])
+            for name in function_names if name in metadata.__signatures__
+        }
+        return {"module": metadata, "functions": functions}
+
+    def discover(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Discover the available tools and their functions.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Tool name -> "module" (the metadata stand-in in lazy mode)
+                and "functions" (name -> callable); tools with none of their functions are left out
+        """
+        tools = {}
+        for tool_name, tool_info in self.tool_modules.items():
+            tool = self._discover_lazy(tool_name, tool_info["module"], tool_info["functions"]) if self.lazy else None
+            if tool is None:
+                try:
+                    module = self.load(tool_name)
+                except ImportError as e:
+                    print(f"Could not load tool {tool_name}: {e}")
+                    continue
+                functions = {name: getattr(module, name) for name in tool_info["functions"] if hasattr(module, name)}
+                tool = {"module": module, "functions": functions}
+            if tool["functions"]:
+                tools[tool_name] = tool
+                state = "imported" if tool_name in self.modules else "registered"
+                print(f"Loaded tool: {tool_name} with {len(tool['functions'])} functions ({state})")
+        return tools
+
+    def prewarm(self, tool_names: Optional[Iterable[str]] = None) -> Dict[str, Union[float, str]]:
+        """
+        Import tools ahead of their first use.
+
+        Args:
+            tool_names (Optional[Iterable[str]]): Tools to import; defaults to all of them
+
+        Returns:
+            Dict[str, Union[float, str]]: Import seconds per tool (0.0 if it was already
+                imported), or an error string for unknown tools and failed imports
+        """
+        results: Dict[str, Union[float, str]] = {}
+        for tool_name in (tool_names if tool_names is not None else self.tool_modules):
+            if tool_name not in self.tool_modules:
+                results[tool_name] = f"Error: unknown tool '{tool_name}'"
+                continue
+            already = tool_name in self.modules
+            try:
+                self.load(tool_name)
+            except ImportError as e:
+                results[tool_name] = f"Error: {str(e)}"
+                continue
+            results[tool_name] = 0.0 if already else self.import_seconds[tool_name]
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get loading statistics.
+
+        Returns:
+            Dict[str, Any]: Whether loading is lazy, the seconds spent reading metadata, the
+                imported tools with their import seconds and total, and failed imports
+        """
+        with self._lock:
+            import_seconds = dict(self.import_seconds)
+            errors = dict(self.errors)
+        return {
+            "lazy": self.lazy,
+            "tools": len(self.tool_modules),
+            "imported": sorted(import_seconds),
+            "metadata_seconds": self.metadata_seconds,
+            "import_seconds": import_seconds,
+            "total_import_seconds": sum(import_seconds.values()),
+            "errors": errors
+        }
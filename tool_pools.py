@@ -0,0 +1,356 @@
+"""
+ToolPools module running chain step tool calls on dedicated, sized thread pools with per-tool concurrency limits.
+
+Tools are grouped into pool classes: "io" for tools that mostly wait on HTTP
+requests, and "parsing" for scrapers that spend their time in HTML parsing or
+calculations. Each class has its own thread pool, so a burst of slow scrapers
+cannot occupy the threads fast API tools need. Calls are additionally bounded by
+concurrency limits: one per rate-limited upstream service (Nominatim, Yahoo Finance,
+DuckDuckGo), shared by every tool calling it, and optionally one per tool. Chain
+steps over a limit wait on the event loop, not in a pool thread; the synchronous
+paths (execute_tool and prefetched calls) hold the same limits through limited().
+"""
+
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union
+
+from deadline import DeadlineExceeded, wait_timeout
+
+# Pool class of each tool; tools not listed use DEFAULT_POOL
+TOOL_POOL_CLASSES = {
+    "web_parser": "parsing",
+    "search": "parsing",
+    "air_quality": "parsing",
+    "astronomy": "parsing"
+}
+
+DEFAULT_POOL = "io"
+
+# Threads per pool class
+POOL_SIZES = {"io": 16, "parsing": 4}
+
+# Rate-limited upstream service each tool calls; astronomy geocodes through the geolocation tool
+TOOL_SERVICES = {
+    "geolocation": "nominatim",
+    "astronomy": "nominatim",
+    "stock": "yahoo_finance",
+    "search": "duckduckgo"
+}
+
+# Concurrent calls allowed per service, shared by all tools calling it
+SERVICE_CONCURRENCY = {
+    "nominatim": 1,  # Nominatim's usage policy allows one request at a time
+    "yahoo_finance": 2,
+    "duckduckgo": 2
+}
+
+# Concurrent calls allowed per tool, on top of its service's limit; tools not listed
+# are only bounded by their service and pool
+TOOL_CONCURRENCY = {
+    "air_quality": 2,
+    "web_parser": 4
+}
+
+
+class ConcurrencyLimit:
+    """
+    Limit on the concurrent calls of a tool or service, usable from any event loop or thread.
+
+    Waiters are served in arrival order; a released slot is handed directly
+    to the next waiter.
+    """
+
+    def __init__(self, limit: int):
+        """
+        Initialize the limit.
+
+        Args:
+            limit (int): Maximum concurrent calls
+        """
+        self.limit = limit
+        self.active = 0
+        self._waiters: Deque[Tuple[Optional[asyncio.AbstractEventLoop],
+                                   Union[asyncio.Future, concurrent.futures.Future]]] = deque()
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "max_waiting": 0}
+
+    async def acquire(self) -> None:
+        """
+        Wait for a slot, for at most the remaining time of the query's deadline.
+
+        Raises:
+            DeadlineExceeded: If the deadline passes before a slot is free
+        """
+        loop = asyncio.get_running_loop()
+        waiter = self._enqueue(lambda: (loop, loop.create_future()))
+        if waiter is None:
+            return
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter[1], wait_timeout())
+        except BaseException as e:
+            self._abandon(waiter, start)
+            if isinstance(e, asyncio.TimeoutError):
+                raise DeadlineExceeded("Deadline exceeded while waiting for a tool slot") from e
+            raise
+        self._waited(start)
+
+    def acquire_blocking(self) -> None:
+        """
+        Wait for a slot in the calling thread, for at most the remaining time of the query's deadline.
+
+        Raises:
+            DeadlineExceeded: If the deadline passes before a slot is free
+        """
+        waiter = self._enqueue(lambda: (None, concurrent.futures.Future()))
+        if waiter is None:
+            return
+        start = time.perf_counter()
+        try:
+            waiter[1].result(wait_timeout())
+        except BaseException as e:
+            self._abandon(waiter, start)
+            if isinstance(e, concurrent.futures.TimeoutError):
+                raise DeadlineExceeded("Deadline exceeded while waiting for a tool slot") from e
+            raise
+        self._waited(start)
+
+    def _enqueue(self, make_waiter: Callable[[], Tuple]) -> Optional[Tuple]:
+        """Take a free slot and return None, or queue and return a new waiter."""
+        with self._lock:
+            self.stats["acquired"] += 1
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return None
+            waiter = make_waiter()
+            self._waiters.append(waiter)
+            self.stats["waited"] += 1
+            self.stats["max_waiting"] = max(self.stats["max_waiting"], len(self._waiters))
+            return waiter
+
+    def _abandon(self, waiter: Tuple, start: float) -> None:
+        """Leave the queue after a failed wait."""
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            else:
+                # The slot was handed over as the wait ended; pass it on
+                self._release()
+        self._waited(start)
+
+    def _waited(self, start: float) -> None:
+        with self._lock:
+            self.stats["wait_seconds"] += time.perf_counter() - start
+
+    def release(self) -> None:
+        """Free a slot, handing it to the next waiter if there is one."""
+        with self._lock:
+            self._release()
+
+    def _release(self) -> None:
+        if self._waiters:
+            loop, future = self._waiters.popleft()
+            if loop is None:
+                future.set_result(None)
+            else:
+                loop.call_soon_threadsafe(_grant, future)
+        else:
+            self.active -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the limit's counters.
+
+        Returns:
+            Dict[str, Any]: Limit, active and waiting calls, calls that acquired a slot, calls
+                that had to wait, the longest queue and the seconds spent waiting
+        """
+        with self._lock:
+            return dict(self.stats, limit=self.limit, active=self.active, waiting=len(self._waiters))
+
+
+def _grant(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class ToolPool:
+    """A sized thread pool counting the calls queued and running on it."""
+
+    def __init__(self, name: str, size: int):
+        """
+        Initialize the pool.
+
+        Args:
+            name (str): Pool class name, used for the thread names
+            size (int): Number of threads
+        """
+        self.name = name
+        self.size = size
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"llmflow-tools-{name}")
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "started": 0, "finished": 0, "max_queued": 0, "queue_seconds": 0.0}
+
+    async def run(self, call: Callable[[], Any]) -> Any:
+        """
+        Run a call on the pool without blocking the event loop.
+
+        Args:
+            call (Callable[[], Any]): The call, with its context and arguments bound
+
+        Returns:
+            Any: The call's result
+        """
+        submitted = time.perf_counter()
+        with self._lock:
+            self.stats["submitted"] += 1
+            waiting = self.stats["submitted"] - self.stats["finished"] - self.size
+            self.stats["max_queued"] = max(self.stats["max_queued"], waiting)
+
+        def counted() -> Any:
+            with self._lock:
+                self.stats["started"] += 1
+                self.stats["queue_seconds"] += time.perf_counter() - submitted
+            try:
+                return call()
+            finally:
+                with self._lock:
+                    self.stats["finished"] += 1
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, counted)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the pool's queue depth and counters.
+
+        Returns:
+            Dict[str, Any]: Size, queued (submitted, not started) and running calls, the
+                deepest queue seen beyond the pool's threads, and the counters
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        stats["size"] = self.size
+        stats["queued"] = stats["submitted"] - stats["started"]
+        stats["running"] = stats["started"] - stats["finished"]
+        return stats
+
+
+class ToolPools:
+    """Dedicated thread pools per tool class and concurrency limits per service and tool."""
+
+    def __init__(self, pool_sizes: Optional[Dict[str, int]] = None,
+                 tool_classes: Optional[Dict[str, str]] = None,
+                 concurrency: Optional[Dict[str, Optional[int]]] = None,
+                 tool_services: Optional[Dict[str, str]] = None,
+                 service_concurrency: Optional[Dict[str, Optional[int]]] = None):
+        """
+        Initialize the pools.
+
+        Args:
+            pool_sizes (Optional[Dict[str, int]]): Pool class -> threads, overriding POOL_SIZES;
+                new class names add pools
+            tool_classes (Optional[Dict[str, str]]): Tool name -> pool class, overriding
+                TOOL_POOL_CLASSES
+            concurrency (Optional[Dict[str, Optional[int]]]): Tool name -> concurrent calls
+                allowed (None for no limit), overriding TOOL_CONCURRENCY
+            tool_services (Optional[Dict[str, str]]): Tool name -> upstream service whose limit
+                the tool shares, overriding TOOL_SERVICES
+            service_concurrency (Optional[Dict[str, Optional[int]]]): Service -> concurrent calls
+                allowed across its tools (None for no limit), overriding SERVICE_CONCURRENCY
+        """
+        sizes = {**POOL_SIZES, **(pool_sizes or {})}
+        self.pools = {name: ToolPool(name, size) for name, size in sizes.items()}
+        self.tool_classes = {**TOOL_POOL_CLASSES, **(tool_classes or {})}
+        for tool_name, pool_name in self.tool_classes.items():
+            if pool_name not in self.pools:
+                raise ValueError(f"Unknown pool class for {tool_name}: {pool_name}")
+        limits = {**TOOL_CONCURRENCY, **(concurrency or {})}
+        self.limits = {tool_name: ConcurrencyLimit(limit) for tool_name, limit in limits.items() if limit}
+        self.tool_services = {**TOOL_SERVICES, **(tool_services or {})}
+        service_limits = {**SERVICE_CONCURRENCY, **(service_concurrency or {})}
+        self.service_limits = {service: ConcurrencyLimit(limit)
+                               for service, limit in service_limits.items() if limit}
+
+    def pool_for(self, tool_name: str) -> ToolPool:
+        """Get the pool a tool's calls run on."""
+        return self.pools[self.tool_classes.get(tool_name, DEFAULT_POOL)]
+
+    def limits_for(self, tool_name: str) -> List[ConcurrencyLimit]:
+        """Get the limits a tool's calls hold, its service's first, so all callers acquire in one order."""
+        limits = [self.service_limits.get(self.tool_services.get(tool_name)), self.limits.get(tool_name)]
+        return [limit for limit in limits if limit is not None]
+
+    @contextlib.contextmanager
+    def limited(self, tool_name: str) -> Iterator[None]:
+        """
+        Hold the tool's concurrency limits around a call made in the calling thread.
+
+        Args:
+            tool_name (str): Name of the tool
+
+        Raises:
+            DeadlineExceeded: If the query's deadline passes while waiting for a slot
+        """
+        held = []
+        try:
+            for limit in self.limits_for(tool_name):
+                limit.acquire_blocking()
+                held.append(limit)
+            yield
+        finally:
+            for limit in reversed(held):
+                limit.release()
+
+    async def run(self, tool_name: str, func: Callable, *args: Any) -> Any:
+        """
+        Run a tool call on its pool once the concurrency limits of the tool and its service allow.
+
+        Args:
+            tool_name (str): Name of the tool, which picks the pool and the limits
+            func (Callable): The tool function
+            *args: Arguments for the function
+
+        Returns:
+            Any: The function's result
+
+        Raises:
+            DeadlineExceeded: If the query's deadline passes while waiting for a slot
+        """
+        held = []
+        try:
+            for limit in self.limits_for(tool_name):
+                await limit.acquire()
+                held.append(limit)
+            call = functools.partial(contextvars.copy_context().run, func, *args)
+            return await self.pool_for(tool_name).run(call)
+        finally:
+            for limit in reversed(held):
+                limit.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get queue depths of the pools and the per-service and per-tool limits.
+
+        Returns:
+            Dict[str, Any]: "pools" (class -> size, queued, running and counters),
+                "services" (service -> limit, active, waiting and counters) and "tools"
+                (tool -> the same for the tool's own limit)
+        """
+        return {
+            "pools": {name: pool.get_stats() for name, pool in self.pools.items()},
+            "services": {service: limit.get_stats() for service, limit in sorted(self.service_limits.items())},
+            "tools": {tool_name: limit.get_stats() for tool_name, limit in sorted(self.limits.items())}
+        }
+
+    def close(self) -> None:
+        """Release the pools' threads."""
+        for pool in self.pools.values():
+            pool.executor.shutdown(wait=False)
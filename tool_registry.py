@@ -0,0 +1,316 @@
+"""
+ToolRegistry module holding a precompiled call adapter for every tool function.
+
+The adapters are built once when the tools are discovered: each one keeps the
+parameter list, the argument counts, the type every argument is coerced to and
+a JSON schema of the arguments, so a call only checks and converts its
+arguments. Types come from the annotations (strings for tools described by the
+lazy loader) or, for unannotated parameters, from the default value.
+"""
+
+import inspect
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from tool_loader import NON_LITERAL
+
+# Annotation name -> coercion target
+TYPE_NAMES = {"str": str, "int": int, "float": float, "bool": bool}
+
+# Coercion target -> JSON schema type
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+
+TRUE_STRINGS = {"true", "yes", "y", "1", "on"}
+FALSE_STRINGS = {"false", "no", "n", "0", "off"}
+NULL_STRINGS = {"", "none", "null"}
+
+
+class ToolArgumentError(ValueError):
+    """Raised when the arguments of a tool call are missing, extra or of the wrong type."""
+
+
+def _parse_annotation(annotation: Any) -> Tuple[Optional[type], bool]:
+    """
+    Read the coercion target of an annotation.
+
+    Args:
+        annotation (Any): Annotation object or its source text
+
+    Returns:
+        Tuple[Optional[type], bool]: Scalar type (None if the annotation is not a plain scalar)
+            and whether None is accepted
+    """
+    if annotation is inspect.Parameter.empty:
+        return None, False
+    if isinstance(annotation, str):
+        text = annotation.replace(" ", "")
+        match = re.fullmatch(r"(?:typing\.)?Optional\[(.+)\]", text)
+        if match:
+            return TYPE_NAMES.get(match.group(1)), True
+        match = re.fullmatch(r"(?:typing\.)?Union\[(.+)\]", text)
+        members = match.group(1).split(",") if match else text.split("|")
+        if "None" in members and len(members) == 2:
+            members.remove("None")
+            return TYPE_NAMES.get(members[0]), True
+        return TYPE_NAMES.get(text), False
+    if annotation in JSON_TYPES:
+        return annotation, False
+    members = getattr(annotation, "__args__", None) or ()
+    if type(None) in members and len(members) == 2:
+        other = members[0] if members[1] is type(None) else members[1]
+        return (other if other in JSON_TYPES else None), True
+    return None, False
+
+
+def _coerce(value: Any, target: type) -> Any:
+    """Convert a value to a scalar type, raising ValueError if it does not represent one."""
+    if target is str:
+        return value if isinstance(value, str) else str(value)
+    if target is bool:
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in TRUE_STRINGS:
+            return True
+        if text in FALSE_STRINGS:
+            return False
+        raise ValueError("expected a boolean")
+    if isinstance(value, bool):
+        raise ValueError("expected a number")
+    number = float(value.strip().replace(",", "")) if isinstance(value, str) else float(value)
+    if target is int:
+        if not number.is_integer():
+            raise ValueError("expected an integer")
+        return int(number)
+    return number
+
+
+@dataclass
+class ToolParameter:
+    """A tool function parameter with its coercion target."""
+    name: str
+    kind: Any
+    required: bool
+    default: Any = None
+    type: Optional[type] = None
+    nullable: bool = False
+
+    def coerce(self, value: Any, function_name: str) -> Any:
+        """
+        Convert an argument to the parameter's type.
+
+        Args:
+            value (Any): The argument
+            function_name (str): Name of the function, used in error messages
+
+        Returns:
+            Any: The converted argument
+
+        Raises:
+            ToolArgumentError: If the argument cannot be converted
+        """
+        if value is None or (self.nullable and isinstance(value, str) and value.strip().lower() in NULL_STRINGS):
+            if self.nullable or not self.required:
+                return None
+            raise ToolArgumentError(f"Argument '{self.name}' of {function_name} must not be empty")
+        if self.type is None or type(value) is self.type:
+            return value
+        try:
+            return _coerce(value, self.type)
+        except (ValueError, TypeError, OverflowError) as e:
+            raise ToolArgumentError(
+                f"Argument '{self.name}' of {function_name} must be {JSON_TYPES[self.type]}, got {value!r}") from e
+
+    def schema(self) -> Dict[str, Any]:
+        """JSON schema of the parameter's value."""
+        schema: Dict[str, Any] = {}
+        if self.type is not None:
+            schema["type"] = [JSON_TYPES[self.type], "null"] if self.nullable else JSON_TYPES[self.type]
+        if not self.required and self.default is not NON_LITERAL:
+            schema["default"] = self.default
+        return schema
+
+
+class ToolAdapter:
+    """
+    Precompiled caller of one tool function.
+
+    bind() checks the argument count and coerces each argument, so calling
+    the function no longer needs inspect.signature.
+    """
+
+    def __init__(self, tool_name: str, function_name: str, func: Callable):
+        """
+        Compile the adapter from the function's signature.
+
+        Args:
+            tool_name (str): Name of the tool
+            function_name (str): Name of the function
+            func (Callable): The function, or its lazy proxy
+        """
+        self.tool_name = tool_name
+        self.function_name = function_name
+        self.func = func
+        try:
+            signature = inspect.signature(func)
+        except (TypeError, ValueError):
+            signature = inspect.Signature([inspect.Parameter("args", inspect.Parameter.VAR_POSITIONAL)])
+        self.parameters: List[ToolParameter] = []
+        self.var_positional = False
+        for param in signature.parameters.values():
+            if param.kind == param.VAR_POSITIONAL:
+                self.var_positional = True
+                continue
+            if param.kind in (param.VAR_KEYWORD, param.KEYWORD_ONLY):
+                continue
+            target, nullable = _parse_annotation(param.annotation)
+            required = param.default is param.empty
+            default = None if required else param.default
+            if target is None and not required and type(default) in JSON_TYPES:
+                target = type(default)
+            self.parameters.append(ToolParameter(param.name, param.kind, required, default, target,
+                                                 nullable or (not required and default is None)))
+        self.names = {param.name: index for index, param in enumerate(self.parameters)}
+        self.min_args = sum(1 for param in self.parameters if param.required)
+        self.max_args = None if self.var_positional else len(self.parameters)
+        self.schema = {
+            "type": "object",
+            "properties": {param.name: param.schema() for param in self.parameters},
+            "required": [param.name for param in self.parameters if param.required]
+        }
+
+    def bind(self, args: List[Any]) -> List[Any]:
+        """
+        Check and coerce positional arguments; extra arguments are dropped.
+
+        Args:
+            args (List[Any]): Arguments, e.g. as produced by the LLM
+
+        Returns:
+            List[Any]: Arguments to call the function with
+
+        Raises:
+            ToolArgumentError: If arguments are missing or cannot be coerced
+        """
+        if len(args) < self.min_args:
+            raise ToolArgumentError(
+                f"Not enough arguments for {self.function_name}, need at least {self.min_args}, got {len(args)}")
+        bound = [param.coerce(value, self.function_name) for param, value in zip(self.parameters, args)]
+        if self.var_positional:
+            bound.extend(args[len(self.parameters):])
+        return bound
+
+    def bind_params(self, params: Dict[str, Any]) -> List[Any]:
+        """
+        Check and coerce named arguments.
+
+        Parameters are matched by name when every key names one; otherwise the
+        values are taken positionally in order, as chain steps generated by the
+        LLM do not always use the parameter names.
+
+        Args:
+            params (Dict[str, Any]): Argument name -> value
+
+        Returns:
+            List[Any]: Positional arguments to call the function with
+
+        Raises:
+            ToolArgumentError: If arguments are missing or cannot be coerced
+        """
+        if not params or any(name not in self.names for name in params):
+            return self.bind(list(params.values()))
+        last = max(self.names[name] for name in params)
+        args = []
+        for param in self.parameters[:last + 1]:
+            if param.name in params:
+                args.append(params[param.name])
+            elif param.required:
+                raise ToolArgumentError(f"Missing argument '{param.name}' for {self.function_name}")
+            elif param.default is NON_LITERAL:
+                # The default cannot be passed positionally, so stop before it
+                raise ToolArgumentError(f"Argument '{param.name}' of {self.function_name} must be given "
+                                        f"to pass later arguments")
+            else:
+                args.append(param.default)
+        return self.bind(args)
+
+    def __call__(self, *args: Any) -> Any:
+        """Call the function with checked and coerced positional arguments."""
+        return self.func(*self.bind(list(args)))
+
+    def __repr__(self) -> str:
+        return f"<tool adapter {self.tool_name}.{self.function_name}>"
+
+
+class ToolRegistry:
+    """
+    Adapters of the discovered tool functions, compiled once.
+
+    The agent's tool dict stays the source of truth: adapter() recompiles an
+    adapter only when the function registered under its name was replaced.
+    """
+
+    def __init__(self, tools: Dict[str, Dict[str, Any]]):
+        """
+        Compile an adapter for every tool function.
+
+        Args:
+            tools (Dict[str, Dict[str, Any]]): Tools discovered by the agent (name -> module and functions)
+        """
+        self._lock = threading.Lock()
+        self.adapters: Dict[Tuple[str, str], ToolAdapter] = {}
+        for tool_name, tool_info in tools.items():
+            for function_name, func in tool_info.get("functions", {}).items():
+                self.adapters[(tool_name, function_name)] = ToolAdapter(tool_name, function_name, func)
+        self.compiled = len(self.adapters)
+
+    def adapter(self, tool_name: str, function_name: str, func: Callable) -> ToolAdapter:
+        """
+        Get the adapter of a tool function.
+
+        Args:
+            tool_name (str): Name of the tool
+            function_name (str): Name of the function
+            func (Callable): Function currently registered under the name
+
+        Returns:
+            ToolAdapter: The compiled adapter
+        """
+        key = (tool_name, function_name)
+        adapter = self.adapters.get(key)
+        if adapter is None or adapter.func is not func:
+            adapter = ToolAdapter(tool_name, function_name, func)
+            with self._lock:
+                self.adapters[key] = adapter
+                self.compiled += 1
+        return adapter
+
+    def functions(self, tools: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, ToolAdapter]]:
+        """
+        Get the adapters of the given tools, grouped by tool.
+
+        Args:
+            tools (Dict[str, Dict[str, Any]]): Tools discovered by the agent
+
+        Returns:
+            Dict[str, Dict[str, ToolAdapter]]: Tool name -> {function name: adapter}
+        """
+        return {
+            tool_name: {function_name: self.adapter(tool_name, function_name, func)
+                        for function_name, func in tool_info.get("functions", {}).items()}
+            for tool_name, tool_info in tools.items()
+        }
+
+    def schemas(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Get the JSON schema of the arguments of every function.
+
+        Returns:
+            Dict[str, Dict[str, Dict[str, Any]]]: Tool name -> {function name: schema}
+        """
+        schemas: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for (tool_name, function_name), adapter in list(self.adapters.items()):
+            schemas.setdefault(tool_name, {})[function_name] = adapter.schema
+        return schemas
@@ -10,6 +10,8 @@ from typing import Dict, List, Any, Optional, Union, Tuple
 from urllib.parse import quote, urlencode
 from datetime import datetime
 
+from deadline import pause, request_timeout
+
 class AirQualityTool:
     """
     Tool Name: Air Quality Information Tool
@@ -253,7 +255,7 @@ class AirQualityTool:
         try:
             headers = {"User-Agent": self.get_random_user_agent()}
             url = f"https://api.waqi.info/feed/{quote(city)}/?token=demo"
-            response = requests.get(url, headers=headers)
+            response = requests.get(url, headers=headers, timeout=request_timeout(10))
             response.raise_for_status()
             data = response.json()
             
@@ -307,8 +309,8 @@ class AirQualityTool:
         url = f"https://api.waqi.info/feed/geo:{lat};{lon}/?token=demo"
         
         try:
-            # Add randomized delay to avoid rate limiting
-            time.sleep(random.uniform(0.5, 2.0))
+            # Add randomized delay to avoid rate limiting, kept short when the query is running out of time
+            pause(random.uniform(0.5, 2.0))
             
             headers = {
                 "User-Agent": self.get_random_user_agent(),
@@ -316,7 +318,7 @@ class AirQualityTool:
                 "Referer": "https://waqi.info/"
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
+            response = requests.get(url, headers=headers, timeout=request_timeout(10))
             response.raise_for_status()
             
             data = response.json()
@@ -362,8 +364,8 @@ class AirQualityTool:
         url = f"https://www.iqair.com/air-quality-map/usa/{url_city}"
         
         try:
-            # Add randomized delay to avoid rate limiting
-            time.sleep(random.uniform(1.0, 3.0))
+            # Add randomized delay to avoid rate limiting, kept short when the query is running out of time
+            pause(random.uniform(1.0, 3.0))
             
             headers = {
                 "User-Agent": self.get_random_user_agent(),
@@ -375,7 +377,7 @@ class AirQualityTool:
                 "Upgrade-Insecure-Requests": "1"
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
+            response = requests.get(url, headers=headers, timeout=request_timeout(10))
             response.raise_for_status()
             
             # Parse HTML response
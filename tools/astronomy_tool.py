@@ -12,6 +12,9 @@ import json
 from dataclasses import dataclass
 from enum import Enum
 
+from deadline import request_timeout
+from tracing import cache_lookup
+
 # ---------------------------------------------------------------------------
 # Data structures for constellation and planet information
 # ---------------------------------------------------------------------------
@@ -401,7 +404,8 @@ class AstronomyTool:
         """Common cache wrapper used by the public fetchers."""
         now = time.time()
         # Ensure key exists before checking time
-        if key in self.cache and key in self.cache_time and (now - self.cache_time[key]) < self.cache_duration:
+        if cache_lookup("astronomy", key in self.cache and key in self.cache_time
+                        and (now - self.cache_time[key]) < self.cache_duration):
             logger.info("Using cached data for %s", key)
             # Ensure cached data is not empty before returning
             if self.cache[key]:
@@ -443,7 +447,7 @@ class AstronomyTool:
     def _safe_request(self, url: str, *, timeout: int = 15) -> Optional[requests.Response]: # Increased timeout
         """HTTP GET wrapper that never raises; returns *None* on failure."""
         try:
-            resp = requests.get(url, headers=self.headers, timeout=timeout)
+            resp = requests.get(url, headers=self.headers, timeout=request_timeout(timeout))
             resp.raise_for_status()  # Check for HTTP errors like 404, 500
             # Basic check for empty or minimal content
             if not resp.text or len(resp.text) < 100:
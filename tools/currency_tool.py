@@ -5,6 +5,38 @@ import json
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Union, Tuple
 
+from deadline import request_timeout
+from tracing import cache_lookup
+
+# Common currency names and symbols mapped to ISO 4217 codes
+CURRENCY_ALIASES = {
+    "DOLLAR": "USD",
+    "DOLLARS": "USD",
+    "US": "USD",
+    "EURO": "EUR",
+    "EUROS": "EUR",
+    "POUND": "GBP",
+    "POUNDS": "GBP",
+    "STERLING": "GBP",
+    "YEN": "JPY",
+    "YUAN": "CNY",
+    "RENMINBI": "CNY",
+    "FRANC": "CHF",
+    "FRANCS": "CHF",
+    "RUBLE": "RUB",
+    "RUBLES": "RUB",
+    "РУБ": "RUB",
+    "РУБЛЬ": "RUB",
+    "РУБЛЯ": "RUB",
+    "РУБЛЕЙ": "RUB",
+    "CANADIAN": "CAD",
+    "CAD$": "CAD",
+    "AUD$": "AUD",
+    "AUSTRALIAN": "AUD",
+    "CRYPTO": "BTC",
+    "BITCOIN": "BTC"
+}
+
 class CurrencyTool:
     """
     Tool Name: Currency Conversion Tool
@@ -183,37 +215,8 @@ class CurrencyTool:
         currency = currency.upper().strip()
         
         # Handle common variations
-        currency_mapping = {
-            "DOLLAR": "USD",
-            "DOLLARS": "USD",
-            "US": "USD",
-            "EURO": "EUR",
-            "EUROS": "EUR",
-            "POUND": "GBP",
-            "POUNDS": "GBP",
-            "STERLING": "GBP",
-            "YEN": "JPY",
-            "YUAN": "CNY",
-            "RENMINBI": "CNY",
-            "FRANC": "CHF",
-            "FRANCS": "CHF",
-            "RUBLE": "RUB",
-            "RUBLES": "RUB",
-            "РУБ": "RUB",
-            "РУБЛЬ": "RUB",
-            "РУБЛЯ": "RUB",
-            "РУБЛЕЙ": "RUB",
-            "CANADIAN": "CAD",
-            "CAD$": "CAD",
-            "AUD$": "AUD",
-            "AUSTRALIAN": "AUD",
-            "CRYPTO": "BTC",
-            "BITCOIN": "BTC"
-        }
-        
-        # Check if the currency is in our mapping
-        if currency in currency_mapping:
-            return currency_mapping[currency]
+        if currency in CURRENCY_ALIASES:
+            return CURRENCY_ALIASES[currency]
         
         # If it's a dollar sign with a country code, extract the code
         if currency.endswith("$"):
@@ -251,8 +254,8 @@ class CurrencyTool:
         """
         # Check if we have a fresh cache entry
         current_time = datetime.now().timestamp()
-        if (base_currency in self.exchange_rates_cache and 
-            current_time - self.cache_timestamp.get(base_currency, 0) < self.cache_expiry):
+        if cache_lookup("currency", base_currency in self.exchange_rates_cache and
+                        current_time - self.cache_timestamp.get(base_currency, 0) < self.cache_expiry):
             print(f"Using cached exchange rates for {base_currency}")
             return self.exchange_rates_cache[base_currency]
         
@@ -260,7 +263,7 @@ class CurrencyTool:
         try:
             print(f"Fetching exchange rates for {base_currency} from primary API")
             url = f"{self.exchange_rates_url}{base_currency}"
-            response = requests.get(url, timeout=10)
+            response = requests.get(url, timeout=request_timeout(10))
             response.raise_for_status()
             data = response.json()
             
@@ -282,7 +285,7 @@ class CurrencyTool:
                 # Try the backup API
                 print(f"Using backup API for {base_currency}")
                 params = {"base": base_currency}
-                response = requests.get(self.backup_api_url, params=params, timeout=10)
+                response = requests.get(self.backup_api_url, params=params, timeout=request_timeout(10))
                 response.raise_for_status()
                 data = response.json()
                 
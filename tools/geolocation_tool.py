@@ -8,6 +8,9 @@ from typing import Dict, List, Any, Optional, Union, Tuple
 import re
 from urllib.parse import quote
 
+from deadline import request_timeout
+from tracing import cache_lookup
+
 class GeolocationTool:
     """
     Tool Name: Geolocation Information Tool
@@ -87,8 +90,8 @@ class GeolocationTool:
         # Check cache
         cache_key = f"location:{location}"
         current_time = datetime.now().timestamp()
-        if (cache_key in self.location_cache and 
-            current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
+        if cache_lookup("geolocation", cache_key in self.location_cache and
+                        current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
             print(f"Using cached location data for {location}")
             return self.location_cache[cache_key]
         
@@ -108,7 +111,7 @@ class GeolocationTool:
                 self.geocoding_url, 
                 params=params, 
                 headers=self.headers,
-                timeout=10
+                timeout=request_timeout(10)
             )
             response.raise_for_status()
             
@@ -155,8 +158,8 @@ class GeolocationTool:
         # Check cache
         cache_key = f"reverse:{latitude},{longitude}"
         current_time = datetime.now().timestamp()
-        if (cache_key in self.location_cache and 
-            current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
+        if cache_lookup("geolocation", cache_key in self.location_cache and
+                        current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
             print(f"Using cached reverse geocoding data")
             return self.location_cache[cache_key]
         
@@ -176,7 +179,7 @@ class GeolocationTool:
                 self.reverse_geocoding_url, 
                 params=params, 
                 headers=self.headers,
-                timeout=10
+                timeout=request_timeout(10)
             )
             response.raise_for_status()
             
@@ -222,12 +225,11 @@ class GeolocationTool:
         reversed_cache_key = f"distance:{location2}|{location1}"
         current_time = datetime.now().timestamp()
         
-        if cache_key in self.location_cache and current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry:
-            print(f"Using cached distance data")
-            return self.location_cache[cache_key]
-        elif reversed_cache_key in self.location_cache and current_time - self.cache_timestamp.get(reversed_cache_key, 0) < self.cache_expiry:
-            print(f"Using cached reversed distance data")
-            return self.location_cache[reversed_cache_key]
+        fresh_keys = [key for key in (cache_key, reversed_cache_key)
+                      if key in self.location_cache and current_time - self.cache_timestamp.get(key, 0) < self.cache_expiry]
+        if cache_lookup("geolocation", fresh_keys):
+            print(f"Using cached {'distance' if fresh_keys[0] == cache_key else 'reversed distance'} data")
+            return self.location_cache[fresh_keys[0]]
         
         try:
             # Get coordinates for both locations
@@ -300,8 +302,8 @@ class GeolocationTool:
         # Check cache
         cache_key = f"nearby:{location}|{category}|{radius_km}"
         current_time = datetime.now().timestamp()
-        if (cache_key in self.location_cache and 
-            current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
+        if cache_lookup("geolocation", cache_key in self.location_cache and
+                        current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
             print(f"Using cached nearby places data")
             return self.location_cache[cache_key]
         
@@ -322,7 +324,7 @@ class GeolocationTool:
                 self.overpass_url,
                 data={"data": overpass_query},
                 headers=self.headers,
-                timeout=15
+                timeout=request_timeout(15)
             )
             response.raise_for_status()
             
@@ -7,6 +7,9 @@ from typing import Dict, List, Any, Optional, Union, Tuple
 import re
 import socket
 
+from deadline import request_timeout
+from tracing import cache_lookup
+
 class IPGeolocationTool:
     """
     Tool Name: IP Geolocation Tool
@@ -82,8 +85,8 @@ class IPGeolocationTool:
         # Check cache
         cache_key = f"ip:{ip_address}"
         current_time = datetime.now().timestamp()
-        if (cache_key in self.ip_cache and 
-            current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
+        if cache_lookup("ip_geolocation", cache_key in self.ip_cache and
+                        current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
             print(f"Using cached IP data for {ip_address}")
             return self.ip_cache[cache_key]
         
@@ -94,7 +97,7 @@ class IPGeolocationTool:
             response = requests.get(
                 api_url, 
                 headers=self.headers,
-                timeout=10
+                timeout=request_timeout(10)
             )
             response.raise_for_status()
             
@@ -122,7 +125,7 @@ class IPGeolocationTool:
                 response = requests.get(
                     backup_api_url, 
                     headers=self.headers,
-                    timeout=10
+                    timeout=request_timeout(10)
                 )
                 response.raise_for_status()
                 
@@ -157,7 +160,7 @@ class IPGeolocationTool:
         
         try:
             # Get current IP
-            response = requests.get(self.ipify_url, timeout=10)
+            response = requests.get(self.ipify_url, timeout=request_timeout(10))
             response.raise_for_status()
             
             data = response.json()
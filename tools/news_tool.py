@@ -10,6 +10,9 @@ import re
 import html
 from urllib.parse import quote
 
+from deadline import deadline_expired, request_timeout
+from tracing import cache_lookup
+
 class NewsTool:
     """
     Tool Name: News Information Tool
@@ -147,8 +150,8 @@ class NewsTool:
         # Use cached results if available and fresh
         cache_key = f"search:{query}:{max_results}:{is_russian}"
         current_time = datetime.now().timestamp()
-        if (cache_key in self.news_cache and 
-            current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
+        if cache_lookup("news", cache_key in self.news_cache and
+                        current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
             print(f"Using cached news results for {query}")
             return self.news_cache[cache_key]
         
@@ -177,8 +180,13 @@ class NewsTool:
         # Fetch and parse each feed
         for feed_url in feeds_to_search:
             try:
+                if deadline_expired():
+                    print("Out of time, using the feeds fetched so far")
+                    break
                 print(f"Fetching feed: {feed_url}")
-                feed_data = feedparser.parse(feed_url)
+                # Fetch with a timeout bounded by the query's deadline; feedparser would wait indefinitely
+                response = requests.get(feed_url, timeout=request_timeout(10))
+                feed_data = feedparser.parse(response.content)
                 
                 if feed_data.entries:
                     # Extract articles from this feed
@@ -269,8 +277,8 @@ class NewsTool:
         # Use cached results if available and fresh
         cache_key = f"headlines:{mapped_category}:{max_results}"
         current_time = datetime.now().timestamp()
-        if (cache_key in self.news_cache and 
-            current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
+        if cache_lookup("news", cache_key in self.news_cache and
+                        current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
             print(f"Using cached headlines for {mapped_category}")
             return self.news_cache[cache_key]
         
@@ -286,8 +294,13 @@ class NewsTool:
         # Fetch and parse each feed
         for feed_url in feeds:
             try:
+                if deadline_expired():
+                    print("Out of time, using the feeds fetched so far")
+                    break
                 print(f"Fetching feed: {feed_url}")
-                feed_data = feedparser.parse(feed_url)
+                # Fetch with a timeout bounded by the query's deadline; feedparser would wait indefinitely
+                response = requests.get(feed_url, timeout=request_timeout(10))
+                feed_data = feedparser.parse(response.content)
                 
                 if feed_data.entries:
                     # Extract articles from this feed
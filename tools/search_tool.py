@@ -12,6 +12,9 @@ import urllib.parse
 import json
 from typing import List, Dict, Union, Optional, Tuple, Any  # Added Any to the imports
 
+from deadline import DeadlineExceeded, budget_sleep, pause, request_timeout
+from tracing import cache_lookup
+
 class SearchTool:
     """
     Tool Name: Web Search Tool
@@ -172,7 +175,7 @@ class SearchTool:
         # Use cache if enabled
         if use_cache:
             cached_results = self.get_cached_results(query)
-            if cached_results is not None:
+            if cache_lookup("search", cached_results is not None):
                 limited_results = cached_results[:num_results] if num_results > 0 else cached_results
                 return {
                     "query": query,
@@ -284,8 +287,8 @@ class SearchTool:
         
         while retry_count < max_retries:
             try:
-                # Add a random delay to mimic human behavior
-                time.sleep(random.uniform(1.0, 3.0))
+                # Add a random delay to mimic human behavior, kept short when the query is running out of time
+                pause(random.uniform(1.0, 3.0))
                 
                 # Get a random user agent and set up headers
                 user_agent = self.get_random_user_agent()
@@ -305,7 +308,7 @@ class SearchTool:
                     url,
                     headers=headers,
                     cookies={"ax": str(random.randint(1, 9))},
-                    timeout=15
+                    timeout=request_timeout(15)
                 )
                 
                 # Check for success
@@ -314,7 +317,8 @@ class SearchTool:
                     if any(term in response.text.lower() for term in ["captcha", "blocked", "too many requests"]):
                         self.logger.warning("CAPTCHA or blocking detected. Retrying...")
                         retry_count += 1
-                        time.sleep(2 ** retry_count + random.uniform(1, 3))
+                        if not budget_sleep(2 ** retry_count + random.uniform(1, 3)):
+                            break
                         continue
                         
                     return response
@@ -323,7 +327,8 @@ class SearchTool:
                     # Too many requests or server error
                     self.logger.warning(f"Got status code {response.status_code}. Retrying...")
                     retry_count += 1
-                    time.sleep(2 ** retry_count + random.uniform(1, 3))
+                    if not budget_sleep(2 ** retry_count + random.uniform(1, 3)):
+                        break
                 else:
                     self.logger.error(f"Error: Got status code {response.status_code}")
                     return None
@@ -331,7 +336,8 @@ class SearchTool:
             except requests.exceptions.RequestException as e:
                 self.logger.warning(f"Request error: {e}")
                 retry_count += 1
-                time.sleep(2 ** retry_count + random.uniform(1, 3))
+                if isinstance(e, DeadlineExceeded) or not budget_sleep(2 ** retry_count + random.uniform(1, 3)):
+                    break
                 
             except Exception as e:
                 self.logger.error(f"Unexpected error: {e}")
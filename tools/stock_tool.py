@@ -14,6 +14,9 @@ import random
 import hashlib
 import math
 
+from deadline import DeadlineExceeded, budget_sleep, pause, request_timeout
+from tracing import cache_lookup
+
 class StockTool:
     """
     Tool Name: Stock Market Information Tool
@@ -249,7 +252,8 @@ class StockTool:
         if time_since_last_call < self.min_request_interval:
             sleep_time = self.min_request_interval - time_since_last_call
             print(f"Rate limiting: Sleeping for {sleep_time:.2f} seconds")
-            time.sleep(sleep_time)
+            if not budget_sleep(sleep_time):
+                raise DeadlineExceeded(f"{api_name} rate limit wait exceeds the query's deadline")
         
         # Update last call time
         self.last_api_call_time = time.time()
@@ -260,7 +264,7 @@ class StockTool:
         
         while retries <= self.max_retries:
             try:
-                response = requests.get(url, params=params, headers=headers, timeout=timeout)
+                response = requests.get(url, params=params, headers=headers, timeout=request_timeout(timeout))
                 
                 # Print response details for debugging
                 print(f"API Request: {url}")
@@ -275,7 +279,8 @@ class StockTool:
                     # Calculate exponential backoff with jitter
                     sleep_time = retry_delay * (1.5 ** retries) + (random.random() * 2.0)
                     print(f"Rate limit hit. Retrying in {sleep_time:.2f} seconds... (attempt {retries}/{self.max_retries})")
-                    time.sleep(sleep_time)
+                    if not budget_sleep(sleep_time):
+                        raise DeadlineExceeded(f"{api_name} rate limited and the query is out of time")
                     continue
                 
                 # For other errors, raise the exception
@@ -294,6 +299,9 @@ class StockTool:
                     raise Exception(f"{api_name} returned invalid JSON")
                 
             except Exception as e:
+                # Out of time: fail now so the caller can fall back, instead of retrying
+                if isinstance(e, DeadlineExceeded):
+                    raise
                 retries += 1
                 if retries > self.max_retries:
                     raise Exception(f"{api_name} request failed after {self.max_retries} retries: {str(e)}")
@@ -301,7 +309,8 @@ class StockTool:
                 # Calculate exponential backoff with jitter
                 sleep_time = retry_delay * (1.5 ** retries) + (random.random() * 2.0)
                 print(f"Request error: {str(e)}. Retrying in {sleep_time:.2f} seconds... (attempt {retries}/{self.max_retries})")
-                time.sleep(sleep_time)
+                if not budget_sleep(sleep_time):
+                    raise DeadlineExceeded(f"{api_name} request failed and the query is out of time: {str(e)}")
     
     def get_stock_quote(self, symbol: str, use_fallback: bool = False) -> Dict[str, Any]:
         """
@@ -325,7 +334,7 @@ class StockTool:
             # Check cache first
             cache_key = f"quote_{symbol}"
             cached_data = self._get_from_cache(cache_key)
-            if cached_data:
+            if cache_lookup("stock", cached_data):
                 return cached_data
             
             # Alpha Vantage API for Global Quote
@@ -442,7 +451,7 @@ class StockTool:
             # Check cache first
             cache_key = f"company_{symbol}"
             cached_data = self._get_from_cache(cache_key)
-            if cached_data:
+            if cache_lookup("stock", cached_data):
                 return cached_data
                 
             # Get basic stock info first
@@ -530,7 +539,7 @@ class StockTool:
             # Check cache first
             cache_key = f"historical_{symbol}_{period}"
             cached_data = self._get_from_cache(cache_key)
-            if cached_data:
+            if cache_lookup("stock", cached_data):
                 return cached_data
                 
             # Map period to Yahoo Finance interval and range
@@ -754,8 +763,8 @@ class StockTool:
                             "52_week_range": f"{base_price * 0.8:.2f} - {base_price * 1.2:.2f}",
                         })
                         
-                    # Sleep to avoid hitting rate limits
-                    time.sleep(0.5)
+                    # Sleep to avoid hitting rate limits, kept short when the query is running out of time
+                    pause(0.5)
                     
                 except Exception as e:
                     error_count += 1
@@ -984,7 +993,7 @@ class StockTool:
             # Check cache first
             cache_key = f"search_{query}_{limit}"
             cached_data = self._get_from_cache(cache_key)
-            if cached_data:
+            if cache_lookup("stock", cached_data):
                 return cached_data
                 
             # Prepare API request
@@ -8,6 +8,141 @@ from dateutil import parser
 from dateutil.relativedelta import relativedelta
 import calendar
 
+from tracing import cache_lookup
+
+# Popular city to timezone mappings
+CITY_TIMEZONES = {
+    # North America
+    "new york": "America/New_York",
+    "los angeles": "America/Los_Angeles",
+    "chicago": "America/Chicago",
+    "toronto": "America/Toronto",
+    "vancouver": "America/Vancouver",
+    "mexico city": "America/Mexico_City",
+    "havana": "America/Havana",
+    "denver": "America/Denver",
+    "phoenix": "America/Phoenix",
+    "anchorage": "America/Anchorage",
+    "honolulu": "Pacific/Honolulu",
+    
+    # South America
+    "sao paulo": "America/Sao_Paulo",
+    "buenos aires": "America/Argentina/Buenos_Aires",
+    "rio de janeiro": "America/Sao_Paulo",
+    "bogota": "America/Bogota",
+    "lima": "America/Lima",
+    "santiago": "America/Santiago",
+    
+    # Europe
+    "london": "Europe/London",
+    "paris": "Europe/Paris",
+    "berlin": "Europe/Berlin",
+    "rome": "Europe/Rome",
+    "madrid": "Europe/Madrid",
+    "amsterdam": "Europe/Amsterdam",
+    "brussels": "Europe/Brussels",
+    "zurich": "Europe/Zurich",
+    "stockholm": "Europe/Stockholm",
+    "oslo": "Europe/Oslo",
+    "copenhagen": "Europe/Copenhagen",
+    "helsinki": "Europe/Helsinki",
+    "vienna": "Europe/Vienna",
+    "athens": "Europe/Athens",
+    "moscow": "Europe/Moscow",
+    "dublin": "Europe/Dublin",
+    "warsaw": "Europe/Warsaw",
+    "budapest": "Europe/Budapest",
+    "prague": "Europe/Prague",
+    "istanbul": "Europe/Istanbul",
+    "kiev": "Europe/Kiev",
+    "kyiv": "Europe/Kiev",
+    
+    # Asia
+    "tokyo": "Asia/Tokyo",
+    "beijing": "Asia/Shanghai",
+    "shanghai": "Asia/Shanghai",
+    "hong kong": "Asia/Hong_Kong",
+    "singapore": "Asia/Singapore",
+    "seoul": "Asia/Seoul",
+    "bangkok": "Asia/Bangkok",
+    "mumbai": "Asia/Kolkata",
+    "delhi": "Asia/Kolkata",
+    "kolkata": "Asia/Kolkata",
+    "karachi": "Asia/Karachi",
+    "dubai": "Asia/Dubai",
+    "manila": "Asia/Manila",
+    "jakarta": "Asia/Jakarta",
+    "kuala lumpur": "Asia/Kuala_Lumpur",
+    "taipei": "Asia/Taipei",
+    "ho chi minh city": "Asia/Ho_Chi_Minh",
+    "yangon": "Asia/Yangon",
+    "dhaka": "Asia/Dhaka",
+    "riyadh": "Asia/Riyadh",
+    "tehran": "Asia/Tehran",
+    "Baghdad": "Asia/Baghdad",
+    
+    # Africa
+    "cairo": "Africa/Cairo",
+    "johannesburg": "Africa/Johannesburg",
+    "nairobi": "Africa/Nairobi",
+    "lagos": "Africa/Lagos",
+    "casablanca": "Africa/Casablanca",
+    "tunis": "Africa/Tunis",
+    "algiers": "Africa/Algiers",
+    "khartoum": "Africa/Khartoum",
+    "accra": "Africa/Accra",
+    "addis ababa": "Africa/Addis_Ababa",
+    
+    # Oceania
+    "sydney": "Australia/Sydney",
+    "melbourne": "Australia/Melbourne",
+    "perth": "Australia/Perth",
+    "brisbane": "Australia/Brisbane",
+    "auckland": "Pacific/Auckland",
+    "wellington": "Pacific/Auckland",
+    "fiji": "Pacific/Fiji",
+    "adelaide": "Australia/Adelaide",
+    "hobart": "Australia/Hobart",
+    
+    # Russian cities
+    "saint petersburg": "Europe/Moscow",
+    "санкт-петербург": "Europe/Moscow",
+    "москва": "Europe/Moscow",
+    "novosibirsk": "Asia/Novosibirsk",
+    "новосибирск": "Asia/Novosibirsk",
+    "yekaterinburg": "Asia/Yekaterinburg",
+    "екатеринбург": "Asia/Yekaterinburg",
+    "vladivostok": "Asia/Vladivostok",
+    "владивосток": "Asia/Vladivostok",
+    "irkutsk": "Asia/Irkutsk",
+    "иркутск": "Asia/Irkutsk",
+}
+
+# Timezone abbreviations accepted in place of a city
+TIMEZONE_ABBREVIATIONS = {
+    "utc": "UTC",
+    "gmt": "UTC",
+    "est": "America/New_York",
+    "edt": "America/New_York",
+    "cst": "America/Chicago",
+    "cdt": "America/Chicago",
+    "mst": "America/Denver",
+    "mdt": "America/Denver",
+    "pst": "America/Los_Angeles",
+    "pdt": "America/Los_Angeles",
+    "bst": "Europe/London",
+    "cet": "Europe/Paris",
+    "cest": "Europe/Paris",
+    "jst": "Asia/Tokyo",
+    "ist": "Asia/Kolkata",
+    "aest": "Australia/Sydney",
+    "aedt": "Australia/Sydney",
+    "awst": "Australia/Perth",
+    "nzst": "Pacific/Auckland",
+    "nzdt": "Pacific/Auckland"
+}
+
+
 class TimeTool:
     """
     Tool Name: Time Information Tool
@@ -45,135 +180,8 @@ class TimeTool:
     
     def __init__(self):
         """Initialize the TimeTool with timezone mappings."""
-        # Popular city to timezone mappings
-        self.city_to_timezone = {
-            # North America
-            "new york": "America/New_York",
-            "los angeles": "America/Los_Angeles",
-            "chicago": "America/Chicago",
-            "toronto": "America/Toronto",
-            "vancouver": "America/Vancouver",
-            "mexico city": "America/Mexico_City",
-            "havana": "America/Havana",
-            "denver": "America/Denver",
-            "phoenix": "America/Phoenix",
-            "anchorage": "America/Anchorage",
-            "honolulu": "Pacific/Honolulu",
-            
-            # South America
-            "sao paulo": "America/Sao_Paulo",
-            "buenos aires": "America/Argentina/Buenos_Aires",
-            "rio de janeiro": "America/Sao_Paulo",
-            "bogota": "America/Bogota",
-            "lima": "America/Lima",
-            "santiago": "America/Santiago",
-            
-            # Europe
-            "london": "Europe/London",
-            "paris": "Europe/Paris",
-            "berlin": "Europe/Berlin",
-            "rome": "Europe/Rome",
-            "madrid": "Europe/Madrid",
-            "amsterdam": "Europe/Amsterdam",
-            "brussels": "Europe/Brussels",
-            "zurich": "Europe/Zurich",
-            "stockholm": "Europe/Stockholm",
-            "oslo": "Europe/Oslo",
-            "copenhagen": "Europe/Copenhagen",
-            "helsinki": "Europe/Helsinki",
-            "vienna": "Europe/Vienna",
-            "athens": "Europe/Athens",
-            "moscow": "Europe/Moscow",
-            "dublin": "Europe/Dublin",
-            "warsaw": "Europe/Warsaw",
-            "budapest": "Europe/Budapest",
-            "prague": "Europe/Prague",
-            "istanbul": "Europe/Istanbul",
-            "kiev": "Europe/Kiev",
-            "kyiv": "Europe/Kiev",
-            
-            # Asia
-            "tokyo": "Asia/Tokyo",
-            "beijing": "Asia/Shanghai",
-            "shanghai": "Asia/Shanghai",
-            "hong kong": "Asia/Hong_Kong",
-            "singapore": "Asia/Singapore",
-            "seoul": "Asia/Seoul",
-            "bangkok": "Asia/Bangkok",
-            "mumbai": "Asia/Kolkata",
-            "delhi": "Asia/Kolkata",
-            "kolkata": "Asia/Kolkata",
-            "karachi": "Asia/Karachi",
-            "dubai": "Asia/Dubai",
-            "manila": "Asia/Manila",
-            "jakarta": "Asia/Jakarta",
-            "kuala lumpur": "Asia/Kuala_Lumpur",
-            "taipei": "Asia/Taipei",
-            "ho chi minh city": "Asia/Ho_Chi_Minh",
-            "yangon": "Asia/Yangon",
-            "dhaka": "Asia/Dhaka",
-            "riyadh": "Asia/Riyadh",
-            "tehran": "Asia/Tehran",
-            "Baghdad": "Asia/Baghdad",
-            
-            # Africa
-            "cairo": "Africa/Cairo",
-            "johannesburg": "Africa/Johannesburg",
-            "nairobi": "Africa/Nairobi",
-            "lagos": "Africa/Lagos",
-            "casablanca": "Africa/Casablanca",
-            "tunis": "Africa/Tunis",
-            "algiers": "Africa/Algiers",
-            "khartoum": "Africa/Khartoum",
-            "accra": "Africa/Accra",
-            "addis ababa": "Africa/Addis_Ababa",
-            
-            # Oceania
-            "sydney": "Australia/Sydney",
-            "melbourne": "Australia/Melbourne",
-            "perth": "Australia/Perth",
-            "brisbane": "Australia/Brisbane",
-            "auckland": "Pacific/Auckland",
-            "wellington": "Pacific/Auckland",
-            "fiji": "Pacific/Fiji",
-            "adelaide": "Australia/Adelaide",
-            "hobart": "Australia/Hobart",
-            
-            # Russian cities
-            "saint petersburg": "Europe/Moscow",
-            "санкт-петербург": "Europe/Moscow",
-            "москва": "Europe/Moscow",
-            "novosibirsk": "Asia/Novosibirsk",
-            "новосибирск": "Asia/Novosibirsk",
-            "yekaterinburg": "Asia/Yekaterinburg",
-            "екатеринбург": "Asia/Yekaterinburg",
-            "vladivostok": "Asia/Vladivostok",
-            "владивосток": "Asia/Vladivostok",
-            "irkutsk": "Asia/Irkutsk",
-            "иркутск": "Asia/Irkutsk",
-            
-            # Common UTC offsets
-            "utc": "UTC",
-            "gmt": "UTC",
-            "est": "America/New_York",
-            "edt": "America/New_York",
-            "cst": "America/Chicago",
-            "cdt": "America/Chicago",
-            "mst": "America/Denver",
-            "mdt": "America/Denver",
-            "pst": "America/Los_Angeles",
-            "pdt": "America/Los_Angeles",
-            "bst": "Europe/London",
-            "cet": "Europe/Paris",
-            "cest": "Europe/Paris",
-            "jst": "Asia/Tokyo",
-            "ist": "Asia/Kolkata",
-            "aest": "Australia/Sydney",
-            "aedt": "Australia/Sydney",
-            "awst": "Australia/Perth",
-            "nzst": "Pacific/Auckland",
-            "nzdt": "Pacific/Auckland"
-        }
+        # Popular city to timezone mappings plus common abbreviations
+        self.city_to_timezone = {**CITY_TIMEZONES, **TIMEZONE_ABBREVIATIONS}
         
         # Use pytz for timezone data
         self.all_timezones = pytz.all_timezones
@@ -505,7 +513,7 @@ class TimeTool:
             return None
             
         # Check cache first
-        if location in self.timezone_cache:
+        if cache_lookup("time", location in self.timezone_cache):
             return self.timezone_cache[location]
         
         # Normalize the location string
@@ -6,6 +6,9 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional, Union, Tuple
 import os
 
+from deadline import request_timeout
+from tracing import cache_lookup
+
 class WeatherTool:
     """
     Tool Name: Weather Information Tool
@@ -59,12 +62,11 @@ class WeatherTool:
         print(f"Getting weather for location: {location}")
         try:
             # Check cache first
-            if location in self.cache:
-                cache_data = self.cache[location]
-                cache_time = datetime.fromisoformat(cache_data['timestamp'])
-                if (datetime.now() - cache_time).total_seconds() < self.cache_expiry:
-                    print(f"Using cached weather data for {location}")
-                    return cache_data
+            cache_data = self.cache.get(location)
+            if cache_lookup("weather", cache_data is not None and
+                            (datetime.now() - datetime.fromisoformat(cache_data['timestamp'])).total_seconds() < self.cache_expiry):
+                print(f"Using cached weather data for {location}")
+                return cache_data
 
             # Get coordinates
             coords = self._get_coordinates(location)
@@ -79,7 +81,7 @@ class WeatherTool:
                 'daily': ['temperature_2m_max', 'temperature_2m_min', 'precipitation_probability_max'],
                 'timezone': 'auto'
             }
-            response = requests.get(self.api_url, params=params, timeout=10)
+            response = requests.get(self.api_url, params=params, timeout=request_timeout(10))
             response.raise_for_status()
             data = response.json()
 
@@ -118,7 +120,7 @@ class WeatherTool:
                 'format': 'json'
             }
             
-            response = requests.get(self.geocoding_url, params=params, timeout=10)
+            response = requests.get(self.geocoding_url, params=params, timeout=request_timeout(10))
             response.raise_for_status()
             data = response.json()
             
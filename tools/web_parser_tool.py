@@ -8,6 +8,8 @@ import re
 from readability import Document
 from typing import Dict, List, Any, Optional, Union, Tuple
 
+from deadline import request_timeout
+
 class WebParserTool:
     """
     Tool Name: Web Content Parser Tool
@@ -80,7 +82,7 @@ class WebParserTool:
             str: Extracted content or error message
         """
         try:
-            response = requests.get(url, headers=self.headers, timeout=15)
+            response = requests.get(url, headers=self.headers, timeout=request_timeout(15))
             response.raise_for_status()
             soup = BeautifulSoup(response.text, 'html.parser')
             
@@ -150,7 +152,7 @@ class WebParserTool:
             str: Extracted content or error message
         """
         try:
-            response = requests.get(url, headers=self.headers, timeout=15)
+            response = requests.get(url, headers=self.headers, timeout=request_timeout(15))
             response.raise_for_status()
             
             doc = Document(response.text)
@@ -179,7 +181,7 @@ class WebParserTool:
             str: Extracted content or error message
         """
         try:
-            response = requests.get(url, headers=self.headers, timeout=15)
+            response = requests.get(url, headers=self.headers, timeout=request_timeout(15))
             response.raise_for_status()
             
             soup = BeautifulSoup(response.text, 'html.parser')
@@ -294,7 +296,7 @@ class WebParserTool:
         
         # First try with Readability - usually gives the best result
         try:
-            response = requests.get(url, headers=self.headers, timeout=15)
+            response = requests.get(url, headers=self.headers, timeout=request_timeout(15))
             response.raise_for_status()
             
             doc = Document(response.text)
@@ -360,7 +362,7 @@ class WebParserTool:
             
             # Try to get title
             try:
-                response = requests.get(url, headers=self.headers, timeout=15)
+                response = requests.get(url, headers=self.headers, timeout=request_timeout(15))
                 soup = BeautifulSoup(response.text, 'html.parser')
                 title = soup.title.string if soup.title else "Unknown Title"
             except:
@@ -8,6 +8,9 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional, Union, Tuple
 from urllib.parse import quote, urlencode
 
+from deadline import request_timeout
+from tracing import cache_lookup
+
 class WikipediaTool:
     """
     Tool Name: Wikipedia Information Tool
@@ -82,7 +85,7 @@ class WikipediaTool:
         url = self.api_base_url.format(lang=lang) + '?' + urlencode(params)
         # Make the request
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = requests.get(url, headers=self.headers, timeout=request_timeout(10))
         except Exception as e:
             raise Exception(f"Failed to connect to Wikipedia: {e}")
         # Process response
@@ -125,8 +128,8 @@ class WikipediaTool:
         # Check cache
         cache_key = f"summary:{lang}:{title}"
         current_time = datetime.now().timestamp()
-        if (cache_key in self.cache and 
-            current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
+        if cache_lookup("wikipedia", cache_key in self.cache and
+                        current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
             print(f"Using cached summary for {title}")
             return self.cache[cache_key]
         
@@ -193,7 +196,7 @@ class WikipediaTool:
             lang = language if language else self.language
             params = {'action': 'query', 'prop': 'extracts', 'pageids': pageid, 'format': 'json', 'explaintext': '1'}
             url = self.api_base_url.format(lang=lang) + '?' + urlencode(params)
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = requests.get(url, headers=self.headers, timeout=request_timeout(10))
             response.raise_for_status()
             data = response.json()
             pages = data.get('query', {}).get('pages', {})
@@ -217,8 +220,8 @@ class WikipediaTool:
         # Check cache
         cache_key = f"content:{lang}:{title}:{sections or 'full'}"
         current_time = datetime.now().timestamp()
-        if (cache_key in self.cache and 
-            current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
+        if cache_lookup("wikipedia", cache_key in self.cache and
+                        current_time - self.cache_timestamp.get(cache_key, 0) < self.cache_expiry):
             print(f"Using cached content for {title}")
             return self.cache[cache_key]
         
@@ -305,7 +308,7 @@ class WikipediaTool:
         
         # Make the API request
         url = self.api_base_url.format(lang=language)
-        response = requests.get(url, params=params, headers=self.headers, timeout=10)
+        response = requests.get(url, params=params, headers=self.headers, timeout=request_timeout(10))
         response.raise_for_status()
         
         data = response.json()
@@ -577,7 +580,8 @@ class WikipediaTool:
     def _get_cached_article(self, pageid: int) -> Optional[Dict[str, Any]]:
         """Retrieve cached article content by pageid."""
         key = f"article:{pageid}"
-        if key in self.cache and datetime.now().timestamp() - self.cache_timestamp.get(key, 0) < self.cache_expiry:
+        if cache_lookup("wikipedia", key in self.cache and
+                        datetime.now().timestamp() - self.cache_timestamp.get(key, 0) < self.cache_expiry):
             return self.cache[key]
         return None
 
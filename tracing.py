@@ -0,0 +1,383 @@
+"""
+Tracing module recording spans around the hot path: LLM calls, tool calls, HTTP requests and cache lookups.
+
+Spans nest through a context variable, which run_blocking copies into worker
+threads, so every span of a query carries the query's trace id and its
+parent's span id. Finished spans are appended to a JSON-lines file and
+aggregated into per-span latency histograms and cache hit/miss counters,
+served in the Prometheus text format by prometheus().
+
+Tracing is off by default. While it is off, span() returns a shared no-op
+span after a single attribute check, and cache_lookup() only returns its
+argument, so the instrumented code pays next to nothing.
+"""
+
+import contextvars
+import functools
+import json
+import random
+import threading
+import time
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Upper bounds in seconds of the span duration histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Span attributes that become Prometheus labels; their values must come from a small set
+METRIC_LABELS = ("stage", "tool", "host")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class NoopSpan:
+    """Span handed out while tracing is disabled; every operation does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def fail(self, message: str) -> None:
+        pass
+
+    def cancel(self) -> None:
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+# Span of the code being run; copied into worker threads by run_blocking
+_current_span: contextvars.ContextVar = contextvars.ContextVar("llmflow_span", default=None)
+
+
+def _new_id(size: int) -> str:
+    """Random hex id of size bytes; ids need to be unique, not unpredictable."""
+    return f"{random.getrandbits(size * 8):0{size * 2}x}"
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "attributes", "status",
+                 "start_time", "duration", "_start", "_activate", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any], activate: bool = True):
+        """
+        Create a span as a child of the current one.
+
+        Args:
+            tracer (Tracer): Tracer the span is reported to when it ends
+            name (str): Operation name
+            attributes (Dict[str, Any]): Details of the operation
+            activate (bool): Make the span the parent of spans started inside it; generators
+                yielding inside the span must pass False, as they resume in their caller's context
+        """
+        parent = _current_span.get()
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else _new_id(16)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = _new_id(8)
+        self.attributes = attributes
+        self.status = "ok"
+        self.start_time = time.time()
+        self.duration = 0.0
+        self._start = time.perf_counter()
+        self._activate = activate
+        self._token = None
+
+    def __enter__(self) -> "Span":
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        if self._activate:
+            self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.duration = time.perf_counter() - self._start
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+        if exc_type is GeneratorExit:
+            self.status = "cancelled"
+        elif exc is not None and self.status == "ok":
+            self.fail(f"{exc_type.__name__}: {exc}")
+        self.tracer.finish(self)
+        return False
+
+    def set(self, **attributes: Any) -> None:
+        """Add or update attributes of the span."""
+        self.attributes.update(attributes)
+
+    def fail(self, message: str) -> None:
+        """Mark the span as failed, e.g. when the operation returns an error instead of raising it."""
+        self.status = "error"
+        self.attributes["error"] = message
+
+    def cancel(self) -> None:
+        """Mark the span as abandoned on purpose, e.g. a cancelled speculative draft."""
+        self.status = "cancelled"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the span as a JSON-serializable record."""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_time,
+            "duration": self.duration,
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+
+class Tracer:
+    """
+    Collector of finished spans.
+
+    Writes each span to the JSON-lines file, if one is configured, and keeps
+    per-span duration histograms, error counts and cache lookup counters.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path: Optional[str] = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+        self._errors: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], int] = {}
+        self._cache_lookups: Dict[Tuple[str, str], int] = {}
+        self.stats = {"spans": 0, "errors": 0, "written": 0, "write_errors": 0}
+
+    def enable(self, path: Optional[str] = None) -> None:
+        """
+        Start tracing.
+
+        Args:
+            path (Optional[str]): JSON-lines file spans are appended to; None only aggregates them
+        """
+        with self._lock:
+            if path is not None and path != self.path:
+                if self._file is not None:
+                    self._file.close()
+                self._file = open(path, "a", encoding="utf-8", buffering=1)
+                self.path = path
+            self.enabled = True
+        instrument_requests()
+
+    def disable(self) -> None:
+        """Stop tracing and close the trace file; aggregates are kept."""
+        with self._lock:
+            self.enabled = False
+            if self._file is not None:
+                self._file.close()
+            self._file = None
+            self.path = None
+
+    def reset(self) -> None:
+        """Drop the aggregated metrics."""
+        with self._lock:
+            self._histograms.clear()
+            self._errors.clear()
+            self._cache_lookups.clear()
+            self.stats = dict.fromkeys(self.stats, 0)
+
+    def span(self, name: str, activate: bool = True, **attributes: Any):
+        """Start a span on this tracer; see the module-level span()."""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes, activate)
+
+    def finish(self, span: Span) -> None:
+        """Record a finished span."""
+        key = (span.name, tuple((label, str(span.attributes[label]))
+                                for label in METRIC_LABELS if span.attributes.get(label) is not None))
+        with self._lock:
+            buckets = self._histograms.get(key)
+            if buckets is None:
+                # One count per bucket, then the +Inf count and the sum
+                buckets = self._histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            for index, bound in enumerate(BUCKETS):
+                if span.duration <= bound:
+                    buckets[index] += 1
+            buckets[-2] += 1
+            buckets[-1] += span.duration
+            self.stats["spans"] += 1
+            if span.status == "error":
+                self._errors[key] = self._errors.get(key, 0) + 1
+                self.stats["errors"] += 1
+            self._write(span)
+
+    def record_cache_lookup(self, cache: str, hit: bool, attributes: Dict[str, Any]) -> None:
+        """Count a cache lookup and write it to the trace as an instant span."""
+        span = Span(self, "cache_lookup", dict(attributes, cache=cache, hit=hit), activate=False)
+        with self._lock:
+            key = (cache, "hit" if hit else "miss")
+            self._cache_lookups[key] = self._cache_lookups.get(key, 0) + 1
+            self._write(span)
+
+    def _write(self, span: Span) -> None:
+        """Append a span to the trace file; the caller holds the lock."""
+        if self._file is None:
+            return
+        try:
+            self._file.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+            self.stats["written"] += 1
+        except (OSError, ValueError) as e:
+            self.stats["write_errors"] += 1
+            print(f"Error writing trace: {str(e)}")
+
+    def prometheus(self) -> str:
+        """
+        Render the aggregates in the Prometheus text exposition format.
+
+        Returns:
+            str: Span duration histograms, span error counts and cache lookup counts
+        """
+        with self._lock:
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+            errors = dict(self._errors)
+            cache_lookups = dict(self._cache_lookups)
+
+        lines = ["# HELP llmflow_span_duration_seconds Duration of traced operations.",
+                 "# TYPE llmflow_span_duration_seconds histogram"]
+        for (name, labels), values in sorted(histograms.items()):
+            pairs = (("span", name),) + labels
+            for bound, count in zip(BUCKETS + ("+Inf",), values):
+                lines.append(f"llmflow_span_duration_seconds_bucket{_labels(pairs + (('le', str(bound)),))} {count}")
+            lines.append(f"llmflow_span_duration_seconds_sum{_labels(pairs)} {values[-1]:.6f}")
+            lines.append(f"llmflow_span_duration_seconds_count{_labels(pairs)} {values[-2]}")
+        lines += ["# HELP llmflow_span_errors_total Traced operations that ended with an error.",
+                  "# TYPE llmflow_span_errors_total counter"]
+        for (name, labels), count in sorted(errors.items()):
+            lines.append(f"llmflow_span_errors_total{_labels((('span', name),) + labels)} {count}")
+        lines += ["# HELP llmflow_cache_lookups_total Cache lookups by cache and result.",
+                  "# TYPE llmflow_cache_lookups_total counter"]
+        for (cache, result), count in sorted(cache_lookups.items()):
+            lines.append(f"llmflow_cache_lookups_total{_labels((('cache', cache), ('result', result)))} {count}")
+        return "\n".join(lines) + "\n"
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get tracing counters.
+
+        Returns:
+            Dict[str, Any]: Whether tracing is enabled, the trace file, spans recorded, failed
+                spans, spans written, write errors, and cache hits and misses per cache
+        """
+        with self._lock:
+            stats = dict(self.stats, enabled=self.enabled, path=self.path)
+            caches: Dict[str, Dict[str, int]] = {}
+            for (cache, result), count in self._cache_lookups.items():
+                caches.setdefault(cache, {"hit": 0, "miss": 0})[result] = count
+        stats["cache_lookups"] = caches
+        return stats
+
+
+def _labels(pairs: Tuple[Tuple[str, str], ...]) -> str:
+    """Render Prometheus labels, escaping the values."""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+# Process-wide tracer; tools reach it through the module functions below
+TRACER = Tracer()
+
+
+def span(name: str, activate: bool = True, **attributes: Any):
+    """
+    Start a span on the process-wide tracer, to be used as a context manager.
+
+    Args:
+        name (str): Operation name
+        activate (bool): Make the span the parent of spans started inside it
+        **attributes: Details of the operation; "stage", "tool" and "host" also label its metrics
+
+    Returns:
+        Span: The span, or the shared no-op span while tracing is disabled
+    """
+    if not TRACER.enabled:
+        return NOOP_SPAN
+    return Span(TRACER, name, attributes, activate)
+
+
+def cache_lookup(cache: str, hit: Any, **attributes: Any) -> Any:
+    """
+    Record a cache lookup, wrapping the condition that decides whether it hit.
+
+    Args:
+        cache (str): Name of the cache, e.g. the tool owning it
+        hit (Any): Truthy on a hit
+        **attributes: Details written to the trace
+
+    Returns:
+        Any: hit, unchanged, so the call can wrap an existing if condition
+    """
+    if TRACER.enabled:
+        TRACER.record_cache_lookup(cache, bool(hit), attributes)
+    return hit
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """
+    Decorate a function so that each call runs in a span.
+
+    Args:
+        name (str): Span name
+
+    Returns:
+        Callable[[Callable], Callable]: The decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not TRACER.enabled:
+                return func(*args, **kwargs)
+            with Span(TRACER, name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+_instrument_lock = threading.Lock()
+_original_request: Optional[Callable] = None
+
+
+def instrument_requests() -> None:
+    """
+    Trace every request made with the requests library, as an "http" span.
+
+    Patches requests.Session.request once; tools calling requests.get and the
+    pooled Ollama client both go through it. The span ends when the response
+    headers arrive, so a streamed body is not included.
+    """
+    global _original_request
+    with _instrument_lock:
+        if _original_request is not None:
+            return
+        import requests
+        original = requests.Session.request
+
+        @functools.wraps(original)
+        def request(session, method, url, *args, **kwargs):
+            if not TRACER.enabled:
+                return original(session, method, url, *args, **kwargs)
+            parts = urlsplit(str(url))
+            with Span(TRACER, "http", {"method": str(method).upper(), "host": parts.netloc,
+                                       "path": parts.path}) as http_span:
+                response = original(session, method, url, *args, **kwargs)
+                http_span.set(status_code=response.status_code)
+                if response.status_code >= 500:
+                    http_span.fail(f"HTTP {response.status_code}")
+                return response
+
+        requests.Session.request = request
+        _original_request = original